@@ -8,12 +8,22 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils.dateparse import parse_date
+from django.utils import timezone
 from django.utils.timezone import make_aware
 from datetime import datetime, timedelta, time
 
+from django.db.models import Prefetch
+
 from empresas.models import Servico, Profissional, HorarioFuncionamento, DataEspecial, Empresa, ConfiguracaoWhatsApp
 from agendamentos.models import Agendamento
 from .authentication import APIKeyAuthentication
+from .contexto_bot import (
+    STATUS_OCUPAM_AGENDA,
+    calcular_disponibilidade,
+    calcular_slots_livres,
+    etag_contexto,
+    obter_contexto,
+)
 from django.conf import settings
 import logging
 
@@ -186,7 +196,9 @@ def listar_profissionais(request):
     profissionais = Profissional.objects.filter(
         empresa=empresa,
         ativo=True
-    ).prefetch_related('servicos').order_by('nome')
+    ).prefetch_related(
+        Prefetch('servicos', queryset=Servico.objects.filter(ativo=True))
+    ).order_by('nome')
 
     dados_profissionais = [
         {
@@ -194,7 +206,7 @@ def listar_profissionais(request):
             'nome': p.nome,
             'email': p.email,
             'telefone': p.telefone,
-            'servicos': [s.nome for s in p.servicos.filter(ativo=True)],
+            'servicos': [s.nome for s in p.servicos.all()],
             'cor_hex': p.cor_hex
         }
         for p in profissionais
@@ -470,6 +482,118 @@ def consultar_horarios_disponiveis(request):
     })
 
 
+# Limites do período de disponibilidade do /contexto/
+CONTEXTO_DIAS_PADRAO = 7
+CONTEXTO_DIAS_MAXIMO = 31
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def consultar_contexto(request):
+    """
+    Tudo que o bot precisa em uma chamada: serviços, profissionais,
+    horários de funcionamento, datas especiais e horários disponíveis de
+    vários dias. Substitui as 5 chamadas separadas por conversa.
+
+    GET /api/n8n/contexto/
+
+    Query params:
+    - data_inicio (opcional): YYYY-MM-DD (padrão: hoje)
+    - dias (opcional): quantidade de dias de disponibilidade (padrão 7, máx 31)
+    - servico_id (opcional): duração usada no cálculo dos horários
+    - profissional_id (opcional): disponibilidade de um profissional
+
+    Suporta If-None-Match: enquanto catálogo e agenda não mudam, responde
+    304 sem recalcular nada.
+
+    Response:
+    {
+        "sucesso": true,
+        "empresa": {"id": 5, "nome": "Barbearia do Zé", "telefone": "87999998888"},
+        "servicos": [...],
+        "profissionais": [...],
+        "horarios_funcionamento": [...],
+        "datas_especiais": [...],
+        "duracao_minutos": 30,
+        "disponibilidade": [
+            {
+                "data": "2025-12-23",
+                "data_formatada": "23/12/2025",
+                "dia_semana": "Terça-feira",
+                "fechado": false,
+                "mensagem": null,
+                "horarios_disponiveis": ["09:00", "09:30", ...]
+            },
+            ...
+        ]
+    }
+    """
+    empresa = request.empresa
+
+    data_inicio_str = request.GET.get('data_inicio')
+    data_inicio = parse_date(data_inicio_str) if data_inicio_str else timezone.localdate()
+    try:
+        dias = int(request.GET.get('dias') or CONTEXTO_DIAS_PADRAO)
+    except ValueError:
+        dias = 0
+    if not data_inicio or not 1 <= dias <= CONTEXTO_DIAS_MAXIMO:
+        return Response({
+            'sucesso': False,
+            'mensagem': f'Parâmetros inválidos. Use data_inicio=YYYY-MM-DD e dias entre 1 e {CONTEXTO_DIAS_MAXIMO}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    servico_id = request.GET.get('servico_id') or ''
+    profissional_id = request.GET.get('profissional_id') or ''
+
+    contexto = obter_contexto(empresa.id)
+    etag = f'"{etag_contexto(empresa.id, contexto, data_inicio, dias, servico_id, profissional_id)}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        resposta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        resposta['ETag'] = etag
+        return resposta
+
+    duracao_minutos = 30  # padrão
+    if servico_id:
+        servico = next((s for s in contexto['servicos'] if str(s['id']) == servico_id), None)
+        if servico:
+            duracao_minutos = servico['duracao_minutos']
+
+    if profissional_id and not any(str(p['id']) == profissional_id for p in contexto['profissionais']):
+        return Response({
+            'sucesso': False,
+            'mensagem': 'Profissional não encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    data_fim = data_inicio + timedelta(days=dias)
+    resposta = Response({
+        'sucesso': True,
+        'empresa': {
+            'id': empresa.id,
+            'nome': empresa.nome,
+            'telefone': empresa.telefone or '',
+        },
+        'servicos': contexto['servicos'],
+        'profissionais': [
+            {chave: valor for chave, valor in p.items() if chave != 'servicos_ids'}
+            for p in contexto['profissionais']
+        ],
+        'horarios_funcionamento': list(contexto['horarios'].values()),
+        'datas_especiais': [
+            d for d in contexto['datas_especiais'].values()
+            if data_inicio.isoformat() <= d['data'] < data_fim.isoformat()
+        ],
+        'duracao_minutos': duracao_minutos,
+        'disponibilidade': calcular_disponibilidade(
+            empresa.id, contexto, data_inicio, dias, duracao_minutos,
+            profissional_id=int(profissional_id) if profissional_id else None,
+        ),
+    })
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
 # ============================================
 # FUNÇÕES AUXILIARES
 # ============================================
@@ -507,52 +631,22 @@ def gerar_slots_disponiveis(empresa, profissional, data, hora_abertura, hora_fec
     Returns:
         Lista de strings com horários disponíveis ['09:00', '09:30', ...]
     """
-    horarios = []
-    hora_atual = datetime.combine(data, hora_abertura)
-    hora_fim = datetime.combine(data, hora_fechamento)
-
-    while hora_atual < hora_fim:
-        hora_slot = hora_atual.time()
-
-        # Calcular fim do atendimento
-        hora_fim_atendimento = hora_atual + timedelta(minutes=duracao_minutos)
-
-        # Verificar se passa do horário de fechamento
-        if hora_fim_atendimento > hora_fim:
-            break
-
-        # Verificar se está no intervalo (almoço)
-        if intervalo_inicio and intervalo_fim:
-            # Se o horário está dentro do intervalo, pular
-            if intervalo_inicio <= hora_slot < intervalo_fim:
-                hora_atual += timedelta(minutes=slot_minutos)
-                continue
-
-            # Se o atendimento terminaria dentro do intervalo, pular
-            hora_fim_atend_time = hora_fim_atendimento.time()
-            if hora_slot < intervalo_inicio < hora_fim_atend_time:
-                hora_atual += timedelta(minutes=slot_minutos)
-                continue
-
-        # Verificar se está livre (sem conflito de agendamento)
-        data_hora_inicio = make_aware(hora_atual)
-        data_hora_fim = make_aware(hora_fim_atendimento)
-
-        conflito_query = Agendamento.objects.filter(
-            empresa=empresa,
-            data_hora_inicio__lt=data_hora_fim,
-            data_hora_fim__gt=data_hora_inicio,
-            status__in=['pendente', 'confirmado']
-        )
-
-        # Se especificou profissional, filtrar por ele
-        if profissional:
-            conflito_query = conflito_query.filter(profissional=profissional)
-
-        if not conflito_query.exists():
-            horarios.append(hora_slot.strftime('%H:%M'))
+    # Uma query para o dia inteiro; os conflitos são checados em memória
+    inicio_dia = make_aware(datetime.combine(data, hora_abertura))
+    fim_dia = make_aware(datetime.combine(data, hora_fechamento))
+    ocupados = Agendamento.objects.filter(
+        empresa=empresa,
+        data_hora_inicio__lt=fim_dia,
+        data_hora_fim__gt=inicio_dia,
+        status__in=STATUS_OCUPAM_AGENDA
+    )
 
-        # Próximo slot
-        hora_atual += timedelta(minutes=slot_minutos)
+    # Se especificou profissional, filtrar por ele
+    if profissional:
+        ocupados = ocupados.filter(profissional=profissional)
 
-    return horarios
+    return calcular_slots_livres(
+        data, hora_abertura, hora_fechamento, intervalo_inicio, intervalo_fim,
+        duracao_minutos, list(ocupados.values_list('data_hora_inicio', 'data_hora_fim')),
+        slot_minutos=slot_minutos,
+    )
@@ -17,7 +17,8 @@ from django.db.models import Q
 from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Agendamento, LogMensagemBot
+from .models import Agendamento
+from .log_bot import novo_log_bot, registrar_log_bot
 from clientes.models import Cliente
 from empresas.models import Servico, Profissional, Empresa
 from .authentication import APIKeyAuthentication
@@ -79,15 +80,8 @@ def processar_comando_bot(request):
     # 📊 LOG DE AUDITORIA
     logger.info(f"[AUDIT] Request recebido | Empresa: {empresa.nome} (ID: {empresa.id}) | Telefone: {telefone} | Intenção: {intencao}")
 
-    # Criar log da interação
-    log = LogMensagemBot.objects.create(
-        empresa=empresa,
-        telefone=telefone,
-        mensagem_original=mensagem_original,
-        intencao_detectada=intencao,
-        dados_extraidos=dados,
-        status='parcial'  # Será atualizado no final
-    )
+    # Log da interação montado em memória (gravado uma única vez no final)
+    log = novo_log_bot(empresa, telefone, mensagem_original, intencao, dados)
 
     try:
         # Roteamento por intenção
@@ -112,10 +106,10 @@ def processar_comando_bot(request):
                 'mensagem': 'Desculpe, não entendi o que você quer fazer. Pode reformular?'
             }
 
-        # Atualizar log
+        # Finalizar e gravar log
         log.status = 'sucesso' if resultado['sucesso'] else 'erro'
         log.resposta_enviada = resultado['mensagem']
-        log.save()
+        registrar_log_bot(log)
 
         return Response(resultado)
 
@@ -124,7 +118,7 @@ def processar_comando_bot(request):
         log.status = 'erro'
         log.erro_detalhes = str(e)
         log.resposta_enviada = 'Ops! Algo deu errado. Tente novamente ou entre em contato.'
-        log.save()
+        registrar_log_bot(log)
 
         return Response({
             'sucesso': False,
@@ -279,9 +273,8 @@ def processar_agendamento(empresa, telefone, dados, log):
             f"Data: {data_hora_inicio.strftime('%d/%m/%Y %H:%M')}"
         )
 
-        # Vincular log ao agendamento
+        # Vincular log ao agendamento (persistido junto com o log no final)
         log.agendamento = agendamento
-        log.save()
 
     # 8. Retornar sucesso
     return {
@@ -358,7 +351,6 @@ def processar_cancelamento(empresa, telefone, dados, log):
     agendamento.save()
 
     log.agendamento = agendamento
-    log.save()
 
     return {
         'sucesso': True,
@@ -590,15 +582,9 @@ def whatsapp_webhook_saas(request):
                 'data_expiracao': assinatura.data_expiracao.strftime('%d/%m/%Y')
             }, status=status.HTTP_402_PAYMENT_REQUIRED)
 
-        # 5. Verificar limites do plano (agendamentos do mês)
-        from django.utils.timezone import now as django_now
-        inicio_mes = django_now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        agendamentos_mes = Agendamento.objects.filter(
-            empresa=empresa,
-            criado_em__gte=inicio_mes,
-            status__in=['pendente', 'confirmado', 'concluido']
-        ).count()
+        # 5. Verificar limites do plano (agendamentos do mês) - contador O(1)
+        from assinaturas.uso import uso_agendamentos_mes
+        agendamentos_mes = uso_agendamentos_mes(empresa)
 
         if agendamentos_mes >= assinatura.plano.max_agendamentos_mes:
             return Response({
@@ -630,15 +616,8 @@ def whatsapp_webhook_saas(request):
                 'plano': assinatura.plano.nome
             }, status=status.HTTP_200_OK)
 
-        # 7. Criar log da interação
-        log = LogMensagemBot.objects.create(
-            empresa=empresa,
-            telefone=telefone,
-            mensagem_original=mensagem_original,
-            intencao_detectada=intencao,
-            dados_extraidos=dados,
-            status='parcial'
-        )
+        # 7. Log da interação montado em memória (gravado uma única vez no final)
+        log = novo_log_bot(empresa, telefone, mensagem_original, intencao, dados)
 
         # 8. Rotear para lógica de processamento existente
         try:
@@ -663,10 +642,10 @@ def whatsapp_webhook_saas(request):
                     'mensagem': 'Desculpe, não entendi o que você quer fazer. Pode reformular?'
                 }
 
-            # Atualizar log
+            # Finalizar e gravar log
             log.status = 'sucesso' if resultado['sucesso'] else 'erro'
             log.resposta_enviada = resultado['mensagem']
-            log.save()
+            registrar_log_bot(log)
 
             return Response(resultado)
 
@@ -675,7 +654,7 @@ def whatsapp_webhook_saas(request):
             log.status = 'erro'
             log.erro_detalhes = str(e)
             log.resposta_enviada = 'Ops! Algo deu errado. Tente novamente.'
-            log.save()
+            registrar_log_bot(log)
 
             return Response({
                 'sucesso': False,
@@ -0,0 +1,173 @@
+"""
+Cache da página pública de agendamento (/agendar/<slug>/)
+
+A página é compartilhada em redes sociais e recebe picos de acesso. Antes,
+cada visualização buscava a empresa pelo slug, contava e listava os
+serviços, e cada chamada das APIs públicas resolvia empresa/serviço de
+novo.
+
+Agora:
+- Catálogo por empresa (perfil + serviços + profissionais por serviço)
+  montado com 3 queries e guardado no cache, com ETag e data de
+  atualização para respostas condicionais (304)
+- Invalidação por signals (agendamentos/signals.py) quando empresa,
+  serviços, profissionais ou horários mudam
+- Horários disponíveis com TTL curto, chaveados por
+  (slug, serviço, profissional, data, versão da ocupação). A versão da
+  ocupação muda a cada agendamento criado/alterado da empresa, então o
+  cache nunca mostra um horário que acabou de ser reservado
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Slug inexistente/inativo fica marcado por pouco tempo (protege o banco
+# de links quebrados sem atrasar a ativação de uma empresa nova)
+TTL_SLUG_INEXISTENTE = 60
+
+
+def _ttl_catalogo():
+    return getattr(settings, 'PUBLICO_CATALOGO_TTL', 60 * 60)
+
+
+def _ttl_horarios():
+    return getattr(settings, 'PUBLICO_HORARIOS_TTL', 60)
+
+
+def _chave_slug(slug):
+    return f'publico:slug:{slug}'
+
+
+def _chave_catalogo(empresa_id):
+    return f'publico:catalogo:{empresa_id}'
+
+
+def _chave_ocupacao(empresa_id):
+    return f'publico:ocupacao:{empresa_id}'
+
+
+def montar_catalogo(slug):
+    """
+    Monta o catálogo público da empresa direto do banco (3 queries).
+
+    Retorna None se a empresa não existe ou está inativa.
+    """
+    from empresas.models import Empresa, Servico, Profissional
+
+    empresa = Empresa.objects.filter(slug=slug, ativa=True).values(
+        'id', 'nome', 'slug', 'telefone', 'onboarding_completo'
+    ).first()
+    if not empresa:
+        return None
+
+    servicos = list(
+        Servico.objects.filter(empresa_id=empresa['id'], ativo=True)
+        .order_by('nome')
+        .values('id', 'nome', 'preco', 'duracao_minutos')
+    )
+
+    profissionais_por_servico = {servico['id']: [] for servico in servicos}
+    vinculos = Profissional.servicos.through.objects.filter(
+        servico_id__in=list(profissionais_por_servico),
+        profissional__ativo=True,
+    ).order_by('profissional__nome').values(
+        'servico_id', 'profissional__id', 'profissional__nome',
+        'profissional__email', 'profissional__cor_hex',
+    )
+    for vinculo in vinculos:
+        profissionais_por_servico[vinculo['servico_id']].append({
+            'id': vinculo['profissional__id'],
+            'nome': vinculo['profissional__nome'],
+            'email': vinculo['profissional__email'],
+            'cor_hex': vinculo['profissional__cor_hex'],
+        })
+
+    conteudo = repr((empresa, servicos, sorted(profissionais_por_servico.items())))
+    return {
+        'empresa': empresa,
+        'servicos': servicos,
+        'profissionais_por_servico': profissionais_por_servico,
+        'etag': hashlib.md5(conteudo.encode('utf-8')).hexdigest(),
+        'atualizado_em': timezone.now().replace(microsecond=0),
+    }
+
+
+def obter_catalogo(slug):
+    """
+    Catálogo público pelo slug (normalmente 2 GETs no cache, sem banco).
+
+    Retorna None se a empresa não existe ou está inativa.
+    """
+    empresa_id = cache.get(_chave_slug(slug))
+    if empresa_id == 0:
+        return None
+
+    if empresa_id:
+        catalogo = cache.get(_chave_catalogo(empresa_id))
+        # Slug pode ter mudado: o catálogo precisa ser do slug pedido
+        if catalogo and catalogo['empresa']['slug'] == slug:
+            return catalogo
+
+    catalogo = montar_catalogo(slug)
+    if catalogo is None:
+        cache.set(_chave_slug(slug), 0, TTL_SLUG_INEXISTENTE)
+        return None
+
+    empresa_id = catalogo['empresa']['id']
+    cache.set_many({
+        _chave_slug(slug): empresa_id,
+        _chave_catalogo(empresa_id): catalogo,
+    }, _ttl_catalogo())
+    return catalogo
+
+
+def invalidar_catalogo(empresa_id, slug=None):
+    """Descarta o catálogo da empresa (próximo acesso remonta do banco)."""
+    chaves = [_chave_catalogo(empresa_id)]
+    if slug:
+        chaves.append(_chave_slug(slug))
+    cache.delete_many(chaves)
+
+
+def versao_ocupacao(empresa_id):
+    """Versão atual da ocupação da agenda da empresa (muda a cada reserva)."""
+    versao = cache.get(_chave_ocupacao(empresa_id))
+    if versao is None:
+        versao = 1
+        cache.add(_chave_ocupacao(empresa_id), versao, None)
+    return versao
+
+
+def versoes_ocupacao(empresa_ids):
+    """Versão da ocupação de várias empresas numa ida ao cache ({id: versão})."""
+    versoes = cache.get_many([_chave_ocupacao(empresa_id) for empresa_id in empresa_ids])
+    return {empresa_id: versoes.get(_chave_ocupacao(empresa_id), 1) for empresa_id in empresa_ids}
+
+
+def invalidar_ocupacao(empresa_id):
+    """Muda a versão da ocupação: todos os horários em cache ficam obsoletos."""
+    try:
+        cache.incr(_chave_ocupacao(empresa_id))
+    except ValueError:
+        cache.set(_chave_ocupacao(empresa_id), 2, None)
+
+
+def chave_horarios(slug, empresa_id, servico_id, profissional_id, data):
+    return (
+        f'publico:horarios:{slug}:{servico_id}:{profissional_id}:'
+        f'{data.isoformat()}:{versao_ocupacao(empresa_id)}'
+    )
+
+
+def obter_horarios(chave):
+    return cache.get(chave)
+
+
+def guardar_horarios(chave, horarios):
+    cache.set(chave, horarios, _ttl_horarios())
@@ -0,0 +1,235 @@
+"""
+Capacidade e ocupação da agenda por profissional (mapa de calor)
+
+Mostra em quais horários da semana a agenda fica ociosa, para o dono
+planejar promoções. A única pista antes era a contagem de agendamentos
+do dashboard.
+
+Como é calculado (tudo em NumPy, resolução de minuto):
+1. Grade semanal da empresa (HorarioFuncionamento, menos o intervalo) e
+   de cada profissional (DisponibilidadeProfissional). Dia da semana sem
+   disponibilidade cadastrada não restringe o profissional, como em
+   _profissional_disponivel (agendamentos/views.py)
+2. Capacidade por dia = grade da empresa no dia da semana, trocada pelo
+   horário especial/feriado (DataEspecial), E a do profissional:
+   matriz booleana profissional x dia x minuto
+3. Ocupação: cada agendamento não cancelado marca +1 no minuto de início
+   e -1 no de fim; a soma acumulada (cumsum) diz quais minutos estão
+   ocupados, sem laço por agendamento
+4. Minutos somados em faixas (RELATORIOS_INTERVALO_OCUPACAO) e os dias
+   agrupados por dia da semana com uma multiplicação de matrizes
+
+O resultado fica no cache pela versão da ocupação, que muda com
+agendamentos, horários, datas especiais, profissionais e disponibilidades
+(agendamentos/signals.py).
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+
+from .cache_publico import versao_ocupacao
+from .models import DisponibilidadeProfissional
+from .relatorios import CANCELADO, MINUTOS_DIA, PeriodoInvalido, _config, extrair
+
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+INTERVALOS = (15, 30, 60)
+
+
+def _minuto(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _marcar(dia, inicio, fim, valor=True):
+    """Marca [inicio, fim) na máscara de minutos do dia"""
+    if inicio is not None and fim is not None and fim > inicio:
+        dia[_minuto(inicio):_minuto(fim)] = valor
+
+
+def grade_empresa(empresa_id, inicio, dias):
+    """Minutos de funcionamento de cada dia do período: bool (dias, 1440)"""
+    from empresas.models import DataEspecial, HorarioFuncionamento
+
+    semana = np.zeros((7, MINUTOS_DIA), dtype=bool)
+    for horario in HorarioFuncionamento.objects.filter(empresa_id=empresa_id, ativo=True):
+        dia = np.zeros(MINUTOS_DIA, dtype=bool)
+        _marcar(dia, horario.hora_abertura, horario.hora_fechamento)
+        _marcar(dia, horario.intervalo_inicio, horario.intervalo_fim, False)
+        semana[horario.dia_semana] |= dia
+
+    dias_semana = (inicio.weekday() + np.arange(dias)) % 7
+    grade = semana[dias_semana]
+    especiais = DataEspecial.objects.filter(
+        empresa_id=empresa_id, data__range=(inicio, inicio + timedelta(days=dias - 1))
+    ).values_list('data', 'tipo', 'hora_abertura', 'hora_fechamento')
+    for data, tipo, abertura, fechamento in especiais:
+        dia = grade[(data - inicio).days]
+        dia[:] = False
+        if tipo == 'especial':
+            _marcar(dia, abertura, fechamento)
+    return grade, dias_semana
+
+
+def grade_profissionais(profissionais):
+    """Disponibilidade semanal de cada profissional: bool (profissionais, 7, 1440)"""
+    indices = {profissional_id: linha for linha, profissional_id in enumerate(profissionais)}
+    grade = np.ones((len(profissionais), 7, MINUTOS_DIA), dtype=bool)
+    restritos = set()
+    disponibilidades = DisponibilidadeProfissional.objects.filter(
+        profissional_id__in=profissionais, ativo=True
+    ).values_list('profissional_id', 'dia_semana', 'hora_inicio', 'hora_fim')
+    for profissional_id, dia_semana, hora_inicio, hora_fim in disponibilidades:
+        linha = indices[profissional_id]
+        if (linha, dia_semana) not in restritos:
+            grade[linha, dia_semana] = False
+            restritos.add((linha, dia_semana))
+        _marcar(grade[linha, dia_semana], hora_inicio, hora_fim)
+    return grade
+
+
+def minutos_ocupados(colunas, profissionais, dias):
+    """Minutos com agendamento (não cancelado) de cada profissional: bool (profissionais, dias, 1440)"""
+    indices = {profissional_id: linha for linha, profissional_id in enumerate(profissionais)}
+    linha_por_indice = np.array([indices.get(p, -1) for p in colunas['profissionais']], dtype=np.int64)
+    linhas = linha_por_indice[colunas['profissional']]
+    validos = (linhas >= 0) & (colunas['status'] != CANCELADO)
+
+    total = dias * MINUTOS_DIA
+    comeco = colunas['minuto'][validos].astype(np.int64)
+    final = np.clip(comeco + colunas['duracao'][validos], 0, total)
+    comeco = np.clip(comeco, 0, total)
+    linhas = linhas[validos]
+
+    # int16 também na soma acumulada (o padrão do cumsum seria int64): com
+    # 366 dias x 20 profissionais são ~21 MB em vez de ~84 MB. Só estoura
+    # com mais de 32 mil agendamentos sobrepostos no mesmo profissional
+    marcas = np.zeros((len(profissionais), total + 1), dtype=np.int16)
+    np.add.at(marcas, (linhas, comeco), 1)
+    np.add.at(marcas, (linhas, final), -1)
+    ocupados = np.cumsum(marcas, axis=1, dtype=np.int16)[:, :total] > 0
+    return ocupados.reshape(len(profissionais), dias, MINUTOS_DIA)
+
+
+def _percentuais(ocupados, capacidade):
+    """Ocupação em % com uma casa; None onde não há capacidade (fechado)"""
+    percentual = np.round(np.divide(
+        ocupados * 100.0, capacidade, out=np.zeros(capacidade.shape), where=capacidade > 0
+    ), 1)
+    return np.where(capacidade > 0, percentual, np.nan)
+
+
+def _total(ocupados, capacidade):
+    """Ocupação geral em % de uma matriz de faixas"""
+    capacidade = int(capacidade.sum())
+    return round(int(ocupados.sum()) * 100 / capacidade, 1) if capacidade else 0.0
+
+
+def _lista(matriz):
+    return [[None if np.isnan(valor) else float(valor) for valor in linha] for linha in matriz]
+
+
+def calcular(empresa_id, inicio, fim, intervalo=30):
+    """
+    Mapa de ocupação do período direto do banco (sem cache).
+
+    Returns:
+        dict: 'horarios' (início de cada faixa), 'geral' e 'profissionais'
+              com 'ocupacao' (7 x faixas, % ou None se fechado), minutos de
+              capacidade e ocupados, e 'ociosos' (faixas menos ocupadas)
+    """
+    from empresas.models import Profissional
+
+    dias = (fim - inicio).days + 1
+    colunas = extrair(empresa_id, inicio, fim)
+    nomes = dict(Profissional.objects.filter(empresa_id=empresa_id, ativo=True).values_list('id', 'nome'))
+    faltantes = [p for p in colunas['profissionais'] if p is not None and p not in nomes]
+    nomes.update(Profissional.objects.filter(pk__in=faltantes).values_list('id', 'nome'))
+    profissionais = list(nomes)
+
+    empresa, dias_semana = grade_empresa(empresa_id, inicio, dias)
+    capacidade = empresa[np.newaxis] & grade_profissionais(profissionais)[:, dias_semana]
+    ocupado = minutos_ocupados(colunas, profissionais, dias) & capacidade
+
+    # (profissional, dia, minuto) -> (profissional, dia da semana, faixa)
+    faixas = MINUTOS_DIA // intervalo
+    por_dia_semana = (np.arange(7)[:, np.newaxis] == dias_semana).astype(np.int32)
+
+    def por_faixa(matriz):
+        minutos = matriz.reshape(len(profissionais), dias, faixas, intervalo).sum(axis=3, dtype=np.int32)
+        return np.matmul(por_dia_semana, minutos)
+
+    capacidade_faixas, ocupado_faixas = por_faixa(capacidade), por_faixa(ocupado)
+    capacidade_geral, ocupado_geral = capacidade_faixas.sum(axis=0), ocupado_faixas.sum(axis=0)
+
+    # Só as faixas em que a empresa abre em algum dia da semana
+    abertas = np.flatnonzero(capacidade_geral.any(axis=0))
+    recorte = slice(abertas[0], abertas[-1] + 1) if len(abertas) else slice(0, 0)
+    capacidade_faixas, ocupado_faixas = capacidade_faixas[..., recorte], ocupado_faixas[..., recorte]
+    capacidade_geral, ocupado_geral = capacidade_geral[:, recorte], ocupado_geral[:, recorte]
+    horarios = [
+        f'{minuto // 60:02d}:{minuto % 60:02d}'
+        for minuto in range(recorte.start * intervalo, recorte.stop * intervalo, intervalo)
+    ]
+
+    geral = _percentuais(ocupado_geral, capacidade_geral)
+    candidatos = np.flatnonzero(~np.isnan(geral.ravel()))
+    ociosos = candidatos[np.argsort(geral.ravel()[candidatos], kind='stable')][:_config('OCIOSOS', 10)]
+
+    return {
+        'periodo': {'inicio': inicio.isoformat(), 'fim': fim.isoformat(), 'dias': dias},
+        'intervalo': intervalo,
+        'dias_semana': DIAS_SEMANA,
+        'horarios': horarios,
+        'geral': {
+            'ocupacao': _lista(geral),
+            'capacidade_minutos': int(capacidade_geral.sum()),
+            'ocupados_minutos': int(ocupado_geral.sum()),
+            'percentual': _total(ocupado_geral, capacidade_geral),
+        },
+        'profissionais': [
+            {
+                'id': profissional_id,
+                'nome': nomes[profissional_id],
+                'ocupacao': _lista(_percentuais(ocupado_faixas[linha], capacidade_faixas[linha])),
+                'capacidade_minutos': int(capacidade_faixas[linha].sum()),
+                'ocupados_minutos': int(ocupado_faixas[linha].sum()),
+                'percentual': _total(ocupado_faixas[linha], capacidade_faixas[linha]),
+            }
+            for linha, profissional_id in enumerate(profissionais)
+        ],
+        'ociosos': [
+            {
+                'dia_semana': DIAS_SEMANA[indice // len(horarios)],
+                'horario': horarios[indice % len(horarios)],
+                'ocupacao': float(geral.ravel()[indice]),
+            }
+            for indice in ociosos
+        ],
+    }
+
+
+def mapa_ocupacao(empresa_id, inicio, fim, intervalo=None):
+    """
+    Mapa de ocupação do período (datas inclusive), do cache ou calculado.
+
+    Raises:
+        PeriodoInvalido: período invertido, longo demais ou intervalo fora de INTERVALOS
+    """
+    intervalo = intervalo or _config('INTERVALO_OCUPACAO', 30)
+    if intervalo not in INTERVALOS:
+        raise PeriodoInvalido(f'Intervalo deve ser um de {", ".join(map(str, INTERVALOS))} minutos')
+    if fim < inicio:
+        raise PeriodoInvalido('A data final é anterior à inicial')
+    if (fim - inicio).days + 1 > _config('MAX_DIAS', 366):
+        raise PeriodoInvalido(f"Período máximo: {_config('MAX_DIAS', 366)} dias")
+
+    chave = (
+        f'relatorios:ocupacao:{empresa_id}:{inicio.isoformat()}:{fim.isoformat()}:'
+        f'{intervalo}:{versao_ocupacao(empresa_id)}'
+    )
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular(empresa_id, inicio, fim, intervalo)
+        cache.set(chave, dados, _config('CACHE_TTL', 3600))
+    return dados
@@ -0,0 +1,239 @@
+"""
+Contexto do bot (n8n) em uma única chamada
+
+Antes, a cada conversa o workflow do n8n chamava serviços, profissionais,
+horários de funcionamento, datas especiais e horários disponíveis em
+requisições separadas — e o cálculo de horários fazia um exists() por
+slot de 30 minutos.
+
+Agora:
+- O "catálogo do bot" (serviços, profissionais com seus serviços,
+  horários e datas especiais futuras) é montado com 4 queries e fica no
+  cache por empresa, invalidado pelos signals (agendamentos/signals.py)
+- A disponibilidade de vários dias sai de UMA query de agendamentos no
+  período, com os slots calculados em memória (calcular_slots_livres)
+- O ETag combina o catálogo com a versão da ocupação
+  (cache_publico.versao_ocupacao): o n8n revalida com If-None-Match e
+  recebe 304 sem nenhum cálculo enquanto nada mudou
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from .cache_publico import versao_ocupacao
+
+TTL_CONTEXTO = 60 * 60  # 1 hora (invalidado por signals antes disso)
+
+# Status que ocupam a agenda (mesmo critério de gerar_slots_disponiveis)
+STATUS_OCUPAM_AGENDA = ['pendente', 'confirmado']
+
+DIAS_SEMANA = ['Segunda-feira', 'Terça-feira', 'Quarta-feira', 'Quinta-feira', 'Sexta-feira', 'Sábado', 'Domingo']
+
+
+def _chave_contexto(empresa_id):
+    return f'bot:contexto:{empresa_id}'
+
+
+def _hora(valor):
+    return valor.strftime('%H:%M') if valor else None
+
+
+def montar_contexto(empresa_id):
+    """Catálogo do bot direto do banco (4 queries)."""
+    from empresas.models import Servico, Profissional, HorarioFuncionamento, DataEspecial
+
+    servicos = [
+        {
+            'id': s.id,
+            'nome': s.nome,
+            'descricao': s.descricao,
+            'preco': str(s.preco),
+            'duracao_minutos': s.duracao_minutos,
+        }
+        for s in Servico.objects.filter(empresa_id=empresa_id, ativo=True).order_by('nome')
+    ]
+    nomes_servicos = {s['id']: s['nome'] for s in servicos}
+
+    servicos_por_profissional = {}
+    vinculos = Profissional.servicos.through.objects.filter(
+        profissional__empresa_id=empresa_id,
+        profissional__ativo=True,
+        servico__ativo=True,
+    ).order_by('servico__nome').values_list('profissional_id', 'servico_id')
+    for profissional_id, servico_id in vinculos:
+        servicos_por_profissional.setdefault(profissional_id, []).append(servico_id)
+
+    profissionais = [
+        {
+            'id': p.id,
+            'nome': p.nome,
+            'email': p.email,
+            'telefone': p.telefone,
+            'servicos': [nomes_servicos[s] for s in servicos_por_profissional.get(p.id, []) if s in nomes_servicos],
+            'servicos_ids': servicos_por_profissional.get(p.id, []),
+            'cor_hex': p.cor_hex,
+        }
+        for p in Profissional.objects.filter(empresa_id=empresa_id, ativo=True).order_by('nome')
+    ]
+
+    horarios = {
+        h.dia_semana: {
+            'dia_semana': h.dia_semana,
+            'dia_semana_nome': DIAS_SEMANA[h.dia_semana],
+            'hora_abertura': _hora(h.hora_abertura),
+            'hora_fechamento': _hora(h.hora_fechamento),
+            'intervalo_inicio': _hora(h.intervalo_inicio),
+            'intervalo_fim': _hora(h.intervalo_fim),
+        }
+        for h in HorarioFuncionamento.objects.filter(empresa_id=empresa_id, ativo=True).order_by('dia_semana')
+    }
+
+    hoje = timezone.localdate()
+    datas_especiais = {
+        d.data.isoformat(): {
+            'data': d.data.isoformat(),
+            'data_formatada': d.data.strftime('%d/%m/%Y'),
+            'descricao': d.descricao,
+            'tipo': d.tipo,
+            'hora_abertura': _hora(d.hora_abertura),
+            'hora_fechamento': _hora(d.hora_fechamento),
+        }
+        for d in DataEspecial.objects.filter(empresa_id=empresa_id, data__gte=hoje - timedelta(days=1)).order_by('data')
+    }
+
+    conteudo = repr((servicos, profissionais, sorted(horarios.items()), sorted(datas_especiais.items())))
+    return {
+        'servicos': servicos,
+        'profissionais': profissionais,
+        'horarios': horarios,
+        'datas_especiais': datas_especiais,
+        'etag': hashlib.md5(conteudo.encode('utf-8')).hexdigest(),
+    }
+
+
+def obter_contexto(empresa_id):
+    """Catálogo do bot (um GET no cache; monta do banco no miss)."""
+    contexto = cache.get(_chave_contexto(empresa_id))
+    if contexto is None:
+        contexto = montar_contexto(empresa_id)
+        cache.set(_chave_contexto(empresa_id), contexto, TTL_CONTEXTO)
+    return contexto
+
+
+def invalidar_contexto_bot(empresa_id):
+    """Descarta o catálogo do bot (chamado pelos signals e pela importação)."""
+    cache.delete(_chave_contexto(empresa_id))
+
+
+def etag_contexto(empresa_id, contexto, *parametros):
+    """ETag da resposta: catálogo + versão da ocupação + parâmetros da consulta."""
+    base = ':'.join(str(p) for p in (contexto['etag'], versao_ocupacao(empresa_id), *parametros))
+    return hashlib.md5(base.encode('utf-8')).hexdigest()
+
+
+def calcular_slots_livres(data, hora_abertura, hora_fechamento, intervalo_inicio, intervalo_fim,
+                          duracao_minutos, ocupados, slot_minutos=30):
+    """
+    Horários livres do dia, sem acessar o banco.
+
+    Args:
+        ocupados: lista de (inicio, fim) aware dos agendamentos que ocupam a agenda
+
+    Returns:
+        Lista de strings ['09:00', '09:30', ...]
+    """
+    horarios = []
+    hora_atual = datetime.combine(data, hora_abertura)
+    hora_fim = datetime.combine(data, hora_fechamento)
+
+    while hora_atual < hora_fim:
+        hora_slot = hora_atual.time()
+        hora_fim_atendimento = hora_atual + timedelta(minutes=duracao_minutos)
+
+        # Passa do horário de fechamento
+        if hora_fim_atendimento > hora_fim:
+            break
+
+        proximo = hora_atual + timedelta(minutes=slot_minutos)
+
+        # Intervalo (almoço): começa dentro dele ou termina depois do início
+        if intervalo_inicio and intervalo_fim:
+            if intervalo_inicio <= hora_slot < intervalo_fim or \
+                    hora_slot < intervalo_inicio < hora_fim_atendimento.time():
+                hora_atual = proximo
+                continue
+
+        inicio = make_aware(hora_atual)
+        fim = make_aware(hora_fim_atendimento)
+        if not any(o_inicio < fim and o_fim > inicio for o_inicio, o_fim in ocupados):
+            horarios.append(hora_slot.strftime('%H:%M'))
+
+        hora_atual = proximo
+
+    return horarios
+
+
+def _parse_hora(texto):
+    return datetime.strptime(texto, '%H:%M').time() if texto else None
+
+
+def calcular_disponibilidade(empresa_id, contexto, data_inicio, dias, duracao_minutos, profissional_id=None):
+    """
+    Disponibilidade de `dias` dias a partir de data_inicio com UMA query.
+
+    Returns:
+        Lista de {'data', 'data_formatada', 'dia_semana', 'fechado',
+        'mensagem', 'horarios_disponiveis'}
+    """
+    from .models import Agendamento
+
+    data_fim = data_inicio + timedelta(days=dias)
+    agendamentos = Agendamento.objects.filter(
+        empresa_id=empresa_id,
+        data_hora_inicio__lt=make_aware(datetime.combine(data_fim, datetime.min.time())),
+        data_hora_fim__gt=make_aware(datetime.combine(data_inicio, datetime.min.time())),
+        status__in=STATUS_OCUPAM_AGENDA,
+    )
+    if profissional_id:
+        agendamentos = agendamentos.filter(profissional_id=profissional_id)
+    ocupados = list(agendamentos.values_list('data_hora_inicio', 'data_hora_fim'))
+
+    resultado = []
+    for indice in range(dias):
+        data = data_inicio + timedelta(days=indice)
+        dia = {
+            'data': data.isoformat(),
+            'data_formatada': data.strftime('%d/%m/%Y'),
+            'dia_semana': DIAS_SEMANA[data.weekday()],
+            'fechado': False,
+            'mensagem': None,
+            'horarios_disponiveis': [],
+        }
+        resultado.append(dia)
+
+        especial = contexto['datas_especiais'].get(data.isoformat())
+        horario = contexto['horarios'].get(data.weekday())
+        if especial and especial['tipo'] == 'feriado':
+            dia.update(fechado=True, mensagem=f"Fechado: {especial['descricao']}")
+            continue
+        if especial and especial['tipo'] == 'especial':
+            abertura, fechamento = especial['hora_abertura'], especial['hora_fechamento']
+            intervalo = (None, None)
+        elif horario:
+            abertura, fechamento = horario['hora_abertura'], horario['hora_fechamento']
+            intervalo = (horario['intervalo_inicio'], horario['intervalo_fim'])
+        else:
+            dia.update(fechado=True, mensagem='Fechado neste dia')
+            continue
+
+        dia['horarios_disponiveis'] = calcular_slots_livres(
+            data, _parse_hora(abertura), _parse_hora(fechamento),
+            _parse_hora(intervalo[0]), _parse_hora(intervalo[1]),
+            duracao_minutos, ocupados,
+        )
+
+    return resultado
@@ -0,0 +1,150 @@
+"""
+Atualizações do calendário em tempo real (Server-Sent Events)
+
+Calendário e painel ficam abertos o dia todo; sem push, só descobrem
+agendamentos feitos pelo WhatsApp ou pela página pública recarregando.
+
+Fluxo:
+- Signals de Agendamento (post_save/post_delete) publicam, após o commit,
+  um evento compacto no canal Redis ``calendario:<empresa_id>``
+- /app/agendamentos/api/eventos/ (view async, só sob ASGI) assina o canal
+  e repassa cada evento como SSE; o calendário remove exclusões na hora
+  e busca o resto pelo feed incremental (feed_calendario, since=<cursor>)
+- Limite de conexões simultâneas por empresa num sorted set do Redis
+  (membro = conexão, score = último heartbeat): conexões que morreram
+  sem avisar expiram sozinhas
+
+Sem CALENDARIO_SSE_REDIS_URL (ou fora do ASGI) o endpoint responde 503 e
+o calendário volta a atualizar por intervalo.
+
+Evento publicado:
+    {"op": "u" | "d", "id": 12, "inicio": 1729350000, "profissional": 3, "status": "confirmado"}
+"""
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_cliente_sync = None
+
+
+def sse_habilitado():
+    return bool(getattr(settings, 'CALENDARIO_SSE_REDIS_URL', '')) and getattr(settings, 'SERVIDOR_ASGI', False)
+
+
+def _canal(empresa_id):
+    return f'calendario:{empresa_id}'
+
+
+def _chave_conexoes(empresa_id):
+    return f'calendario:conexoes:{empresa_id}'
+
+
+def _heartbeat():
+    return getattr(settings, 'CALENDARIO_SSE_HEARTBEAT', 15)
+
+
+def _redis_sync():
+    global _cliente_sync
+    if _cliente_sync is None:
+        import redis
+        _cliente_sync = redis.Redis.from_url(
+            settings.CALENDARIO_SSE_REDIS_URL, socket_timeout=2, socket_connect_timeout=2
+        )
+    return _cliente_sync
+
+
+def evento_agendamento(agendamento, op):
+    """Evento compacto de mudança ('u' = criado/alterado, 'd' = excluído)"""
+    return {
+        'op': op,
+        'id': agendamento.pk,
+        'inicio': int(agendamento.data_hora_inicio.timestamp()),
+        'profissional': agendamento.profissional_id,
+        'status': agendamento.status,
+    }
+
+
+def publicar_mudanca(empresa_id, evento):
+    """Publica o evento no canal da empresa. Falha do Redis só é logada."""
+    if not getattr(settings, 'CALENDARIO_SSE_REDIS_URL', ''):
+        return
+    try:
+        _redis_sync().publish(_canal(empresa_id), json.dumps(evento, separators=(',', ':')))
+    except Exception as e:
+        logger.warning(f"Falha ao publicar evento do calendário (empresa {empresa_id}): {e}")
+
+
+def _formatar_sse(dados, evento=None):
+    linhas = f'event: {evento}\n' if evento else ''
+    return f'{linhas}data: {dados}\n\n'
+
+
+async def abrir_conexao(empresa_id):
+    """
+    Reserva uma vaga de conexão SSE para a empresa.
+
+    Retorna (redis, conexao_id) ou None se o limite foi atingido.
+    """
+    import redis.asyncio as redis_async
+
+    cliente = redis_async.Redis.from_url(settings.CALENDARIO_SSE_REDIS_URL)
+    chave = _chave_conexoes(empresa_id)
+    conexao_id = uuid.uuid4().hex
+    agora = time.time()
+
+    async with cliente.pipeline(transaction=True) as pipe:
+        # Expira conexões sem heartbeat (worker reiniciado, rede caiu)
+        pipe.zremrangebyscore(chave, '-inf', agora - 3 * _heartbeat())
+        pipe.zadd(chave, {conexao_id: agora})
+        pipe.zcard(chave)
+        pipe.expire(chave, 3 * _heartbeat())
+        *_, total, _ = await pipe.execute()
+
+    if total > getattr(settings, 'CALENDARIO_SSE_MAX_CONEXOES', 20):
+        await cliente.zrem(chave, conexao_id)
+        await cliente.aclose()
+        return None
+    return cliente, conexao_id
+
+
+async def fluxo_eventos(empresa_id, cliente, conexao_id):
+    """
+    Gerador do corpo SSE: repassa os eventos do canal, manda heartbeat
+    (comentário) a cada CALENDARIO_SSE_HEARTBEAT segundos e encerra após
+    CALENDARIO_SSE_DURACAO_MAX para o navegador reconectar (a sessão é
+    revalidada e o worker não fica preso a uma conexão eterna).
+    """
+    chave = _chave_conexoes(empresa_id)
+    heartbeat = _heartbeat()
+    limite = time.monotonic() + getattr(settings, 'CALENDARIO_SSE_DURACAO_MAX', 600)
+    pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(_canal(empresa_id))
+        # retry: espera do navegador antes de reconectar; 'pronto' avisa o
+        # cliente para buscar o que mudou enquanto estava desconectado
+        yield f'retry: 5000\n{_formatar_sse("{}", "pronto")}'
+
+        proximo_heartbeat = time.monotonic() + heartbeat
+        while time.monotonic() < limite:
+            espera = max(0.0, proximo_heartbeat - time.monotonic())
+            mensagem = await pubsub.get_message(timeout=espera)
+            if mensagem is not None:
+                yield _formatar_sse(mensagem['data'].decode('utf-8'), 'agendamento')
+                continue
+            if time.monotonic() >= proximo_heartbeat:
+                await cliente.zadd(chave, {conexao_id: time.time()})
+                await cliente.expire(chave, 3 * heartbeat)
+                proximo_heartbeat = time.monotonic() + heartbeat
+                yield ': ping\n\n'
+    finally:
+        # Também roda quando o navegador fecha a aba (o servidor cancela o gerador)
+        try:
+            await pubsub.aclose()
+            await cliente.zrem(chave, conexao_id)
+        finally:
+            await cliente.aclose()
@@ -0,0 +1,201 @@
+"""
+Feed do calendário (v2): /app/agendamentos/api/feed/
+
+O endpoint antigo (api_agendamentos) remonta a lista inteira de eventos
+da faixa visível a cada navegação/atualização, com um dict verboso por
+evento (nomes e cores repetidos em todos). Numa agenda cheia com vários
+profissionais isso são centenas de eventos reenviados a cada refresh.
+
+O feed v2:
+- Filtra por faixa de data_hora_inicio (índice empresa + data_hora_inicio),
+  sem __date/__month
+- Payload colunar: uma lista por campo, com tabelas de consulta para
+  profissionais (nome, cor) e serviços; horários em epoch (segundos) e
+  duração em minutos
+- Modo incremental: com since=<cursor> devolve só o que mudou desde o
+  cursor (índice empresa + atualizado_em) e os ids que saíram da faixa,
+  foram cancelados ou excluídos (AgendamentoRemovido)
+- ETag do conteúdo: sem mudanças, responde 304
+
+Formato da resposta:
+    {
+      "versao": 2,
+      "cursor": "1729350000123",          # repassar em since=
+      "completo": true,                   # false = delta sobre o que o cliente tem
+      "status": ["pendente", ...],        # eventos.status são índices daqui
+      "profissionais": {"3": ["Ana", "#e11d48"]},
+      "servicos": {"5": "Corte"},
+      "eventos": {"id": [...], "inicio": [...], "duracao": [...], "status": [...],
+                  "cliente": [...], "servico": [...], "profissional": [...], "valor": [...]},
+      "removidos": [12, 15]
+    }
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Agendamento, AgendamentoRemovido, StatusAgendamento
+
+VERSAO_FEED = 2
+
+# Status exibidos no calendário (cancelados saem da tela)
+STATUS_FEED = [
+    StatusAgendamento.PENDENTE,
+    StatusAgendamento.CONFIRMADO,
+    StatusAgendamento.CONCLUIDO,
+    StatusAgendamento.NAO_COMPARECEU,
+]
+_INDICE_STATUS = {status: indice for indice, status in enumerate(STATUS_FEED)}
+
+# Sobreposição ao usar o cursor: uma transação que gravou atualizado_em
+# antes do cursor mas só fez commit depois ainda aparece no delta seguinte
+# (reenviar um evento é inofensivo: o cliente substitui pelo id)
+MARGEM_CURSOR = timedelta(seconds=5)
+
+COLUNAS = ('id', 'inicio', 'duracao', 'status', 'cliente', 'servico', 'profissional', 'valor')
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _retencao_removidos():
+    return timedelta(days=getattr(settings, 'CALENDARIO_REMOVIDOS_RETENCAO_DIAS', 30))
+
+
+def faixa_datas(inicio, fim):
+    """Converte datas (date) da faixa do calendário em datetimes aware [inicio, fim)"""
+    return (
+        timezone.make_aware(datetime.combine(inicio, time.min)),
+        timezone.make_aware(datetime.combine(fim, time.min)),
+    )
+
+
+def gerar_cursor(instante):
+    return str(int(instante.timestamp() * 1000))
+
+
+def ler_cursor(valor):
+    """Cursor (epoch em ms) -> datetime UTC; CursorInvalido se malformado"""
+    try:
+        return datetime.fromtimestamp(int(valor) / 1000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise CursorInvalido(f'Cursor inválido: {valor}')
+
+
+def _epoch(valor):
+    return int(valor.timestamp())
+
+
+def montar_feed(empresa_id, inicio, fim, profissionais_ids=None, desde=None):
+    """
+    Monta o payload do feed para a faixa [inicio, fim) (datetimes aware).
+
+    Com ``desde`` (datetime do cursor) devolve apenas as mudanças; se o
+    cursor for mais antigo que a retenção dos registros de exclusão, cai
+    para a carga completa (o cliente recebe completo=true e recomeça).
+    """
+    agora = timezone.now()
+    if desde is not None and desde < agora - _retencao_removidos():
+        desde = None
+
+    campos = (
+        'id', 'data_hora_inicio', 'data_hora_fim', 'status', 'cliente__nome',
+        'servico_id', 'profissional_id', 'valor_cobrado',
+    )
+    agendamentos = Agendamento.objects.filter(empresa_id=empresa_id).order_by()
+    removidos = []
+
+    if desde is None:
+        agendamentos = agendamentos.filter(
+            data_hora_inicio__gte=inicio,
+            data_hora_inicio__lt=fim,
+            status__in=STATUS_FEED,
+        )
+        if profissionais_ids:
+            agendamentos = agendamentos.filter(profissional_id__in=profissionais_ids)
+        linhas = list(agendamentos.order_by('data_hora_inicio', 'id').values_list(*campos))
+    else:
+        # Tudo que mudou desde o cursor; o que não pertence mais à faixa
+        # (cancelado, movido, de outro profissional) vira remoção
+        linhas = []
+        alterados = agendamentos.filter(
+            atualizado_em__gt=desde - MARGEM_CURSOR
+        ).order_by('data_hora_inicio', 'id').values_list(*campos)
+        for linha in alterados:
+            visivel = (
+                inicio <= linha[1] < fim
+                and linha[3] in _INDICE_STATUS
+                and (not profissionais_ids or linha[6] in profissionais_ids)
+            )
+            if visivel:
+                linhas.append(linha)
+            else:
+                removidos.append(linha[0])
+        removidos.extend(
+            AgendamentoRemovido.objects.filter(
+                empresa_id=empresa_id,
+                removido_em__gt=desde - MARGEM_CURSOR,
+            ).values_list('agendamento_id', flat=True)
+        )
+
+    eventos = {coluna: [] for coluna in COLUNAS}
+    for id_, inicio_ag, fim_ag, status, cliente, servico_id, profissional_id, valor in linhas:
+        eventos['id'].append(id_)
+        eventos['inicio'].append(_epoch(inicio_ag))
+        eventos['duracao'].append(int((fim_ag - inicio_ag).total_seconds() // 60))
+        eventos['status'].append(_INDICE_STATUS[status])
+        eventos['cliente'].append(cliente)
+        eventos['servico'].append(servico_id)
+        eventos['profissional'].append(profissional_id)
+        eventos['valor'].append(float(valor or 0))
+
+    return {
+        'versao': VERSAO_FEED,
+        'cursor': gerar_cursor(agora),
+        'completo': desde is None,
+        'status': [str(status) for status in STATUS_FEED],
+        'profissionais': _tabela_profissionais(set(filter(None, eventos['profissional']))),
+        'servicos': _tabela_servicos(set(filter(None, eventos['servico']))),
+        'eventos': eventos,
+        'removidos': sorted(set(removidos)),
+    }
+
+
+def _tabela_profissionais(ids):
+    from empresas.models import Profissional
+
+    if not ids:
+        return {}
+    return {
+        str(id_): [nome, cor]
+        for id_, nome, cor in Profissional.objects.filter(id__in=ids).values_list('id', 'nome', 'cor_hex')
+    }
+
+
+def _tabela_servicos(ids):
+    from empresas.models import Servico
+
+    if not ids:
+        return {}
+    return {str(id_): nome for id_, nome in Servico.objects.filter(id__in=ids).values_list('id', 'nome')}
+
+
+def etag_feed(feed):
+    """ETag do conteúdo (o cursor muda a cada chamada e fica de fora)"""
+    conteudo = json.dumps({**feed, 'cursor': None}, sort_keys=True, separators=(',', ':'))
+    return f'"{hashlib.md5(conteudo.encode("utf-8")).hexdigest()}"'
+
+
+def registrar_removido(empresa_id, agendamento_id):
+    AgendamentoRemovido.objects.create(empresa_id=empresa_id, agendamento_id=agendamento_id)
+
+
+def limpar_removidos(dias=None):
+    """Apaga registros de exclusão mais antigos que a retenção; retorna quantos"""
+    retencao = timedelta(days=dias) if dias is not None else _retencao_removidos()
+    apagados, _ = AgendamentoRemovido.objects.filter(removido_em__lt=timezone.now() - retencao).delete()
+    return apagados
@@ -0,0 +1,170 @@
+"""
+Gravação dos logs de interação do bot WhatsApp (LogMensagemBot)
+
+Antes, cada mensagem recebida gerava 2-3 escritas no banco: um INSERT no
+início do processamento e UPDATEs ao vincular o agendamento e ao registrar
+o resultado. Agora o log é montado em memória durante o request e
+persistido UMA única vez, no final.
+
+Modos de gravação:
+- Síncrono (padrão): um único INSERT ao final do processamento.
+- Write-behind (settings.BOT_LOG_WRITE_BEHIND=True): o log vai para uma
+  fila em memória e uma thread de fundo grava em lote com bulk_create.
+  Se a fila estiver cheia, a gravação volta a ser síncrona (o log nunca
+  é descartado).
+"""
+
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import LogMensagemBot
+
+logger = logging.getLogger(__name__)
+
+
+def novo_log_bot(empresa, telefone, mensagem_original, intencao, dados):
+    """
+    Cria o log da interação apenas em memória (sem tocar no banco).
+
+    Os processadores do bot preenchem `agendamento`, `status`,
+    `resposta_enviada` e `erro_detalhes` e, no final, o log é gravado
+    com registrar_log_bot().
+    """
+    return LogMensagemBot(
+        empresa=empresa,
+        telefone=telefone or '',
+        mensagem_original=mensagem_original or '',
+        intencao_detectada=intencao or 'outro',
+        dados_extraidos=dados or {},
+        status='parcial',
+    )
+
+
+def registrar_log_bot(log):
+    """
+    Persiste o log da interação (uma única escrita).
+
+    Falhas ao gravar o log nunca derrubam a resposta do bot: o erro é
+    apenas registrado no logger.
+    """
+    if getattr(settings, 'BOT_LOG_WRITE_BEHIND', False):
+        get_gravador().enfileirar(log)
+        return
+
+    try:
+        log.save()
+    except Exception as e:
+        logger.error(f"[LogBot] Erro ao gravar log do bot ({log.telefone}): {e}")
+
+
+class GravadorLogBot:
+    """
+    Buffer write-behind para LogMensagemBot.
+
+    - Fila limitada (maxsize) para não crescer sem controle em picos
+    - Thread daemon que grava em lotes com bulk_create
+    - Fila cheia => gravação síncrona (degradação segura)
+    """
+
+    def __init__(self, tamanho_fila=1000, tamanho_lote=100, intervalo_flush=2.0):
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._loop,
+                name='gravador-log-bot',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def enfileirar(self, log):
+        """Coloca o log na fila; se estiver cheia, grava na hora."""
+        self.iniciar()
+        try:
+            self._fila.put_nowait(log)
+        except queue.Full:
+            logger.warning("[LogBot] Fila cheia - gravando log de forma síncrona")
+            try:
+                log.save()
+            except Exception as e:
+                logger.error(f"[LogBot] Erro ao gravar log do bot ({log.telefone}): {e}")
+
+    def flush(self):
+        """Grava imediatamente tudo o que estiver na fila."""
+        while True:
+            lote = self._coletar_lote(bloquear=False)
+            if not lote:
+                return
+            self._gravar_lote(lote)
+
+    def parar(self):
+        """Para a thread de fundo e grava o que sobrou na fila."""
+        self._parar.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.intervalo_flush * 2)
+        self.flush()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            lote = self._coletar_lote(bloquear=True)
+            if lote:
+                self._gravar_lote(lote)
+
+    def _coletar_lote(self, bloquear):
+        lote = []
+        try:
+            if bloquear:
+                lote.append(self._fila.get(timeout=self.intervalo_flush))
+            while len(lote) < self.tamanho_lote:
+                lote.append(self._fila.get_nowait())
+        except queue.Empty:
+            pass
+        return lote
+
+    def _gravar_lote(self, lote):
+        close_old_connections()
+        try:
+            LogMensagemBot.objects.bulk_create(lote, batch_size=self.tamanho_lote)
+        except Exception as e:
+            # Um registro inválido não pode derrubar o lote inteiro
+            logger.error(f"[LogBot] Erro no bulk_create ({len(lote)} logs): {e} - gravando um a um")
+            for log in lote:
+                try:
+                    log.save()
+                except Exception as erro_individual:
+                    logger.error(f"[LogBot] Log descartado ({log.telefone}): {erro_individual}")
+        finally:
+            close_old_connections()
+
+
+_gravador = None
+_gravador_lock = threading.Lock()
+
+
+def get_gravador():
+    """Retorna o gravador write-behind do processo (criado sob demanda)."""
+    global _gravador
+    if _gravador is None:
+        with _gravador_lock:
+            if _gravador is None:
+                _gravador = GravadorLogBot(
+                    tamanho_fila=getattr(settings, 'BOT_LOG_FILA_MAX', 1000),
+                    tamanho_lote=getattr(settings, 'BOT_LOG_TAMANHO_LOTE', 100),
+                    intervalo_flush=getattr(settings, 'BOT_LOG_INTERVALO_FLUSH', 2.0),
+                )
+                atexit.register(_gravador.parar)
+    return _gravador
@@ -0,0 +1,58 @@
+"""
+Comando Django para aplicar a política de retenção dos logs do bot (LogMensagemBot)
+Executar periodicamente via cron ou Celery Beat
+
+Usa core.particionamento: no Postgres remove partições mensais inteiras
+(DROP instantâneo) e arquiva os registros antes; no SQLite apaga em lotes.
+"""
+from django.core.management.base import BaseCommand
+from core.particionamento import get_config_tabela, purgar_antigos
+
+
+class Command(BaseCommand):
+    help = 'Remove logs do bot WhatsApp mais antigos que a retenção configurada (em lotes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Manter logs dos últimos N dias (padrão: settings.BOT_LOG_RETENCAO_DIAS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Quantidade de registros removidos por DELETE (padrão: 5000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostrar o que seria deletado, sem deletar'
+        )
+
+    def handle(self, *args, **options):
+        resultado = purgar_antigos(
+            get_config_tabela('agendamentos.LogMensagemBot'),
+            dias=options['days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if resultado['limite'] is None:
+            self.stdout.write(self.style.WARNING('Retenção desativada (0 dias): nenhum log removido'))
+            return
+        data_limite = resultado['limite'].strftime("%d/%m/%Y")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[DRY RUN] Seriam deletados:'))
+            self.stdout.write(f"  - {resultado['registros_removidos']} logs do bot")
+            self.stdout.write(f'  - Mais antigos que: {data_limite}')
+            return
+
+        for particao in resultado['particoes_removidas']:
+            self.stdout.write(f'  - partição removida: {particao}')
+        for arquivo in resultado['arquivos']:
+            self.stdout.write(f'  - arquivado em: {arquivo}')
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Total: {resultado['registros_removidos']} logs do bot removidos (anteriores a {data_limite})"
+        ))
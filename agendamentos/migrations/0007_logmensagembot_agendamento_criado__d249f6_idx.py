@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0006_agendamento_notificado_1dia_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logmensagembot',
+            index=models.Index(fields=['criado_em'], name='agendamento_criado__d249f6_idx'),
+        ),
+    ]
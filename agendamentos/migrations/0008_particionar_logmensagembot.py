@@ -0,0 +1,20 @@
+# Converte LogMensagemBot em tabela particionada por mês (apenas Postgres).
+# No SQLite esta migration não faz nada. Ver core/particionamento.py.
+
+from django.db import migrations
+
+from core.particionamento import converter_para_particionada_op
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0007_logmensagembot_agendamento_criado__d249f6_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            converter_para_particionada_op('agendamentos', 'LogMensagemBot'),
+            migrations.RunPython.noop,
+        ),
+    ]
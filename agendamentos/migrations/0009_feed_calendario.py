@@ -0,0 +1,49 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0008_particionar_logmensagembot'),
+        ('clientes', '0003_cliente_origem'),
+        ('empresas', '0008_alter_profissional_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendamentoRemovido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agendamento_id', models.PositiveIntegerField()),
+                ('removido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Agendamento Removido',
+                'verbose_name_plural': 'Agendamentos Removidos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['empresa', 'data_hora_inicio'], name='agendamento_empresa_fc3128_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='agendamento_empresa_caf420_idx'),
+        ),
+        migrations.AddField(
+            model_name='agendamentoremovido',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos_removidos', to='empresas.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamentoremovido',
+            index=models.Index(fields=['empresa', 'removido_em'], name='agendamento_empresa_a271ce_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamentoremovido',
+            index=models.Index(fields=['removido_em'], name='agendamento_removid_581ec6_idx'),
+        ),
+    ]
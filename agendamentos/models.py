@@ -9,6 +9,15 @@ class StatusAgendamento(models.TextChoices):
     CONCLUIDO = 'concluido', 'Concluído'
     NAO_COMPARECEU = 'nao_compareceu', 'Não Compareceu'
 
+
+# Campos cujo valor no banco fica guardado na instância (from_db) para os
+# eventos de domínio saberem o que mudou sem buscar a linha de novo
+CAMPOS_RASTREADOS = ('status', 'data_hora_inicio', 'data_hora_fim', 'profissional_id')
+
+# Validados contra a empresa do agendamento (agendamentos/services/agendamentos.py)
+CAMPOS_EMPRESA = ('cliente', 'servico', 'profissional')
+
+
 class Agendamento(models.Model):
     empresa = models.ForeignKey('empresas.Empresa', on_delete=models.CASCADE, related_name='agendamentos')
     cliente = models.ForeignKey('clientes.Cliente', on_delete=models.CASCADE, related_name='agendamentos')
@@ -56,38 +65,79 @@ class Agendamento(models.Model):
         verbose_name = 'Agendamento'
         verbose_name_plural = 'Agendamentos'
         ordering = ['-data_hora_inicio']
+        indexes = [
+            models.Index(fields=['empresa', 'data_hora_inicio']),  # Faixa do calendário
+            models.Index(fields=['empresa', 'atualizado_em']),  # Sincronização incremental (since)
+        ]
 
     def __str__(self):
         return f"{self.cliente} - {self.servico} ({self.data_hora_inicio})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._guardar_originais()
+        return instancia
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._guardar_originais()
+
+    def _guardar_originais(self):
+        """Snapshot dos campos rastreados como estão no banco (campos adiados ficam de fora)"""
+        adiados = self.get_deferred_fields()
+        self._originais = {
+            campo: self.__dict__[campo] for campo in CAMPOS_RASTREADOS if campo not in adiados
+        }
+
+    def valor_original(self, campo):
+        """Valor do campo no banco antes das alterações em memória (None se novo)"""
+        return getattr(self, '_originais', {}).get(campo)
+
+    def campo_alterado(self, campo):
+        originais = getattr(self, '_originais', {})
+        return campo in originais and originais[campo] != getattr(self, campo)
+
     def clean(self):
-        """Validação multi-tenant para prevenir cruzamento de dados"""
-        from django.core.exceptions import ValidationError
-        
-        # Validar que cliente pertence à mesma empresa
-        if self.cliente_id and self.cliente.empresa_id != self.empresa_id:
-            raise ValidationError({
-                'cliente': f'Cliente "{self.cliente.nome}" não pertence à empresa "{self.empresa.nome}"'
-            })
-        
-        # Validar que profissional pertence à mesma empresa  
-        if self.profissional_id and self.profissional.empresa_id != self.empresa_id:
-            raise ValidationError({
-                'profissional': f'Profissional "{self.profissional.nome}" não pertence à empresa "{self.empresa.nome}"'
-            })
-        
-        # Validar que serviço pertence à mesma empresa
-        if self.servico_id and self.servico.empresa_id != self.empresa_id:
-            raise ValidationError({
-                'servico': f'Serviço "{self.servico.nome}" não pertence à empresa "{self.empresa.nome}"'
-            })
-    
+        """Validação multi-tenant para prevenir cruzamento de dados (só por id)"""
+        from .services.agendamentos import validar_empresa
+
+        validar_empresa([self])
+
     def save(self, *args, **kwargs):
         """Override save para garantir validação apenas na criação"""
         # Validar apenas ao criar (não ao atualizar)
         if not self.pk:  # Se não tem ID, é criação
-            self.full_clean()
+            # Existência e empresa das FKs são checadas por id em clean()
+            self.full_clean(exclude=['empresa', *CAMPOS_EMPRESA])
+        elif not hasattr(self, '_originais'):
+            # Instância montada à mão (sem from_db): busca o snapshot uma vez
+            self._originais = Agendamento.objects.filter(pk=self.pk).values(*CAMPOS_RASTREADOS).first() or {}
         super().save(*args, **kwargs)
+        self._guardar_originais()
+
+class AgendamentoRemovido(models.Model):
+    """
+    Registro (tombstone) de agendamento excluído
+
+    O feed do calendário em modo incremental (since=<cursor>) só enxerga
+    linhas alteradas; exclusões ficam aqui para o cliente poder tirá-las
+    da tela. Registros antigos são apagados por limpar_agendamentos_removidos.
+    """
+    empresa = models.ForeignKey('empresas.Empresa', on_delete=models.CASCADE, related_name='agendamentos_removidos')
+    agendamento_id = models.PositiveIntegerField()
+    removido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Agendamento Removido'
+        verbose_name_plural = 'Agendamentos Removidos'
+        indexes = [
+            models.Index(fields=['empresa', 'removido_em']),
+            models.Index(fields=['removido_em']),  # Retenção
+        ]
+
+    def __str__(self):
+        return f"Agendamento #{self.agendamento_id} removido em {self.removido_em}"
 
 
 class DisponibilidadeProfissional(models.Model):
@@ -163,6 +213,7 @@ class LogMensagemBot(models.Model):
         indexes = [
             models.Index(fields=['telefone', '-criado_em']),
             models.Index(fields=['empresa', 'intencao_detectada']),
+            models.Index(fields=['criado_em']),  # Retenção (limpar_logs_bot)
         ]
 
     def __str__(self):
@@ -3,16 +3,44 @@ Views públicas de agendamento (sem autenticação)
 Permite que clientes finais agendem serviços diretamente pelo site
 """
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.db import transaction
 from django.db.models import Q
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone as dt_timezone
 from empresas.models import Empresa, Servico, Profissional, HorarioFuncionamento
 from clientes.models import Cliente
 from .models import Agendamento
+from .cache_publico import obter_catalogo, chave_horarios, obter_horarios, guardar_horarios
+
+
+def _resposta_publica(request, etag, ultima_modificacao, gerar_resposta):
+    """
+    Resposta cacheável por nginx/navegador: 304 se o cliente já tem a
+    versão atual (If-None-Match / If-Modified-Since), senão gera a
+    resposta com ETag, Last-Modified e Cache-Control público.
+    """
+    etag = quote_etag(etag)
+    timestamp = int(ultima_modificacao.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = gerar_resposta()
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(settings, 'PUBLICO_CACHE_MAX_AGE', 60),
+        stale_while_revalidate=getattr(settings, 'PUBLICO_CACHE_STALE', 300),
+    )
+    return response
 
 
 def agendamento_publico(request, slug):
@@ -26,11 +54,9 @@ def agendamento_publico(request, slug):
     try:
         logger.info(f'Acesso à página de agendamento público - slug: {slug}')
         
-        # Buscar empresa pelo slug
-        try:
-            empresa = Empresa.objects.get(slug=slug, ativa=True)
-            logger.info(f'Empresa encontrada: {empresa.nome} (ID: {empresa.id})')
-        except Empresa.DoesNotExist:
+        # Empresa + serviços vêm do catálogo em cache (sem queries no caso comum)
+        catalogo = obter_catalogo(slug)
+        if catalogo is None:
             logger.warning(f'Empresa não encontrada ou inativa - slug: {slug}')
             return render(request, 'agendamentos/publico/empresa_indisponivel.html', {
                 'empresa': None,
@@ -38,34 +64,42 @@ def agendamento_publico(request, slug):
                 'slug': slug
             }, status=404)
 
+        empresa = catalogo['empresa']
+
         # Verificar se onboarding está completo
-        if not empresa.onboarding_completo:
-            logger.info(f'Empresa {empresa.nome} - onboarding não completo')
+        if not empresa['onboarding_completo']:
+            logger.info(f"Empresa {empresa['nome']} - onboarding não completo")
             return render(request, 'agendamentos/publico/empresa_indisponivel.html', {
                 'empresa': empresa,
                 'motivo': 'configuracao'
             })
 
-        # Buscar serviços ativos
-        servicos = empresa.servicos.filter(ativo=True).order_by('nome')
-        logger.info(f'Empresa {empresa.nome} - {servicos.count()} serviços ativos')
+        # Serviços ativos
+        servicos = catalogo['servicos']
 
-        if not servicos.exists():
-            logger.warning(f'Empresa {empresa.nome} - sem serviços ativos')
+        if not servicos:
+            logger.warning(f"Empresa {empresa['nome']} - sem serviços ativos")
             return render(request, 'agendamentos/publico/empresa_indisponivel.html', {
                 'empresa': empresa,
                 'motivo': 'sem_servicos'
             })
 
+        hoje = timezone.now().date()
         context = {
             'empresa': empresa,
             'servicos': servicos,
-            'hoje': timezone.now().date().isoformat(),  # formato YYYY-MM-DD para input date
+            'hoje': hoje.isoformat(),  # formato YYYY-MM-DD para input date
         }
 
-        logger.info(f'Renderizando página de agendamento para {empresa.nome}')
-        return render(request, 'agendamentos/publico/agendar.html', context)
-        
+        # A página muda quando o catálogo muda ou quando vira o dia (data mínima)
+        inicio_dia = datetime.combine(hoje, time.min, tzinfo=dt_timezone.utc)
+        return _resposta_publica(
+            request,
+            etag=f"{catalogo['etag']}-{hoje:%Y%m%d}",
+            ultima_modificacao=max(catalogo['atualizado_em'], inicio_dia),
+            gerar_resposta=lambda: render(request, 'agendamentos/publico/agendar.html', context),
+        )
+
     except Exception as e:
         logger.error(f'Erro inesperado na view agendamento_publico - slug: {slug}')
         logger.error(f'Tipo de erro: {type(e).__name__}')
@@ -86,29 +120,39 @@ def api_profissionais_por_servico(request, slug):
     API: Retorna profissionais que executam um serviço específico
     GET /agendar/{slug}/api/profissionais/?servico_id=123
     """
-    empresa = get_object_or_404(Empresa, slug=slug, ativa=True)
+    catalogo = obter_catalogo(slug)
+    if catalogo is None:
+        raise Http404('Empresa não encontrada')
+
     servico_id = request.GET.get('servico_id')
 
     if not servico_id:
         return JsonResponse({'error': 'servico_id obrigatório'}, status=400)
 
-    servico = get_object_or_404(Servico, id=servico_id, empresa=empresa, ativo=True)
-
-    # Buscar profissionais que executam este serviço
-    profissionais = servico.profissionais.filter(ativo=True).values(
-        'id', 'nome', 'email', 'cor_hex'
+    servico = next(
+        (s for s in catalogo['servicos'] if str(s['id']) == servico_id),
+        None
+    )
+    if servico is None:
+        raise Http404('Serviço não encontrado')
+
+    # Profissionais que executam este serviço (já agrupados no catálogo)
+    profissionais = catalogo['profissionais_por_servico'][servico['id']]
+
+    return _resposta_publica(
+        request,
+        etag=f"{catalogo['etag']}-s{servico['id']}",
+        ultima_modificacao=catalogo['atualizado_em'],
+        gerar_resposta=lambda: JsonResponse({
+            'profissionais': profissionais,
+            'servico': {
+                'id': servico['id'],
+                'nome': servico['nome'],
+                'preco': float(servico['preco']),
+                'duracao_minutos': servico['duracao_minutos']
+            }
+        }),
     )
-
-    return JsonResponse({
-        'profissionais': list(profissionais),
-        'servico': {
-            'id': servico.id,
-            'nome': servico.nome,
-            'preco': float(servico.preco),
-            'duracao_minutos': servico.duracao_minutos
-        }
-    })
-
 
 
 @csrf_exempt
@@ -126,7 +170,10 @@ def api_horarios_disponiveis(request, slug):
     """
     import json
 
-    empresa = get_object_or_404(Empresa, slug=slug, ativa=True)
+    catalogo = obter_catalogo(slug)
+    if catalogo is None:
+        raise Http404('Empresa não encontrada')
+    empresa_id = catalogo['empresa']['id']
 
     try:
         data = json.loads(request.body)
@@ -137,37 +184,47 @@ def api_horarios_disponiveis(request, slug):
         if not all([servico_id, profissional_id, data_str]):
             return JsonResponse({'error': 'Dados incompletos'}, status=400)
 
-        servico = get_object_or_404(Servico, id=servico_id, empresa=empresa)
-        profissional = get_object_or_404(Profissional, id=profissional_id, empresa=empresa)
         data_agendamento = datetime.strptime(data_str, '%Y-%m-%d').date()
 
         # Não permitir agendamentos no passado
         if data_agendamento < timezone.now().date():
             return JsonResponse({'horarios': []})
 
+        # Cache curto, invalidado a cada mudança na agenda da empresa
+        chave = chave_horarios(slug, empresa_id, servico_id, profissional_id, data_agendamento)
+        horarios_disponiveis = obter_horarios(chave)
+        if horarios_disponiveis is not None:
+            return JsonResponse({'horarios': horarios_disponiveis})
+
+        servico = get_object_or_404(Servico, id=servico_id, empresa_id=empresa_id)
+        profissional = get_object_or_404(Profissional, id=profissional_id, empresa_id=empresa_id)
+
         # Buscar horário de funcionamento para este dia da semana
         dia_semana = data_agendamento.weekday()  # 0=segunda, 6=domingo
         horario_func = HorarioFuncionamento.objects.filter(
-            empresa=empresa,
+            empresa_id=empresa_id,
             dia_semana=dia_semana,
             ativo=True
         ).first()
 
         if not horario_func:
-            return JsonResponse({'horarios': []})
-
-        # Gerar slots de horários disponíveis
-        horarios_disponiveis = _gerar_slots_disponiveis(
-            empresa=empresa,
-            profissional=profissional,
-            servico=servico,
-            data=data_agendamento,
-            hora_abertura=horario_func.hora_abertura,
-            hora_fechamento=horario_func.hora_fechamento
-        )
+            horarios_disponiveis = []
+        else:
+            # Gerar slots de horários disponíveis
+            horarios_disponiveis = _gerar_slots_disponiveis(
+                empresa=empresa_id,
+                profissional=profissional,
+                servico=servico,
+                data=data_agendamento,
+                hora_abertura=horario_func.hora_abertura,
+                hora_fechamento=horario_func.hora_fechamento
+            )
 
+        guardar_horarios(chave, horarios_disponiveis)
         return JsonResponse({'horarios': horarios_disponiveis})
 
+    except Http404:
+        raise
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -198,18 +255,28 @@ def _gerar_slots_disponiveis(empresa, profissional, servico, data, hora_abertura
             elif hora_minima.minute > 0:
                 dt_atual = dt_atual.replace(minute=30)
 
+    def _aware(dt):
+        return dt if timezone.is_aware(dt) else timezone.make_aware(dt)
+
+    # Agendamentos do dia em UMA query (antes era um exists() por slot)
+    ocupados = list(Agendamento.objects.filter(
+        empresa=empresa,
+        profissional=profissional,
+        data_hora_inicio__lt=_aware(dt_fim_dia),
+        data_hora_fim__gt=_aware(dt_atual),
+        status__in=['pendente', 'confirmado']
+    ).values_list('data_hora_inicio', 'data_hora_fim'))
+
     # Gerar slots de 30 em 30 minutos
     while dt_atual + timedelta(minutes=duracao_minutos) <= dt_fim_dia:
         dt_fim_slot = dt_atual + timedelta(minutes=duracao_minutos)
 
         # Verificar se há conflito com agendamentos existentes
-        conflito = Agendamento.objects.filter(
-            empresa=empresa,
-            profissional=profissional,
-            data_hora_inicio__lt=dt_fim_slot,
-            data_hora_fim__gt=dt_atual,
-            status__in=['pendente', 'confirmado']
-        ).exists()
+        inicio_slot, fim_slot = _aware(dt_atual), _aware(dt_fim_slot)
+        conflito = any(
+            inicio < fim_slot and fim > inicio_slot
+            for inicio, fim in ocupados
+        )
 
         if not conflito:
             slots.append({
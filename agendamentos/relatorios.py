@@ -0,0 +1,329 @@
+"""
+Relatórios de agendamentos: faturamento por profissional, ocupação,
+faltas, mix de serviços e horários de pico
+
+Os relatórios de docs/ESTRATEGIA_RELATORIOS_POR_PLANO.md, calculados com
+annotate() sobre Agendamento a cada acesso, seriam uma query agrupada por
+indicador e não escalam com meses de histórico.
+
+Aqui:
+1. extrair() lê os agendamentos do período UMA vez (values_list em
+   blocos, sem instâncias) para colunas compactas (array -> NumPy):
+   minuto de início (hora local, contado do início do período), duração,
+   índice do profissional, índice do serviço, código do status e valor
+   em centavos
+2. agregar() calcula todos os indicadores com group-bys vetorizados
+   (np.bincount) sobre essas colunas
+3. relatorio() guarda o resultado no cache por (empresa, período, versão
+   da ocupação). A versão muda a cada agendamento salvo/excluído, a cada
+   alteração de horário de funcionamento e a cada serviço salvo/excluído
+   (o faturamento sem valor_cobrado usa o preço do serviço), ver
+   agendamentos/signals.py: o cache nunca mostra dado velho. Nomes de
+   profissionais e serviços são resolvidos na leitura
+
+Valores em centavos; taxas em percentual com uma casa.
+"""
+
+import logging
+from array import array
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_publico import versao_ocupacao
+from .models import Agendamento, StatusAgendamento
+
+logger = logging.getLogger(__name__)
+
+# Código de cada status nas colunas (ordem do TextChoices)
+CODIGOS_STATUS = {status: codigo for codigo, status in enumerate(StatusAgendamento.values)}
+PENDENTE = CODIGOS_STATUS[StatusAgendamento.PENDENTE]
+CONFIRMADO = CODIGOS_STATUS[StatusAgendamento.CONFIRMADO]
+CANCELADO = CODIGOS_STATUS[StatusAgendamento.CANCELADO]
+CONCLUIDO = CODIGOS_STATUS[StatusAgendamento.CONCLUIDO]
+NAO_COMPARECEU = CODIGOS_STATUS[StatusAgendamento.NAO_COMPARECEU]
+
+MINUTOS_DIA = 24 * 60
+
+
+class PeriodoInvalido(ValueError):
+    """Período de relatório invertido ou maior que RELATORIOS_MAX_DIAS."""
+
+
+def _config(nome, padrao):
+    return getattr(settings, f'RELATORIOS_{nome}', padrao)
+
+
+def _percentual(parte, total):
+    """parte/total em %, com 0 onde o total é 0 (aceita arrays)"""
+    parte, total = np.asarray(parte, dtype=float), np.asarray(total, dtype=float)
+    resultado = np.divide(parte * 100, total, out=np.zeros_like(parte), where=total > 0)
+    return np.round(resultado, 1)
+
+
+# ============================================
+# EXTRAÇÃO EM COLUNAS
+# ============================================
+
+def extrair(empresa_id, inicio, fim):
+    """
+    Agendamentos da empresa com início entre as datas (inclusive), em colunas.
+
+    Returns:
+        dict: 'minuto', 'duracao', 'profissional', 'servico', 'status' e
+              'valor' (np.ndarray, uma posição por agendamento) e
+              'profissionais'/'servicos' (id de cada índice; o índice 0 é
+              "sem profissional"/"sem serviço")
+    """
+    base = datetime.combine(inicio, time.min)
+    fuso = timezone.get_current_timezone()
+    registros = (
+        Agendamento.objects
+        .filter(
+            empresa_id=empresa_id,
+            data_hora_inicio__gte=timezone.make_aware(base),
+            data_hora_inicio__lt=timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min)),
+        )
+        .annotate(valor_efetivo=Coalesce('valor_cobrado', 'servico__preco'))
+        .order_by()
+        .values_list('data_hora_inicio', 'data_hora_fim', 'profissional_id', 'servico_id', 'status', 'valor_efetivo')
+        .iterator(chunk_size=_config('CHUNK', 5000))
+    )
+
+    indices_profissionais, indices_servicos = {None: 0}, {None: 0}
+    minuto, duracao = array('i'), array('i')
+    profissional, servico = array('H'), array('H')
+    status, valor = array('b'), array('q')
+    for inicio_ag, fim_ag, profissional_id, servico_id, status_ag, valor_ag in registros:
+        local = inicio_ag.astimezone(fuso).replace(tzinfo=None)
+        minuto.append(int((local - base).total_seconds()) // 60)
+        duracao.append(max(int((fim_ag - inicio_ag).total_seconds()) // 60, 0))
+        profissional.append(indices_profissionais.setdefault(profissional_id, len(indices_profissionais)))
+        servico.append(indices_servicos.setdefault(servico_id, len(indices_servicos)))
+        status.append(CODIGOS_STATUS.get(status_ag, -1))
+        valor.append(int(valor_ag * 100) if valor_ag is not None else 0)
+
+    return {
+        'minuto': np.asarray(minuto, dtype=np.int32),
+        'duracao': np.asarray(duracao, dtype=np.int32),
+        'profissional': np.asarray(profissional, dtype=np.uint16),
+        'servico': np.asarray(servico, dtype=np.uint16),
+        'status': np.asarray(status, dtype=np.int8),
+        'valor': np.asarray(valor, dtype=np.int64),
+        'profissionais': list(indices_profissionais),
+        'servicos': list(indices_servicos),
+    }
+
+
+def _minutos_intervalo(inicio, fim):
+    if not inicio or not fim or fim <= inicio:
+        return 0
+    return (fim.hour * 60 + fim.minute) - (inicio.hour * 60 + inicio.minute)
+
+
+def minutos_abertos(empresa_id, inicio, fim):
+    """
+    Minutos de funcionamento da empresa no período: horário da semana
+    (menos o intervalo) e datas especiais (feriado fecha o dia, horário
+    especial substitui o da semana).
+    """
+    from empresas.models import DataEspecial, HorarioFuncionamento
+
+    por_dia_semana = [0] * 7
+    for horario in HorarioFuncionamento.objects.filter(empresa_id=empresa_id, ativo=True):
+        por_dia_semana[horario.dia_semana] += max(
+            _minutos_intervalo(horario.hora_abertura, horario.hora_fechamento)
+            - _minutos_intervalo(horario.intervalo_inicio, horario.intervalo_fim),
+            0,
+        )
+    especiais = {
+        especial.data: _minutos_intervalo(especial.hora_abertura, especial.hora_fechamento)
+        if especial.tipo == 'especial' else 0
+        for especial in DataEspecial.objects.filter(empresa_id=empresa_id, data__range=(inicio, fim))
+    }
+
+    total = 0
+    for deslocamento in range((fim - inicio).days + 1):
+        dia = inicio + timedelta(days=deslocamento)
+        total += especiais.get(dia, por_dia_semana[dia.weekday()])
+    return total
+
+
+# ============================================
+# AGREGAÇÃO VETORIZADA
+# ============================================
+
+def agregar(colunas, inicio, fim, minutos_abertos=0, profissionais_ativos=0):
+    """
+    Todos os indicadores do período a partir das colunas de extrair().
+
+    Args:
+        minutos_abertos: minutos de funcionamento no período (por profissional)
+        profissionais_ativos: profissionais que atendem no período (base da
+            ocupação geral; no mínimo os que têm agendamento)
+    """
+    dias = (fim - inicio).days + 1
+    n_profissionais, n_servicos = len(colunas['profissionais']), len(colunas['servicos'])
+    status, minuto = colunas['status'], colunas['minuto']
+
+    cancelado = status == CANCELADO
+    concluido = status == CONCLUIDO
+    falta = status == NAO_COMPARECEU
+    em_aberto = (status == PENDENTE) | (status == CONFIRMADO)
+    ocupa = ~cancelado  # Falta também ocupou o horário
+    receita = np.where(concluido, colunas['valor'], 0)
+    ocupados = np.where(ocupa, colunas['duracao'], 0)
+
+    def por(indices, tamanho, pesos=None):
+        return np.bincount(indices, weights=pesos, minlength=tamanho).astype(np.int64)
+
+    # Por profissional: uma linha por métrica, uma coluna por índice
+    profissional = colunas['profissional']
+    metricas = ('agendamentos', 'concluidos', 'faltas', 'cancelados', 'receita', 'minutos')
+    por_profissional = np.vstack([
+        por(profissional, n_profissionais),
+        por(profissional, n_profissionais, concluido),
+        por(profissional, n_profissionais, falta),
+        por(profissional, n_profissionais, cancelado),
+        por(profissional, n_profissionais, receita),
+        por(profissional, n_profissionais, ocupados),
+    ])
+    taxa_faltas = _percentual(por_profissional[2], por_profissional[1] + por_profissional[2])
+    ocupacao = _percentual(por_profissional[5], minutos_abertos)
+
+    servico = colunas['servico']
+    servico_agendamentos = por(servico, n_servicos, ocupa)
+    servico_receita = por(servico, n_servicos, receita)
+    participacao = _percentual(servico_agendamentos, servico_agendamentos.sum())
+
+    # Horários de pico: dia da semana x hora de início (sem cancelados)
+    dia = minuto // MINUTOS_DIA
+    dia_semana = (inicio.weekday() + dia) % 7
+    hora = (minuto % MINUTOS_DIA) // 60
+    horarios_pico = por((dia_semana * 24 + hora)[ocupa], 7 * 24).reshape(7, 24)
+
+    dentro = (dia >= 0) & (dia < dias)
+    por_dia_agendamentos = por(dia[ocupa & dentro], dias)
+    por_dia_receita = por(dia[dentro], dias, receita[dentro])
+
+    totais = dict(zip(metricas, (int(valor) for valor in por_profissional.sum(axis=1))))
+    atendimentos = totais['concluidos']
+    com_profissional = int(np.count_nonzero(por_profissional[0, 1:]))
+    base_ocupacao = minutos_abertos * max(profissionais_ativos, com_profissional, 1)
+
+    return {
+        'periodo': {'inicio': inicio.isoformat(), 'fim': fim.isoformat(), 'dias': dias},
+        'resumo': {
+            **totais,
+            'em_aberto': int(np.count_nonzero(em_aberto)),
+            'ticket_medio': totais['receita'] // atendimentos if atendimentos else 0,
+            'taxa_faltas': float(_percentual(totais['faltas'], totais['concluidos'] + totais['faltas'])),
+            'taxa_cancelamento': float(_percentual(totais['cancelados'], totais['agendamentos'])),
+            'minutos_abertos': minutos_abertos,
+            'ocupacao': float(_percentual(totais['minutos'], base_ocupacao)),
+        },
+        'profissionais': sorted(
+            (
+                {
+                    'id': colunas['profissionais'][indice],
+                    **{metrica: int(por_profissional[linha, indice]) for linha, metrica in enumerate(metricas)},
+                    'taxa_faltas': float(taxa_faltas[indice]),
+                    'ocupacao': float(ocupacao[indice]),
+                }
+                for indice in range(n_profissionais) if por_profissional[0, indice]
+            ),
+            key=lambda item: (-item['receita'], -item['agendamentos']),
+        ),
+        'servicos': sorted(
+            (
+                {
+                    'id': colunas['servicos'][indice],
+                    'agendamentos': int(servico_agendamentos[indice]),
+                    'receita': int(servico_receita[indice]),
+                    'participacao': float(participacao[indice]),
+                }
+                for indice in range(n_servicos) if servico_agendamentos[indice] or servico_receita[indice]
+            ),
+            key=lambda item: (-item['agendamentos'], -item['receita']),
+        ),
+        'horarios_pico': horarios_pico.tolist(),
+        'por_dia': {
+            'agendamentos': por_dia_agendamentos.tolist(),
+            'receita': por_dia_receita.tolist(),
+        },
+    }
+
+
+# ============================================
+# RELATÓRIO EM CACHE
+# ============================================
+
+def _chave(empresa_id, inicio, fim):
+    return f'relatorios:agendamentos:{empresa_id}:{inicio.isoformat()}:{fim.isoformat()}:{versao_ocupacao(empresa_id)}'
+
+
+def calcular(empresa_id, inicio, fim):
+    """Indicadores do período direto do banco (sem cache)"""
+    from empresas.models import Profissional
+
+    colunas = extrair(empresa_id, inicio, fim)
+    ativos = Profissional.objects.filter(empresa_id=empresa_id, ativo=True).count()
+    return agregar(colunas, inicio, fim, minutos_abertos(empresa_id, inicio, fim), ativos)
+
+
+def _com_nomes(dados):
+    """Acrescenta nomes e valores em reais (leitura; o cache guarda só ids e centavos)"""
+    from empresas.models import Profissional, Servico
+
+    nomes_profissionais = dict(
+        Profissional.objects.filter(pk__in=[p['id'] for p in dados['profissionais'] if p['id']]).values_list('id', 'nome')
+    )
+    nomes_servicos = dict(
+        Servico.objects.filter(pk__in=[s['id'] for s in dados['servicos'] if s['id']]).values_list('id', 'nome')
+    )
+
+    def reais(centavos):
+        return Decimal(centavos) / 100
+
+    return {
+        **dados,
+        'resumo': {
+            **dados['resumo'],
+            'receita_reais': reais(dados['resumo']['receita']),
+            'ticket_medio_reais': reais(dados['resumo']['ticket_medio']),
+        },
+        'profissionais': [
+            {**item, 'nome': nomes_profissionais.get(item['id'], 'Sem profissional'), 'receita_reais': reais(item['receita'])}
+            for item in dados['profissionais']
+        ],
+        'servicos': [
+            {**item, 'nome': nomes_servicos.get(item['id'], 'Sem serviço'), 'receita_reais': reais(item['receita'])}
+            for item in dados['servicos']
+        ],
+    }
+
+
+def relatorio(empresa_id, inicio, fim):
+    """
+    Relatório de agendamentos do período (datas inclusive), do cache ou
+    calculado na hora.
+
+    Raises:
+        PeriodoInvalido: fim antes do início ou mais de RELATORIOS_MAX_DIAS
+    """
+    if fim < inicio:
+        raise PeriodoInvalido('A data final é anterior à inicial')
+    if (fim - inicio).days + 1 > _config('MAX_DIAS', 366):
+        raise PeriodoInvalido(f"Período máximo: {_config('MAX_DIAS', 366)} dias")
+
+    chave = _chave(empresa_id, inicio, fim)
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular(empresa_id, inicio, fim)
+        cache.set(chave, dados, _config('CACHE_TTL', 3600))
+    return _com_nomes(dados)
@@ -0,0 +1,137 @@
+"""
+Camada de serviço de Agendamento (caminho rápido, sem signals)
+
+- validar_empresa: confere por id que cliente, serviço e profissional são
+  da empresa do agendamento. Objetos já carregados na instância são
+  conferidos em memória; os demais com uma query por tipo para o lote todo
+- criar_agendamentos: valida o lote, grava com bulk_create e emite os
+  eventos de domínio uma vez por lote
+- alterar_status: muda o status de vários agendamentos com um UPDATE e
+  emite os eventos uma vez por lote
+
+Os eventos (agendamentos/services/eventos.py) fazem o que os signals
+fariam num save(): receitas, contadores de uso, caches e calendário.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Agendamento, CAMPOS_EMPRESA
+from .eventos import emitir_mudancas
+
+MENSAGENS_EMPRESA = {
+    'cliente': 'Cliente #{id} não pertence à empresa do agendamento',
+    'servico': 'Serviço #{id} não pertence à empresa do agendamento',
+    'profissional': 'Profissional #{id} não pertence à empresa do agendamento',
+}
+
+
+def _modelos_empresa():
+    from clientes.models import Cliente
+    from empresas.models import Profissional, Servico
+
+    return {'cliente': Cliente, 'servico': Servico, 'profissional': Profissional}
+
+
+def carregar_empresas(agendamentos):
+    """
+    {campo: {id: empresa_id}} das FKs do lote que não estão carregadas na
+    instância (no máximo uma query por tipo, só com os ids necessários).
+    """
+    pendentes = {campo: set() for campo in CAMPOS_EMPRESA}
+    for agendamento in agendamentos:
+        for campo in CAMPOS_EMPRESA:
+            id_ = getattr(agendamento, f'{campo}_id')
+            if id_ is not None and not Agendamento._meta.get_field(campo).is_cached(agendamento):
+                pendentes[campo].add(id_)
+
+    modelos = _modelos_empresa()
+    return {
+        campo: dict(
+            modelos[campo].objects.filter(pk__in=ids).order_by().values_list('pk', 'empresa_id')
+        ) if ids else {}
+        for campo, ids in pendentes.items()
+    }
+
+
+def validar_empresa(agendamentos, empresas=None):
+    """
+    Levanta ValidationError se alguma FK do lote não existe ou é de outra
+    empresa. ``empresas`` é o mapa de carregar_empresas (pré-carregado pelo
+    chamador para reaproveitar entre lotes).
+    """
+    empresas = empresas if empresas is not None else carregar_empresas(agendamentos)
+    for agendamento in agendamentos:
+        erros = {}
+        if agendamento.empresa_id is None:
+            erros['empresa'] = 'Este campo não pode ser nulo.'
+        if agendamento.cliente_id is None:
+            erros['cliente'] = 'Este campo não pode ser nulo.'
+        for campo in CAMPOS_EMPRESA:
+            id_ = getattr(agendamento, f'{campo}_id')
+            if id_ is None:
+                continue
+            if Agendamento._meta.get_field(campo).is_cached(agendamento):
+                empresa_id = getattr(agendamento, campo).empresa_id
+            else:
+                empresa_id = empresas[campo].get(id_)
+            if empresa_id != agendamento.empresa_id:
+                erros[campo] = MENSAGENS_EMPRESA[campo].format(id=id_)
+        if erros:
+            raise ValidationError(erros)
+
+
+def criar_agendamentos(agendamentos, tamanho_lote=500):
+    """
+    Valida e grava vários agendamentos com bulk_create.
+
+    A validação de campos (clean_fields sem as FKs) roda em memória; a de
+    empresa usa carregar_empresas (uma query por tipo de FK para o lote).
+
+    Returns:
+        list: os agendamentos criados (com pk)
+    """
+    agendamentos = list(agendamentos)
+    if not agendamentos:
+        return []
+
+    for agendamento in agendamentos:
+        agendamento.clean_fields(exclude=['empresa', *CAMPOS_EMPRESA])
+    validar_empresa(agendamentos)
+
+    with transaction.atomic():
+        criados = Agendamento.objects.bulk_create(agendamentos, batch_size=tamanho_lote)
+        emitir_mudancas(criados, criados=True)
+
+    for agendamento in criados:
+        agendamento._guardar_originais()
+    return criados
+
+
+def alterar_status(agendamentos, status):
+    """
+    Muda o status de vários agendamentos com um único UPDATE.
+
+    Usa o snapshot das instâncias (carregadas do banco) para saber o
+    status anterior; as que já estão no status pedido são ignoradas.
+
+    Returns:
+        list: os agendamentos alterados
+    """
+    alterados = [agendamento for agendamento in agendamentos if agendamento.status != status]
+    if not alterados:
+        return []
+
+    agora = timezone.now()
+    with transaction.atomic():
+        Agendamento.objects.filter(pk__in=[agendamento.pk for agendamento in alterados]).update(
+            status=status, atualizado_em=agora
+        )
+        for agendamento in alterados:
+            agendamento.status = status
+            agendamento.atualizado_em = agora
+        emitir_mudancas(alterados)
+
+    for agendamento in alterados:
+        agendamento._guardar_originais()
+    return alterados
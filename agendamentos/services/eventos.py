@@ -0,0 +1,96 @@
+"""
+Eventos de domínio de Agendamento
+
+Financeiro, contadores de uso e caches reagiam a cada save() com signals
+próprios, e cada um buscava o agendamento de novo no banco para descobrir
+o que tinha mudado (status anterior, categoria, ...). Em caminhos em lote
+isso multiplicava as queries escondidas.
+
+Agora as mudanças são detectadas em memória (snapshot guardado em
+Agendamento.from_db) e viram eventos explícitos, entregues em lote:
+
+- criado: agendamentos novos
+- status_alterado: qualquer mudança de status (valor_original('status') tem o anterior)
+- concluido / cancelado: passaram a (ou foram criados como) concluído / cancelado
+- remarcado: mudou horário ou profissional
+- salvo: qualquer criação ou alteração (caches, calendário)
+
+Cada assinante recebe a lista de agendamentos do lote de uma vez:
+
+    @assinar(CONCLUIDO)
+    def criar_receitas(agendamentos):
+        ...
+
+Os assinantes rodam dentro da transação de quem gravou; o que só deve
+acontecer após o commit (cache, Redis) usa transaction.on_commit.
+Um save() comum chega aqui pelo post_save (agendamentos/signals.py);
+agendamentos/services/agendamentos.py emite uma vez por lote.
+"""
+from ..models import StatusAgendamento
+
+CRIADO = 'criado'
+STATUS_ALTERADO = 'status_alterado'
+CONCLUIDO = 'concluido'
+CANCELADO = 'cancelado'
+REMARCADO = 'remarcado'
+SALVO = 'salvo'
+
+# Ordem de entrega: financeiro/contadores antes de caches e calendário
+EVENTOS = (CRIADO, STATUS_ALTERADO, CONCLUIDO, CANCELADO, REMARCADO, SALVO)
+
+CAMPOS_REMARCACAO = ('data_hora_inicio', 'data_hora_fim', 'profissional_id')
+
+_assinantes = {evento: [] for evento in EVENTOS}
+
+
+def assinar(*eventos):
+    """Decorator: registra a função como assinante dos eventos"""
+    def registrar(funcao):
+        for evento in eventos:
+            if funcao not in _assinantes[evento]:
+                _assinantes[evento].append(funcao)
+        return funcao
+    return registrar
+
+
+def emitir(evento, agendamentos):
+    """Entrega o lote a todos os assinantes do evento"""
+    if not agendamentos:
+        return
+    for funcao in _assinantes[evento]:
+        funcao(agendamentos)
+
+
+def classificar(agendamentos, criados=False):
+    """
+    Agrupa os agendamentos por evento comparando com o snapshot do banco.
+
+    Returns:
+        dict: {evento: [agendamentos]} só com os eventos que ocorreram
+    """
+    eventos = {evento: [] for evento in EVENTOS}
+    for agendamento in agendamentos:
+        if criados:
+            eventos[CRIADO].append(agendamento)
+            mudou_status = True
+        else:
+            mudou_status = agendamento.campo_alterado('status')
+            if mudou_status:
+                eventos[STATUS_ALTERADO].append(agendamento)
+            if any(agendamento.campo_alterado(campo) for campo in CAMPOS_REMARCACAO):
+                eventos[REMARCADO].append(agendamento)
+
+        if mudou_status and agendamento.status == StatusAgendamento.CONCLUIDO:
+            eventos[CONCLUIDO].append(agendamento)
+        elif mudou_status and agendamento.status == StatusAgendamento.CANCELADO:
+            eventos[CANCELADO].append(agendamento)
+        eventos[SALVO].append(agendamento)
+
+    return {evento: lote for evento, lote in eventos.items() if lote}
+
+
+def emitir_mudancas(agendamentos, criados=False):
+    """Classifica o lote e emite cada evento uma única vez"""
+    for evento, lote in classificar(agendamentos, criados).items():
+        emitir(evento, lote)
+
@@ -0,0 +1,123 @@
+"""
+Signals que invalidam o cache da página pública de agendamento
+(agendamentos/cache_publico.py) e o contexto do bot (agendamentos/contexto_bot.py),
+que registram exclusões para o feed incremental do calendário
+(agendamentos/feed_calendario.py) e que publicam as mudanças para os
+calendários conectados (agendamentos/eventos_calendario.py)
+
+O save() de Agendamento vira eventos de domínio (services/eventos.py);
+caches e calendário assinam o evento "salvo", que chega uma vez por lote.
+
+As invalidações rodam após o commit: se rodassem antes, um acesso
+concorrente poderia recolocar no cache os dados antigos.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from empresas.models import Empresa, Servico, Profissional, HorarioFuncionamento, DataEspecial
+from .cache_publico import invalidar_catalogo, invalidar_ocupacao
+from .contexto_bot import invalidar_contexto_bot
+from .eventos_calendario import evento_agendamento, publicar_mudanca
+from .feed_calendario import registrar_removido
+from .models import Agendamento, DisponibilidadeProfissional
+from .services.eventos import SALVO, assinar, emitir_mudancas
+
+
+@receiver(post_save, sender=Empresa)
+def invalidar_catalogo_empresa(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_catalogo, instance.pk, instance.slug))
+
+
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+@receiver(post_save, sender=Profissional)
+@receiver(post_delete, sender=Profissional)
+def invalidar_catalogo_servicos(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_catalogo, instance.empresa_id))
+    transaction.on_commit(partial(invalidar_contexto_bot, instance.empresa_id))
+
+
+@receiver(m2m_changed, sender=Profissional.servicos.through)
+def invalidar_catalogo_vinculos(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(partial(invalidar_catalogo, instance.empresa_id))
+        transaction.on_commit(partial(invalidar_contexto_bot, instance.empresa_id))
+
+
+@receiver(post_save, sender=HorarioFuncionamento)
+@receiver(post_delete, sender=HorarioFuncionamento)
+@receiver(post_save, sender=DataEspecial)
+@receiver(post_delete, sender=DataEspecial)
+@receiver(post_delete, sender=Agendamento)
+def invalidar_horarios_publicos(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_ocupacao, instance.empresa_id))
+
+
+@receiver(post_save, sender=Profissional)
+@receiver(post_delete, sender=Profissional)
+def invalidar_ocupacao_profissional(sender, instance, **kwargs):
+    # Entrada/saída de profissional muda a capacidade (agendamentos/capacidade.py)
+    transaction.on_commit(partial(invalidar_ocupacao, instance.empresa_id))
+
+
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+def invalidar_ocupacao_servico(sender, instance, **kwargs):
+    # Faturamento sem valor_cobrado usa o preço do serviço (relatórios e
+    # painel da organização têm a versão da ocupação na chave)
+    transaction.on_commit(partial(invalidar_ocupacao, instance.empresa_id))
+
+
+@receiver(post_save, sender=DisponibilidadeProfissional)
+@receiver(post_delete, sender=DisponibilidadeProfissional)
+def invalidar_ocupacao_disponibilidade(sender, instance, **kwargs):
+    empresa_id = instance.profissional.empresa_id
+    transaction.on_commit(partial(invalidar_ocupacao, empresa_id))
+
+
+@receiver(post_save, sender=HorarioFuncionamento)
+@receiver(post_delete, sender=HorarioFuncionamento)
+@receiver(post_save, sender=DataEspecial)
+@receiver(post_delete, sender=DataEspecial)
+def invalidar_contexto_horarios(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_contexto_bot, instance.empresa_id))
+
+
+@receiver(post_delete, sender=Agendamento)
+def registrar_agendamento_removido(sender, instance, origin=None, **kwargs):
+    # Empresa sendo excluída leva os agendamentos junto: não há calendário
+    # para sincronizar e o registro apontaria para a empresa apagada
+    if isinstance(origin, Empresa) or (isinstance(origin, QuerySet) and origin.model is Empresa):
+        return
+    registrar_removido(instance.empresa_id, instance.pk)
+
+
+@receiver(post_save, sender=Agendamento)
+def emitir_eventos_agendamento(sender, instance, created, raw=False, **kwargs):
+    # Ponte do save() comum para os eventos de domínio; caminhos em lote
+    # emitem direto (agendamentos/services/agendamentos.py)
+    if not raw:
+        emitir_mudancas([instance], criados=created)
+
+
+@assinar(SALVO)
+def invalidar_ocupacao_agendamentos(agendamentos):
+    for empresa_id in {agendamento.empresa_id for agendamento in agendamentos}:
+        transaction.on_commit(partial(invalidar_ocupacao, empresa_id))
+
+
+@assinar(SALVO)
+def publicar_agendamentos_salvos(agendamentos):
+    for agendamento in agendamentos:
+        transaction.on_commit(partial(
+            publicar_mudanca, agendamento.empresa_id, evento_agendamento(agendamento, 'u')
+        ))
+
+
+@receiver(post_delete, sender=Agendamento)
+def publicar_agendamento_removido(sender, instance, **kwargs):
+    transaction.on_commit(partial(publicar_mudanca, instance.empresa_id, evento_agendamento(instance, 'd')))
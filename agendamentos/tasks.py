@@ -9,114 +9,87 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# tipo -> (antecedência, campo de controle no agendamento, permissão no plano)
+LEMBRETES = {
+    '1_dia': (timedelta(hours=24), 'notificado_1dia', 'permite_lembrete_1_dia'),
+    '1_hora': (timedelta(hours=1), 'notificado_1hora', 'permite_lembrete_1_hora'),
+}
+
+
 @shared_task
 def enviar_lembretes_agendamentos():
     """
-    Envia lembretes de agendamentos conforme configuração do plano.
+    Enfileira lembretes de agendamentos conforme configuração do plano.
     
-    Executa a cada 10 minutos via Celery Beat.
+    Executa a cada 10 minutos via Celery Beat. Os lembretes vão para a
+    fila de envio WhatsApp (empresas/fila_whatsapp.py), que limita o ritmo
+    por instância; cada agendamento recebe no máximo um lembrete de cada tipo.
     
     Lógica:
     - Lembrete 1 dia antes (24h): Todos os planos
     - Lembrete 1 hora antes: Apenas planos que permitem
     """
     from agendamentos.models import Agendamento
-    from empresas.services.evolution_api import EvolutionAPIService
+    from empresas.fila_whatsapp import enfileirar, montar_mensagem
     
     agora = timezone.now()
     lembretes_enviados = {'1_dia': 0, '1_hora': 0, 'erros': 0}
     
-    # ========== LEMBRETE 1 DIA ANTES (24h) ==========
-    # Busca agendamentos entre 23h50min e 24h10min no futuro
-    inicio_janela_1dia = agora + timedelta(hours=23, minutes=50)
-    fim_janela_1dia = agora + timedelta(hours=24, minutes=10)
-    
-    agendamentos_1_dia = Agendamento.objects.filter(
-        data_hora_inicio__gte=inicio_janela_1dia,
-        data_hora_inicio__lte=fim_janela_1dia,
-        status='confirmado',
-        notificado_1dia=False
-    ).select_related(
-        'empresa__assinatura__plano',
-        'empresa__configuracao_whatsapp',
-        'cliente',
-        'servico',
-        'profissional'
-    )
-    
-    logger.info(f"Encontrados {agendamentos_1_dia.count()} agendamentos para lembrete de 1 dia")
-    
-    for agendamento in agendamentos_1_dia:
-        try:
-            plano = agendamento.empresa.assinatura.plano
-            
-            # Verificar se plano permite lembrete de 1 dia
-            if not plano.permite_lembrete_1_dia:
-                logger.debug(f"Plano {plano.nome} não permite lembrete de 1 dia")
-                continue
-            
-            # Enviar lembrete
-            sucesso = _enviar_mensagem_lembrete(agendamento, tipo='1_dia')
-            
-            if sucesso:
-                agendamento.notificado_1dia = True
-                agendamento.save(update_fields=['notificado_1dia'])
-                lembretes_enviados['1_dia'] += 1
-                logger.info(f"Lembrete 1 dia enviado: Agendamento #{agendamento.id}")
-            else:
-                lembretes_enviados['erros'] += 1
+    for tipo, (antecedencia, campo, permissao) in LEMBRETES.items():
+        # Janela de 10 minutos antes e depois da antecedência
+        agendamentos = Agendamento.objects.filter(
+            data_hora_inicio__gte=agora + antecedencia - timedelta(minutes=10),
+            data_hora_inicio__lte=agora + antecedencia + timedelta(minutes=10),
+            status='confirmado',
+            **{campo: False}
+        ).select_related(
+            'empresa__assinatura__plano',
+            'empresa__config_whatsapp',
+            'cliente',
+            'servico',
+            'profissional'
+        )
+        
+        mensagens, enfileirados = [], []
+        for agendamento in agendamentos:
+            try:
+                plano = agendamento.empresa.assinatura.plano
+                if not getattr(plano, permissao):
+                    logger.debug(f"Plano {plano.nome} não permite lembrete de {tipo.replace('_', ' ')}")
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Erro ao enviar lembrete 1 dia para agendamento #{agendamento.id}: {e}")
-            lembretes_enviados['erros'] += 1
-    
-    # ========== LEMBRETE 1 HORA ANTES ==========
-    # Busca agendamentos entre 50min e 1h10min no futuro
-    inicio_janela_1hora = agora + timedelta(minutes=50)
-    fim_janela_1hora = agora + timedelta(hours=1, minutes=10)
-    
-    agendamentos_1_hora = Agendamento.objects.filter(
-        data_hora_inicio__gte=inicio_janela_1hora,
-        data_hora_inicio__lte=fim_janela_1hora,
-        status='confirmado',
-        notificado_1hora=False
-    ).select_related(
-        'empresa__assinatura__plano',
-        'empresa__configuracao_whatsapp',
-        'cliente',
-        'servico',
-        'profissional'
-    )
-    
-    logger.info(f"Encontrados {agendamentos_1_hora.count()} agendamentos para lembrete de 1 hora")
-    
-    for agendamento in agendamentos_1_hora:
-        try:
-            plano = agendamento.empresa.assinatura.plano
-            
-            # Verificar se plano permite lembrete de 1 hora (apenas planos superiores)
-            if not plano.permite_lembrete_1_hora:
-                logger.debug(f"Plano {plano.nome} não permite lembrete de 1 hora")
-                continue
-            
-            # Enviar lembrete
-            sucesso = _enviar_mensagem_lembrete(agendamento, tipo='1_hora')
-            
-            if sucesso:
-                agendamento.notificado_1hora = True
-                agendamento.save(update_fields=['notificado_1hora'])
-                lembretes_enviados['1_hora'] += 1
-                logger.info(f"Lembrete 1 hora enviado: Agendamento #{agendamento.id}")
-            else:
-                lembretes_enviados['erros'] += 1
+                config_whatsapp = getattr(agendamento.empresa, 'config_whatsapp', None)
+                if not config_whatsapp or not config_whatsapp.esta_conectado():
+                    logger.warning(
+                        f"WhatsApp não conectado para empresa {agendamento.empresa.nome} "
+                        f"(ID: {agendamento.empresa.id})"
+                    )
+                    lembretes_enviados['erros'] += 1
+                    continue
+                if not agendamento.cliente.telefone:
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Erro ao enviar lembrete 1 hora para agendamento #{agendamento.id}: {e}")
-            lembretes_enviados['erros'] += 1
+                mensagens.append(montar_mensagem(
+                    agendamento.empresa_id,
+                    config_whatsapp.instance_name,
+                    agendamento.cliente.telefone,
+                    _mensagem_lembrete(agendamento, tipo),
+                    f'lembrete_{tipo}',
+                    agendamento_id=agendamento.pk,
+                ))
+                enfileirados.append(agendamento.pk)
+            except Exception as e:
+                logger.error(f"Erro ao preparar lembrete {tipo} para agendamento #{agendamento.id}: {e}")
+                lembretes_enviados['erros'] += 1
+        
+        # Lembrete já enfileirado antes para o agendamento é ignorado pela fila
+        enfileirar(mensagens)
+        Agendamento.objects.filter(pk__in=enfileirados).update(**{campo: True})
+        lembretes_enviados[tipo] = len(enfileirados)
     
     # Log resumo
     logger.info(
-        f"Lembretes enviados: {lembretes_enviados['1_dia']} (1 dia), "
+        f"Lembretes enfileirados: {lembretes_enviados['1_dia']} (1 dia), "
         f"{lembretes_enviados['1_hora']} (1 hora), "
         f"{lembretes_enviados['erros']} erros"
     )
@@ -124,37 +97,25 @@ def enviar_lembretes_agendamentos():
     return lembretes_enviados
 
 
-def _enviar_mensagem_lembrete(agendamento, tipo='1_dia'):
+def _mensagem_lembrete(agendamento, tipo='1_dia'):
     """
-    Envia mensagem de lembrete via Evolution API (WhatsApp)
+    Texto do lembrete de agendamento
     
     Args:
         agendamento: Instância de Agendamento
         tipo: '1_dia' ou '1_hora'
-    
-    Returns:
-        bool: True se enviou com sucesso
     """
-    config_whatsapp = agendamento.empresa.configuracao_whatsapp
-    
-    # Verificar se WhatsApp está conectado
-    if not config_whatsapp or config_whatsapp.status != 'conectado':
-        logger.warning(
-            f"WhatsApp não conectado para empresa {agendamento.empresa.nome} "
-            f"(ID: {agendamento.empresa.id})"
-        )
-        return False
+    inicio = timezone.localtime(agendamento.data_hora_inicio)
     
-    # Montar mensagem conforme tipo
     if tipo == '1_dia':
-        mensagem = f"""🔔 *Lembrete de Agendamento*
+        return f"""🔔 *Lembrete de Agendamento*
 
 Olá {agendamento.cliente.nome}! 
 
 Você tem um agendamento amanhã:
 
-📅 Data: {agendamento.data_hora_inicio.strftime('%d/%m/%Y')}
-🕐 Horário: {agendamento.data_hora_inicio.strftime('%H:%M')}
+📅 Data: {inicio.strftime('%d/%m/%Y')}
+🕐 Horário: {inicio.strftime('%H:%M')}
 ✂️ Serviço: {agendamento.servico.nome}
 👤 Profissional: {agendamento.profissional.nome if agendamento.profissional else 'A definir'}
 
@@ -162,28 +123,31 @@ Nos vemos lá! 😊
 
 _Para cancelar ou reagendar, responda esta mensagem._"""
     
-    else:  # 1_hora
-        mensagem = f"""⏰ *Lembrete: Seu horário é daqui a 1 hora!*
+    # 1_hora
+    return f"""⏰ *Lembrete: Seu horário é daqui a 1 hora!*
 
 Olá {agendamento.cliente.nome}!
 
-Seu agendamento é às *{agendamento.data_hora_inicio.strftime('%H:%M')}*
+Seu agendamento é às *{inicio.strftime('%H:%M')}*
 
 ✂️ {agendamento.servico.nome}
 👤 Com {agendamento.profissional.nome if agendamento.profissional else 'nosso profissional'}
 
 Até já! 🚀"""
-    
-    # Enviar via Evolution API
+
+
+@shared_task
+def limpar_agendamentos_removidos():
+    """
+    Apaga os registros de exclusão (AgendamentoRemovido) mais antigos que
+    settings.CALENDARIO_REMOVIDOS_RETENCAO_DIAS. Cursores do calendário
+    mais antigos que isso recebem a carga completa.
+    """
+    from agendamentos.feed_calendario import limpar_removidos
+
     try:
-        service = EvolutionAPIService(config_whatsapp)
-        resultado = service.enviar_mensagem(
-            numero=agendamento.cliente.telefone,
-            mensagem=mensagem
-        )
-        
-        return resultado.get('success', False)
-        
+        apagados = limpar_removidos()
+        logger.info(f"{apagados} registros de agendamentos removidos apagados")
+        return apagados
     except Exception as e:
-        logger.error(f"Erro ao enviar mensagem via Evolution API: {e}")
-        return False
+        logger.error(f"Erro ao limpar agendamentos removidos: {str(e)}")
@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from django.utils.timezone import now, make_aware, get_current_timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
+from io import StringIO
 from empresas.models import Empresa, Servico, Profissional
 from clientes.models import Cliente
 from agendamentos.models import Agendamento, StatusAgendamento, DisponibilidadeProfissional
@@ -751,3 +752,931 @@ class BotAPITest(TestCase):
         # Verificar profissionais
         self.assertEqual(len(data['profissionais']), 1)
         self.assertEqual(data['profissionais'][0]['nome'], 'João Barbeiro')
+
+
+class LogBotTest(TestCase):
+    """Testes da gravação única/write-behind dos logs do bot (log_bot.py)"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from django.conf import settings
+
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Log',
+            slug='empresa-log',
+            telefone='11999999999',
+            email='log@teste.com',
+            cnpj='11.222.333/0001-44'
+        )
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=30
+        )
+        self.profissional = Profissional.objects.create(
+            empresa=self.empresa,
+            nome='Pedro',
+            email='pedro@teste.com',
+            telefone='11888888888'
+        )
+        self.client_api = APIClient()
+        self.headers = {
+            'HTTP_X_API_KEY': settings.GESTTO_API_KEY,
+            'HTTP_X_EMPRESA_ID': str(self.empresa.id),
+        }
+
+    def test_agendar_grava_log_uma_unica_vez(self):
+        """O log é inserido uma vez, já com agendamento e status final"""
+        from agendamentos.models import LogMensagemBot
+
+        amanha = (now() + timedelta(days=1)).date()
+        response = self.client_api.post('/api/bot/processar/', {
+            'telefone': '5511977776666',
+            'mensagem_original': 'quero cortar amanhã 10h',
+            'intencao': 'agendar',
+            'dados': {'servico': 'corte', 'data': amanha.isoformat(), 'hora': '10:00'},
+        }, format='json', **self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['sucesso'])
+
+        logs = LogMensagemBot.objects.filter(empresa=self.empresa)
+        self.assertEqual(logs.count(), 1)
+        log = logs.get()
+        self.assertEqual(log.status, 'sucesso')
+        self.assertIsNotNone(log.agendamento_id)
+
+    def test_agendar_sem_updates_no_log(self):
+        """Nenhum UPDATE é emitido na tabela de logs"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        amanha = (now() + timedelta(days=1)).date()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client_api.post('/api/bot/processar/', {
+                'telefone': '5511977776666',
+                'intencao': 'agendar',
+                'dados': {'servico': 'corte', 'data': amanha.isoformat(), 'hora': '11:00'},
+            }, format='json', **self.headers)
+
+        sqls = [q['sql'] for q in ctx.captured_queries if 'agendamentos_logmensagembot' in q['sql']]
+        self.assertEqual(len(sqls), 1)
+        self.assertTrue(sqls[0].startswith('INSERT'))
+
+    def test_gravador_write_behind_flush_em_lote(self):
+        """O gravador acumula logs e grava em lote com bulk_create"""
+        from agendamentos.log_bot import GravadorLogBot, novo_log_bot
+        from agendamentos.models import LogMensagemBot
+
+        gravador = GravadorLogBot(tamanho_fila=10, tamanho_lote=5)
+        for i in range(3):
+            log = novo_log_bot(self.empresa, f'55119000000{i}', 'oi', 'consultar', {})
+            log.status = 'sucesso'
+            gravador._fila.put_nowait(log)
+
+        self.assertEqual(LogMensagemBot.objects.count(), 0)
+        gravador.flush()
+        self.assertEqual(LogMensagemBot.objects.count(), 3)
+
+    def test_gravador_fila_cheia_grava_sincrono(self):
+        """Com a fila cheia o log é gravado na hora (nunca descartado)"""
+        from agendamentos.log_bot import GravadorLogBot, novo_log_bot
+        from agendamentos.models import LogMensagemBot
+
+        gravador = GravadorLogBot(tamanho_fila=1, tamanho_lote=5)
+        gravador._fila.put_nowait(novo_log_bot(self.empresa, '1', 'a', 'outro', {}))
+
+        # Evita iniciar a thread de fundo no teste
+        gravador.iniciar = lambda: None
+        log = novo_log_bot(self.empresa, '2', 'b', 'outro', {})
+        log.status = 'erro'
+        gravador.enfileirar(log)
+
+        self.assertEqual(LogMensagemBot.objects.filter(telefone='2').count(), 1)
+
+    def test_comando_limpar_logs_bot(self):
+        """Remove apenas logs mais antigos que a retenção"""
+        import tempfile
+        from django.core.management import call_command
+        from django.test import override_settings
+        from agendamentos.models import LogMensagemBot
+
+        antigo = LogMensagemBot.objects.create(
+            empresa=self.empresa, telefone='1', mensagem_original='x',
+            intencao_detectada='outro', status='sucesso'
+        )
+        LogMensagemBot.objects.filter(pk=antigo.pk).update(criado_em=now() - timedelta(days=200))
+        recente = LogMensagemBot.objects.create(
+            empresa=self.empresa, telefone='2', mensagem_original='y',
+            intencao_detectada='outro', status='sucesso'
+        )
+
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(PARTICIONAMENTO_ARQUIVO_DIR=diretorio):
+            call_command('limpar_logs_bot', days=90, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(LogMensagemBot.objects.filter(pk=antigo.pk).exists())
+        self.assertTrue(LogMensagemBot.objects.filter(pk=recente.pk).exists())
+
+
+class PaginaPublicaCacheTest(TestCase):
+    """Testes do cache da página pública de agendamento (cache_publico.py)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from empresas.models import HorarioFuncionamento
+
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Publica',
+            slug='empresa-publica',
+            telefone='11999999999',
+            email='publica@teste.com',
+            cnpj='22.333.444/0001-55',
+            onboarding_completo=True
+        )
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=30
+        )
+        self.profissional = Profissional.objects.create(
+            empresa=self.empresa,
+            nome='Ana',
+            email='ana@teste.com',
+            telefone='11888888888'
+        )
+        self.profissional.servicos.add(self.servico)
+        self.cliente = Cliente.objects.create(
+            empresa=self.empresa,
+            nome='Cliente Publico',
+            telefone='11777777777'
+        )
+
+        self.data = (now() + timedelta(days=2)).date()
+        HorarioFuncionamento.objects.create(
+            empresa=self.empresa,
+            dia_semana=self.data.weekday(),
+            hora_abertura=datetime.strptime('09:00', '%H:%M').time(),
+            hora_fechamento=datetime.strptime('11:00', '%H:%M').time()
+        )
+        self.url = f'/agendar/{self.empresa.slug}/'
+
+    def _queries_catalogo(self, queries):
+        return [q for q in queries if 'empresas_servico' in q['sql'] or 'empresas_empresa' in q['sql']]
+
+    def test_pagina_cacheada_com_etag_e_304(self):
+        """Segundo acesso não consulta empresa/serviços e aceita revalidação"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Corte')
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self._queries_catalogo(contexto.captured_queries), [])
+
+    def test_alteracao_de_servico_invalida_catalogo(self):
+        """Novo serviço aparece na hora e muda o ETag"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servico.objects.create(
+                empresa=self.empresa,
+                nome='Barba',
+                preco=Decimal('25.00'),
+                duracao_minutos=20
+            )
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Barba')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_profissionais_vem_do_catalogo(self):
+        response = self.client.get(f'{self.url}api/profissionais/', {'servico_id': self.servico.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['nome'] for p in response.json()['profissionais']], ['Ana'])
+
+        response = self.client.get(f'{self.url}api/profissionais/', {'servico_id': 999999})
+        self.assertEqual(response.status_code, 404)
+
+    def test_horarios_invalidados_por_novo_agendamento(self):
+        """Horários ficam em cache até a agenda da empresa mudar"""
+        import json
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        payload = json.dumps({
+            'servico_id': self.servico.id,
+            'profissional_id': self.profissional.id,
+            'data': self.data.isoformat(),
+        })
+        url = f'{self.url}api/horarios-disponiveis/'
+
+        horarios = self.client.post(url, payload, content_type='application/json').json()['horarios']
+        self.assertEqual([h['hora'] for h in horarios], ['09:00', '09:30', '10:00', '10:30'])
+
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual(
+                self.client.post(url, payload, content_type='application/json').json()['horarios'],
+                horarios
+            )
+        self.assertFalse([q for q in contexto.captured_queries if 'agendamentos_' in q['sql']])
+        self.assertEqual(self._queries_catalogo(contexto.captured_queries), [])
+
+        inicio = make_aware(datetime.combine(self.data, datetime.strptime('09:00', '%H:%M').time()))
+        with self.captureOnCommitCallbacks(execute=True):
+            Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=self.cliente,
+                servico=self.servico,
+                profissional=self.profissional,
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=30),
+            )
+
+        horarios = self.client.post(url, payload, content_type='application/json').json()['horarios']
+        self.assertEqual([h['hora'] for h in horarios], ['09:30', '10:00', '10:30'])
+
+
+class ContextoBotTest(TestCase):
+    """Testes do endpoint de contexto do bot (/api/n8n/contexto/)"""
+
+    def setUp(self):
+        from django.conf import settings
+        from django.core.cache import cache
+        from empresas.models import HorarioFuncionamento, DataEspecial
+
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Contexto',
+            slug='empresa-contexto',
+            telefone='11999999999',
+            email='contexto@teste.com',
+            cnpj='33.444.555/0001-66'
+        )
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=60
+        )
+        self.profissional = Profissional.objects.create(
+            empresa=self.empresa,
+            nome='Bruno',
+            telefone='11888888888'
+        )
+        self.profissional.servicos.add(self.servico)
+        self.cliente = Cliente.objects.create(
+            empresa=self.empresa,
+            nome='Cliente Contexto',
+            telefone='11777777777'
+        )
+
+        self.data = (now() + timedelta(days=1)).date()
+        for dia in range(7):
+            HorarioFuncionamento.objects.create(
+                empresa=self.empresa,
+                dia_semana=dia,
+                hora_abertura=datetime.strptime('09:00', '%H:%M').time(),
+                hora_fechamento=datetime.strptime('12:00', '%H:%M').time()
+            )
+        DataEspecial.objects.create(
+            empresa=self.empresa,
+            data=self.data + timedelta(days=1),
+            descricao='Feriado local'
+        )
+        self.url = '/api/n8n/contexto/'
+        self.params = {'data_inicio': self.data.isoformat(), 'dias': 3, 'servico_id': self.servico.id}
+        self.headers = {
+            'HTTP_X_API_KEY': settings.GESTTO_API_KEY,
+            'HTTP_X_EMPRESA_ID': str(self.empresa.id),
+        }
+
+    def test_contexto_completo_com_uma_query_de_agendamentos(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        inicio = make_aware(datetime.combine(self.data, datetime.strptime('10:00', '%H:%M').time()))
+        Agendamento.objects.create(
+            empresa=self.empresa,
+            cliente=self.cliente,
+            servico=self.servico,
+            profissional=self.profissional,
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=60),
+            status=StatusAgendamento.CONFIRMADO
+        )
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(self.url, self.params, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+
+        self.assertEqual([s['nome'] for s in dados['servicos']], ['Corte'])
+        self.assertEqual(dados['profissionais'][0]['servicos'], ['Corte'])
+        self.assertEqual(len(dados['horarios_funcionamento']), 7)
+        self.assertEqual([d['descricao'] for d in dados['datas_especiais']], ['Feriado local'])
+
+        dia, feriado, _ = dados['disponibilidade']
+        self.assertEqual(dia['horarios_disponiveis'], ['09:00', '11:00'])
+        self.assertTrue(feriado['fechado'])
+        self.assertEqual(feriado['horarios_disponiveis'], [])
+        self.assertEqual(
+            len([q for q in contexto.captured_queries if 'agendamentos_agendamento' in q['sql']]), 1
+        )
+
+    def test_etag_304_ate_a_agenda_mudar(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        etag = self.client.get(self.url, self.params, **self.headers)['ETag']
+
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([
+            q for q in contexto.captured_queries
+            if 'agendamentos_agendamento' in q['sql'] or 'empresas_servico' in q['sql']
+        ])
+
+        inicio = make_aware(datetime.combine(self.data, datetime.strptime('09:00', '%H:%M').time()))
+        with self.captureOnCommitCallbacks(execute=True):
+            Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=self.cliente,
+                servico=self.servico,
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=60),
+                status=StatusAgendamento.PENDENTE
+            )
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('09:00', response.json()['disponibilidade'][0]['horarios_disponiveis'])
+
+    def test_novo_servico_invalida_contexto(self):
+        self.client.get(self.url, self.params, **self.headers)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servico.objects.create(
+                empresa=self.empresa,
+                nome='Barba',
+                preco=Decimal('25.00'),
+                duracao_minutos=20
+            )
+
+        dados = self.client.get(self.url, self.params, **self.headers).json()
+        self.assertEqual([s['nome'] for s in dados['servicos']], ['Barba', 'Corte'])
+
+
+class FeedCalendarioTest(TestCase):
+    """Testes do feed v2 do calendário (/app/agendamentos/api/feed/)"""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Feed',
+            slug='empresa-feed',
+            telefone='11999999999',
+            email='feed@teste.com',
+            cnpj='44.555.666/0001-77'
+        )
+        self.usuario = Usuario.objects.create_user(
+            username='feed',
+            email='feed@teste.com',
+            password='senha123',
+            empresa=self.empresa
+        )
+        self.client.force_login(self.usuario)
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=30
+        )
+        self.profissional = Profissional.objects.create(
+            empresa=self.empresa,
+            nome='Bruno',
+            telefone='11888888888',
+            cor_hex='#e11d48'
+        )
+        self.cliente = Cliente.objects.create(
+            empresa=self.empresa,
+            nome='Cliente Feed',
+            telefone='11777777777'
+        )
+
+        self.data = (now() + timedelta(days=2)).date()
+        self.url = reverse('agendamentos:api_calendario_feed')
+        self.params = {
+            'start': self.data.isoformat(),
+            'end': (self.data + timedelta(days=1)).isoformat(),
+        }
+        self.ag_9h = self._criar('09:00')
+        self.ag_10h = self._criar('10:00')
+        self.ag_11h = self._criar('11:00', status=StatusAgendamento.CANCELADO)
+        self._criar('09:00', dias=3)  # Fora da faixa
+
+        # Tudo "antigo": só o que mudar depois entra no delta
+        Agendamento.objects.update(atualizado_em=now() - timedelta(hours=1))
+
+    def _criar(self, hora, dias=0, status=StatusAgendamento.CONFIRMADO):
+        inicio = make_aware(datetime.combine(
+            self.data + timedelta(days=dias), datetime.strptime(hora, '%H:%M').time()
+        ))
+        return Agendamento.objects.create(
+            empresa=self.empresa,
+            cliente=self.cliente,
+            servico=self.servico,
+            profissional=self.profissional,
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=30),
+            status=status,
+            valor_cobrado=Decimal('40.00')
+        )
+
+    def test_carga_completa_colunar(self):
+        response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, 200)
+        feed = response.json()
+        self.assertTrue(feed['completo'])
+        self.assertEqual(feed['eventos']['id'], [self.ag_9h.id, self.ag_10h.id])
+        self.assertEqual(feed['eventos']['duracao'], [30, 30])
+        self.assertEqual(feed['eventos']['inicio'][0], int(self.ag_9h.data_hora_inicio.timestamp()))
+        self.assertEqual(feed['status'][feed['eventos']['status'][0]], 'confirmado')
+        self.assertEqual(feed['profissionais'], {str(self.profissional.id): ['Bruno', '#e11d48']})
+        self.assertEqual(feed['servicos'], {str(self.servico.id): 'Corte'})
+        self.assertEqual(feed['removidos'], [])
+
+    def test_delta_traz_alteracoes_e_remocoes(self):
+        cursor = self.client.get(self.url, self.params).json()['cursor']
+
+        novo = self._criar('14:00')
+        self.ag_9h.status = StatusAgendamento.CANCELADO
+        self.ag_9h.save()
+        id_excluido = self.ag_10h.id
+        self.ag_10h.delete()
+
+        feed = self.client.get(self.url, {**self.params, 'since': cursor}).json()
+
+        self.assertFalse(feed['completo'])
+        self.assertEqual(feed['eventos']['id'], [novo.id])
+        self.assertEqual(feed['removidos'], sorted([self.ag_9h.id, id_excluido]))
+
+    def test_etag_sem_mudancas_retorna_304(self):
+        response = self.client.get(self.url, self.params)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self._criar('15:00')
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(self.url, {'start': 'x', 'end': 'y'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'since': 'abc'}).status_code, 400)
+
+
+class EventosCalendarioTest(TestCase):
+    """Testes do push do calendário (SSE, agendamentos/eventos_calendario.py)"""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nome='Empresa SSE',
+            slug='empresa-sse',
+            telefone='11999999999',
+            email='sse@teste.com',
+            cnpj='55.666.777/0001-88'
+        )
+        self.usuario = Usuario.objects.create_user(
+            username='sse',
+            email='sse@teste.com',
+            password='senha123',
+            empresa=self.empresa
+        )
+        self.client.force_login(self.usuario)
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=30
+        )
+        self.cliente = Cliente.objects.create(
+            empresa=self.empresa,
+            nome='Cliente SSE',
+            telefone='11777777777'
+        )
+        self.url = reverse('agendamentos:eventos_calendario')
+
+    def test_signals_publicam_apos_commit(self):
+        from unittest.mock import patch
+
+        inicio = now() + timedelta(days=1)
+        with patch('agendamentos.signals.publicar_mudanca') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                agendamento = Agendamento.objects.create(
+                    empresa=self.empresa,
+                    cliente=self.cliente,
+                    servico=self.servico,
+                    data_hora_inicio=inicio,
+                    data_hora_fim=inicio + timedelta(minutes=30)
+                )
+            id_agendamento = agendamento.id
+            with self.captureOnCommitCallbacks(execute=True):
+                agendamento.delete()
+
+        eventos = [chamada.args for chamada in publicar.call_args_list]
+        self.assertEqual([(empresa_id, e['op'], e['id']) for empresa_id, e in eventos], [
+            (self.empresa.id, 'u', id_agendamento),
+            (self.empresa.id, 'd', id_agendamento),
+        ])
+        self.assertEqual(eventos[0][1]['inicio'], int(inicio.timestamp()))
+
+    def test_sem_redis_responde_503(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+
+    def test_limite_de_conexoes_responde_429(self):
+        from unittest.mock import AsyncMock, patch
+        from django.test import override_settings
+
+        with override_settings(CALENDARIO_SSE_REDIS_URL='redis://localhost:6379/0', SERVIDOR_ASGI=True), \
+                patch('agendamentos.views.abrir_conexao', AsyncMock(return_value=None)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+
+    async def test_fluxo_repassa_eventos_e_libera_vaga(self):
+        from unittest.mock import AsyncMock, MagicMock
+        from django.test import override_settings
+        from agendamentos.eventos_calendario import fluxo_eventos
+
+        pubsub = MagicMock()
+        pubsub.subscribe = AsyncMock()
+        pubsub.aclose = AsyncMock()
+        pubsub.get_message = AsyncMock(side_effect=[{'data': b'{"op":"u","id":7}'}, None, None, None])
+        cliente = MagicMock()
+        cliente.pubsub.return_value = pubsub
+        cliente.zadd = AsyncMock()
+        cliente.zrem = AsyncMock()
+        cliente.expire = AsyncMock()
+        cliente.aclose = AsyncMock()
+
+        with override_settings(CALENDARIO_SSE_HEARTBEAT=0, CALENDARIO_SSE_DURACAO_MAX=0.05):
+            fluxo = fluxo_eventos(self.empresa.id, cliente, 'conexao-1')
+            partes = [await fluxo.__anext__() for _ in range(3)]
+            await fluxo.aclose()  # Navegador desconectou
+
+        self.assertIn('event: pronto', partes[0])
+        self.assertEqual(partes[1], 'event: agendamento\ndata: {"op":"u","id":7}\n\n')
+        self.assertEqual(partes[2], ': ping\n\n')
+        cliente.zrem.assert_awaited_with(f'calendario:conexoes:{self.empresa.id}', 'conexao-1')
+        cliente.aclose.assert_awaited()
+
+
+class EventosDominioTest(TestCase):
+    """Testes da camada de serviço e dos eventos de domínio (agendamentos/services/)"""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Dominio',
+            slug='empresa-dominio',
+            telefone='11999999999',
+            email='dominio@teste.com',
+            cnpj='77.888.999/0001-11'
+        )
+        self.outra = Empresa.objects.create(
+            nome='Outra Empresa',
+            slug='outra-empresa',
+            telefone='11999999998',
+            email='outra@teste.com',
+            cnpj='77.888.999/0002-11'
+        )
+        self.servico = Servico.objects.create(
+            empresa=self.empresa, nome='Corte', preco=Decimal('40.00'), duracao_minutos=30
+        )
+        self.cliente = Cliente.objects.create(empresa=self.empresa, nome='Cliente', telefone='11777777777')
+        self.cliente_outra = Cliente.objects.create(empresa=self.outra, nome='Intruso', telefone='11777777778')
+
+    def _novo(self, dias=1, **campos):
+        inicio = now() + timedelta(days=dias)
+        dados = {
+            'empresa_id': self.empresa.id,
+            'cliente_id': self.cliente.id,
+            'servico_id': self.servico.id,
+            'data_hora_inicio': inicio,
+            'data_hora_fim': inicio + timedelta(minutes=30),
+            'valor_cobrado': Decimal('40.00'),
+            **campos,
+        }
+        return Agendamento(**dados)
+
+    def _assinante(self, evento):
+        from agendamentos.services import eventos
+
+        lotes = []
+        eventos.assinar(evento)(lotes.append)
+        self.addCleanup(eventos._assinantes[evento].remove, lotes.append)
+        return lotes
+
+    def test_save_sem_queries_escondidas(self):
+        """Criar com objetos carregados e mudar status não buscam nada além do INSERT/UPDATE"""
+        with self.assertNumQueries(1):
+            agendamento = Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=self.cliente,
+                servico=self.servico,
+                data_hora_inicio=now() + timedelta(days=1),
+                data_hora_fim=now() + timedelta(days=1, minutes=30),
+            )
+
+        agendamento = Agendamento.objects.get(pk=agendamento.pk)
+        cancelados = self._assinante('cancelado')
+        agendamento.status = StatusAgendamento.CANCELADO
+        with self.assertNumQueries(1):
+            agendamento.save()
+        self.assertEqual(cancelados, [[agendamento]])
+        self.assertEqual(agendamento.valor_original('status'), StatusAgendamento.CANCELADO)
+
+    def test_validacao_de_empresa_por_id(self):
+        from django.core.exceptions import ValidationError
+
+        with self.assertRaises(ValidationError) as erro:
+            self._novo(cliente_id=self.cliente_outra.id).save()
+        self.assertIn('cliente', erro.exception.message_dict)
+
+        with self.assertRaises(ValidationError):
+            novo = self._novo()
+            novo.cliente = self.cliente_outra
+            novo.save()
+
+    def test_criar_em_lote_emite_uma_vez(self):
+        from agendamentos.services.agendamentos import criar_agendamentos
+
+        criados_lotes = self._assinante('criado')
+        novos = [self._novo(dias=dia) for dia in range(1, 6)]
+
+        # Uma query por tipo de FK + INSERT (+ SAVEPOINT/RELEASE do atomic)
+        with self.assertNumQueries(5):
+            criados = criar_agendamentos(novos)
+
+        self.assertEqual(len(criados_lotes), 1)
+        self.assertEqual(len(criados_lotes[0]), 5)
+        self.assertTrue(all(agendamento.pk for agendamento in criados))
+        self.assertEqual(Agendamento.objects.filter(empresa=self.empresa).count(), 5)
+
+    def test_alterar_status_em_lote_cria_receitas(self):
+        from agendamentos.services.agendamentos import alterar_status, criar_agendamentos
+        from financeiro.models import LancamentoFinanceiro
+
+        criar_agendamentos([self._novo(dias=-dia) for dia in range(1, 4)])
+        agendamentos = list(Agendamento.objects.filter(empresa=self.empresa))
+
+        alterados = alterar_status(agendamentos, StatusAgendamento.CONCLUIDO)
+
+        self.assertEqual(len(alterados), 3)
+        self.assertEqual(LancamentoFinanceiro.objects.filter(empresa=self.empresa).count(), 3)
+
+        alterar_status(agendamentos, StatusAgendamento.CANCELADO)
+        self.assertFalse(LancamentoFinanceiro.objects.exclude(status='cancelado').exists())
+        self.assertEqual(alterar_status(agendamentos, StatusAgendamento.CANCELADO), [])
+
+
+class RelatoriosTest(TestCase):
+    """Testes do motor de relatórios em colunas (agendamentos/relatorios.py)"""
+
+    def setUp(self):
+        from agendamentos.services.agendamentos import criar_agendamentos
+
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Relatorios',
+            slug='empresa-relatorios',
+            telefone='11999999999',
+            email='relatorios@teste.com',
+            cnpj='55.666.777/0001-88'
+        )
+        self.corte = Servico.objects.create(empresa=self.empresa, nome='Corte', preco=Decimal('40.00'), duracao_minutos=30)
+        self.barba = Servico.objects.create(empresa=self.empresa, nome='Barba', preco=Decimal('25.50'), duracao_minutos=20)
+        self.ana = Profissional.objects.create(empresa=self.empresa, nome='Ana')
+        self.bia = Profissional.objects.create(empresa=self.empresa, nome='Bia')
+        cliente = Cliente.objects.create(empresa=self.empresa, nome='Cliente', telefone='11777777777')
+
+        self.inicio = datetime(2025, 3, 1).date()
+        self.fim = datetime(2025, 3, 31).date()
+        fuso = get_current_timezone()
+        status = [
+            StatusAgendamento.CONCLUIDO, StatusAgendamento.CONCLUIDO, StatusAgendamento.NAO_COMPARECEU,
+            StatusAgendamento.CANCELADO, StatusAgendamento.CONFIRMADO,
+        ]
+        novos = []
+        for i in range(60):
+            servico = self.corte if i % 3 else self.barba
+            inicio = make_aware(datetime(2025, 2, 27, 8) + timedelta(days=i % 35, hours=i % 10), fuso)
+            novos.append(Agendamento(
+                empresa=self.empresa,
+                cliente=cliente,
+                servico=servico,
+                profissional=[self.ana, self.bia, None][i % 3 if i % 7 else 2],
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=servico.duracao_minutos),
+                status=status[i % 5],
+                valor_cobrado=Decimal('35.00') if i % 4 == 0 else None,
+            ))
+        criar_agendamentos(novos)
+
+    def _periodo(self):
+        from django.db.models.functions import Coalesce
+
+        fuso = get_current_timezone()
+        return Agendamento.objects.filter(
+            empresa=self.empresa,
+            data_hora_inicio__gte=make_aware(datetime(2025, 3, 1), fuso),
+            data_hora_inicio__lt=make_aware(datetime(2025, 4, 1), fuso),
+        ).annotate(valor_efetivo=Coalesce('valor_cobrado', 'servico__preco'))
+
+    def test_indicadores_batem_com_o_orm(self):
+        """Cada indicador do motor confere com a agregação equivalente no ORM"""
+        from django.db.models import Count, Q, Sum
+        from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+        from agendamentos.relatorios import calcular
+
+        dados = calcular(self.empresa.id, self.inicio, self.fim)
+        periodo = self._periodo()
+        resumo = dados['resumo']
+
+        concluidos = periodo.filter(status=StatusAgendamento.CONCLUIDO)
+        faltas = periodo.filter(status=StatusAgendamento.NAO_COMPARECEU).count()
+        receita = concluidos.aggregate(total=Sum('valor_efetivo'))['total']
+        self.assertEqual(resumo['agendamentos'], periodo.count())
+        self.assertEqual(resumo['concluidos'], concluidos.count())
+        self.assertEqual(resumo['receita'], int(receita * 100))
+        self.assertEqual(resumo['taxa_faltas'], round(faltas * 100 / (concluidos.count() + faltas), 1))
+
+        por_profissional = {
+            linha['profissional']: linha
+            for linha in periodo.values('profissional').annotate(
+                total=Count('id'),
+                faltas=Count('id', filter=Q(status=StatusAgendamento.NAO_COMPARECEU)),
+                receita=Sum('valor_efetivo', filter=Q(status=StatusAgendamento.CONCLUIDO)),
+            )
+        }
+        self.assertEqual({p['id'] for p in dados['profissionais']}, set(por_profissional))
+        for profissional in dados['profissionais']:
+            esperado = por_profissional[profissional['id']]
+            self.assertEqual(profissional['agendamentos'], esperado['total'])
+            self.assertEqual(profissional['faltas'], esperado['faltas'])
+            self.assertEqual(profissional['receita'], int((esperado['receita'] or 0) * 100))
+
+        mix = dict(periodo.exclude(status=StatusAgendamento.CANCELADO).values_list('servico').annotate(total=Count('id')))
+        self.assertEqual({s['id']: s['agendamentos'] for s in dados['servicos']}, mix)
+
+        pico = [[0] * 24 for _ in range(7)]
+        for dia, hora, total in (
+            periodo.exclude(status=StatusAgendamento.CANCELADO)
+            .annotate(dia=ExtractIsoWeekDay('data_hora_inicio'), hora=ExtractHour('data_hora_inicio'))
+            .values_list('dia', 'hora').annotate(total=Count('id'))
+        ):
+            pico[dia - 1][hora] += total
+        self.assertEqual(dados['horarios_pico'], pico)
+        self.assertEqual(sum(dados['por_dia']['agendamentos']), sum(map(sum, pico)))
+
+    def test_cache_acompanha_a_versao_e_view_json(self):
+        """Agendamento ou serviço salvo troca a chave do cache; a view devolve o relatório em JSON"""
+        from django.core.cache import cache
+        from django.db.models import Sum
+        from agendamentos.relatorios import relatorio
+        from assinaturas.models import Assinatura, Plano
+
+        cache.clear()
+        antes = relatorio(self.empresa.id, self.inicio, self.fim)
+        with self.assertNumQueries(2):  # Só os nomes; indicadores vêm do cache
+            relatorio(self.empresa.id, self.inicio, self.fim)
+
+        agendamento = self._periodo().filter(status=StatusAgendamento.CONFIRMADO).first()
+        agendamento.status = StatusAgendamento.CONCLUIDO
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento.save()
+        depois = relatorio(self.empresa.id, self.inicio, self.fim)
+        self.assertEqual(depois['resumo']['concluidos'], antes['resumo']['concluidos'] + 1)
+
+        # Preço do serviço entra no faturamento dos agendamentos sem valor_cobrado
+        self.corte.preco = Decimal('50.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.corte.save()
+        reajustado = relatorio(self.empresa.id, self.inicio, self.fim)
+        self.assertEqual(
+            reajustado['resumo']['receita'],
+            int(self._periodo().filter(status=StatusAgendamento.CONCLUIDO).aggregate(total=Sum('valor_efetivo'))['total'] * 100)
+        )
+        self.assertGreater(reajustado['resumo']['receita'], depois['resumo']['receita'])
+
+        plano = Plano.objects.create(nome='profissional', preco_mensal=Decimal('199.90'), permite_relatorios_avancados=True)
+        Assinatura.objects.create(
+            empresa=self.empresa, plano=plano, status='ativa', data_expiracao=now() + timedelta(days=30)
+        )
+        usuario = get_user_model().objects.create_user(
+            username='gestor', email='gestor@teste.com', password='senha12345', empresa=self.empresa
+        )
+        self.client.force_login(usuario)
+        resposta = self.client.get(
+            reverse('agendamentos:relatorios'), {'inicio': '2025-03-01', 'fim': '2025-03-31', 'formato': 'json'}
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['resumo']['concluidos'], depois['resumo']['concluidos'])
+
+
+class CapacidadeTest(TestCase):
+    """Testes do mapa de ocupação da capacidade (agendamentos/capacidade.py)"""
+
+    def setUp(self):
+        from datetime import time
+        from empresas.models import DataEspecial, HorarioFuncionamento
+
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Capacidade',
+            slug='empresa-capacidade',
+            telefone='11999999999',
+            email='capacidade@teste.com',
+            cnpj='44.555.666/0001-77'
+        )
+        HorarioFuncionamento.objects.create(
+            empresa=self.empresa, dia_semana=0, hora_abertura=time(9), hora_fechamento=time(12),
+            intervalo_inicio=time(10), intervalo_fim=time(10, 30)
+        )
+        DataEspecial.objects.create(empresa=self.empresa, data=datetime(2025, 3, 10).date(), descricao='Feriado')
+        self.ana = Profissional.objects.create(empresa=self.empresa, nome='Ana')
+        self.bia = Profissional.objects.create(empresa=self.empresa, nome='Bia')
+        DisponibilidadeProfissional.objects.create(profissional=self.ana, dia_semana=0, hora_inicio=time(9), hora_fim=time(11))
+        servico = Servico.objects.create(empresa=self.empresa, nome='Corte', preco=Decimal('40.00'), duracao_minutos=30)
+        cliente = Cliente.objects.create(empresa=self.empresa, nome='Cliente', telefone='11777777777')
+
+        fuso = get_current_timezone()
+        for profissional, inicio, minutos, status in [
+            (self.ana, datetime(2025, 3, 3, 9), 30, StatusAgendamento.CONFIRMADO),
+            (self.bia, datetime(2025, 3, 3, 9, 30), 45, StatusAgendamento.CONCLUIDO),  # 15 min no intervalo
+            (self.bia, datetime(2025, 3, 3, 11), 30, StatusAgendamento.CANCELADO),
+            (self.ana, datetime(2025, 3, 10, 9), 30, StatusAgendamento.CONFIRMADO),  # Feriado
+        ]:
+            Agendamento.objects.create(
+                empresa=self.empresa, cliente=cliente, servico=servico, profissional=profissional,
+                data_hora_inicio=make_aware(inicio, fuso),
+                data_hora_fim=make_aware(inicio + timedelta(minutes=minutos), fuso),
+                status=status,
+            )
+        self.inicio, self.fim = datetime(2025, 3, 3).date(), datetime(2025, 3, 16).date()
+
+    def test_capacidade_cruza_funcionamento_disponibilidade_e_feriado(self):
+        from agendamentos.capacidade import calcular
+
+        dados = calcular(self.empresa.id, self.inicio, self.fim)
+
+        self.assertEqual(dados['horarios'], ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30'])
+        self.assertEqual(dados['geral']['ocupacao'][0], [50.0, 50.0, None, 0.0, 0.0, 0.0])
+        self.assertEqual(dados['geral']['ocupacao'][1], [None] * 6)
+        self.assertEqual(dados['geral']['percentual'], 25.0)
+
+        por_nome = {p['nome']: p for p in dados['profissionais']}
+        self.assertEqual(por_nome['Ana']['capacidade_minutos'], 90)  # 9h-11h menos o intervalo, só na semana sem feriado
+        self.assertEqual(por_nome['Ana']['ocupacao'][0], [100.0, 0.0, None, 0.0, None, None])
+        self.assertEqual(por_nome['Bia']['capacidade_minutos'], 150)
+        self.assertEqual(por_nome['Bia']['percentual'], 20.0)
+        self.assertEqual(dados['ociosos'][0], {'dia_semana': 'Seg', 'horario': '10:30', 'ocupacao': 0.0})
+
+    def test_endpoint_em_cache_invalidado_pela_disponibilidade(self):
+        from datetime import time
+        from django.core.cache import cache
+        from agendamentos.capacidade import mapa_ocupacao
+        from assinaturas.models import Assinatura, Plano
+
+        cache.clear()
+        plano = Plano.objects.create(nome='profissional', preco_mensal=Decimal('199.90'), permite_relatorios_avancados=True)
+        Assinatura.objects.create(
+            empresa=self.empresa, plano=plano, status='ativa', data_expiracao=now() + timedelta(days=30)
+        )
+        usuario = get_user_model().objects.create_user(
+            username='dono', email='dono@capacidade.com', password='senha12345', empresa=self.empresa
+        )
+        self.client.force_login(usuario)
+        url = reverse('agendamentos:api_ocupacao')
+        resposta = self.client.get(url, {'inicio': '2025-03-03', 'fim': '2025-03-16'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['geral']['percentual'], 25.0)
+        with self.assertNumQueries(0):
+            mapa_ocupacao(self.empresa.id, self.inicio, self.fim)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DisponibilidadeProfissional.objects.create(
+                profissional=self.bia, dia_semana=0, hora_inicio=time(9), hora_fim=time(10)
+            )
+        self.assertEqual(mapa_ocupacao(self.empresa.id, self.inicio, self.fim)['geral']['percentual'], 40.0)
+
+        self.assertEqual(self.client.get(url, {'intervalo': '7'}).status_code, 400)
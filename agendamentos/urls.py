@@ -10,9 +10,15 @@ urlpatterns = [
     path('editar/<int:id>/', views.editar_agendamento, name='editar_agendamento'),
     path('deletar/<int:id>/', views.deletar_agendamento, name='deletar_agendamento'),
     path('api/', views.api_agendamentos, name='api_agendamentos'),
+    path('api/feed/', views.api_calendario_feed, name='api_calendario_feed'),
+    path('api/eventos/', views.eventos_calendario, name='eventos_calendario'),
     path('api/disponibilidade/', views.verificar_disponibilidade, name='verificar_disponibilidade'),
     path('api/horarios-disponiveis/', views.listar_horarios_disponiveis, name='listar_horarios_disponiveis'),
 
+    # Relatórios (agendamentos/relatorios.py)
+    path('relatorios/', views.relatorios_view, name='relatorios'),
+    path('api/ocupacao/', views.api_ocupacao, name='api_ocupacao'),
+
     # Agendamentos recorrentes
     path('recorrencias/', views.listar_recorrencias, name='listar_recorrencias'),
     path('recorrencias/criar/', views.criar_recorrencia, name='criar_recorrencia'),
@@ -3,7 +3,6 @@ Utilitários para gerenciar agendamentos recorrentes
 """
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +20,7 @@ def gerar_agendamentos_recorrencia(recorrencia, dias_futuros=60):
         int: Número de agendamentos criados
     """
     from .models import Agendamento
+    from .services.agendamentos import criar_agendamentos
     
     if not recorrencia.ativo:
         logger.info(f"Recorrência {recorrencia.id} está inativa, pulando geração")
@@ -33,64 +33,67 @@ def gerar_agendamentos_recorrencia(recorrencia, dias_futuros=60):
     if recorrencia.data_fim:
         data_limite = min(data_limite, recorrencia.data_fim)
     
-    agendamentos_criados = 0
     data_atual = data_inicio
     
     logger.info(f"Gerando agendamentos para recorrência {recorrencia.id} de {data_inicio} até {data_limite}")
     
-    with transaction.atomic():
-        while data_atual <= data_limite:
-            # Verificar se deve criar agendamento nesta data
-            deve_criar = False
+    # Horários que já têm agendamento ativo desta recorrência (uma query só)
+    existentes = set(
+        Agendamento.objects.filter(
+            empresa=recorrencia.empresa,
+            cliente=recorrencia.cliente,
+            servico=recorrencia.servico,
+            profissional=recorrencia.profissional,
+            data_hora_inicio__date__gte=data_inicio,
+            data_hora_inicio__date__lte=data_limite,
+            status__in=['pendente', 'confirmado']
+        ).values_list('data_hora_inicio', flat=True)
+    )
+    
+    novos = []
+    while data_atual <= data_limite:
+        # Verificar se deve criar agendamento nesta data
+        deve_criar = False
+        
+        if recorrencia.frequencia == 'diaria':
+            deve_criar = True
+        
+        elif recorrencia.frequencia == 'semanal':
+            dia_semana = data_atual.weekday()  # 0=segunda, 6=domingo
+            deve_criar = dia_semana in recorrencia.dias_semana
+        
+        elif recorrencia.frequencia == 'mensal':
+            deve_criar = data_atual.day == recorrencia.dia_mes
+        
+        if deve_criar:
+            # Criar data/hora de início
+            data_hora_inicio = timezone.make_aware(
+                datetime.combine(data_atual, recorrencia.hora_inicio)
+            )
             
-            if recorrencia.frequencia == 'diaria':
-                deve_criar = True
-            
-            elif recorrencia.frequencia == 'semanal':
-                dia_semana = data_atual.weekday()  # 0=segunda, 6=domingo
-                deve_criar = dia_semana in recorrencia.dias_semana
-            
-            elif recorrencia.frequencia == 'mensal':
-                deve_criar = data_atual.day == recorrencia.dia_mes
-            
-            if deve_criar:
-                # Criar data/hora de início
-                data_hora_inicio = timezone.make_aware(
-                    datetime.combine(data_atual, recorrencia.hora_inicio)
-                )
-                
+            if data_hora_inicio not in existentes:
                 # Calcular data/hora de fim
                 data_hora_fim = data_hora_inicio + timedelta(minutes=recorrencia.servico.duracao_minutos)
                 
-                # Verificar se já existe agendamento
-                existe = Agendamento.objects.filter(
+                # Status confirmado pois é recorrente
+                novos.append(Agendamento(
                     empresa=recorrencia.empresa,
                     cliente=recorrencia.cliente,
                     servico=recorrencia.servico,
                     profissional=recorrencia.profissional,
                     data_hora_inicio=data_hora_inicio,
-                    status__in=['pendente', 'confirmado']
-                ).exists()
-                
-                if not existe:
-                    # Criar agendamento (status confirmado pois é recorrente)
-                    Agendamento.objects.create(
-                        empresa=recorrencia.empresa,
-                        cliente=recorrencia.cliente,
-                        servico=recorrencia.servico,
-                        profissional=recorrencia.profissional,
-                        data_hora_inicio=data_hora_inicio,
-                        data_hora_fim=data_hora_fim,
-                        status='confirmado',  # Recorrências já são confirmadas
-                        valor_cobrado=recorrencia.servico.preco,
-                        origem='manual',
-                        notas=f'Gerado automaticamente pela recorrência #{recorrencia.id}'
-                    )
-                    agendamentos_criados += 1
-                    logger.debug(f"Agendamento criado para {data_hora_inicio}")
-            
-            # Próximo dia
-            data_atual += timedelta(days=1)
+                    data_hora_fim=data_hora_fim,
+                    status='confirmado',  # Recorrências já são confirmadas
+                    valor_cobrado=recorrencia.servico.preco,
+                    origem='manual',
+                    notas=f'Gerado automaticamente pela recorrência #{recorrencia.id}'
+                ))
+        
+        # Próximo dia
+        data_atual += timedelta(days=1)
+    
+    # Um bulk_create e um lote de eventos de domínio para a recorrência inteira
+    agendamentos_criados = len(criar_agendamentos(novos))
     
     logger.info(f"Gerados {agendamentos_criados} agendamentos para recorrência {recorrencia.id}")
     return agendamentos_criados
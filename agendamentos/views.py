@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
@@ -8,8 +8,12 @@ from django.utils import timezone
 from django.db import transaction
 from django.conf import settings
 from dateutil import parser
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from .models import Agendamento, DisponibilidadeProfissional
+from .eventos_calendario import abrir_conexao, fluxo_eventos, sse_habilitado
+from .feed_calendario import etag_feed, faixa_datas, ler_cursor, montar_feed
+from .capacidade import mapa_ocupacao
+from .relatorios import PeriodoInvalido, relatorio
 from empresas.models import Servico, Profissional, HorarioFuncionamento, DataEspecial, Empresa
 from clientes.models import Cliente
 from core.decorators import plano_required
@@ -48,7 +52,7 @@ STATUS_COLORS = {
 
 @login_required
 def calendario_view(request):
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
     
@@ -71,11 +75,75 @@ def calendario_view(request):
     }
     return render(request, 'agendamentos/calendario.html', context)
 
+@login_required
+@plano_required(feature_flag='permite_relatorios_avancados', feature_name='Relatórios Avançados')
+def relatorios_view(request):
+    """
+    Relatório de agendamentos do período (agendamentos/relatorios.py):
+    faturamento por profissional, ocupação, faltas, mix de serviços e
+    horários de pico. ?formato=json devolve os mesmos dados.
+    """
+    empresa = request.empresa
+    hoje = timezone.localdate()
+    try:
+        inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else hoje.replace(day=1)
+        fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else hoje
+        dados = relatorio(empresa.id, inicio, fim)
+    except (ValueError, PeriodoInvalido) as e:
+        erro = str(e) if isinstance(e, PeriodoInvalido) else 'Data inválida'
+        if request.GET.get('formato') == 'json':
+            return JsonResponse({'error': erro}, status=400)
+        messages.error(request, erro)
+        return redirect('agendamentos:relatorios')
+
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(dados)
+
+    # Horários de pico: só as horas com movimento (ou o horário comercial)
+    pico = dados['horarios_pico']
+    horas = [hora for hora in range(24) if any(linha[hora] for linha in pico)] or list(range(8, 19))
+    horas = list(range(horas[0], horas[-1] + 1))
+    dias_semana = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+    context = {
+        'empresa': empresa,
+        'inicio': inicio,
+        'fim': fim,
+        'dados': dados,
+        'horas': horas,
+        'pico': [(dias_semana[dia], [linha[hora] for hora in horas]) for dia, linha in enumerate(pico)],
+        'pico_maximo': max(max(linha) for linha in pico) or 1,
+    }
+    return render(request, 'agendamentos/relatorios.html', context)
+
+
+@login_required
+@plano_required(feature_flag='permite_relatorios_avancados', feature_name='Relatórios Avançados')
+def api_ocupacao(request):
+    """
+    Mapa de calor da ocupação (agendamentos/capacidade.py): % da capacidade
+    usada por profissional, dia da semana e faixa de horário.
+
+    Query params: inicio, fim (padrão: últimas 4 semanas), intervalo (15, 30 ou 60)
+    """
+    hoje = timezone.localdate()
+    try:
+        fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else hoje
+        inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else fim - timedelta(days=27)
+        intervalo = int(request.GET['intervalo']) if request.GET.get('intervalo') else None
+        dados = mapa_ocupacao(request.empresa.id, inicio, fim, intervalo)
+    except PeriodoInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetro inválido'}, status=400)
+    return JsonResponse(dados)
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
 def criar_agendamento(request):
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
 
@@ -163,7 +231,7 @@ def criar_agendamento(request):
 
 
 def api_agendamentos(request):
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return JsonResponse({"error": "Não autorizado"}, status=403)
 
@@ -174,16 +242,15 @@ def api_agendamentos(request):
     # Fallback para o método antigo (mes/ano) se não vier start/end
     if start_str and end_str:
         try:
-            start_date = parser.parse(start_str).date()
-            end_date = parser.parse(end_str).date()
+            inicio, fim = faixa_datas(parser.parse(start_str).date(), parser.parse(end_str).date())
 
             # Buscar agendamentos no intervalo (excluir cancelados)
             ags = Agendamento.objects.filter(
                 empresa=empresa,
-                data_hora_inicio__date__gte=start_date,
-                data_hora_inicio__date__lt=end_date
+                data_hora_inicio__gte=inicio,
+                data_hora_inicio__lt=fim
             ).exclude(status='cancelado').select_related("cliente", "servico", "profissional")
-        except:
+        except (ValueError, OverflowError):
             # Se der erro no parse, usar método antigo
             mes = request.GET.get("mes")
             ano = request.GET.get("ano")
@@ -255,6 +322,79 @@ def api_agendamentos(request):
     return JsonResponse(eventos, safe=False)
 
 
+@login_required
+def api_calendario_feed(request):
+    """
+    Feed v2 do calendário (payload colunar, incremental e com ETag)
+
+    Query Parameters:
+        - start, end: faixa visível (YYYY-MM-DD, fim exclusivo)
+        - profissionais: ids separados por vírgula (opcional)
+        - since: cursor devolvido pela chamada anterior (opcional)
+
+    Formato da resposta em agendamentos/feed_calendario.py
+    """
+    empresa = request.empresa
+    if not empresa:
+        return JsonResponse({"error": "Não autorizado"}, status=403)
+
+    try:
+        inicio, fim = faixa_datas(
+            date.fromisoformat(request.GET.get("start", "")[:10]),
+            date.fromisoformat(request.GET.get("end", "")[:10]),
+        )
+        profissionais_ids = {
+            int(id.strip()) for id in request.GET.get("profissionais", "").split(',') if id.strip()
+        }
+        since = request.GET.get("since")
+        desde = ler_cursor(since) if since else None
+    except ValueError as e:
+        return JsonResponse({"error": f"Parâmetros inválidos: {e}"}, status=400)
+
+    if fim <= inicio or fim - inicio > timedelta(days=62):
+        return JsonResponse({"error": "Faixa de datas inválida (máximo 62 dias)"}, status=400)
+
+    feed = montar_feed(empresa.id, inicio, fim, profissionais_ids, desde)
+    etag = etag_feed(feed)
+    if etag in request.headers.get("If-None-Match", ""):
+        resposta = HttpResponseNotModified()
+    else:
+        resposta = JsonResponse(feed)
+    resposta["ETag"] = etag
+    resposta["Cache-Control"] = "private, no-cache"
+    return resposta
+
+
+@login_required
+async def eventos_calendario(request):
+    """
+    Stream SSE com as mudanças de agendamentos da empresa
+    (ver agendamentos/eventos_calendario.py)
+
+    503 quando o push não está disponível (sem Redis ou fora do ASGI) e
+    429 quando a empresa atingiu o limite de conexões: nos dois casos o
+    calendário volta a atualizar por intervalo.
+    """
+    # Unidade aberta na sessão (UnidadeAtivaMiddleware), já carregada
+    empresa = getattr(request, "empresa", None)
+    if not empresa:
+        return JsonResponse({"error": "Não autorizado"}, status=403)
+    if not sse_habilitado():
+        return JsonResponse({"error": "Atualização em tempo real indisponível"}, status=503)
+
+    conexao = await abrir_conexao(empresa.pk)
+    if conexao is None:
+        return JsonResponse({"error": "Limite de conexões em tempo real atingido"}, status=429)
+
+    resposta = StreamingHttpResponse(
+        fluxo_eventos(empresa.pk, *conexao),
+        content_type="text/event-stream",
+    )
+    resposta["Cache-Control"] = "no-cache"
+    resposta["X-Accel-Buffering"] = "no"  # nginx não pode segurar o stream
+    return resposta
+
+
 @login_required
 def verificar_disponibilidade(request):
     """
@@ -274,7 +414,7 @@ def verificar_disponibilidade(request):
             "sugestoes": [horários próximos disponíveis]
         }
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return JsonResponse({"error": "Não autorizado"}, status=403)
     
@@ -350,7 +490,7 @@ def listar_horarios_disponiveis(request):
             "total_disponiveis": 10
         }
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return JsonResponse({"error": "Não autorizado"}, status=403)
     
@@ -543,7 +683,7 @@ def listar_horarios_disponiveis(request):
 
 @login_required
 def editar_agendamento(request, id):
-    empresa = request.user.empresa
+    empresa = request.empresa
     agendamento = get_object_or_404(Agendamento, id=id, empresa=empresa)
     
     if request.method == 'POST':
@@ -561,7 +701,7 @@ def editar_agendamento(request, id):
 
 @login_required
 def deletar_agendamento(request, id):
-    empresa = request.user.empresa
+    empresa = request.empresa
     agendamento = get_object_or_404(Agendamento, id=id, empresa=empresa)
 
     if request.method == 'POST':
@@ -582,7 +722,7 @@ def listar_recorrencias(request):
     """Lista todas as recorrências da empresa"""
     from .models import AgendamentoRecorrente
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
 
@@ -605,7 +745,7 @@ def criar_recorrencia(request):
     from .models import AgendamentoRecorrente
     import json
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
 
@@ -738,7 +878,7 @@ def deletar_recorrencia(request, id):
     """Deleta uma recorrência"""
     from .models import AgendamentoRecorrente
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     recorrencia = get_object_or_404(AgendamentoRecorrente, id=id, empresa=empresa)
 
     recorrencia.delete()
@@ -754,7 +894,7 @@ def ativar_desativar_recorrencia(request, id):
     """Ativa ou desativa uma recorrência"""
     from .models import AgendamentoRecorrente
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     recorrencia = get_object_or_404(AgendamentoRecorrente, id=id, empresa=empresa)
 
     recorrencia.ativo = not recorrencia.ativo
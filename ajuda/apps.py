@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class AjudaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ajuda'
+
+    def ready(self):
+        import ajuda.signals
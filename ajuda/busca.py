@@ -0,0 +1,176 @@
+"""
+Busca da Central de Ajuda (/ajuda/buscar/)
+
+Índice invertido de texto completo sobre título + texto puro dos artigos
+publicados:
+- PostgreSQL: Artigo.vetor_busca (tsvector 'portuguese', título com peso
+  A) com índice GIN; ranking por ts_rank e trecho com ts_headline
+- SQLite (desenvolvimento e testes): tabela virtual FTS5 ajuda_artigo_fts,
+  criada e populada no primeiro uso; ranking bm25 com o título valendo
+  mais e trecho com snippet()
+
+O índice é atualizado no save/delete do artigo (ajuda/signals.py). Os
+resultados ficam no cache pela versão da ajuda (ajuda/conteudo.py).
+Trechos chegam com os termos em <mark> e o resto escapado.
+"""
+import hashlib
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .conteudo import _ttl, versao
+
+TABELA_FTS = 'ajuda_artigo_fts'
+
+# Delimitadores dos termos no trecho (trocados por <mark> depois de escapar)
+INICIO, FIM = '\x02', '\x03'
+
+
+def _postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _vetor():
+    return (
+        SearchVector('titulo', weight='A', config='portuguese')
+        + SearchVector('texto_busca', weight='B', config='portuguese')
+    )
+
+
+def _trecho(texto):
+    return mark_safe(escape(texto or '').replace(INICIO, '<mark>').replace(FIM, '</mark>'))
+
+
+# ==========================================
+# ÍNDICE
+# ==========================================
+
+def _garantir_fts():
+    """Cria e popula a tabela FTS5 se ainda não existe (SQLite)"""
+    from .models import Artigo
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [TABELA_FTS])
+        if cursor.fetchone() is None:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {TABELA_FTS} USING fts5("
+                "artigo_id UNINDEXED, titulo, texto, tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.executemany(
+                f"INSERT INTO {TABELA_FTS} (artigo_id, titulo, texto) VALUES (%s, %s, %s)",
+                list(Artigo.objects.filter(publicado=True).values_list('id', 'titulo', 'texto_busca')),
+            )
+
+
+def indexar(artigo):
+    """Atualiza o artigo no índice (sai do índice se não está publicado)"""
+    from .models import Artigo
+
+    if _postgres():
+        Artigo.objects.filter(pk=artigo.pk).update(vetor_busca=_vetor())
+        return
+    _garantir_fts()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE artigo_id = %s", [artigo.pk])
+        if artigo.publicado:
+            cursor.execute(
+                f"INSERT INTO {TABELA_FTS} (artigo_id, titulo, texto) VALUES (%s, %s, %s)",
+                [artigo.pk, artigo.titulo, artigo.texto_busca],
+            )
+
+
+def remover(artigo_id):
+    if _postgres():
+        return
+    _garantir_fts()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA_FTS} WHERE artigo_id = %s", [artigo_id])
+
+
+# ==========================================
+# CONSULTA
+# ==========================================
+
+def _buscar_postgres(termo, limite):
+    from .models import Artigo
+
+    consulta = SearchQuery(termo, config='portuguese', search_type='websearch')
+    artigos = (
+        Artigo.objects.filter(vetor_busca=consulta, publicado=True)
+        .annotate(
+            rank=SearchRank(F('vetor_busca'), consulta),
+            trecho=SearchHeadline(
+                'texto_busca', consulta, config='portuguese', start_sel=INICIO, stop_sel=FIM,
+                max_words=35, min_words=15, max_fragments=2, fragment_delimiter=' … ',
+            ),
+        )
+        .select_related('categoria')
+        .only('titulo', 'slug', 'categoria__nome', 'categoria__slug')
+        .order_by('-rank', 'titulo')[:limite]
+    )
+    return [(artigo, artigo.trecho) for artigo in artigos]
+
+
+def _consulta_fts(termo):
+    """Termos do usuário como prefixos entre aspas (nada de sintaxe FTS5)"""
+    return ' '.join(f'"{palavra}"*' for palavra in re.findall(r'\w+', termo)[:10])
+
+
+def _buscar_sqlite(termo, limite):
+    from .models import Artigo
+
+    consulta = _consulta_fts(termo)
+    if not consulta:
+        return []
+    _garantir_fts()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT artigo_id, snippet({TABELA_FTS}, 2, %s, %s, ' … ', 24) FROM {TABELA_FTS} "
+            f"WHERE {TABELA_FTS} MATCH %s ORDER BY bm25({TABELA_FTS}, 0.0, 10.0, 1.0) LIMIT %s",
+            [INICIO, FIM, consulta, limite],
+        )
+        encontrados = cursor.fetchall()
+
+    artigos = (
+        Artigo.objects.filter(pk__in=[artigo_id for artigo_id, _ in encontrados], publicado=True)
+        .select_related('categoria')
+        .only('titulo', 'slug', 'categoria__nome', 'categoria__slug')
+        .in_bulk()
+    )
+    return [(artigos[artigo_id], trecho) for artigo_id, trecho in encontrados if artigo_id in artigos]
+
+
+def buscar(termo, limite=20):
+    """
+    Artigos publicados que casam com o termo, do mais relevante ao menos.
+
+    Returns:
+        list: dicts {'titulo', 'slug', 'categoria', 'categoria_slug', 'trecho'}
+    """
+    termo = ' '.join(termo.split())[:100]
+    if not termo:
+        return []
+
+    chave = f"ajuda:busca:{versao()}:{limite}:{hashlib.md5(termo.lower().encode('utf-8')).hexdigest()}"
+    resultados = cache.get(chave)
+    if resultados is not None:
+        return resultados
+
+    encontrados = _buscar_postgres(termo, limite) if _postgres() else _buscar_sqlite(termo, limite)
+    resultados = [
+        {
+            'titulo': artigo.titulo,
+            'slug': artigo.slug,
+            'categoria': artigo.categoria.nome,
+            'categoria_slug': artigo.categoria.slug,
+            'trecho': _trecho(trecho),
+        }
+        for artigo, trecho in encontrados
+    ]
+    cache.set(chave, resultados, _ttl())
+    return resultados
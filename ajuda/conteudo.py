@@ -0,0 +1,114 @@
+"""
+Conteúdo da Central de Ajuda: Markdown pré-renderizado e páginas em cache
+
+Antes, ajuda_artigo rodava markdown.markdown (fenced_code, tables, nl2br,
+toc) a cada visualização e buscava os outros artigos da categoria.
+
+Agora:
+- HTML, sumário (TOC) e texto puro (usado na busca) são gerados no save do
+  Artigo (admin, fixtures, importar_docs) e guardados no banco com o hash
+  do Markdown: conteúdo igual não é renderizado de novo
+- A página do artigo (artigo + "nesta categoria") fica no cache por
+  AJUDA_CACHE_TTL, chaveada pela versão da ajuda. Qualquer alteração em
+  artigo ou categoria muda a versão (ajuda/signals.py) e todas as páginas
+  e buscas em cache ficam obsoletas
+"""
+import hashlib
+import html
+import re
+
+import markdown
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import strip_tags
+
+EXTENSOES = ['fenced_code', 'tables', 'nl2br', 'toc']
+
+CHAVE_VERSAO = 'ajuda:versao'
+
+# Campos que a página do artigo não usa (ficam fora do cache)
+CAMPOS_PESADOS = ('conteudo', 'texto_busca', 'vetor_busca')
+
+
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def texto_puro(conteudo_html):
+    """Texto do HTML renderizado, sem tags e com espaços normalizados"""
+    return re.sub(r'\s+', ' ', html.unescape(strip_tags(conteudo_html))).strip()
+
+
+def renderizar(conteudo):
+    """
+    Returns:
+        tuple: (html, toc_html, texto_puro); toc vazio se não há títulos
+    """
+    md = markdown.Markdown(extensions=EXTENSOES)
+    conteudo_html = md.convert(conteudo)
+    toc = md.toc if md.toc_tokens else ''
+    return conteudo_html, toc, texto_puro(conteudo_html)
+
+
+def renderizar_artigo(artigo):
+    """Preenche os campos pré-renderizados se o Markdown mudou; True se mudou"""
+    hash_atual = hash_conteudo(artigo.conteudo)
+    if hash_atual == artigo.conteudo_hash:
+        return False
+    artigo.conteudo_html, artigo.toc_html, artigo.texto_busca = renderizar(artigo.conteudo)
+    artigo.conteudo_hash = hash_atual
+    return True
+
+
+# ==========================================
+# CACHE
+# ==========================================
+
+def _ttl():
+    return getattr(settings, 'AJUDA_CACHE_TTL', 3600)
+
+
+def versao():
+    """Versão atual do conteúdo da ajuda (muda a cada alteração)"""
+    atual = cache.get(CHAVE_VERSAO)
+    if atual is None:
+        atual = 1
+        cache.add(CHAVE_VERSAO, atual, None)
+    return atual
+
+
+def invalidar():
+    """Muda a versão: páginas e buscas em cache ficam obsoletas"""
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.set(CHAVE_VERSAO, 2, None)
+
+
+def pagina_artigo(slug):
+    """
+    Dados da página do artigo publicado, do cache ou do banco.
+
+    Returns:
+        dict|None: {'artigo', 'outros_artigos'} ou None se não existe
+    """
+    from .models import Artigo
+
+    chave = f'ajuda:artigo:{versao()}:{slug}'
+    pagina = cache.get(chave)
+    if pagina is not None:
+        return pagina
+
+    artigo = (
+        Artigo.objects.select_related('categoria').defer(*CAMPOS_PESADOS)
+        .filter(slug=slug, publicado=True).first()
+    )
+    if artigo is None:
+        return None
+    outros_artigos = list(
+        Artigo.objects.filter(categoria=artigo.categoria_id, publicado=True)
+        .exclude(id=artigo.id).order_by('titulo').only('titulo', 'slug')[:5]
+    )
+    pagina = {'artigo': artigo, 'outros_artigos': outros_artigos}
+    cache.set(chave, pagina, _ttl())
+    return pagina
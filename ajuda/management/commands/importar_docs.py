@@ -4,6 +4,7 @@ from pathlib import Path
 from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 from django.conf import settings
+from ajuda.conteudo import hash_conteudo
 from ajuda.models import Categoria, Artigo
 
 class Command(BaseCommand):
@@ -117,6 +118,16 @@ class Command(BaseCommand):
             else:
                 content_body = content
 
+            # Arquivo sem mudanças: não renderiza nem reindexa de novo
+            existente = Artigo.objects.filter(slug=slugify(titulo)).only(
+                'titulo', 'categoria', 'conteudo_hash', 'publicado'
+            ).first()
+            if existente and (
+                existente.titulo, existente.categoria_id, existente.conteudo_hash, existente.publicado
+            ) == (titulo, categoria.pk, hash_conteudo(content_body), True):
+                return True
+
+            # O save pré-renderiza o HTML (ajuda/conteudo.py) e o signal indexa para a busca
             artigo, created = Artigo.objects.update_or_create(
                 slug=slugify(titulo),
                 defaults={
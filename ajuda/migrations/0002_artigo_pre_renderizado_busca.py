@@ -0,0 +1,65 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+def renderizar_artigos(apps, schema_editor):
+    """Pré-renderiza os artigos existentes e, no PostgreSQL, preenche o vetor de busca"""
+    from django.contrib.postgres.search import SearchVector
+
+    from ajuda.conteudo import hash_conteudo, renderizar
+
+    Artigo = apps.get_model('ajuda', 'Artigo')
+    artigos = list(Artigo.objects.all())
+    for artigo in artigos:
+        artigo.conteudo_html, artigo.toc_html, artigo.texto_busca = renderizar(artigo.conteudo)
+        artigo.conteudo_hash = hash_conteudo(artigo.conteudo)
+    Artigo.objects.bulk_update(artigos, ['conteudo_html', 'toc_html', 'texto_busca', 'conteudo_hash'], batch_size=200)
+
+    if schema_editor.connection.vendor == 'postgresql':
+        Artigo.objects.update(vetor_busca=(
+            SearchVector('titulo', weight='A', config='portuguese')
+            + SearchVector('texto_busca', weight='B', config='portuguese')
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ajuda', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artigo',
+            name='conteudo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='artigo',
+            name='conteudo_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artigo',
+            name='texto_busca',
+            field=models.TextField(blank=True, editable=False, help_text='Texto puro usado na busca'),
+        ),
+        migrations.AddField(
+            model_name='artigo',
+            name='toc_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artigo',
+            name='vetor_busca',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artigo',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['vetor_busca'], name='ajuda_artigo_busca_gin'),
+        ),
+        migrations.RunPython(renderizar_artigos, migrations.RunPython.noop),
+    ]
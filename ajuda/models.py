@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 
@@ -28,6 +30,14 @@ class Artigo(models.Model):
     slug = models.SlugField(unique=True, blank=True)
     conteudo = models.TextField(help_text='Conteúdo em Markdown')
     publicado = models.BooleanField(default=True)
+
+    # Pré-renderizados no save a partir do Markdown (ajuda/conteudo.py)
+    conteudo_html = models.TextField(blank=True, editable=False)
+    toc_html = models.TextField(blank=True, editable=False)
+    texto_busca = models.TextField(blank=True, editable=False, help_text='Texto puro usado na busca')
+    conteudo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Só preenchido no PostgreSQL (ajuda/busca.py); no SQLite a busca usa FTS5
+    vetor_busca = SearchVectorField(null=True, editable=False)
     
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
@@ -36,11 +46,19 @@ class Artigo(models.Model):
         verbose_name = 'Artigo'
         verbose_name_plural = 'Artigos'
         ordering = ['titulo']
+        indexes = [
+            GinIndex(fields=['vetor_busca'], name='ajuda_artigo_busca_gin'),
+        ]
 
     def __str__(self):
         return self.titulo
 
     def save(self, *args, **kwargs):
+        from .conteudo import renderizar_artigo
+
         if not self.slug:
             self.slug = slugify(self.titulo)
+        # Só renderiza de novo se o Markdown mudou
+        if renderizar_artigo(self) and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'conteudo_html', 'toc_html', 'texto_busca', 'conteudo_hash'}
         super().save(*args, **kwargs)
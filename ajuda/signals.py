@@ -0,0 +1,37 @@
+"""
+Mantém o conteúdo pré-renderizado, o índice de busca e o cache da
+Central de Ajuda em dia (ajuda/conteudo.py e ajuda/busca.py)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .busca import indexar, remover
+from .conteudo import invalidar, renderizar_artigo
+from .models import Artigo, Categoria
+
+
+@receiver(post_save, sender=Artigo)
+def artigo_salvo(sender, instance, raw, **kwargs):
+    # Fixtures (loaddata) não passam pelo Artigo.save
+    if raw and renderizar_artigo(instance):
+        Artigo.objects.filter(pk=instance.pk).update(
+            conteudo_html=instance.conteudo_html,
+            toc_html=instance.toc_html,
+            texto_busca=instance.texto_busca,
+            conteudo_hash=instance.conteudo_hash,
+        )
+    indexar(instance)
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_delete, sender=Artigo)
+def artigo_removido(sender, instance, **kwargs):
+    remover(instance.pk)
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def categoria_alterada(sender, **kwargs):
+    transaction.on_commit(invalidar)
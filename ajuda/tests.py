@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from ajuda.busca import buscar
+from ajuda.conteudo import pagina_artigo
+from ajuda.models import Artigo, Categoria
+
+
+class ConteudoAjudaTest(TestCase):
+    """Testes do Markdown pré-renderizado, do cache e da busca da Central de Ajuda"""
+
+    def setUp(self):
+        cache.clear()
+        self.categoria = Categoria.objects.create(nome='Agendamentos')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artigo = Artigo.objects.create(
+                categoria=self.categoria,
+                titulo='Como remarcar um horário',
+                conteudo='## Passo a passo\n\nAbra a agenda e arraste o `<horário>` para a nova posição.',
+            )
+            Artigo.objects.create(
+                categoria=self.categoria,
+                titulo='Lembretes automáticos',
+                conteudo='Os lembretes são enviados pelo WhatsApp um dia antes do horário.',
+            )
+
+    def test_html_renderizado_no_save_e_pagina_em_cache(self):
+        self.assertIn('<h2 id="passo-a-passo">', self.artigo.conteudo_html)
+        self.assertIn('passo-a-passo', self.artigo.toc_html)
+        hash_original = self.artigo.conteudo_hash
+
+        self.artigo.titulo = 'Como remarcar'
+        self.artigo.save()
+        self.assertEqual(self.artigo.conteudo_hash, hash_original)
+
+        pagina_artigo(self.artigo.slug)
+        with self.assertNumQueries(0):
+            pagina = pagina_artigo(self.artigo.slug)
+        self.assertIn('Passo a passo', pagina['artigo'].conteudo_html)
+        self.assertEqual([a.slug for a in pagina['outros_artigos']], ['lembretes-automaticos'])
+
+        # Alteração no artigo invalida a página em cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artigo.conteudo = '## Novo texto'
+            self.artigo.save()
+        self.assertIn('Novo texto', pagina_artigo(self.artigo.slug)['artigo'].conteudo_html)
+
+    def test_busca_ranqueia_titulo_e_destaca_trecho(self):
+        resultados = buscar('horario')
+        self.assertEqual([r['slug'] for r in resultados], [self.artigo.slug, 'lembretes-automaticos'])
+        self.assertIn('<mark>horário</mark>', resultados[1]['trecho'])
+        self.assertIn('&lt;<mark>horário</mark>&gt;', resultados[0]['trecho'])
+
+        # Despublicado sai do índice
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artigo.publicado = False
+            self.artigo.save()
+        response = self.client.get(reverse('ajuda_buscar'), {'q': 'horário', 'formato': 'json'})
+        self.assertEqual([r['slug'] for r in response.json()['resultados']], ['lembretes-automaticos'])
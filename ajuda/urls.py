@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.ajuda_home, name='ajuda_home'),
+    path('buscar/', views.ajuda_buscar, name='ajuda_buscar'),
     path('categoria/<slug:slug>/', views.ajuda_categoria, name='ajuda_categoria'),
     path('artigo/<slug:slug>/', views.ajuda_artigo, name='ajuda_artigo'),
 ]
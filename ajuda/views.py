@@ -1,6 +1,8 @@
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Prefetch
-import markdown
+from django.http import Http404, JsonResponse
+from .busca import buscar
+from .conteudo import pagina_artigo
 from .models import Categoria, Artigo
 
 def ajuda_home(request):
@@ -40,20 +42,12 @@ def ajuda_categoria(request, slug):
 def ajuda_artigo(request, slug):
     """
     Exibe um artigo específico
+    HTML pré-renderizado no save; página em cache (ajuda/conteudo.py)
     """
-    artigo = get_object_or_404(Artigo, slug=slug, publicado=True)
-    
-    # Converter Markdown para HTML
-    conteudo_html = markdown.markdown(
-        artigo.conteudo,
-        extensions=['fenced_code', 'tables', 'nl2br', 'toc']
-    )
-    
-    # Outros artigos da mesma categoria (sidebar)
-    outros_artigos = Artigo.objects.filter(
-        categoria=artigo.categoria, 
-        publicado=True
-    ).exclude(id=artigo.id).order_by('titulo')[:5]
+    pagina = pagina_artigo(slug)
+    if pagina is None:
+        raise Http404('Artigo não encontrado')
+    artigo = pagina['artigo']
     
     # Breadcrumb
     breadcrumb_items = [
@@ -64,8 +58,32 @@ def ajuda_artigo(request, slug):
     
     context = {
         'artigo': artigo,
-        'conteudo_html': conteudo_html,
-        'outros_artigos': outros_artigos,
+        'conteudo_html': artigo.conteudo_html,
+        'toc_html': artigo.toc_html,
+        'outros_artigos': pagina['outros_artigos'],
         'breadcrumb_items': breadcrumb_items,
     }
     return render(request, 'ajuda/artigo.html', context)
+
+def ajuda_buscar(request):
+    """
+    Busca de artigos por texto (?q=), com trechos destacados
+    ?formato=json para busca enquanto digita
+    """
+    termo = request.GET.get('q', '').strip()
+    resultados = buscar(termo) if termo else []
+    
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'termo': termo, 'resultados': resultados})
+    
+    breadcrumb_items = [
+        {'label': 'Central de Ajuda', 'url': 'ajuda_home'},
+        {'label': 'Busca', 'url': '#'},
+    ]
+    
+    context = {
+        'termo': termo,
+        'resultados': resultados,
+        'breadcrumb_items': breadcrumb_items,
+    }
+    return render(request, 'ajuda/busca.html', context)
@@ -5,7 +5,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Plano, Assinatura, HistoricoPagamento
+from .models import Plano, Assinatura, HistoricoPagamento, UsoMensal, NotificacaoTrial
 
 
 @admin.register(Plano)
@@ -277,3 +277,21 @@ class HistoricoPagamentoAdmin(admin.ModelAdmin):
             obj.get_status_display()
         )
     status_badge.short_description = 'Status'
+
+
+@admin.register(UsoMensal)
+class UsoMensalAdmin(admin.ModelAdmin):
+    list_display = ['empresa', 'periodo', 'metrica', 'valor', 'atualizado_em']
+    list_filter = ['metrica', 'periodo']
+    search_fields = ['empresa__nome']
+    readonly_fields = ['empresa', 'periodo', 'metrica', 'valor', 'atualizado_em']
+    date_hierarchy = 'periodo'
+
+
+@admin.register(NotificacaoTrial)
+class NotificacaoTrialAdmin(admin.ModelAdmin):
+    list_display = ['assinatura', 'tipo', 'data_expiracao', 'email', 'whatsapp', 'criado_em']
+    list_filter = ['tipo', 'email', 'whatsapp']
+    search_fields = ['assinatura__empresa__nome']
+    readonly_fields = ['assinatura', 'tipo', 'data_expiracao', 'email', 'whatsapp', 'execucao', 'criado_em']
+    date_hierarchy = 'criado_em'
@@ -5,3 +5,6 @@ class AssinaturasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assinaturas'
     verbose_name = 'Assinaturas e Planos'
+
+    def ready(self):
+        import assinaturas.signals  # Contadores de uso mensal
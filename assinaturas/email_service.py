@@ -1,14 +1,12 @@
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from core.email_outbox import enfileirar_email
 import logging
 
 logger = logging.getLogger(__name__)
 
 def enviar_email_boas_vindas(usuario, empresa, activation_token, plano):
     """
-    Envia email HTML com link de ativação de conta.
+    Enfileira email HTML com link de ativação de conta (enviado pela fila).
     Pode ser chamado pela view de cadastro (manual) ou pelo webhook (stripe/asaas).
     
     Args:
@@ -42,28 +40,18 @@ def enviar_email_boas_vindas(usuario, empresa, activation_token, plano):
             'site_url': settings.SITE_URL if hasattr(settings, 'SITE_URL') else 'http://localhost:8000',
         }
 
-        # Renderiza o template HTML
-        logger.info('Renderizando template de email...')
-        html_message = render_to_string('emails/boas_vindas_com_senha.html', context)
-        # Versão texto puro (fallback)
-        plain_message = strip_tags(html_message)
-
-        # Configurações do email
-        from_email = settings.DEFAULT_FROM_EMAIL
-        subject = f'Ative sua conta - {empresa.nome} | Gestto 🎉'
-        
-        # Envia o email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=from_email,
-            recipient_list=[usuario.email],
-            html_message=html_message,
-            fail_silently=False,  # Lança exceção se falhar
+        # Renderiza e grava na fila (core/email_outbox.py): o envio SMTP
+        # acontece no worker, fora da requisição de cadastro/webhook
+        enfileirar_email(
+            [usuario.email],
+            f'Ative sua conta - {empresa.nome} | Gestto 🎉',
+            template='emails/boas_vindas_com_senha.html',
+            contexto=context,
+            chave=f'ativacao:{usuario.pk}:{activation_token}',  # Webhook reenviado não duplica
         )
 
-        logger.info(f'✓ Email de boas-vindas enviado com sucesso para {usuario.email}')
+        logger.info(f'✓ Email de boas-vindas enfileirado para {usuario.email}')
 
     except Exception as e:
-        logger.error(f'Erro ao enviar email de boas-vindas para {usuario.email}: {str(e)}')
+        logger.error(f'Erro ao enfileirar email de boas-vindas para {usuario.email}: {str(e)}')
         raise
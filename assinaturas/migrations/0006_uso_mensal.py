@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assinaturas', '0005_update_trial_15_dias'),
+        ('empresas', '0008_alter_profissional_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primeiro dia do mês de referência')),
+                ('metrica', models.CharField(choices=[('agendamentos', 'Agendamentos')], max_length=30)),
+                ('valor', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uso_mensal', to='empresas.empresa')),
+            ],
+            options={
+                'verbose_name': 'Uso Mensal',
+                'verbose_name_plural': 'Uso Mensal',
+                'ordering': ['-periodo', 'empresa'],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'periodo', 'metrica'), name='uso_mensal_unico_por_periodo')],
+            },
+        ),
+    ]
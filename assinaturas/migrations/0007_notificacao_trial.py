@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assinaturas', '0006_uso_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoTrial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('3_dias', '3 dias antes'), ('1_dia', '1 dia antes'), ('hoje', 'No dia')], max_length=10)),
+                ('data_expiracao', models.DateField()),
+                ('email', models.BooleanField(default=False, help_text='Email enfileirado')),
+                ('whatsapp', models.BooleanField(default=False, help_text='WhatsApp enviado')),
+                ('execucao', models.CharField(blank=True, help_text='Execução que registrou o aviso', max_length=32)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Notificação de Trial',
+                'verbose_name_plural': 'Notificações de Trial',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='assinatura',
+            index=models.Index(fields=['status', 'data_expiracao'], name='assinaturas_status_c8761b_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificacaotrial',
+            name='assinatura',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_trial', to='assinaturas.assinatura'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacaotrial',
+            index=models.Index(fields=['execucao'], name='assinaturas_execuca_5ebc0b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacaotrial',
+            constraint=models.UniqueConstraint(fields=('assinatura', 'tipo', 'data_expiracao'), name='notificacao_trial_unica'),
+        ),
+    ]
@@ -226,6 +226,9 @@ class Assinatura(models.Model):
         verbose_name = 'Assinatura'
         verbose_name_plural = 'Assinaturas'
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'data_expiracao']),  # Trials expirando (notificacoes_trial.py)
+        ]
 
     def __str__(self):
         return f"{self.empresa.nome} - {self.plano.get_nome_display()} ({self.get_status_display()})"
@@ -337,3 +340,84 @@ class HistoricoPagamento(models.Model):
 
     def __str__(self):
         return f"{self.assinatura.empresa.nome} - R$ {self.valor} - {self.get_status_display()}"
+
+
+class UsoMensal(models.Model):
+    """
+    Contador de uso mensal por empresa (para checagem de limites do plano)
+
+    O valor "quente" fica no cache (Redis INCR/DECR, ver assinaturas/uso.py);
+    esta tabela é a cópia persistida, atualizada periodicamente e
+    reconciliada toda noite com os dados reais.
+    """
+    METRICAS = [
+        ('agendamentos', 'Agendamentos'),
+    ]
+
+    empresa = models.ForeignKey(
+        'empresas.Empresa',
+        on_delete=models.CASCADE,
+        related_name='uso_mensal'
+    )
+    periodo = models.DateField(help_text="Primeiro dia do mês de referência")
+    metrica = models.CharField(max_length=30, choices=METRICAS)
+    valor = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Uso Mensal'
+        verbose_name_plural = 'Uso Mensal'
+        ordering = ['-periodo', 'empresa']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'periodo', 'metrica'],
+                name='uso_mensal_unico_por_periodo'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa.nome} - {self.periodo.strftime('%m/%Y')} - {self.get_metrica_display()}: {self.valor}"
+
+
+class NotificacaoTrial(models.Model):
+    """
+    Aviso de trial expirando já enviado (assinaturas/notificacoes_trial.py)
+
+    A chave única (assinatura, tipo, data de expiração) impede aviso
+    duplicado mesmo com duas execuções simultâneas; se o trial for
+    prorrogado, a nova data gera novos avisos.
+    """
+    TIPOS = [
+        ('3_dias', '3 dias antes'),
+        ('1_dia', '1 dia antes'),
+        ('hoje', 'No dia'),
+    ]
+
+    assinatura = models.ForeignKey(
+        Assinatura,
+        on_delete=models.CASCADE,
+        related_name='notificacoes_trial'
+    )
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    data_expiracao = models.DateField()
+    email = models.BooleanField(default=False, help_text="Email enfileirado")
+    whatsapp = models.BooleanField(default=False, help_text="WhatsApp enviado")
+    execucao = models.CharField(max_length=32, blank=True, help_text="Execução que registrou o aviso")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Notificação de Trial'
+        verbose_name_plural = 'Notificações de Trial'
+        ordering = ['-criado_em']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['assinatura', 'tipo', 'data_expiracao'],
+                name='notificacao_trial_unica'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['execucao']),
+        ]
+
+    def __str__(self):
+        return f"{self.assinatura} - {self.get_tipo_display()} ({self.data_expiracao:%d/%m/%Y})"
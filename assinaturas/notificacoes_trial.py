@@ -0,0 +1,272 @@
+"""
+Avisos de trial expirando (3 dias antes, 1 dia antes e no dia)
+
+Antes, notificar_trials_expirando carregava todas as assinaturas em trial
+e calculava os dias restantes em Python; para cada uma buscava o admin
+(duas queries), a ConfiguracaoWhatsApp, enviava email e WhatsApp em série
+e regravava o JSON de metadados.
+
+Agora, por execução:
+1. Uma query com as faixas de data_expiracao dos dias-alvo (índice
+   status + data_expiracao), já sem as que têm NotificacaoTrial
+2. Admins e configurações de WhatsApp das empresas em uma query cada
+3. Os avisos são reservados em NotificacaoTrial (bulk_create com chave
+   única): o que outra execução já registrou fica de fora
+4. Emails vão para a fila (core/email_outbox.py) num bulk_create
+5. WhatsApps vão para a fila de envio (empresas/fila_whatsapp.py) pela
+   instância do Gestto (GESTTO_WHATSAPP_INSTANCE), limitada por minuto
+"""
+import logging
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Case, CharField, Exists, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from .models import Assinatura, NotificacaoTrial
+
+logger = logging.getLogger(__name__)
+
+# dias restantes -> tipo do aviso
+TIPOS_POR_DIAS = {3: '3_dias', 1: '1_dia', 0: 'hoje'}
+
+ASSUNTOS = {
+    '3_dias': 'Seu trial termina em 3 dias - {empresa} | Gestto',
+    '1_dia': 'URGENTE: Seu trial termina amanhã - {empresa} | Gestto',
+    'hoje': 'ÚLTIMO DIA: Seu trial expira hoje - {empresa} | Gestto',
+}
+
+MENSAGENS_WHATSAPP = {
+    '3_dias': (
+        "Olá! Seu período de teste do Gestto termina em *3 dias*.\n\n"
+        "Você está aproveitando todas as funcionalidades?\n\n"
+        "Para continuar usando sem interrupção, assine agora:\n"
+        "{checkout_url}\n\n"
+        "Qualquer dúvida, estamos à disposição!"
+    ),
+    '1_dia': (
+        "Atenção! Seu trial do Gestto *expira amanhã*.\n\n"
+        "Não perca seus dados e configurações!\n\n"
+        "Assine agora e continue usando:\n"
+        "{checkout_url}\n\n"
+        "Precisa de ajuda? Responda esta mensagem!"
+    ),
+    'hoje': (
+        "*ÚLTIMO DIA!* Seu trial do Gestto expira *hoje*.\n\n"
+        "Após a expiração, você perderá acesso às funcionalidades.\n\n"
+        "Assine agora para não perder nada:\n"
+        "{checkout_url}\n\n"
+        "Seus dados serão mantidos por mais 30 dias."
+    ),
+}
+
+
+def _site_url():
+    return getattr(settings, 'SITE_URL', 'https://gestto.com.br')
+
+
+def _checkout_url():
+    return f"{_site_url()}/app/configuracoes/assinatura/"
+
+
+def faixas_alvo(hoje):
+    """{tipo: (inicio, fim)} dos dias-alvo, como datetimes aware [inicio, fim)"""
+    faixas = {}
+    for dias, tipo in TIPOS_POR_DIAS.items():
+        inicio = timezone.make_aware(datetime.combine(hoje + timedelta(days=dias), time.min))
+        faixas[tipo] = (inicio, inicio + timedelta(days=1))
+    return faixas
+
+
+def tipo_do_aviso(data_expiracao, faixas):
+    for tipo, (inicio, fim) in faixas.items():
+        if inicio <= data_expiracao < fim:
+            return tipo
+    return None
+
+
+def assinaturas_a_notificar(hoje, faixas=None):
+    """Trials que expiram num dia-alvo e ainda não têm o aviso daquele dia"""
+    faixas = faixas or faixas_alvo(hoje)
+    filtro_datas = Q()
+    for inicio, fim in faixas.values():
+        filtro_datas |= Q(data_expiracao__gte=inicio, data_expiracao__lt=fim)
+
+    # Aviso do tipo correspondente já registrado para esta data de expiração
+    datas_alvo = Q()
+    for dias, tipo in TIPOS_POR_DIAS.items():
+        datas_alvo |= Q(tipo=tipo, data_expiracao=hoje + timedelta(days=dias))
+    ja_notificada = NotificacaoTrial.objects.filter(
+        datas_alvo, assinatura=OuterRef('pk'), tipo=OuterRef('tipo_aviso')
+    )
+    return (
+        Assinatura.objects
+        .filter(filtro_datas, status='trial', trial_ativo=True)
+        .select_related('empresa', 'plano')
+        .order_by('pk')
+        .alias(tipo_aviso=_tipo_aviso_sql(faixas))
+        .filter(~Exists(ja_notificada))
+    )
+
+
+def _tipo_aviso_sql(faixas):
+    return Case(
+        *[
+            When(data_expiracao__gte=inicio, data_expiracao__lt=fim, then=Value(tipo))
+            for tipo, (inicio, fim) in faixas.items()
+        ],
+        output_field=CharField(),
+    )
+
+
+def _admins_por_empresa(empresa_ids):
+    """{empresa_id: usuario} preferindo staff (uma query)"""
+    from core.models import Usuario
+
+    admins = {}
+    usuarios = Usuario.objects.filter(empresa_id__in=empresa_ids).order_by('empresa_id', '-is_staff', 'pk')
+    for usuario in usuarios:
+        admins.setdefault(usuario.empresa_id, usuario)
+    return admins
+
+
+def _empresas_com_whatsapp(empresa_ids):
+    """Empresas com WhatsApp conectado (uma query)"""
+    from empresas.models import ConfiguracaoWhatsApp
+
+    return set(
+        ConfiguracaoWhatsApp.objects.filter(empresa_id__in=empresa_ids, status='conectado')
+        .values_list('empresa_id', flat=True)
+    )
+
+
+def _instancia_gestto():
+    """instance_name do Gestto, ou None se não configurada ou desconectada"""
+    from empresas.models import ConfiguracaoWhatsApp
+
+    instancia = getattr(settings, 'GESTTO_WHATSAPP_INSTANCE', None)
+    if not instancia:
+        logger.info("GESTTO_WHATSAPP_INSTANCE não configurada, WhatsApp não enviado")
+        return None
+    config = ConfiguracaoWhatsApp.objects.filter(instance_name=instancia).first()
+    if not config or not config.esta_conectado():
+        logger.warning(f"Instância {instancia} do Gestto não está conectada")
+        return None
+    return instancia
+
+
+def montar_email_aviso(usuario, assinatura, tipo, dias_restantes):
+    from core.email_outbox import montar_email
+
+    empresa = assinatura.empresa
+    contexto = {
+        'usuario': usuario,
+        'empresa': empresa,
+        'assinatura': assinatura,
+        'plano': assinatura.plano,
+        'dias_restantes': dias_restantes,
+        'data_expiracao': assinatura.data_expiracao,
+        'site_url': _site_url(),
+        'checkout_url': _checkout_url(),
+    }
+    return montar_email(
+        [usuario.email],
+        ASSUNTOS[tipo].format(empresa=empresa.nome),
+        template=f'emails/trial_expirando_{tipo}.html',
+        contexto=contexto,
+        chave=f"trial_expirando_{tipo}:{assinatura.pk}:{assinatura.data_expiracao:%Y%m%d}",
+    )
+
+
+def enfileirar_whatsapps(envios):
+    """
+    Coloca os WhatsApps na fila de envio da instância do Gestto.
+
+    Args:
+        envios: lista de (notificacao_id, assinatura, telefone, tipo)
+
+    Returns:
+        list: ids das notificações cujo WhatsApp foi enfileirado
+    """
+    from empresas.fila_whatsapp import enfileirar, montar_mensagem
+
+    if not envios:
+        return []
+    instancia = _instancia_gestto()
+    if instancia is None:
+        return []
+
+    enfileirar(
+        montar_mensagem(
+            assinatura.empresa_id, instancia, telefone,
+            MENSAGENS_WHATSAPP[tipo].format(checkout_url=_checkout_url()), f'trial_{tipo}',
+        )
+        for _, assinatura, telefone, tipo in envios
+    )
+    return [envio[0] for envio in envios]
+
+
+def notificar_trials(hoje=None):
+    """
+    Registra os avisos de trial do dia e enfileira emails e WhatsApps.
+
+    Returns:
+        dict: {'notificacoes_enviadas', 'emails', 'whatsapp', 'sem_usuario'}
+    """
+    from core.email_outbox import enfileirar_lote
+
+    hoje = hoje or timezone.localdate()
+    faixas = faixas_alvo(hoje)
+    assinaturas = list(assinaturas_a_notificar(hoje, faixas))
+    resumo = {'notificacoes_enviadas': 0, 'emails': 0, 'whatsapp': 0, 'sem_usuario': 0}
+    if not assinaturas:
+        return resumo
+
+    empresa_ids = {assinatura.empresa_id for assinatura in assinaturas}
+    admins = _admins_por_empresa(empresa_ids)
+    com_whatsapp = _empresas_com_whatsapp(empresa_ids)
+
+    # Reserva os avisos; os que outra execução já registrou são ignorados
+    execucao = uuid.uuid4().hex
+    reservas = []
+    for assinatura in assinaturas:
+        usuario = admins.get(assinatura.empresa_id)
+        if not usuario:
+            resumo['sem_usuario'] += 1
+            logger.warning(f"Empresa {assinatura.empresa.nome} sem usuário para notificar")
+            continue
+        reservas.append(NotificacaoTrial(
+            assinatura=assinatura,
+            tipo=tipo_do_aviso(assinatura.data_expiracao, faixas),
+            data_expiracao=timezone.localtime(assinatura.data_expiracao).date(),
+            email=bool(usuario.email),
+            execucao=execucao,
+        ))
+    NotificacaoTrial.objects.bulk_create(reservas, batch_size=1000, ignore_conflicts=True)
+    reservadas = dict(
+        NotificacaoTrial.objects.filter(execucao=execucao).values_list('assinatura_id', 'id')
+    )
+
+    por_id = {assinatura.pk: assinatura for assinatura in assinaturas}
+    emails, envios = [], []
+    for reserva in reservas:
+        notificacao_id = reservadas.get(reserva.assinatura_id)
+        if notificacao_id is None:
+            continue
+        assinatura = por_id[reserva.assinatura_id]
+        usuario = admins[assinatura.empresa_id]
+        dias_restantes = (reserva.data_expiracao - hoje).days
+        if reserva.email:
+            emails.append(montar_email_aviso(usuario, assinatura, reserva.tipo, dias_restantes))
+        if assinatura.empresa_id in com_whatsapp and usuario.telefone:
+            envios.append((notificacao_id, assinatura, usuario.telefone, reserva.tipo))
+
+    resumo['notificacoes_enviadas'] = len(reservadas)
+    resumo['emails'] = enfileirar_lote(emails)
+
+    enfileirados = enfileirar_whatsapps(envios)
+    if enfileirados:
+        NotificacaoTrial.objects.filter(pk__in=enfileirados).update(whatsapp=True)
+    resumo['whatsapp'] = len(enfileirados)
+    return resumo
@@ -0,0 +1,63 @@
+"""
+Signals e assinantes de eventos de domínio que mantêm os contadores de uso
+mensal (assinaturas/uso.py)
+
+Criação e mudança de status chegam pelos eventos de Agendamento
+(agendamentos/services/eventos.py), com o status anterior já em memória;
+a exclusão continua no post_delete.
+"""
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from agendamentos.models import Agendamento
+from agendamentos.services.eventos import CRIADO, STATUS_ALTERADO, assinar
+from .uso import STATUS_CONTABILIZADOS, ajustar_uso, periodo_de
+
+
+def _agendar_ajuste(instance, delta):
+    # Só mexe no contador depois do commit: rollback não deixa o uso inflado
+    transaction.on_commit(partial(
+        ajustar_uso, instance.empresa_id, periodo_de(instance.criado_em), delta
+    ))
+
+
+def _agendar_ajustes(deltas):
+    """Um ajuste por (empresa, período) para o lote inteiro"""
+    for (empresa_id, periodo), delta in deltas.items():
+        if delta:
+            transaction.on_commit(partial(ajustar_uso, empresa_id, periodo, delta))
+
+
+@assinar(CRIADO)
+def contar_agendamentos_criados(agendamentos):
+    """+1 para cada agendamento criado num status que conta na cota"""
+    deltas = Counter(
+        (agendamento.empresa_id, periodo_de(agendamento.criado_em))
+        for agendamento in agendamentos
+        if agendamento.status in STATUS_CONTABILIZADOS
+    )
+    _agendar_ajustes(deltas)
+
+
+@assinar(STATUS_ALTERADO)
+def atualizar_uso_status(agendamentos):
+    """
+    +1 quando um agendamento passa a contar na cota (reativado),
+    -1 quando deixa de contar (cancelado, não compareceu)
+    """
+    deltas = Counter()
+    for agendamento in agendamentos:
+        contava = agendamento.valor_original('status') in STATUS_CONTABILIZADOS
+        conta = agendamento.status in STATUS_CONTABILIZADOS
+        deltas[(agendamento.empresa_id, periodo_de(agendamento.criado_em))] += int(conta) - int(contava)
+    _agendar_ajustes(deltas)
+
+
+@receiver(post_delete, sender=Agendamento)
+def remover_uso_agendamento(sender, instance, **kwargs):
+    if instance.status in STATUS_CONTABILIZADOS:
+        _agendar_ajuste(instance, -1)
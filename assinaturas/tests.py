@@ -0,0 +1,183 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.utils.timezone import now
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from django.utils import timezone
+from empresas.models import Empresa, Servico
+from clientes.models import Cliente
+from agendamentos.models import Agendamento, StatusAgendamento
+from assinaturas.models import Assinatura, NotificacaoTrial, Plano, UsoMensal
+from assinaturas import uso
+from assinaturas.notificacoes_trial import notificar_trials
+from core.models import EmailPendente, Usuario
+
+
+class UsoMensalTest(TestCase):
+    """Testes dos contadores de uso mensal (assinaturas/uso.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Uso',
+            slug='empresa-uso',
+            telefone='11999999999',
+            email='uso@teste.com',
+            cnpj='12.345.678/0001-11'
+        )
+        self.servico = Servico.objects.create(
+            empresa=self.empresa,
+            nome='Corte',
+            preco=Decimal('40.00'),
+            duracao_minutos=30
+        )
+        self.cliente = Cliente.objects.create(
+            empresa=self.empresa,
+            nome='Cliente Uso',
+            telefone='11777777777'
+        )
+
+    def _criar_agendamento(self, status=StatusAgendamento.PENDENTE):
+        inicio = now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Agendamento.objects.create(
+                empresa=self.empresa,
+                cliente=self.cliente,
+                servico=self.servico,
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=30),
+                status=status,
+            )
+
+    def _salvar(self, agendamento, status):
+        agendamento.status = status
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento.save()
+
+    def test_leitura_sem_query_depois_de_semeado(self):
+        """Depois do primeiro acesso a checagem de limite não toca no banco"""
+        self._criar_agendamento()
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 1)
+
+    def test_signals_incrementam_e_decrementam(self):
+        """Criação, cancelamento, reativação e exclusão ajustam o contador"""
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 0)
+
+        agendamento = self._criar_agendamento()
+        self._criar_agendamento(status=StatusAgendamento.CANCELADO)
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 1)
+
+        self._salvar(agendamento, StatusAgendamento.CANCELADO)
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 0)
+
+        self._salvar(agendamento, StatusAgendamento.CONFIRMADO)
+        self._salvar(agendamento, StatusAgendamento.CONCLUIDO)
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento.delete()
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 0)
+
+    def test_reconciliacao_corrige_update_em_massa(self):
+        """queryset.update não dispara signals; a reconciliação corrige"""
+        self._criar_agendamento()
+        self._criar_agendamento()
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 2)
+
+        Agendamento.objects.filter(empresa=self.empresa).update(status=StatusAgendamento.CANCELADO)
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 2)
+
+        self.assertEqual(uso.reconciliar_uso(), 1)
+        self.assertEqual(uso.uso_agendamentos_mes(self.empresa), 0)
+        registro = UsoMensal.objects.get(empresa=self.empresa, periodo=uso.periodo_de())
+        self.assertEqual(registro.valor, 0)
+
+    def test_persistir_uso(self):
+        """A task periódica copia o contador do cache para UsoMensal"""
+        self._criar_agendamento()
+        uso.uso_agendamentos_mes(self.empresa)
+        self._criar_agendamento()
+
+        self.assertEqual(uso.persistir_uso(), 1)
+        registro = UsoMensal.objects.get(empresa=self.empresa, periodo=uso.periodo_de())
+        self.assertEqual(registro.valor, 2)
+
+        self._criar_agendamento()
+        uso.persistir_uso()
+        registro.refresh_from_db()
+        self.assertEqual(registro.valor, 3)
+
+
+class NotificacaoTrialTest(TestCase):
+    """Testes dos avisos de trial expirando (assinaturas/notificacoes_trial.py)"""
+
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        self.plano = Plano.objects.create(nome='essencial', preco_mensal=Decimal('99.90'))
+
+    def _trial(self, indice, dias, telefone=''):
+        empresa = Empresa.objects.create(
+            nome=f'Empresa Trial {indice}',
+            slug=f'empresa-trial-{indice}',
+            telefone='11999999999',
+            email=f'trial{indice}@teste.com',
+            cnpj=f'12.345.678/0001-{indice:02d}'
+        )
+        Usuario.objects.create_user(
+            username=f'admin{indice}', email=f'admin{indice}@teste.com',
+            empresa=empresa, telefone=telefone, is_staff=True,
+        )
+        meio_dia = timezone.make_aware(
+            datetime.combine(self.hoje + timedelta(days=dias), time(12))
+        )
+        return Assinatura.objects.create(
+            empresa=empresa, plano=self.plano, status='trial',
+            trial_ativo=True, data_expiracao=meio_dia,
+        )
+
+    def test_avisa_somente_dias_alvo_uma_vez(self):
+        trial_3 = self._trial(1, 3)
+        trial_1 = self._trial(2, 1)
+        trial_0 = self._trial(3, 0)
+        self._trial(4, 2)
+        self._trial(5, 10)
+
+        resumo = notificar_trials(self.hoje)
+
+        self.assertEqual(resumo['notificacoes_enviadas'], 3)
+        self.assertEqual(resumo['emails'], 3)
+        tipos = dict(NotificacaoTrial.objects.values_list('assinatura_id', 'tipo'))
+        self.assertEqual(tipos, {trial_3.pk: '3_dias', trial_1.pk: '1_dia', trial_0.pk: 'hoje'})
+        self.assertEqual(EmailPendente.objects.filter(assunto__contains='trial').count(), 3)
+
+        # Segunda execução no mesmo dia não repete nada
+        with self.assertNumQueries(1):
+            resumo = notificar_trials(self.hoje)
+        self.assertEqual(resumo['notificacoes_enviadas'], 0)
+        self.assertEqual(EmailPendente.objects.filter(assunto__contains='trial').count(), 3)
+
+    def test_queries_nao_crescem_com_o_numero_de_trials(self):
+        for indice in range(1, 7):
+            self._trial(indice, indice % 2)
+        # seleção, admins, WhatsApp, reserva, ids reservados, emails
+        with self.assertNumQueries(6):
+            resumo = notificar_trials(self.hoje)
+        self.assertEqual(resumo['notificacoes_enviadas'], 6)
+
+    def test_whatsapp_pela_instancia_do_gestto(self):
+        from empresas.models import ConfiguracaoWhatsApp, MensagemWhatsApp
+
+        assinatura = self._trial(1, 1, telefone='(11) 98888-7777')
+        ConfiguracaoWhatsApp.objects.filter(empresa=assinatura.empresa).update(status='conectado')
+
+        with patch('assinaturas.notificacoes_trial._instancia_gestto', return_value='gestto'):
+            resumo = notificar_trials(self.hoje)
+
+        self.assertEqual(resumo['whatsapp'], 1)
+        mensagem = MensagemWhatsApp.objects.get()
+        self.assertEqual((mensagem.instance_name, mensagem.numero, mensagem.tipo), ('gestto', '5511988887777', 'trial_1_dia'))
+        self.assertTrue(NotificacaoTrial.objects.get(assinatura=assinatura).whatsapp)
@@ -0,0 +1,213 @@
+"""
+Contadores de uso mensal por empresa (limites do plano)
+
+Antes, cada checagem de limite fazia um COUNT(*) em Agendamento filtrando
+o mês atual — custo que cresce com o volume da empresa e rodava a cada
+tentativa de agendamento (bot, webhook, middleware, tela de assinatura).
+
+Agora o uso fica num contador atômico no cache, chaveado por
+(empresa, período, métrica):
+
+- Leitura O(1): cache.get; só no primeiro acesso do mês (ou se a chave
+  sumir do cache) o valor é recalculado com um COUNT e semeado
+- Escrita: signals de Agendamento fazem INCR/DECR (Redis) após o commit
+- Persistência periódica em UsoMensal (task persistir_uso_mensal)
+- Reconciliação noturna com os dados reais (task reconciliar_uso_mensal),
+  que corrige desvios de updates em massa que não disparam signals
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.db.models import Count
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.particionamento import inicio_mes, proximo_mes
+
+logger = logging.getLogger(__name__)
+
+METRICA_AGENDAMENTOS = 'agendamentos'
+
+# Status que consomem a cota mensal de agendamentos
+STATUS_CONTABILIZADOS = ['pendente', 'confirmado', 'concluido']
+
+# As chaves vivem um pouco mais que o mês para sobreviver à virada
+TIMEOUT_CONTADOR = 60 * 60 * 24 * 40
+
+
+def periodo_de(data_hora=None):
+    """Período (primeiro dia do mês, no fuso local) de um datetime."""
+    return inicio_mes(data_hora or timezone.now()).date()
+
+
+def _chave(empresa_id, periodo, metrica):
+    return f"uso:{empresa_id}:{periodo.strftime('%Y%m')}:{metrica}"
+
+
+def _intervalo(periodo):
+    """Início e fim (exclusivo) do período como datetimes aware."""
+    inicio = timezone.make_aware(datetime(periodo.year, periodo.month, 1))
+    return inicio, proximo_mes(inicio)
+
+
+def contar_agendamentos(empresa_id, periodo):
+    """Contagem real no banco (usada para semear e reconciliar)."""
+    from agendamentos.models import Agendamento
+
+    inicio, fim = _intervalo(periodo)
+    return Agendamento.objects.filter(
+        empresa_id=empresa_id,
+        criado_em__gte=inicio,
+        criado_em__lt=fim,
+        status__in=STATUS_CONTABILIZADOS,
+    ).count()
+
+
+def obter_uso(empresa, metrica=METRICA_AGENDAMENTOS, periodo=None):
+    """
+    Uso da empresa no período (padrão: mês atual).
+
+    Normalmente é um único GET no cache. Em cache miss, conta no banco e
+    semeia a chave com cache.add (se outro processo semeou antes, vale o
+    valor dele).
+    """
+    empresa_id = getattr(empresa, 'pk', empresa)
+    periodo = periodo or periodo_de()
+    chave = _chave(empresa_id, periodo, metrica)
+
+    valor = cache.get(chave)
+    if valor is not None:
+        return int(valor)
+
+    valor = contar_agendamentos(empresa_id, periodo)
+    if not cache.add(chave, valor, TIMEOUT_CONTADOR):
+        valor = cache.get(chave, valor)
+    return int(valor)
+
+
+def uso_agendamentos_mes(empresa):
+    """Atalho para a checagem da cota de agendamentos do mês atual."""
+    return obter_uso(empresa, METRICA_AGENDAMENTOS)
+
+
+def ajustar_uso(empresa_id, periodo, delta, metrica=METRICA_AGENDAMENTOS):
+    """
+    Incrementa/decrementa o contador de forma atômica (INCR no Redis).
+
+    Se a chave não existe no cache nada é feito: a próxima leitura conta
+    no banco, que já reflete a alteração.
+    """
+    if not delta:
+        return
+    chave = _chave(empresa_id, periodo, metrica)
+    try:
+        if delta > 0:
+            cache.incr(chave, delta)
+        else:
+            cache.decr(chave, -delta)
+    except ValueError:
+        # Chave inexistente (expirou ou ainda não foi semeada)
+        pass
+    except Exception as e:
+        logger.error(f"[Uso] Erro ao ajustar contador {chave}: {e}")
+
+
+def persistir_uso(periodo=None):
+    """
+    Copia os contadores do cache para a tabela UsoMensal.
+
+    Retorna quantas linhas foram gravadas/atualizadas.
+    """
+    from assinaturas.models import UsoMensal
+    from empresas.models import Empresa
+
+    periodo = periodo or periodo_de()
+    ids = list(Empresa.objects.filter(ativa=True).values_list('id', flat=True))
+    chaves = {_chave(empresa_id, periodo, METRICA_AGENDAMENTOS): empresa_id for empresa_id in ids}
+    valores = cache.get_many(list(chaves))
+
+    registros = [
+        UsoMensal(
+            empresa_id=chaves[chave],
+            periodo=periodo,
+            metrica=METRICA_AGENDAMENTOS,
+            valor=max(int(valor), 0),
+        )
+        for chave, valor in valores.items()
+    ]
+    return _gravar_uso(registros)
+
+
+def reconciliar_uso(periodo=None):
+    """
+    Recalcula o uso real do período com UMA query agregada (GROUP BY
+    empresa), corrige o cache e grava em UsoMensal.
+
+    Retorna o número de empresas cujo contador em cache estava divergente.
+    """
+    from agendamentos.models import Agendamento
+    from assinaturas.models import UsoMensal
+    from empresas.models import Empresa
+
+    periodo = periodo or periodo_de()
+    inicio, fim = _intervalo(periodo)
+
+    contagens = dict(
+        Agendamento.objects.filter(
+            criado_em__gte=inicio,
+            criado_em__lt=fim,
+            status__in=STATUS_CONTABILIZADOS,
+        ).values('empresa_id').annotate(total=Count('id')).values_list('empresa_id', 'total')
+    )
+
+    # Empresas sem agendamentos contabilizados (ex: tudo cancelado) também
+    # entram, para zerar contadores que ficaram para trás
+    for empresa_id in Empresa.objects.filter(ativa=True).values_list('id', flat=True):
+        contagens.setdefault(empresa_id, 0)
+
+    chaves = {_chave(empresa_id, periodo, METRICA_AGENDAMENTOS): empresa_id for empresa_id in contagens}
+    em_cache = cache.get_many(list(chaves))
+
+    divergentes = {}
+    for chave, empresa_id in chaves.items():
+        real = contagens[empresa_id]
+        if chave in em_cache and int(em_cache[chave]) != real:
+            logger.warning(
+                f"[Uso] Empresa {empresa_id} {periodo:%m/%Y}: cache={em_cache[chave]} real={real} - corrigindo"
+            )
+            divergentes[chave] = real
+    if divergentes:
+        cache.set_many(divergentes, TIMEOUT_CONTADOR)
+
+    _gravar_uso([
+        UsoMensal(empresa_id=empresa_id, periodo=periodo, metrica=METRICA_AGENDAMENTOS, valor=total)
+        for empresa_id, total in contagens.items()
+    ])
+    return len(divergentes)
+
+
+def _gravar_uso(registros):
+    from assinaturas.models import UsoMensal
+
+    if not registros:
+        return 0
+    UsoMensal.objects.bulk_create(
+        registros,
+        update_conflicts=True,
+        unique_fields=['empresa', 'periodo', 'metrica'],
+        update_fields=['valor', 'atualizado_em'],
+    )
+    return len(registros)
+
+
+def periodos_para_reconciliar(data_hora=None):
+    """
+    Períodos verificados pela reconciliação noturna: o mês atual e, nos
+    primeiros dias do mês, também o anterior (fechamento).
+    """
+    agora = data_hora or timezone.now()
+    periodos = [periodo_de(agora)]
+    if timezone.localtime(agora).day <= 3:
+        periodos.insert(0, periodo_de(inicio_mes(agora) - timedelta(days=1)))
+    return periodos
@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import MetricasDiarias
 
-# Register your models here.
+
+@admin.register(MetricasDiarias)
+class MetricasDiariasAdmin(admin.ModelAdmin):
+    list_display = ('data', 'fonte', 'mrr', 'assinaturas_ativas', 'trials', 'conversoes', 'cancelamentos', 'gerado_em')
+    list_filter = ('fonte',)
+    date_hierarchy = 'data'
+    ordering = ('-data',)
+    readonly_fields = ('gerado_em',)
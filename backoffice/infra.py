@@ -0,0 +1,200 @@
+"""
+Métricas de infraestrutura coletadas em segundo plano
+
+Antes, dashboard_view e infra_view chamavam psutil dentro da request
+(cpu_percent(interval=None) devolve o uso desde a chamada anterior do
+processo: número sem sentido) e infra_view fazia COUNT(*) em tabelas
+inteiras (varredura completa no PostgreSQL).
+
+Agora a task coletar_metricas_infra (Celery Beat, a cada minuto) grava uma
+amostra com:
+- Host: CPU medida em 1 segundo, RAM, disco e load average
+- Banco: no PostgreSQL, estimativa de linhas por tabela (pg_class.reltuples,
+  atualizada pelo autovacuum), tamanho do banco e conexões; no SQLite
+  (desenvolvimento) COUNT(*) mesmo
+- Redis (INFRA_REDIS_URL): memória, clientes, operações/s e hit rate
+
+As amostras ficam num buffer circular: lista no Redis (LPUSH + LTRIM) com
+INFRA_AMOSTRAS posições, ou no cache quando não há Redis. As views só leem
+o buffer.
+"""
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+CHAVE_BUFFER = 'backoffice:infra:amostras'
+
+# Tabelas exibidas no painel: rótulo -> model
+TABELAS = {
+    'Empresas': 'empresas.Empresa',
+    'Usuarios': 'core.Usuario',
+    'Profissionais': 'empresas.Profissional',
+    'Assinaturas': 'assinaturas.Assinatura',
+    'Clientes': 'clientes.Cliente',
+    'Agendamentos': 'agendamentos.Agendamento',
+}
+
+_cliente_redis = None
+
+
+def _tamanho():
+    return getattr(settings, 'INFRA_AMOSTRAS', 1440)
+
+
+def _redis():
+    """Cliente Redis do buffer, ou None se INFRA_REDIS_URL não está configurada"""
+    global _cliente_redis
+    url = getattr(settings, 'INFRA_REDIS_URL', '')
+    if not url:
+        return None
+    if _cliente_redis is None:
+        import redis
+
+        _cliente_redis = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+    return _cliente_redis
+
+
+# ==========================================
+# COLETA
+# ==========================================
+
+def _host():
+    import psutil
+
+    host = {
+        'cpu_percent': psutil.cpu_percent(interval=1),
+        'ram_percent': psutil.virtual_memory().percent,
+        'disk_percent': psutil.disk_usage('/').percent,
+    }
+    if hasattr(os, 'getloadavg'):
+        host['load_1m'] = round(os.getloadavg()[0], 2)
+    return host
+
+
+def _banco():
+    from django.apps import apps
+
+    tabelas = {rotulo: apps.get_model(modelo)._meta.db_table for rotulo, modelo in TABELAS.items()}
+    banco = {'vendor': connection.vendor, 'estimado': connection.vendor == 'postgresql'}
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind IN ('r', 'p') AND relname = ANY(%s)",
+                [list(tabelas.values())],
+            )
+            linhas = dict(cursor.fetchall())
+            cursor.execute(
+                "SELECT pg_database_size(current_database()), "
+                "(SELECT count(*) FROM pg_stat_activity WHERE datname = current_database())"
+            )
+            banco['tamanho_mb'], banco['conexoes'] = cursor.fetchone()
+            banco['tamanho_mb'] = round(banco['tamanho_mb'] / 1024 / 1024, 1)
+        else:
+            linhas = {}
+            for tabela in tabelas.values():
+                cursor.execute(f'SELECT COUNT(*) FROM "{tabela}"')
+                linhas[tabela] = cursor.fetchone()[0]
+
+    # reltuples = -1: tabela ainda não analisada pelo autovacuum
+    banco['tabelas'] = {rotulo: max(linhas.get(tabela, 0), 0) for rotulo, tabela in tabelas.items()}
+    return banco
+
+
+def _info_redis(cliente):
+    info = cliente.info()
+    acertos, falhas = info.get('keyspace_hits', 0), info.get('keyspace_misses', 0)
+    return {
+        'memoria_mb': round(info.get('used_memory', 0) / 1024 / 1024, 1),
+        'clientes': info.get('connected_clients', 0),
+        'ops_por_segundo': info.get('instantaneous_ops_per_sec', 0),
+        'hit_rate': round(acertos / (acertos + falhas) * 100, 1) if acertos + falhas else None,
+    }
+
+
+def coletar():
+    """Mede host, banco e Redis; cada parte que falhar fica de fora da amostra"""
+    amostra = {'ts': int(time.time())}
+    cliente = _redis()
+    partes = [('host', _host), ('banco', _banco)]
+    if cliente is not None:
+        partes.append(('redis', lambda: _info_redis(cliente)))
+    for nome, medir in partes:
+        try:
+            amostra[nome] = medir()
+        except Exception as e:
+            logger.warning(f"[Infra] Falha ao coletar {nome}: {e}")
+    return amostra
+
+
+# ==========================================
+# BUFFER
+# ==========================================
+
+def registrar(amostra):
+    """Adiciona a amostra ao buffer, descartando as mais antigas"""
+    cliente = _redis()
+    if cliente is not None:
+        with cliente.pipeline() as pipe:
+            pipe.lpush(CHAVE_BUFFER, json.dumps(amostra))
+            pipe.ltrim(CHAVE_BUFFER, 0, _tamanho() - 1)
+            pipe.execute()
+        return
+    amostras = cache.get(CHAVE_BUFFER) or []
+    amostras.insert(0, amostra)
+    cache.set(CHAVE_BUFFER, amostras[:_tamanho()], None)
+
+
+def amostras(limite=None):
+    """Amostras do buffer, da mais antiga para a mais recente"""
+    limite = limite or _tamanho()
+    try:
+        cliente = _redis()
+        if cliente is not None:
+            recentes = [json.loads(item) for item in cliente.lrange(CHAVE_BUFFER, 0, limite - 1)]
+        else:
+            recentes = (cache.get(CHAVE_BUFFER) or [])[:limite]
+    except Exception as e:
+        logger.warning(f"[Infra] Buffer de amostras indisponível: {e}")
+        return []
+    return recentes[::-1]
+
+
+def ultima_amostra():
+    recentes = amostras(1)
+    return recentes[-1] if recentes else None
+
+
+def series(limite=None):
+    """
+    Séries para os gráficos do infra_view.
+
+    Returns:
+        dict: {'horarios': [...], 'cpu': [...], 'ram': [...], 'disco': [...],
+               'redis_memoria': [...], 'redis_ops': [...]}
+    """
+    from datetime import datetime
+
+    from django.utils import timezone
+
+    lista = amostras(limite)
+    fuso = timezone.get_current_timezone()
+
+    def _valor(amostra, parte, campo):
+        return (amostra.get(parte) or {}).get(campo)
+
+    return {
+        'horarios': [datetime.fromtimestamp(a['ts'], fuso).strftime('%H:%M') for a in lista],
+        'cpu': [_valor(a, 'host', 'cpu_percent') for a in lista],
+        'ram': [_valor(a, 'host', 'ram_percent') for a in lista],
+        'disco': [_valor(a, 'host', 'disk_percent') for a in lista],
+        'redis_memoria': [_valor(a, 'redis', 'memoria_mb') for a in lista],
+        'redis_ops': [_valor(a, 'redis', 'ops_por_segundo') for a in lista],
+    }
@@ -0,0 +1,54 @@
+"""
+Comando Django para reconstruir o histórico de MetricasDiarias a partir do
+HistoricoPagamento (backoffice/metricas.py)
+
+Útil na primeira implantação (o gráfico de MRR precisa de 30 dias) e
+depois de corrigir pagamentos. Dias com fotografia real não são
+regravados, a menos que se use --sobrescrever.
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from backoffice.metricas import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as métricas diárias do backoffice a partir do histórico de pagamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=90,
+            help='Quantidade de dias até ontem a reconstruir (padrão: 90)'
+        )
+        parser.add_argument(
+            '--inicio',
+            type=datetime.date.fromisoformat,
+            default=None,
+            help='Data inicial (AAAA-MM-DD); tem precedência sobre --dias'
+        )
+        parser.add_argument(
+            '--fim',
+            type=datetime.date.fromisoformat,
+            default=None,
+            help='Data final (AAAA-MM-DD, padrão: ontem)'
+        )
+        parser.add_argument(
+            '--sobrescrever',
+            action='store_true',
+            help='Regravar também os dias que já têm fotografia'
+        )
+
+    def handle(self, *args, **options):
+        fim = options['fim'] or timezone.localdate() - datetime.timedelta(days=1)
+        inicio = options['inicio'] or fim - datetime.timedelta(days=options['dias'] - 1)
+        if inicio > fim:
+            raise CommandError('A data inicial é posterior à final')
+
+        gravados = reconstruir(inicio, fim, sobrescrever=options['sobrescrever'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {gravados} dias reconstruídos ({inicio:%d/%m/%Y} a {fim:%d/%m/%Y})"
+        ))
@@ -0,0 +1,397 @@
+"""
+Métricas diárias de SaaS para o dashboard do backoffice
+
+Antes, dashboard_view fazia 30 aggregates de MRR em loop (um por dia do
+gráfico) e mais ~15 counts/aggregates a cada atualização do superusuário.
+O histórico de MRR ainda estava errado: filtrava pelo status ATUAL, então
+uma assinatura cancelada ontem sumia de todos os dias anteriores.
+
+Agora:
+- registrar_dia grava em MetricasDiarias a fotografia do dia: MRR, ARR,
+  contagens por status, conversões, cancelamentos, distribuição por plano
+  e as listas do painel (~12 queries, uma vez por dia)
+- Task registrar_metricas_diarias: de madrugada para o dia anterior e sob
+  demanda (botão do dashboard) para hoje
+- painel monta o contexto do dashboard com UMA leitura das fotografias dos
+  últimos 60 dias (gráfico, crescimento, conversão e churn)
+- reconstruir (comando reconstruir_metricas) recria dias passados a partir
+  do HistoricoPagamento: assinatura pagante no dia = pagamento aprovado nos
+  METRICAS_JANELA_PAGAMENTO dias anteriores, MRR = valor desse pagamento
+"""
+import datetime
+import logging
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from .models import MetricasDiarias
+
+logger = logging.getLogger(__name__)
+
+# Assinatura ativa sem login do dono há mais que isso = risco de churn
+DIAS_RISCO = 7
+
+
+def _limites(data):
+    """[inicio, fim) do dia como datetimes aware"""
+    inicio = timezone.make_aware(datetime.datetime.combine(data, datetime.time.min))
+    return inicio, inicio + datetime.timedelta(days=1)
+
+
+def _dinheiro(valor):
+    return Decimal(valor or 0).quantize(Decimal('0.01'))
+
+
+# ==========================================
+# FOTOGRAFIA DO DIA
+# ==========================================
+
+def _listas(mrr):
+    """Top clientes, donos sem login e funil de onboarding (estado atual)"""
+    from assinaturas.models import Assinatura
+    from core.models import Usuario
+    from core.onboarding import funil_onboarding
+    from empresas.models import Empresa
+
+    top_clientes = [
+        {
+            'empresa': {'nome': assinatura.empresa.nome},
+            'plano': {'nome': assinatura.plano.nome},
+            'valor': float(assinatura.plano.preco_mensal),
+            'percentual': round(float(assinatura.plano.preco_mensal / mrr * 100), 1) if mrr else 0,
+        }
+        for assinatura in Assinatura.objects.filter(status='ativa', empresa__is_demo=False)
+        .select_related('empresa', 'plano').order_by('-plano__preco_mensal', '-criado_em')[:5]
+    ]
+
+    limite = timezone.now() - datetime.timedelta(days=DIAS_RISCO)
+    risco_churn = [
+        {
+            'empresa': {'nome': usuario.empresa.nome},
+            'email': usuario.email,
+            'last_login': usuario.last_login.isoformat(),
+        }
+        for usuario in Usuario.objects.filter(
+            empresa__isnull=False, empresa__is_demo=False, last_login__lt=limite, is_active=True
+        ).select_related('empresa').order_by('last_login')[:10]
+    ]
+
+    return {
+        'top_clientes': top_clientes,
+        'risco_churn': risco_churn,
+        'onboarding_funil': funil_onboarding(Empresa.objects.filter(is_demo=False)),
+    }
+
+
+def calcular_dia(data):
+    """
+    Métricas do dia ``data`` a partir do estado atual das assinaturas
+    (contagens e MRR valem para o momento da execução).
+
+    Returns:
+        dict: campos de MetricasDiarias
+    """
+    from assinaturas.models import Assinatura, HistoricoPagamento
+    from core.models import Usuario
+    from empresas.models import Empresa, Profissional
+
+    inicio, fim = _limites(data)
+
+    def _filtro_dia(campo):
+        return Q(**{f'{campo}__gte': inicio, f'{campo}__lt': fim})
+
+    assinaturas = Assinatura.objects.filter(empresa__is_demo=False)
+    base = assinaturas.aggregate(
+        ativas=Count('id', filter=Q(status='ativa')),
+        trials=Count('id', filter=Q(status='trial')),
+        suspensas=Count('id', filter=Q(status='suspensa')),
+        canceladas=Count('id', filter=Q(status='cancelada')),
+        mrr=Sum('plano__preco_mensal', filter=Q(status='ativa')),
+        novos_trials=Count('id', filter=_filtro_dia('data_inicio')),
+        cancelamentos=Count('id', filter=_filtro_dia('cancelada_em')),
+    )
+    empresas = Empresa.objects.filter(is_demo=False).aggregate(
+        total=Count('id'), novas=Count('id', filter=_filtro_dia('criada_em')),
+    )
+
+    aprovados = HistoricoPagamento.objects.filter(
+        status='aprovado', data_aprovacao__isnull=False, assinatura__empresa__is_demo=False
+    )
+    receita_dia = aprovados.filter(_filtro_dia('data_aprovacao')).aggregate(total=Sum('valor'))['total']
+    conversoes = (
+        aprovados.values('assinatura_id').annotate(primeiro=Min('data_aprovacao'))
+        .filter(primeiro__gte=inicio, primeiro__lt=fim).count()
+    )
+
+    distribuicao = {
+        linha['plano__nome']: {'assinaturas': linha['assinaturas'], 'mrr': float(linha['mrr'] or 0)}
+        for linha in assinaturas.filter(status__in=['ativa', 'trial']).values('plano__nome').annotate(
+            assinaturas=Count('id'), mrr=Sum('plano__preco_mensal', filter=Q(status='ativa')),
+        ).order_by('-assinaturas')
+    }
+
+    limite_risco = timezone.now() - datetime.timedelta(days=DIAS_RISCO)
+    assinaturas_risco = assinaturas.filter(
+        status='ativa',
+        empresa__usuarios__last_login__lt=limite_risco,
+        empresa__usuarios__is_active=True,
+    ).distinct().count()
+
+    mrr = _dinheiro(base['mrr'])
+    return {
+        'mrr': mrr,
+        'arr': mrr * 12,
+        'ticket_medio': _dinheiro(mrr / base['ativas']) if base['ativas'] else Decimal('0.00'),
+        'receita_dia': _dinheiro(receita_dia),
+        'empresas_total': empresas['total'],
+        'usuarios': Usuario.objects.filter(empresa__is_demo=False).count(),
+        'profissionais': Profissional.objects.filter(empresa__is_demo=False).count(),
+        'assinaturas_ativas': base['ativas'],
+        'trials': base['trials'],
+        'suspensas': base['suspensas'],
+        'canceladas': base['canceladas'],
+        'novas_empresas': empresas['novas'],
+        'novos_trials': base['novos_trials'],
+        'conversoes': conversoes,
+        'cancelamentos': base['cancelamentos'],
+        'assinaturas_risco': assinaturas_risco,
+        'distribuicao_planos': distribuicao,
+        'detalhes': _listas(mrr),
+    }
+
+
+def registrar_dia(data=None):
+    """Grava (ou regrava) a fotografia do dia; padrão: hoje"""
+    data = data or timezone.localdate()
+    metricas, _ = MetricasDiarias.objects.update_or_create(
+        data=data, defaults={**calcular_dia(data), 'fonte': 'snapshot'}
+    )
+    return metricas
+
+
+# ==========================================
+# RECONSTRUÇÃO (BACKFILL)
+# ==========================================
+
+def _data_local(valor):
+    return timezone.localtime(valor).date() if valor else None
+
+
+def _por_dia(datas):
+    contagem = {}
+    for data in datas:
+        if data:
+            contagem[data] = contagem.get(data, 0) + 1
+    return contagem
+
+
+def _acumulado(datas):
+    """Função data -> quantas das datas são <= data"""
+    ordenadas = sorted(d for d in datas if d)
+    return lambda data: bisect_right(ordenadas, data)
+
+
+def reconstruir(inicio, fim, sobrescrever=False):
+    """
+    Recria as métricas de [inicio, fim] a partir do HistoricoPagamento.
+
+    Dias que já têm fotografia (fonte='snapshot') só são regravados com
+    ``sobrescrever``. Contagens de usuários e profissionais usam as datas de
+    cadastro; listas do painel não são reconstruídas.
+
+    Returns:
+        int: dias gravados
+    """
+    from assinaturas.models import Assinatura, HistoricoPagamento
+    from core.models import Usuario
+    from empresas.models import Empresa, Profissional
+
+    janela = datetime.timedelta(days=getattr(settings, 'METRICAS_JANELA_PAGAMENTO', 35))
+
+    assinaturas = {
+        linha['id']: {
+            'plano': linha['plano__nome'],
+            'inicio': _data_local(linha['data_inicio']),
+            'trial_ate': _data_local(linha['data_inicio']) + datetime.timedelta(days=linha['plano__trial_dias'] or 0),
+            'cancelada': _data_local(linha['cancelada_em']),
+            'datas': [],
+            'valores': [],
+        }
+        for linha in Assinatura.objects.filter(empresa__is_demo=False).values(
+            'id', 'plano__nome', 'plano__trial_dias', 'data_inicio', 'cancelada_em'
+        )
+    }
+    receita_por_dia = {}
+    pagamentos = HistoricoPagamento.objects.filter(
+        status='aprovado', data_aprovacao__isnull=False, assinatura_id__in=list(assinaturas)
+    ).order_by('data_aprovacao').values_list('assinatura_id', 'valor', 'data_aprovacao')
+    for assinatura_id, valor, aprovado_em in pagamentos:
+        data = _data_local(aprovado_em)
+        assinaturas[assinatura_id]['datas'].append(data)
+        assinaturas[assinatura_id]['valores'].append(valor)
+        receita_por_dia[data] = receita_por_dia.get(data, Decimal('0')) + valor
+
+    criacao_empresas = [_data_local(d) for d in Empresa.objects.filter(is_demo=False).values_list('criada_em', flat=True)]
+    empresas_ate = _acumulado(criacao_empresas)
+    novas_empresas = _por_dia(criacao_empresas)
+    usuarios_ate = _acumulado(
+        _data_local(d) for d in Usuario.objects.filter(empresa__is_demo=False).values_list('date_joined', flat=True)
+    )
+    profissionais_ate = _acumulado(
+        _data_local(d) for d in Profissional.objects.filter(empresa__is_demo=False).values_list('criado_em', flat=True)
+    )
+    novos_trials = _por_dia(a['inicio'] for a in assinaturas.values())
+    cancelamentos = _por_dia(a['cancelada'] for a in assinaturas.values())
+    conversoes = _por_dia(a['datas'][0] for a in assinaturas.values() if a['datas'])
+
+    protegidas = set() if sobrescrever else set(
+        MetricasDiarias.objects.filter(data__range=(inicio, fim), fonte='snapshot').values_list('data', flat=True)
+    )
+
+    linhas = []
+    data = inicio
+    while data <= fim:
+        if data not in protegidas:
+            linhas.append(_dia_reconstruido(
+                data, janela, assinaturas,
+                empresas_total=empresas_ate(data),
+                usuarios=usuarios_ate(data),
+                profissionais=profissionais_ate(data),
+                novas_empresas=novas_empresas.get(data, 0),
+                novos_trials=novos_trials.get(data, 0),
+                conversoes=conversoes.get(data, 0),
+                cancelamentos=cancelamentos.get(data, 0),
+                receita_dia=_dinheiro(receita_por_dia.get(data)),
+            ))
+        data += datetime.timedelta(days=1)
+
+    campos = [f.name for f in MetricasDiarias._meta.concrete_fields if f.name not in ('id', 'data', 'gerado_em')]
+    MetricasDiarias.objects.bulk_create(
+        linhas, batch_size=500, update_conflicts=True, unique_fields=['data'], update_fields=campos,
+    )
+    logger.info(f"Métricas reconstruídas de {inicio} a {fim}: {len(linhas)} dias")
+    return len(linhas)
+
+
+def _dia_reconstruido(data, janela, assinaturas, **valores):
+    mrr = Decimal('0')
+    ativas = trials = canceladas = 0
+    distribuicao = {}
+    for assinatura in assinaturas.values():
+        if assinatura['inicio'] > data:
+            continue
+        if assinatura['cancelada'] and assinatura['cancelada'] <= data:
+            canceladas += 1
+            continue
+        indice = bisect_right(assinatura['datas'], data) - 1
+        plano = distribuicao.setdefault(assinatura['plano'], {'assinaturas': 0, 'mrr': 0.0})
+        if indice >= 0 and assinatura['datas'][indice] > data - janela:
+            valor = assinatura['valores'][indice]
+            ativas += 1
+            mrr += valor
+            plano['assinaturas'] += 1
+            plano['mrr'] += float(valor)
+        elif indice < 0 and data < assinatura['trial_ate']:
+            trials += 1
+            plano['assinaturas'] += 1
+
+    mrr = _dinheiro(mrr)
+    return MetricasDiarias(
+        data=data,
+        fonte='backfill',
+        mrr=mrr,
+        arr=mrr * 12,
+        ticket_medio=_dinheiro(mrr / ativas) if ativas else Decimal('0.00'),
+        assinaturas_ativas=ativas,
+        trials=trials,
+        canceladas=canceladas,
+        distribuicao_planos={nome: dados for nome, dados in distribuicao.items() if dados['assinaturas']},
+        **valores,
+    )
+
+
+# ==========================================
+# DASHBOARD
+# ==========================================
+
+def _soma(fotografias, campo):
+    return sum(getattr(f, campo) for f in fotografias)
+
+
+def painel(hoje=None):
+    """
+    Contexto de negócio do dashboard (metrics, financial, bi, analytics) a
+    partir das fotografias dos últimos 60 dias: uma query, mais a
+    fotografia de hoje se ainda não existe nenhuma.
+    """
+    hoje = hoje or timezone.localdate()
+    fotografias = list(
+        MetricasDiarias.objects.filter(data__gt=hoje - datetime.timedelta(days=60), data__lte=hoje).order_by('data')
+    )
+    if not fotografias:
+        fotografias = [registrar_dia(hoje)]
+    atual = fotografias[-1]
+
+    corte = atual.data - datetime.timedelta(days=30)
+    ultimos_30 = [f for f in fotografias if f.data > corte]
+    anteriores = [f for f in fotografias if f.data <= corte]
+    referencia = anteriores[-1] if anteriores else ultimos_30[0]
+
+    mrr_anterior = referencia.mrr if anteriores else Decimal('0')
+    crescimento_mrr = (atual.mrr - mrr_anterior) / mrr_anterior * 100 if mrr_anterior else 0
+    trials_iniciados = _soma(ultimos_30, 'novos_trials')
+    convertidos = _soma(ultimos_30, 'conversoes')
+    cancelamentos = _soma(ultimos_30, 'cancelamentos')
+    base_churn = referencia.assinaturas_ativas
+
+    detalhes = atual.detalhes or {}
+    risco_churn = [
+        {**usuario, 'last_login': datetime.datetime.fromisoformat(usuario['last_login'])}
+        for usuario in detalhes.get('risco_churn', [])
+    ]
+
+    return {
+        'metrics': {
+            'empresas_total': atual.empresas_total,
+            'empresas_ativas': atual.assinaturas_ativas,
+            'usuarios': atual.usuarios,
+            'profissionais': atual.profissionais,
+            'novas_empresas_30d': _soma(ultimos_30, 'novas_empresas'),
+        },
+        'financial': {
+            'mrr': float(atual.mrr),
+            'arr': float(atual.arr),
+            'ticket_medio': float(atual.ticket_medio),
+            'crescimento_mrr': round(float(crescimento_mrr), 1),
+            'mrr_mes_anterior': float(mrr_anterior),
+        },
+        'bi': {
+            'risco_churn': risco_churn,
+            'funil': {
+                'trial': atual.trials,
+                'ativa': atual.assinaturas_ativas,
+                'cancelada': atual.canceladas,
+                'suspensa': atual.suspensas,
+            },
+            'onboarding_funil': detalhes.get('onboarding_funil', {'total': 0, 'completos': 0, 'steps': []}),
+            'top_clientes': detalhes.get('top_clientes', []),
+            'planos_dist': [
+                {'plano__nome': nome, 'total': dados['assinaturas']}
+                for nome, dados in atual.distribuicao_planos.items()
+            ],
+            'taxa_conversao': round(convertidos / trials_iniciados * 100, 1) if trials_iniciados else 0,
+            'churn_rate': round(cancelamentos / base_churn * 100, 1) if base_churn else 0,
+            'assinaturas_risco': atual.assinaturas_risco,
+            'trials_iniciados': trials_iniciados,
+            'convertidos': convertidos,
+        },
+        'analytics': {
+            'mrr_historico': [
+                {'data': f.data.strftime('%d/%m'), 'mrr': float(f.mrr)} for f in ultimos_30
+            ],
+        },
+        'fotografia': atual,
+    }
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricasDiarias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(unique=True)),
+                ('fonte', models.CharField(choices=[('snapshot', 'Fotografia do dia'), ('backfill', 'Reconstruída do histórico de pagamentos')], default='snapshot', max_length=10)),
+                ('mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('arr', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ticket_medio', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('receita_dia', models.DecimalField(decimal_places=2, default=0, help_text='Pagamentos aprovados no dia', max_digits=12)),
+                ('empresas_total', models.PositiveIntegerField(default=0)),
+                ('usuarios', models.PositiveIntegerField(default=0)),
+                ('profissionais', models.PositiveIntegerField(default=0)),
+                ('assinaturas_ativas', models.PositiveIntegerField(default=0)),
+                ('trials', models.PositiveIntegerField(default=0)),
+                ('suspensas', models.PositiveIntegerField(default=0)),
+                ('canceladas', models.PositiveIntegerField(default=0)),
+                ('novas_empresas', models.PositiveIntegerField(default=0)),
+                ('novos_trials', models.PositiveIntegerField(default=0)),
+                ('conversoes', models.PositiveIntegerField(default=0, help_text='Primeiro pagamento aprovado no dia')),
+                ('cancelamentos', models.PositiveIntegerField(default=0)),
+                ('assinaturas_risco', models.PositiveIntegerField(default=0, help_text='Ativas sem login há mais de 7 dias')),
+                ('distribuicao_planos', models.JSONField(blank=True, default=dict)),
+                ('detalhes', models.JSONField(blank=True, default=dict)),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Métricas Diárias',
+                'verbose_name_plural': 'Métricas Diárias',
+                'ordering': ['-data'],
+            },
+        ),
+    ]
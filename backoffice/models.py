@@ -1,3 +1,59 @@
 from django.db import models
 
-# Create your models here.
+
+class MetricasDiarias(models.Model):
+    """
+    Fotografia diária das métricas de SaaS do backoffice (backoffice/metricas.py)
+
+    Gravada pela task registrar_metricas_diarias (toda madrugada, para o dia
+    anterior, ou sob demanda para hoje). Dias anteriores à primeira
+    fotografia podem ser reconstruídos do HistoricoPagamento pelo comando
+    reconstruir_metricas (fonte='backfill').
+    """
+
+    FONTES = [
+        ('snapshot', 'Fotografia do dia'),
+        ('backfill', 'Reconstruída do histórico de pagamentos'),
+    ]
+
+    data = models.DateField(unique=True)
+    fonte = models.CharField(max_length=10, choices=FONTES, default='snapshot')
+
+    # Receita (MRR = soma mensal das assinaturas pagantes no fim do dia)
+    mrr = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    arr = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ticket_medio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    receita_dia = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, help_text="Pagamentos aprovados no dia"
+    )
+
+    # Base no fim do dia (sem empresas demo)
+    empresas_total = models.PositiveIntegerField(default=0)
+    usuarios = models.PositiveIntegerField(default=0)
+    profissionais = models.PositiveIntegerField(default=0)
+    assinaturas_ativas = models.PositiveIntegerField(default=0)
+    trials = models.PositiveIntegerField(default=0)
+    suspensas = models.PositiveIntegerField(default=0)
+    canceladas = models.PositiveIntegerField(default=0)
+
+    # Movimento do dia
+    novas_empresas = models.PositiveIntegerField(default=0)
+    novos_trials = models.PositiveIntegerField(default=0)
+    conversoes = models.PositiveIntegerField(default=0, help_text="Primeiro pagamento aprovado no dia")
+    cancelamentos = models.PositiveIntegerField(default=0)
+    assinaturas_risco = models.PositiveIntegerField(default=0, help_text="Ativas sem login há mais de 7 dias")
+
+    # {plano: {'assinaturas': int, 'mrr': float}}
+    distribuicao_planos = models.JSONField(default=dict, blank=True)
+    # Listas do painel (top clientes, risco de churn, funil de onboarding); só nas fotografias
+    detalhes = models.JSONField(default=dict, blank=True)
+
+    gerado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Métricas Diárias'
+        verbose_name_plural = 'Métricas Diárias'
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} - MRR R$ {self.mrr}"
@@ -0,0 +1,36 @@
+"""
+Tasks Celery do backoffice
+"""
+from celery import shared_task
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def registrar_metricas_diarias(data=None):
+    """
+    Grava a fotografia das métricas de SaaS (backoffice/metricas.py).
+
+    Sem data: dia anterior (Celery Beat, logo após a meia-noite). O botão
+    do dashboard passa a data de hoje.
+    """
+    from django.utils import timezone
+    from backoffice.metricas import registrar_dia
+
+    if data:
+        data = datetime.date.fromisoformat(data)
+    else:
+        data = timezone.localdate() - datetime.timedelta(days=1)
+    metricas = registrar_dia(data)
+    logger.info(f"Métricas de {data} registradas: MRR R$ {metricas.mrr}, {metricas.assinaturas_ativas} ativas")
+    return str(metricas.data)
+
+
+@shared_task
+def coletar_metricas_infra():
+    """Amostra de host, banco e Redis para o painel de infraestrutura (backoffice/infra.py)"""
+    from backoffice.infra import coletar, registrar
+
+    registrar(coletar())
@@ -1,3 +1,113 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from assinaturas.models import Assinatura, HistoricoPagamento, Plano
+from backoffice import infra
+from backoffice.metricas import painel, reconstruir, registrar_dia
+from backoffice.models import MetricasDiarias
+from empresas.models import Empresa
 
-# Create your tests here.
+
+class MetricasDiariasTest(TestCase):
+    """Testes das fotografias diárias de métricas (backoffice/metricas.py)"""
+
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        self.plano = Plano.objects.create(nome='essencial', preco_mensal=Decimal('99.90'), trial_dias=7)
+        self.assinaturas = {}
+        for indice, status in enumerate(['ativa', 'ativa', 'trial', 'cancelada'], start=1):
+            empresa = Empresa.objects.create(
+                nome=f'Empresa Métricas {indice}',
+                slug=f'empresa-metricas-{indice}',
+                telefone='11999999999',
+                email=f'metricas{indice}@teste.com',
+                cnpj=f'12.345.678/0004-{indice:02d}'
+            )
+            self.assinaturas[indice] = Assinatura.objects.create(
+                empresa=empresa, plano=self.plano, status=status,
+                data_expiracao=timezone.now() + datetime.timedelta(days=30),
+            )
+
+    def _pagamento(self, assinatura, dias_atras, valor='99.90'):
+        aprovado_em = timezone.make_aware(
+            datetime.datetime.combine(self.hoje - datetime.timedelta(days=dias_atras), datetime.time(12))
+        )
+        return HistoricoPagamento.objects.create(
+            assinatura=assinatura, valor=Decimal(valor), status='aprovado', gateway='asaas',
+            transaction_id=f'tx-{assinatura.pk}-{dias_atras}', data_aprovacao=aprovado_em,
+        )
+
+    def test_fotografia_do_dia_e_painel_com_uma_leitura(self):
+        self._pagamento(self.assinaturas[1], 0)
+        metricas = registrar_dia(self.hoje)
+
+        self.assertEqual(metricas.mrr, Decimal('199.80'))
+        self.assertEqual(metricas.arr, Decimal('2397.60'))
+        self.assertEqual((metricas.assinaturas_ativas, metricas.trials, metricas.canceladas), (2, 1, 1))
+        self.assertEqual((metricas.conversoes, metricas.receita_dia), (1, Decimal('99.90')))
+        self.assertEqual(metricas.distribuicao_planos['essencial'], {'assinaturas': 3, 'mrr': 199.8})
+        self.assertEqual(len(metricas.detalhes['top_clientes']), 2)
+
+        with self.assertNumQueries(1):
+            contexto = painel(self.hoje)
+        self.assertEqual(contexto['financial']['mrr'], 199.8)
+        self.assertEqual(contexto['bi']['funil'], {'trial': 1, 'ativa': 2, 'cancelada': 1, 'suspensa': 0})
+        self.assertEqual(contexto['analytics']['mrr_historico'], [{'data': self.hoje.strftime('%d/%m'), 'mrr': 199.8}])
+
+    def test_reconstrucao_pelo_historico_de_pagamentos(self):
+        Assinatura.objects.update(data_inicio=timezone.now() - datetime.timedelta(days=60))
+        self._pagamento(self.assinaturas[1], 50, '79.90')
+        self._pagamento(self.assinaturas[1], 10)
+        self._pagamento(self.assinaturas[2], 5)
+        fotografia = registrar_dia(self.hoje - datetime.timedelta(days=1))
+
+        gravados = reconstruir(self.hoje - datetime.timedelta(days=55), self.hoje - datetime.timedelta(days=1))
+        self.assertEqual(gravados, 54)
+
+        dias = {m.data: m for m in MetricasDiarias.objects.filter(fonte='backfill')}
+        dia = lambda atras: dias[self.hoje - datetime.timedelta(days=atras)]
+        self.assertEqual((dia(55).mrr, dia(55).assinaturas_ativas), (Decimal('0.00'), 0))
+        self.assertEqual((dia(50).mrr, dia(50).conversoes), (Decimal('79.90'), 1))
+        # Pagamento de 50 dias atrás cobre só até 16 dias atrás (janela de 35 dias)
+        self.assertEqual(dia(14).mrr, Decimal('0.00'))
+        self.assertEqual(dia(10).mrr, Decimal('99.90'))
+        self.assertEqual((dia(2).mrr, dia(2).assinaturas_ativas), (Decimal('199.80'), 2))
+
+        # A fotografia real de ontem não é sobrescrita
+        fotografia.refresh_from_db()
+        self.assertEqual(fotografia.fonte, 'snapshot')
+
+
+@override_settings(INFRA_REDIS_URL='', INFRA_AMOSTRAS=3)
+class MetricasInfraTest(TestCase):
+    """Testes do coletor de infraestrutura e do buffer circular (backoffice/infra.py)"""
+
+    def setUp(self):
+        cache.delete(infra.CHAVE_BUFFER)
+        self.addCleanup(cache.delete, infra.CHAVE_BUFFER)
+
+    def test_coleta_conta_tabelas_sem_redis(self):
+        Empresa.objects.create(
+            nome='Empresa Infra', slug='empresa-infra', telefone='11999999999',
+            email='infra@teste.com', cnpj='12.345.678/0009-01'
+        )
+        with patch('backoffice.infra._host', return_value={'cpu_percent': 12.5}):
+            amostra = infra.coletar()
+
+        self.assertEqual(amostra['host'], {'cpu_percent': 12.5})
+        self.assertEqual(amostra['banco']['tabelas']['Empresas'], 1)
+        self.assertFalse(amostra['banco']['estimado'])
+        self.assertNotIn('redis', amostra)
+
+    def test_buffer_descarta_amostras_antigas(self):
+        for minuto in range(5):
+            infra.registrar({'ts': 1700000000 + minuto * 60, 'host': {'cpu_percent': minuto}})
+
+        self.assertEqual([a['host']['cpu_percent'] for a in infra.amostras()], [2, 3, 4])
+        self.assertEqual(infra.ultima_amostra()['host']['cpu_percent'], 4)
+        series = infra.series()
+        self.assertEqual(series['cpu'], [2, 3, 4])
+        self.assertEqual(series['redis_memoria'], [None, None, None])
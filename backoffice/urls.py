@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard_view, name='backoffice_dashboard'),
+    path('metricas/atualizar/', views.atualizar_metricas_view, name='backoffice_atualizar_metricas'),
     path('logs/', views.logs_view, name='backoffice_logs'),
     path('infra/', views.infra_view, name='backoffice_infra'),
 ]
@@ -18,7 +18,7 @@ from core.decorators import plano_required
 @plano_required(feature_flag='permite_dashboard_clientes', feature_name='Dashboard de Clientes')
 def dashboard_clientes(request):
     """Dashboard principal de clientes com métricas e insights (APENAS PLANO PROFISSIONAL)"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
     
@@ -186,7 +186,7 @@ def dashboard_clientes(request):
 @login_required
 def listar_clientes(request):
     """Lista completa de clientes - LIBERADO PARA TODOS OS PLANOS"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
     
@@ -228,7 +228,7 @@ def listar_clientes(request):
 
 @login_required
 def criar_cliente(request):
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         return redirect('logout')
     
@@ -271,7 +271,7 @@ def criar_cliente(request):
 
 @login_required
 def editar_cliente(request, id):
-    empresa = request.user.empresa
+    empresa = request.empresa
     cliente = get_object_or_404(Cliente, id=id, empresa=empresa)
     
     if request.method == 'POST':
@@ -303,7 +303,7 @@ def editar_cliente(request, id):
 
 @login_required
 def deletar_cliente(request, id):
-    empresa = request.user.empresa
+    empresa = request.empresa
     cliente = get_object_or_404(Cliente, id=id, empresa=empresa)
     
     if request.method == 'POST':
@@ -326,7 +326,7 @@ def deletar_cliente(request, id):
 @login_required
 def detalhes_cliente(request, id):
     """Visualiza perfil completo do cliente com histórico - LIBERADO PARA TODOS OS PLANOS"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     cliente = get_object_or_404(Cliente, id=id, empresa=empresa)
     
     # Histórico de agendamentos
@@ -14,6 +14,10 @@ app.conf.beat_schedule = {
         'task': 'agendamentos.tasks.enviar_lembretes_agendamentos',
         'schedule': crontab(minute='*/10'),  # A cada 10 minutos
     },
+    'concluir-agendamentos-vencidos': {
+        'task': 'financeiro.tasks.concluir_agendamentos_vencidos',
+        'schedule': crontab(minute='*/15'),  # A cada 15 minutos (em lote, idempotente)
+    },
     'gerar-agendamentos-recorrentes': {
         'task': 'agendamentos.tasks.gerar_agendamentos_recorrentes',
         'schedule': crontab(hour=0, minute=0),  # Diariamente à meia-noite
@@ -22,6 +26,54 @@ app.conf.beat_schedule = {
         'task': 'assinaturas.tasks.notificar_trials_expirando',
         'schedule': crontab(hour=9, minute=0),  # Diariamente às 9h
     },
+    'persistir-uso-mensal': {
+        'task': 'assinaturas.tasks.persistir_uso_mensal',
+        'schedule': crontab(minute='*/15'),  # A cada 15 minutos
+    },
+    'reconciliar-uso-mensal': {
+        'task': 'assinaturas.tasks.reconciliar_uso_mensal',
+        'schedule': crontab(hour=2, minute=0),  # Diariamente às 2h
+    },
+    'criar-particoes-futuras': {
+        'task': 'core.tasks.criar_particoes_futuras',
+        'schedule': crontab(hour=1, minute=0),  # Diariamente à 1h (idempotente)
+    },
+    'manter-tabelas-append-only': {
+        'task': 'core.tasks.manter_tabelas_append_only',
+        'schedule': crontab(hour=3, minute=30),  # Diariamente às 3h30 (logs do bot, analytics, pagamentos)
+    },
+    'enviar-emails-pendentes': {
+        'task': 'core.tasks.enviar_emails_pendentes',
+        'schedule': crontab(minute='*'),  # A cada minuto (fila de emails, em lotes)
+    },
+    'limpar-emails-enviados': {
+        'task': 'core.tasks.limpar_emails_enviados',
+        'schedule': crontab(hour=4, minute=0),  # Diariamente às 4h
+    },
+    'limpar-agendamentos-removidos': {
+        'task': 'agendamentos.tasks.limpar_agendamentos_removidos',
+        'schedule': crontab(hour=3, minute=45),  # Diariamente às 3h45 (tombstones do feed do calendário)
+    },
+    'sincronizar-status-whatsapp': {
+        'task': 'empresas.tasks.sincronizar_status_whatsapp',
+        'schedule': crontab(minute='*/5'),  # A cada 5 minutos (status por empresa no cache)
+    },
+    'registrar-metricas-diarias': {
+        'task': 'backoffice.tasks.registrar_metricas_diarias',
+        'schedule': crontab(hour=0, minute=10),  # Diariamente às 0h10 (fotografia do dia anterior)
+    },
+    'processar-fila-whatsapp': {
+        'task': 'empresas.tasks.processar_fila_whatsapp',
+        'schedule': crontab(minute='*'),  # A cada minuto (lembretes e avisos com limite por instância)
+    },
+    'limpar-exportacoes': {
+        'task': 'core.tasks.limpar_exportacoes',
+        'schedule': crontab(hour=4, minute=30),  # Diariamente às 4h30 (arquivos de exportação vencidos)
+    },
+    'coletar-metricas-infra': {
+        'task': 'backoffice.tasks.coletar_metricas_infra',
+        'schedule': crontab(minute='*'),  # A cada minuto (buffer de 24h do painel de infraestrutura)
+    },
 }
 
 @app.task(bind=True)
@@ -62,6 +62,7 @@ MIDDLEWARE = [
     'landing.middleware_analytics.AnalyticsMiddleware',
 
     # SaaS Middlewares
+    'core.middleware.UnidadeAtivaMiddleware',  # Antes dos limites: valem os da unidade aberta
     'core.middleware.AssinaturaExpiracaoMiddleware',
     'core.middleware.LimitesPlanoMiddleware',
     'core.middleware.UsageTrackingMiddleware',
@@ -81,6 +82,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'landing.context_processors.analytics',  # Google Analytics
+                'empresas.context_processors.unidades',  # Seletor de unidade (multi-unidades)
             ],
         },
     },
@@ -155,10 +157,11 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle',
     ],
+    # Sobrescrevíveis por ambiente (ex: testes de carga em tests/locustfile_api.py)
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour',
-        'bot_api': '500/hour',
+        'anon': config('THROTTLE_ANON', default='100/hour'),
+        'user': config('THROTTLE_USER', default='1000/hour'),
+        'bot_api': config('THROTTLE_BOT_API', default='500/hour'),
     }
 }
 
@@ -173,6 +176,11 @@ SITE_URL = config('SITE_URL', default='http://localhost:8000')
 GESTTO_API_KEY = config('GESTTO_API_KEY', default='desenvolvimento-inseguro-mudar-em-producao')
 N8N_WEBHOOK_URL = config('N8N_WEBHOOK_URL', default='')
 
+# Servidor ASGI (gunicorn + uvicorn workers, config/asgi.py): os webhooks
+# são views async e o cliente HTTP de saída (core/http_async.py) é
+# compartilhado por processo
+SERVIDOR_ASGI = config('SERVIDOR_ASGI', default=False, cast=bool)
+
 # Stripe (Cartão de Crédito - Internacional)
 STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
@@ -186,9 +194,99 @@ ASAAS_SANDBOX = config('ASAAS_SANDBOX', default=True, cast=bool)
 EVOLUTION_API_URL = config('EVOLUTION_API_URL', default='')
 EVOLUTION_API_KEY = config('EVOLUTION_API_KEY', default='')
 
+# Provisionamento da instância em segundo plano (empresas/provisionamento_whatsapp.py)
+# O job fica no cache: o worker do Celery só o enxerga com cache compartilhado (Redis).
+# Com LocMemCache as etapas rodam numa thread do processo web.
+WHATSAPP_PROVISIONAMENTO_TENTATIVAS_QR = config('WHATSAPP_PROVISIONAMENTO_TENTATIVAS_QR', default=5, cast=int)
+WHATSAPP_PROVISIONAMENTO_INTERVALO_QR = config('WHATSAPP_PROVISIONAMENTO_INTERVALO_QR', default=2, cast=int)  # segundos
+WHATSAPP_PROVISIONAMENTO_INTERVALO_STATUS = config('WHATSAPP_PROVISIONAMENTO_INTERVALO_STATUS', default=5, cast=int)  # segundos
+WHATSAPP_PROVISIONAMENTO_DURACAO_MAX = config('WHATSAPP_PROVISIONAMENTO_DURACAO_MAX', default=180, cast=int)  # Espera pela leitura do QR
+WHATSAPP_STATUS_TTL = config('WHATSAPP_STATUS_TTL', default=600, cast=int)  # Status por empresa no cache (empresas/status_whatsapp.py)
+
 # Google Analytics 4
 GA4_MEASUREMENT_ID = config('GA4_MEASUREMENT_ID', default='')
 
+# Logs do bot WhatsApp (LogMensagemBot)
+# Write-behind: grava os logs em lote numa thread de fundo (bulk_create)
+BOT_LOG_WRITE_BEHIND = config('BOT_LOG_WRITE_BEHIND', default=False, cast=bool)
+BOT_LOG_FILA_MAX = config('BOT_LOG_FILA_MAX', default=1000, cast=int)  # Fila cheia => gravação síncrona
+BOT_LOG_TAMANHO_LOTE = config('BOT_LOG_TAMANHO_LOTE', default=100, cast=int)
+BOT_LOG_INTERVALO_FLUSH = config('BOT_LOG_INTERVALO_FLUSH', default=2.0, cast=float)  # segundos
+BOT_LOG_RETENCAO_DIAS = config('BOT_LOG_RETENCAO_DIAS', default=90, cast=int)
+
+# Tabelas append-only (core/particionamento.py)
+# Postgres: partições mensais; expurgo por DROP de partição. SQLite: DELETE em lotes.
+# Retenção 0 = sem expurgo.
+ANALYTICS_RETENCAO_DIAS = config('ANALYTICS_RETENCAO_DIAS', default=30, cast=int)
+HISTORICO_PAGAMENTO_RETENCAO_DIAS = config('HISTORICO_PAGAMENTO_RETENCAO_DIAS', default=0, cast=int)  # 0 = manter tudo (fonte das métricas do backoffice)
+PARTICIONAMENTO_MESES_FUTUROS = config('PARTICIONAMENTO_MESES_FUTUROS', default=3, cast=int)
+PARTICIONAMENTO_ARQUIVO_DIR = config('PARTICIONAMENTO_ARQUIVO_DIR', default=str(BASE_DIR / 'data' / 'arquivo'))
+
+# Cache da página pública de agendamento (/agendar/<slug>/)
+PUBLICO_CATALOGO_TTL = config('PUBLICO_CATALOGO_TTL', default=3600, cast=int)  # Catálogo (invalidado por signals)
+PUBLICO_HORARIOS_TTL = config('PUBLICO_HORARIOS_TTL', default=60, cast=int)  # Horários disponíveis
+PUBLICO_CACHE_MAX_AGE = config('PUBLICO_CACHE_MAX_AGE', default=60, cast=int)  # Cache-Control max-age (nginx/navegador)
+PUBLICO_CACHE_STALE = config('PUBLICO_CACHE_STALE', default=300, cast=int)  # stale-while-revalidate
+
+# Conclusão automática de agendamentos passados (financeiro/conclusao.py)
+CONCLUSAO_MARGEM_MINUTOS = config('CONCLUSAO_MARGEM_MINUTOS', default=30, cast=int)  # Após o fim do atendimento
+CONCLUSAO_TAMANHO_LOTE = config('CONCLUSAO_TAMANHO_LOTE', default=500, cast=int)
+
+# Feed incremental do calendário (agendamentos/feed_calendario.py)
+# Cursores mais antigos que a retenção das exclusões recebem a carga completa
+CALENDARIO_REMOVIDOS_RETENCAO_DIAS = config('CALENDARIO_REMOVIDOS_RETENCAO_DIAS', default=30, cast=int)
+
+# Atualizações do calendário em tempo real (SSE, agendamentos/eventos_calendario.py)
+# Vazio = desligado (calendário atualiza por intervalo). Exige SERVIDOR_ASGI.
+CALENDARIO_SSE_REDIS_URL = config('CALENDARIO_SSE_REDIS_URL', default='')
+CALENDARIO_SSE_MAX_CONEXOES = config('CALENDARIO_SSE_MAX_CONEXOES', default=20, cast=int)  # Por empresa
+CALENDARIO_SSE_HEARTBEAT = config('CALENDARIO_SSE_HEARTBEAT', default=15, cast=int)  # segundos
+CALENDARIO_SSE_DURACAO_MAX = config('CALENDARIO_SSE_DURACAO_MAX', default=600, cast=int)  # segundos até reconectar
+
+# Fila de saída de emails (core/email_outbox.py)
+# EMAIL_OUTBOX_BACKEND vazio = EMAIL_BACKEND. Testes offline:
+# django.core.mail.backends.filebased.EmailBackend (grava em EMAIL_FILE_PATH)
+EMAIL_OUTBOX_BACKEND = config('EMAIL_OUTBOX_BACKEND', default='')
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'tmp' / 'emails'))
+EMAIL_OUTBOX_DISPARO_IMEDIATO = config('EMAIL_OUTBOX_DISPARO_IMEDIATO', default=False, cast=bool)  # .delay() após o commit
+EMAIL_OUTBOX_TAMANHO_LOTE = config('EMAIL_OUTBOX_TAMANHO_LOTE', default=50, cast=int)  # Emails por conexão SMTP
+EMAIL_OUTBOX_MAX_TENTATIVAS = config('EMAIL_OUTBOX_MAX_TENTATIVAS', default=5, cast=int)
+EMAIL_OUTBOX_BACKOFF_BASE = config('EMAIL_OUTBOX_BACKOFF_BASE', default=60, cast=int)  # segundos, dobra a cada falha
+EMAIL_OUTBOX_RETENCAO_DIAS = config('EMAIL_OUTBOX_RETENCAO_DIAS', default=30, cast=int)
+
+# Exportação CSV/XLSX (core/exportacao.py)
+EXPORTACAO_LIMITE_SINCRONO = config('EXPORTACAO_LIMITE_SINCRONO', default=20000, cast=int)  # Linhas; acima disso vira job em segundo plano
+EXPORTACAO_CHUNK = config('EXPORTACAO_CHUNK', default=2000, cast=int)  # Linhas por leitura do cursor
+EXPORTACAO_RETENCAO_DIAS = config('EXPORTACAO_RETENCAO_DIAS', default=7, cast=int)  # Arquivos gerados no MEDIA_ROOT
+
+# Relatórios de agendamentos (agendamentos/relatorios.py)
+RELATORIOS_CACHE_TTL = config('RELATORIOS_CACHE_TTL', default=3600, cast=int)  # segundos; agendamento salvo já troca a chave
+RELATORIOS_MAX_DIAS = config('RELATORIOS_MAX_DIAS', default=366, cast=int)
+RELATORIOS_CHUNK = config('RELATORIOS_CHUNK', default=5000, cast=int)  # Linhas por leitura do cursor
+RELATORIOS_INTERVALO_OCUPACAO = config('RELATORIOS_INTERVALO_OCUPACAO', default=30, cast=int)  # Faixa do mapa de calor (15, 30 ou 60 min)
+
+# Organizações multi-unidade (empresas/organizacoes.py)
+ORGANIZACOES_CACHE_TTL = config('ORGANIZACOES_CACHE_TTL', default=300, cast=int)  # segundos; agendamentos já trocam a chave do painel
+
+# Métricas diárias do backoffice (backoffice/metricas.py)
+METRICAS_JANELA_PAGAMENTO = config('METRICAS_JANELA_PAGAMENTO', default=35, cast=int)  # Dias que um pagamento mantém a assinatura ativa na reconstrução
+
+# Métricas de infraestrutura do backoffice (backoffice/infra.py)
+# INFRA_REDIS_URL vazio = buffer no cache e sem métricas do Redis
+INFRA_REDIS_URL = config('INFRA_REDIS_URL', default='')
+INFRA_AMOSTRAS = config('INFRA_AMOSTRAS', default=1440, cast=int)  # Uma por minuto: 24h
+
+# Central de Ajuda (ajuda/conteudo.py e ajuda/busca.py)
+AJUDA_CACHE_TTL = config('AJUDA_CACHE_TTL', default=3600, cast=int)  # Páginas e buscas; invalidadas a cada alteração
+
+# Fila de envio WhatsApp (empresas/fila_whatsapp.py)
+WHATSAPP_FILA_POR_MINUTO = config('WHATSAPP_FILA_POR_MINUTO', default=20, cast=int)  # Por instância, ritmo contínuo
+WHATSAPP_FILA_RAJADA = config('WHATSAPP_FILA_RAJADA', default=3, cast=int)  # Por instância, de uma vez
+WHATSAPP_FILA_CONCORRENCIA = config('WHATSAPP_FILA_CONCORRENCIA', default=8, cast=int)  # Envios simultâneos no total
+WHATSAPP_FILA_DURACAO = config('WHATSAPP_FILA_DURACAO', default=50, cast=int)  # segundos por execução
+WHATSAPP_FILA_MAX_TENTATIVAS = config('WHATSAPP_FILA_MAX_TENTATIVAS', default=4, cast=int)
+WHATSAPP_FILA_BACKOFF_BASE = config('WHATSAPP_FILA_BACKOFF_BASE', default=60, cast=int)  # segundos, dobra a cada falha
+
 # ============================================
 # ADMIN INTERFACE
 # ============================================
@@ -19,10 +19,15 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', cast=Csv())
 # Suporta DATABASE_URL (Supabase/Heroku style) ou variáveis individuais
 DATABASE_URL = config('DATABASE_URL', default=None)
 
+# Sob ASGI o ORM roda em threads do sync_to_async: conexões persistentes
+# ficariam presas a threads ociosas, então cada requisição fecha a sua
+# (use um pooler como o PgBouncer/Supabase na frente do Postgres)
+CONN_MAX_AGE = 0 if SERVIDOR_ASGI else 600
+
 if DATABASE_URL:
     # Produção: Usa DATABASE_URL do Supabase/Heroku
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=CONN_MAX_AGE)
     }
 else:
     # Produção: Usa variáveis individuais
@@ -34,7 +39,7 @@ else:
             'PASSWORD': config('DB_PASSWORD'),
             'HOST': config('DB_HOST'),
             'PORT': config('DB_PORT', default='5432'),
-            'CONN_MAX_AGE': 600,  # Mantém conexões abertas por 10 min
+            'CONN_MAX_AGE': CONN_MAX_AGE,  # WSGI: mantém conexões abertas por 10 min
             'OPTIONS': {
                 'connect_timeout': 10,
             },
@@ -110,6 +115,12 @@ CACHES = {
     }
 }
 
+# Push do calendário (SSE) pelo mesmo Redis; pub/sub independe do número do banco
+CALENDARIO_SSE_REDIS_URL = config('CALENDARIO_SSE_REDIS_URL', default=config('REDIS_URL', default='redis://redis:6379/1'))
+
+# Buffer e INFO das métricas de infraestrutura do backoffice
+INFRA_REDIS_URL = config('INFRA_REDIS_URL', default=config('REDIS_URL', default='redis://redis:6379/1'))
+
 # Session usando cache (Redis) para performance
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -18,6 +18,7 @@ from agendamentos.api_n8n import (
     consultar_horarios_funcionamento,
     consultar_datas_especiais,
     consultar_horarios_disponiveis,
+    consultar_contexto,
     buscar_empresa_por_instancia
 )
 from empresas.api_views import whatsapp_webhook
@@ -93,6 +94,7 @@ urlpatterns = [
     path('api/n8n/horarios-funcionamento/', consultar_horarios_funcionamento, name='api_n8n_horarios_funcionamento'),
     path('api/n8n/datas-especiais/', consultar_datas_especiais, name='api_n8n_datas_especiais'),
     path('api/n8n/horarios-disponiveis/', consultar_horarios_disponiveis, name='api_n8n_horarios_disponiveis'),
+    path('api/n8n/contexto/', consultar_contexto, name='api_n8n_contexto'),
 
     # API n8n - Buscar empresa por instance_name (usado para identificar empresa no webhook)
     path('api/n8n/empresa-por-instancia/<str:instance_name>/', buscar_empresa_por_instancia, name='api_n8n_empresa_por_instancia'),
@@ -120,6 +122,12 @@ urlpatterns = [
     # Onboarding wizard
     path('app/', include('core.onboarding_urls')),
 
+    # Exportação de dados (CSV/XLSX)
+    path('app/', include('core.exportacao_urls')),
+
+    # Organizações multi-unidade (painel consolidado e troca de unidade)
+    path('app/', include('empresas.organizacao_urls')),
+
     # Sistema principal
     path('app/dashboard/', dashboard_view, name='dashboard'),
     path('app/upgrade/', upgrade_required, name='upgrade_required'),
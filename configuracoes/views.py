@@ -23,7 +23,7 @@ def primeiros_passos(request):
     Guia de configuração inicial - Primeiros Passos
     Mostra checklist visual com o que já foi configurado e o que falta
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Verificar status de cada item
     servicos = Servico.objects.filter(empresa=empresa, ativo=True)
@@ -137,7 +137,7 @@ def configuracoes_dashboard(request):
     """Dashboard de configuracoes"""
     from core.models import Usuario
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     context = {
         'empresa': empresa,
@@ -159,7 +159,7 @@ def configuracoes_dashboard(request):
 @login_required
 def empresa_dados(request):
     """Edita os dados da empresa (nome, endereço, contato, etc.)"""
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if request.method == 'POST':
         # Dados básicos
@@ -194,7 +194,7 @@ def empresa_dados(request):
 @login_required
 def servicos_lista(request):
     """Lista todos os serviços"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     servicos = Servico.objects.filter(empresa=empresa).order_by('nome')
     
     context = {
@@ -208,7 +208,7 @@ def servicos_lista(request):
 @login_required
 def servico_criar(request):
     """Cria um novo serviço"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     if request.method == 'POST':
         nome = request.POST.get('nome')
@@ -233,7 +233,7 @@ def servico_criar(request):
 @login_required
 def servico_editar(request, pk):
     """Edita um serviço"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     servico = get_object_or_404(Servico, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -259,7 +259,7 @@ def servico_editar(request, pk):
 @login_required
 def servico_deletar(request, pk):
     """Deleta um serviço"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     servico = get_object_or_404(Servico, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -281,7 +281,7 @@ def servico_deletar(request, pk):
 @login_required
 def categorias_lista(request):
     """Lista todas as categorias financeiras"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     categorias = CategoriaFinanceira.objects.filter(empresa=empresa).order_by('tipo', 'nome')
     
     context = {
@@ -295,7 +295,7 @@ def categorias_lista(request):
 @login_required
 def categoria_criar(request):
     """Cria uma nova categoria"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     if request.method == 'POST':
         nome = request.POST.get('nome')
@@ -320,7 +320,7 @@ def categoria_criar(request):
 @login_required
 def categoria_editar(request, pk):
     """Edita uma categoria"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     categoria = get_object_or_404(CategoriaFinanceira, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -350,7 +350,7 @@ def categoria_editar(request, pk):
 @login_required
 def formas_pagamento_lista(request):
     """Lista todas as formas de pagamento"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     formas = FormaPagamento.objects.filter(empresa=empresa).order_by('nome')
     
     context = {
@@ -364,7 +364,7 @@ def formas_pagamento_lista(request):
 @login_required
 def forma_pagamento_criar(request):
     """Cria uma nova forma de pagamento"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     if request.method == 'POST':
         nome = request.POST.get('nome')
@@ -383,7 +383,7 @@ def forma_pagamento_criar(request):
 @login_required
 def forma_pagamento_editar(request, pk):
     """Edita uma forma de pagamento"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     forma = get_object_or_404(FormaPagamento, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -412,7 +412,7 @@ def usuarios_lista(request):
     """Lista todos os usuarios da empresa"""
     from core.models import Usuario
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     usuarios = Usuario.objects.filter(empresa=empresa).order_by('-criado_em')
     usuarios_ativos = usuarios.filter(ativo=True).count()
 
@@ -444,7 +444,7 @@ def usuario_criar(request):
     from django.contrib.auth import password_validation
     from django.core.exceptions import ValidationError
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Verificar limite do plano
     usuarios_ativos = Usuario.objects.filter(empresa=empresa, ativo=True).count()
@@ -534,7 +534,7 @@ def usuario_editar(request, pk):
     """Edita um usuario da empresa"""
     from core.models import Usuario
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     usuario = get_object_or_404(Usuario, pk=pk, empresa=empresa)
 
     # Nao permitir editar a si mesmo por esta tela (usar alterar senha)
@@ -608,7 +608,7 @@ def usuario_deletar(request, pk):
     """Deleta (desativa) um usuario da empresa"""
     from core.models import Usuario
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     usuario = get_object_or_404(Usuario, pk=pk, empresa=empresa)
 
     # Nao permitir deletar a si mesmo
@@ -637,7 +637,7 @@ def usuario_deletar(request, pk):
 def profissionais_lista(request):
     """Lista todos os profissionais"""
     try:
-        empresa = request.user.empresa
+        empresa = request.empresa
         profissionais = Profissional.objects.filter(empresa=empresa).order_by('nome')
         
         # Breadcrumb
@@ -690,7 +690,7 @@ def profissionais_lista(request):
 @login_required
 def profissional_criar(request):
     """Cria um novo profissional"""
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Validar limite do plano (GET e POST)
     assinatura = getattr(empresa, 'assinatura', None)
@@ -762,7 +762,7 @@ def profissional_criar(request):
 @login_required
 def profissional_editar(request, pk):
     """Edita um profissional"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     profissional = get_object_or_404(Profissional, pk=pk, empresa=empresa)
     
     # Obter assinatura e plano para validação de limites
@@ -828,7 +828,7 @@ def profissional_editar(request, pk):
 @login_required
 def profissional_deletar(request, pk):
     """Deleta um profissional"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     profissional = get_object_or_404(Profissional, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -856,7 +856,7 @@ def assinatura_gerenciar(request):
     - Fazer upgrade/downgrade
     - Cancelar assinatura
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if not hasattr(empresa, 'assinatura'):
         messages.error(request, 'Empresa sem assinatura ativa.')
@@ -866,15 +866,9 @@ def assinatura_gerenciar(request):
     plano = assinatura.plano
 
     # Calcular uso do mês atual
-    inicio_mes = now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    from assinaturas.uso import uso_agendamentos_mes
 
-    from agendamentos.models import Agendamento
-
-    agendamentos_mes = Agendamento.objects.filter(
-        empresa=empresa,
-        criado_em__gte=inicio_mes,
-        status__in=['pendente', 'confirmado', 'concluido']
-    ).count()
+    agendamentos_mes = uso_agendamentos_mes(empresa)
 
     profissionais_ativos = Profissional.objects.filter(
         empresa=empresa,
@@ -925,7 +919,7 @@ def assinatura_alterar_plano(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Metodo nao permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if not hasattr(empresa, 'assinatura'):
         return JsonResponse({'success': False, 'error': 'Empresa sem assinatura'}, status=400)
@@ -1054,7 +1048,7 @@ def assinatura_cancelar(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Metodo nao permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if not hasattr(empresa, 'assinatura'):
         return JsonResponse({'success': False, 'error': 'Empresa sem assinatura'}, status=400)
@@ -1119,7 +1113,7 @@ def assinatura_gerar_checkout(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if not hasattr(empresa, 'assinatura'):
         return JsonResponse({'success': False, 'error': 'Empresa sem assinatura'}, status=400)
@@ -1217,7 +1211,7 @@ def assinatura_reativar(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Metodo nao permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if not hasattr(empresa, 'assinatura'):
         return JsonResponse({'success': False, 'error': 'Empresa sem assinatura'}, status=400)
@@ -1266,11 +1260,11 @@ def whatsapp_dashboard(request):
     """
     Dashboard de configuração do WhatsApp
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Criar ou buscar configuração
+    from empresas import status_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
-    from empresas.services import EvolutionAPIService
 
     config, created = ConfiguracaoWhatsApp.objects.get_or_create(
         empresa=empresa,
@@ -1285,19 +1279,16 @@ def whatsapp_dashboard(request):
         config.gerar_instance_name()
         config.gerar_webhook_secret()
 
-    # Se já tem instância configurada, sincronizar com Evolution API
-    # para detectar se foi deletada externamente
-    if config.instance_name and not created:
-        service = EvolutionAPIService(config)
-        sync_result = service.sincronizar_status()
-
-        # Se foi deletada externamente, mostrar mensagem ao usuário
-        if sync_result.get('action') == 'deleted_externally':
-            messages.warning(
-                request,
-                'A instância do WhatsApp foi removida externamente. '
-                'É necessário criar uma nova conexão.'
-            )
+    # Status sincronizado em segundo plano (empresas/status_whatsapp.py):
+    # a página não chama a Evolution API
+    if status_whatsapp.consumir_aviso_remocao(empresa.pk):
+        messages.warning(
+            request,
+            'A instância do WhatsApp foi removida externamente. '
+            'É necessário criar uma nova conexão.'
+        )
+    elif config.instance_name and not created and status_whatsapp.status_em_cache(empresa.pk) is None:
+        status_whatsapp.solicitar_sincronizacao(empresa.pk)
 
     context = {
         'empresa': empresa,
@@ -1312,16 +1303,19 @@ def whatsapp_dashboard(request):
 @login_required
 def whatsapp_criar_instancia(request):
     """
-    Conecta WhatsApp usando método robusto com retry (AJAX)
+    Inicia a conexão do WhatsApp em segundo plano (AJAX)
+
+    Retorna na hora com o id do job; o navegador acompanha por
+    whatsapp_obter_qr (empresas/provisionamento_whatsapp.py).
     """
     from django.http import JsonResponse
+    from empresas import provisionamento_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
-    from empresas.services import EvolutionAPIService
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     # VALIDAÇÃO CRÍTICA: Verificar se o plano permite WhatsApp
     assinatura = empresa.assinatura_ativa
@@ -1342,110 +1336,86 @@ def whatsapp_criar_instancia(request):
             'action': 'upgrade_required'
         }, status=403)
     
-    config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
-
-    # Criar service e usar método robusto
-    service = EvolutionAPIService(config)
-    result = service.conectar_whatsapp()
-
-    if result['success']:
-        response_data = {
-            'success': True,
-            'status': result['status'],
-            'message': result['message'],
-            'action': result['action'],
-            'instance_name': config.instance_name
-        }
+    if not ConfiguracaoWhatsApp.objects.filter(empresa=empresa).exists():
+        return JsonResponse({'success': False, 'error': 'Configuração não encontrada'})
 
-        # Incluir QR Code se disponível
-        if result.get('qrcode'):
-            response_data['qrcode'] = result['qrcode']
+    job = provisionamento_whatsapp.iniciar(empresa.pk)
+    if job['estado'] == 'erro':
+        return JsonResponse({'success': False, 'error': job['mensagem'], 'action': 'error'})
 
-        return JsonResponse(response_data)
-    else:
-        return JsonResponse({
-            'success': False,
-            'error': result.get('message', 'Erro ao conectar WhatsApp'),
-            'action': result.get('action', 'error')
-        })
+    return JsonResponse({
+        'success': True,
+        'job': job['id'],
+        'estado': job['estado'],
+        'message': job['mensagem'],
+        'action': 'queued',
+    }, status=202)
 
 
 @login_required
 def whatsapp_obter_qr(request):
     """
-    Obtém QR Code atualizado (AJAX polling)
+    Estado da conexão e QR Code atual (AJAX polling)
+
+    Só lê o job no cache e a configuração no banco; quem fala com a
+    Evolution API é a task de provisionamento.
     """
     from django.http import JsonResponse
+    from empresas import provisionamento_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
-    from empresas.services import EvolutionAPIService
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
     except ConfiguracaoWhatsApp.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Configuração não encontrada'})
 
-    service = EvolutionAPIService(config)
-
-    # Verificar status primeiro
-    status_result = service.obter_status_conexao()
-
-    # Se já está conectado, retornar sucesso
-    if config.esta_conectado():
-        return JsonResponse({
-            'success': True,
-            'conectado': True,
-            'status': config.status,
-            'numero': config.numero_conectado,
-            'nome': config.nome_perfil
-        })
-
-    # Se aguardando QR, tentar obter novo
-    if config.status == 'aguardando_qr':
-        qr_result = service.obter_qrcode()
-
-        return JsonResponse({
-            'success': True,
-            'conectado': False,
-            'qrcode': qr_result.get('qrcode', config.qr_code),
-            'status': config.status
-        })
-
-    return JsonResponse({
+    job = provisionamento_whatsapp.obter_job(empresa.pk)
+    resposta = {
         'success': True,
-        'conectado': False,
+        'conectado': config.esta_conectado(),
         'status': config.status,
-        'qrcode': config.qr_code
-    })
+        'qrcode': config.qr_code if config.status == 'aguardando_qr' else '',
+        'numero': config.numero_conectado,
+        'nome': config.nome_perfil,
+    }
+    if job:
+        resposta.update(job=job['id'], estado=job['estado'], mensagem=job['mensagem'])
+    return JsonResponse(resposta)
 
 
 @login_required
 def whatsapp_verificar_status(request):
     """
     Verifica status da conexão (AJAX)
+
+    Responde com o status salvo e pede uma sincronização em segundo plano
+    (no máximo uma por minuto por empresa).
     """
     from django.http import JsonResponse
+    from empresas import status_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
-    from empresas.services import EvolutionAPIService
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
     except ConfiguracaoWhatsApp.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Configuração não encontrada'})
 
-    service = EvolutionAPIService(config)
-    result = service.obter_status_conexao()
+    if config.instance_name:
+        status_whatsapp.solicitar_sincronizacao(empresa.pk)
+    sincronizado = status_whatsapp.status_em_cache(empresa.pk)
 
     return JsonResponse({
-        'success': result['success'],
+        'success': True,
         'status': config.status,
         'conectado': config.esta_conectado(),
         'numero': config.numero_conectado,
         'nome': config.nome_perfil,
-        'foto': config.foto_perfil_url
+        'foto': config.foto_perfil_url,
+        'sincronizado_em': sincronizado['sincronizado_em'] if sincronizado else None,
     })
 
 
@@ -1455,19 +1425,21 @@ def whatsapp_desconectar(request):
     Desconecta WhatsApp (logout)
     """
     from django.http import JsonResponse
+    from empresas import provisionamento_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
     from empresas.services import EvolutionAPIService
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
     except ConfiguracaoWhatsApp.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Configuração não encontrada'})
 
+    provisionamento_whatsapp.cancelar(empresa.pk)
     service = EvolutionAPIService(config)
     result = service.desconectar_instancia()
 
@@ -1487,19 +1459,21 @@ def whatsapp_deletar_instancia(request):
     Deleta instância completamente (CUIDADO: Irreversível)
     """
     from django.http import JsonResponse
+    from empresas import provisionamento_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
     from empresas.services import EvolutionAPIService
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
     except ConfiguracaoWhatsApp.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Configuração não encontrada'})
 
+    provisionamento_whatsapp.cancelar(empresa.pk)
     service = EvolutionAPIService(config)
     result = service.deletar_instancia()
 
@@ -1525,7 +1499,7 @@ def whatsapp_reconfigurar(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
@@ -1564,13 +1538,14 @@ def whatsapp_sincronizar(request):
     Detecta se a instância foi deletada externamente
     """
     from django.http import JsonResponse
+    from empresas import status_whatsapp
     from empresas.models import ConfiguracaoWhatsApp
     from empresas.services import EvolutionAPIService
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método não permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
@@ -1589,6 +1564,7 @@ def whatsapp_sincronizar(request):
     result = service.sincronizar_status()
 
     if result['success']:
+        status_whatsapp.guardar_status(config)
         # Mensagens personalizadas baseadas na ação
         if result['action'] == 'deleted_externally':
             messages.warning(
@@ -1619,19 +1595,22 @@ def whatsapp_resetar_config(request):
     AGORA TAMBEM deleta a instancia na Evolution API para evitar conflitos.
     """
     from django.http import JsonResponse
+    from empresas import provisionamento_whatsapp
     from empresas.models import ConfiguracaoWhatsApp, WhatsAppInstance
     from empresas.services import EvolutionAPIService
 
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Metodo nao permitido'}, status=405)
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     try:
         config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
     except ConfiguracaoWhatsApp.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Configuracao nao encontrada'})
 
+    provisionamento_whatsapp.cancelar(empresa.pk)
+
     # ✅ NOVO: Tentar deletar a instância na Evolution API antes de resetar
     if config.instance_name:
         try:
@@ -1677,8 +1656,52 @@ def whatsapp_resetar_config(request):
 # WEBHOOK INTERMEDIARIO (Evolution -> Django -> n8n)
 # ==========================================
 
+def _validar_webhook_n8n(empresa_id, secret):
+    """
+    Valida empresa, secret e assinatura (parte síncrona/ORM do webhook).
+
+    Returns:
+        (empresa, config, None) se válido, ou (None, None, JsonResponse de erro)
+    """
+    import logging
+    from django.http import JsonResponse
+    from empresas.models import Empresa, ConfiguracaoWhatsApp
+
+    logger = logging.getLogger(__name__)
+
+    # 1. Buscar empresa e configuração WhatsApp
+    try:
+        empresa = Empresa.objects.select_related('config_whatsapp', 'assinatura').get(id=empresa_id)
+        config = empresa.config_whatsapp
+    except Empresa.DoesNotExist:
+        logger.error(f"Webhook: Empresa {empresa_id} não encontrada")
+        return None, None, JsonResponse({'error': 'Empresa não encontrada'}, status=404)
+    except ConfiguracaoWhatsApp.DoesNotExist:
+        logger.error(f"Webhook: Empresa {empresa_id} sem configuração WhatsApp")
+        return None, None, JsonResponse({'error': 'WhatsApp não configurado'}, status=404)
+
+    # 2. Validar secret
+    if config.webhook_secret != secret:
+        logger.warning(f"Webhook: Secret inválido para empresa {empresa_id}")
+        return None, None, JsonResponse({'error': 'Não autorizado'}, status=403)
+
+    # 3. Validar se assinatura está ativa
+    if not empresa.assinatura_ativa:
+        logger.warning(f"Webhook: Assinatura inativa para empresa {empresa_id} ({empresa.nome})")
+
+        # TODO: Enviar mensagem informando que assinatura está vencida
+        # (pode fazer isso via Evolution API direto aqui, ou deixar n8n decidir)
+
+        return None, None, JsonResponse({
+            'error': 'Assinatura inativa',
+            'message': 'Entre em contato com suporte para reativar'
+        }, status=402)
+
+    return empresa, config, None
+
+
 @csrf_exempt
-def whatsapp_webhook_n8n(request, empresa_id, secret):
+async def whatsapp_webhook_n8n(request, empresa_id, secret):
     """
     Webhook intermediário que recebe mensagens da Evolution API,
     valida empresa/assinatura e encaminha para n8n.
@@ -1691,13 +1714,16 @@ def whatsapp_webhook_n8n(request, empresa_id, secret):
     3. Django adiciona empresa_id ao payload
     4. Django → n8n workflow
     5. n8n processa e responde via Evolution API
+
+    View async: a validação (ORM) roda em sync_to_async e o encaminhamento
+    usa httpx, sem prender um worker enquanto o n8n responde.
     """
     import json
-    import requests
+    import httpx
     import logging
-    from django.views.decorators.csrf import csrf_exempt
+    from asgiref.sync import sync_to_async
     from django.http import JsonResponse
-    from empresas.models import Empresa, ConfiguracaoWhatsApp
+    from core.http_async import post_json
 
     logger = logging.getLogger(__name__)
 
@@ -1706,33 +1732,9 @@ def whatsapp_webhook_n8n(request, empresa_id, secret):
         return JsonResponse({'error': 'Apenas POST permitido'}, status=405)
 
     try:
-        # 1. Buscar empresa e configuração WhatsApp
-        try:
-            empresa = Empresa.objects.select_related('whatsapp_config').get(id=empresa_id)
-            config = empresa.whatsapp_config
-        except Empresa.DoesNotExist:
-            logger.error(f"Webhook: Empresa {empresa_id} não encontrada")
-            return JsonResponse({'error': 'Empresa não encontrada'}, status=404)
-        except ConfiguracaoWhatsApp.DoesNotExist:
-            logger.error(f"Webhook: Empresa {empresa_id} sem configuração WhatsApp")
-            return JsonResponse({'error': 'WhatsApp não configurado'}, status=404)
-
-        # 2. Validar secret
-        if config.webhook_secret != secret:
-            logger.warning(f"Webhook: Secret inválido para empresa {empresa_id}")
-            return JsonResponse({'error': 'Não autorizado'}, status=403)
-
-        # 3. Validar se assinatura está ativa
-        if not empresa.assinatura_ativa:
-            logger.warning(f"Webhook: Assinatura inativa para empresa {empresa_id} ({empresa.nome})")
-
-            # TODO: Enviar mensagem informando que assinatura está vencida
-            # (pode fazer isso via Evolution API direto aqui, ou deixar n8n decidir)
-
-            return JsonResponse({
-                'error': 'Assinatura inativa',
-                'message': 'Entre em contato com suporte para reativar'
-            }, status=402)
+        empresa, config, erro = await sync_to_async(_validar_webhook_n8n)(empresa_id, secret)
+        if erro:
+            return erro
 
         # 4. Parsear payload da Evolution API
         try:
@@ -1760,9 +1762,9 @@ def whatsapp_webhook_n8n(request, empresa_id, secret):
             return JsonResponse({'error': 'Configuração interna incorreta'}, status=500)
 
         try:
-            response = requests.post(
+            response = await post_json(
                 n8n_webhook_url,
-                json=payload_n8n,
+                payload_n8n,
                 headers={'Content-Type': 'application/json'},
                 timeout=10
             )
@@ -1781,13 +1783,13 @@ def whatsapp_webhook_n8n(request, empresa_id, secret):
                     'error': 'Erro ao processar mensagem no n8n'
                 }, status=500)
 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.error(f"Timeout ao encaminhar para n8n: empresa={empresa.nome}")
             return JsonResponse({
                 'success': False,
                 'error': 'Timeout ao processar mensagem'
             }, status=504)
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Erro de conexão com n8n: {str(e)}")
             return JsonResponse({
                 'success': False,
@@ -1814,7 +1816,7 @@ def horarios_funcionamento(request):
     """
     from datetime import time
 
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     DIAS_SEMANA = [
         (0, 'Segunda-feira'),
@@ -1889,7 +1891,7 @@ def horarios_funcionamento(request):
 @login_required
 def datas_especiais_lista(request):
     """Lista datas especiais (feriados e horários diferenciados)"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     datas = DataEspecial.objects.filter(empresa=empresa).order_by('data')
 
     context = {
@@ -1903,7 +1905,7 @@ def datas_especiais_lista(request):
 @login_required
 def data_especial_criar(request):
     """Cria nova data especial"""
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if request.method == 'POST':
         data = request.POST.get('data')
@@ -1934,7 +1936,7 @@ def data_especial_criar(request):
 @login_required
 def data_especial_editar(request, pk):
     """Edita data especial"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     data_especial = get_object_or_404(DataEspecial, pk=pk, empresa=empresa)
 
     if request.method == 'POST':
@@ -1965,7 +1967,7 @@ def data_especial_editar(request, pk):
 @login_required
 def data_especial_deletar(request, pk):
     """Deleta data especial"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     data_especial = get_object_or_404(DataEspecial, pk=pk, empresa=empresa)
 
     if request.method == 'POST':
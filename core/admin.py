@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Usuario
+from .models import EmailPendente, Exportacao, Usuario
 
 @admin.register(Usuario)
 class UsuarioAdmin(BaseUserAdmin):
@@ -18,7 +18,7 @@ class UsuarioAdmin(BaseUserAdmin):
             'fields': ('first_name', 'last_name', 'telefone')
         }),
         ('EMPRESA (OBRIGATÓRIO)', {
-            'fields': ('empresa',),
+            'fields': ('empresa', 'acessa_unidades'),
             'description': '⚠️ TODO USUÁRIO DEVE ESTAR VINCULADO A UMA EMPRESA. Este campo é obrigatório.'
         }),
         ('Permissões', {
@@ -53,3 +53,31 @@ class UsuarioAdmin(BaseUserAdmin):
     )
 
     readonly_fields = ('criado_em', 'atualizado_em', 'last_login', 'date_joined')
+
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ('assunto', 'destinatarios', 'status', 'tentativas', 'proxima_tentativa', 'enviado_em')
+    list_filter = ('status',)
+    search_fields = ('assunto', 'chave')
+    ordering = ('-criado_em',)
+    readonly_fields = ('criado_em', 'enviado_em', 'lote', 'erro', 'tentativas')
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar (volta para a fila)')
+    def reenviar(self, request, queryset):
+        from django.utils import timezone
+
+        total = queryset.exclude(status='enviado').update(
+            status='pendente', tentativas=0, proxima_tentativa=timezone.now(), lote=''
+        )
+        self.message_user(request, f'{total} email(s) devolvido(s) para a fila.')
+
+
+@admin.register(Exportacao)
+class ExportacaoAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'tipo', 'formato', 'status', 'linhas', 'usuario', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'tipo', 'formato')
+    search_fields = ('empresa__nome', 'usuario__email')
+    ordering = ('-criado_em',)
+    readonly_fields = ('criado_em', 'concluido_em', 'linhas', 'erro')
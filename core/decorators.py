@@ -35,12 +35,11 @@ def plano_required(feature_flag=None, feature_name=None, redirect_to='dashboard'
                 return redirect('login')
 
             # Verificar se tem empresa
-            if not hasattr(request.user, 'empresa') or not request.user.empresa:
+            empresa = getattr(request, 'empresa', None)
+            if not empresa:
                 messages.error(request, 'Você precisa estar vinculado a uma empresa.')
                 return redirect('dashboard')
 
-            empresa = request.user.empresa
-
             # Verificar se tem assinatura ativa
             assinatura = getattr(empresa, 'assinatura_ativa', None)
             if not assinatura:
@@ -0,0 +1,240 @@
+"""
+Fila de saída de emails (outbox)
+
+Antes, boas-vindas, empresa criada e aviso de trial eram enviados com
+send_mail dentro da view/signal: cada email abria uma conexão SMTP nova
+com o Brevo e renderizava o template na hora, e o cadastro esperava as
+idas e voltas do SMTP.
+
+Agora:
+- enfileirar_email renderiza o template (compilado uma vez por processo)
+  e grava um EmailPendente na transação de quem chamou: rollback não
+  deixa email de cadastro que não existiu
+- A task core.tasks.enviar_emails_pendentes (Beat, a cada minuto, e
+  disparada após o commit se EMAIL_OUTBOX_DISPARO_IMEDIATO) reserva um
+  lote, abre UMA conexão e envia todas as mensagens por ela
+- Falha: nova tentativa com backoff exponencial (EMAIL_OUTBOX_BACKOFF_BASE
+  segundos * 2^tentativas) até EMAIL_OUTBOX_MAX_TENTATIVAS; depois fica
+  como "falhou" no admin
+- Reserva por lote (UPDATE ... WHERE status/proxima_tentativa): dois
+  workers nunca pegam o mesmo email; reserva de worker que morreu expira
+
+EMAIL_OUTBOX_BACKEND troca o backend só da fila. Para testes offline use
+'django.core.mail.backends.filebased.EmailBackend' (grava em EMAIL_FILE_PATH).
+"""
+import logging
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import EmailPendente, StatusEmail
+
+logger = logging.getLogger(__name__)
+
+# Tempo que um lote fica reservado para o worker que o pegou
+RESERVA_LOTE = timedelta(minutes=10)
+
+
+def _config(nome, padrao):
+    return getattr(settings, f'EMAIL_OUTBOX_{nome}', padrao)
+
+
+@lru_cache(maxsize=64)
+def _template_compilado(nome):
+    return get_template(nome)
+
+
+def renderizar_template(nome, contexto):
+    """Renderiza com o template compilado em cache (em DEBUG, sempre relido do disco)"""
+    template = get_template(nome) if settings.DEBUG else _template_compilado(nome)
+    return template.render(contexto)
+
+
+def montar_email(destinatarios, assunto, template=None, contexto=None, html=None,
+                 texto=None, remetente=None, chave=None):
+    """EmailPendente renderizado e ainda não gravado (ver enfileirar_email)"""
+    if isinstance(destinatarios, str):
+        destinatarios = [destinatarios]
+    if template:
+        html = renderizar_template(template, contexto or {})
+    if texto is None:
+        texto = strip_tags(html or '')
+
+    return EmailPendente(
+        destinatarios=list(destinatarios),
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL,
+        assunto=assunto,
+        corpo_texto=texto,
+        corpo_html=html or '',
+        chave=chave,
+        proxima_tentativa=timezone.now(),
+    )
+
+
+def enfileirar_email(destinatarios, assunto, template=None, contexto=None, html=None,
+                     texto=None, remetente=None, chave=None):
+    """
+    Grava o email na fila (na transação atual) já renderizado.
+
+    Args:
+        destinatarios: email ou lista de emails
+        template/contexto: template HTML (o texto puro é derivado dele)
+        html/texto: corpo pronto, quando não há template
+        chave: identificador único; se já existe na fila nada é gravado
+
+    Returns:
+        EmailPendente ou None (chave repetida)
+    """
+    email = montar_email(destinatarios, assunto, template, contexto, html, texto, remetente, chave)
+    try:
+        with transaction.atomic():
+            email.save()
+    except IntegrityError:
+        if chave is None:
+            raise
+        logger.info(f"[Email] Já enfileirado: {chave}")
+        return None
+
+    _agendar_disparo()
+    return email
+
+
+def enfileirar_lote(emails, tamanho_lote=500):
+    """
+    Grava vários emails (de montar_email) com bulk_create; chaves já
+    existentes são ignoradas. Retorna quantos foram passados.
+    """
+    emails = list(emails)
+    if emails:
+        EmailPendente.objects.bulk_create(emails, batch_size=tamanho_lote, ignore_conflicts=True)
+        _agendar_disparo()
+    return len(emails)
+
+
+def _agendar_disparo():
+    if _config('DISPARO_IMEDIATO', False):
+        transaction.on_commit(_disparar_envio)
+
+
+def _disparar_envio():
+    from .tasks import enviar_emails_pendentes
+
+    try:
+        enviar_emails_pendentes.delay()
+    except Exception as e:
+        # Sem broker o Beat envia no próximo minuto
+        logger.warning(f"[Email] Não foi possível disparar a fila agora: {e}")
+
+
+def _reservar_lote(tamanho_lote):
+    """Reserva até tamanho_lote emails vencidos; retorna a lista reservada"""
+    agora = timezone.now()
+    vencidos = EmailPendente.objects.filter(
+        status__in=[StatusEmail.PENDENTE, StatusEmail.ENVIANDO],
+        proxima_tentativa__lte=agora,
+    )
+    ids = list(vencidos.order_by('proxima_tentativa').values_list('id', flat=True)[:tamanho_lote])
+    if not ids:
+        return []
+
+    lote = uuid.uuid4().hex
+    # O WHERE repetido garante que outro worker não reservou no meio tempo
+    vencidos.filter(id__in=ids).update(
+        status=StatusEmail.ENVIANDO, lote=lote, proxima_tentativa=agora + RESERVA_LOTE
+    )
+    return list(EmailPendente.objects.filter(lote=lote))
+
+
+def _mensagem(email, conexao):
+    mensagem = EmailMultiAlternatives(
+        subject=email.assunto,
+        body=email.corpo_texto,
+        from_email=email.remetente,
+        to=email.destinatarios,
+        connection=conexao,
+    )
+    if email.corpo_html:
+        mensagem.attach_alternative(email.corpo_html, 'text/html')
+    return mensagem
+
+
+def _registrar_falha(email, erro):
+    email.tentativas += 1
+    email.erro = str(erro)[:2000]
+    if email.tentativas >= _config('MAX_TENTATIVAS', 5):
+        email.status = StatusEmail.FALHOU
+        logger.error(f"[Email] Desistindo de #{email.pk} após {email.tentativas} tentativas: {erro}")
+    else:
+        email.status = StatusEmail.PENDENTE
+        espera = _config('BACKOFF_BASE', 60) * 2 ** (email.tentativas - 1)
+        email.proxima_tentativa = timezone.now() + timedelta(seconds=espera)
+        logger.warning(f"[Email] Falha ao enviar #{email.pk} (tentativa {email.tentativas}): {erro}")
+    email.save(update_fields=['tentativas', 'erro', 'status', 'proxima_tentativa'])
+
+
+def processar_fila(tamanho_lote=None, max_lotes=None):
+    """
+    Envia os emails vencidos, lote a lote, com uma conexão por lote.
+
+    Returns:
+        dict: {'enviados', 'falhas', 'lotes'}
+    """
+    tamanho_lote = tamanho_lote or _config('TAMANHO_LOTE', 50)
+    max_lotes = max_lotes or _config('MAX_LOTES', 20)
+    resumo = {'enviados': 0, 'falhas': 0, 'lotes': 0}
+
+    while resumo['lotes'] < max_lotes:
+        emails = _reservar_lote(tamanho_lote)
+        if not emails:
+            break
+        resumo['lotes'] += 1
+
+        enviados, falhos = [], []
+        try:
+            conexao = get_connection(backend=_config('BACKEND', '') or None, fail_silently=False)
+            with conexao:
+                for email in emails:
+                    try:
+                        # Conexão já aberta: send_messages não abre/fecha a cada email
+                        conexao.send_messages([_mensagem(email, conexao)])
+                        enviados.append(email.pk)
+                    except Exception as e:
+                        _registrar_falha(email, e)
+                        falhos.append(email.pk)
+        except Exception as e:
+            # Falha ao abrir a conexão: o que não foi tentado volta para a fila
+            for email in emails:
+                if email.pk not in enviados and email.pk not in falhos:
+                    _registrar_falha(email, e)
+                    falhos.append(email.pk)
+        resumo['falhas'] += len(falhos)
+
+        if enviados:
+            EmailPendente.objects.filter(pk__in=enviados).update(
+                status=StatusEmail.ENVIADO, enviado_em=timezone.now(), lote='', erro=''
+            )
+            resumo['enviados'] += len(enviados)
+
+        if len(emails) < tamanho_lote:
+            break
+
+    if resumo['lotes']:
+        logger.info(f"[Email] Fila: {resumo['enviados']} enviados, {resumo['falhas']} falhas")
+    return resumo
+
+
+def limpar_enviados(dias=None):
+    """Apaga emails enviados há mais de EMAIL_OUTBOX_RETENCAO_DIAS; retorna quantos"""
+    dias = dias if dias is not None else _config('RETENCAO_DIAS', 30)
+    apagados, _ = EmailPendente.objects.filter(
+        status=StatusEmail.ENVIADO,
+        enviado_em__lt=timezone.now() - timedelta(days=dias),
+    ).delete()
+    return apagados
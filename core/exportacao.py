@@ -0,0 +1,433 @@
+"""
+Exportação de dados da empresa (CSV e XLSX) com memória constante
+
+Pedido de clientes para o contador: agendamentos, clientes e lançamentos
+financeiros. Liberado pelo recurso Plano.permite_integracao_contabil.
+
+Fluxo:
+1. Colunas escolhidas pelo usuário entre as do registro EXPORTACOES
+   (campo -> lookup do values_list, com chaves estrangeiras via __)
+2. Leitura com values_list().iterator(chunk_size=EXPORTACAO_CHUNK): sem
+   instâncias de model e, no PostgreSQL, com cursor no servidor; a memória
+   não cresce com o número de linhas
+3. Até EXPORTACAO_LIMITE_SINCRONO linhas a resposta sai na hora:
+   - CSV: StreamingHttpResponse, gerado em blocos enquanto é enviado
+   - XLSX: openpyxl em modo write-only (linhas vão direto para o disco)
+     num arquivo temporário, enviado com FileResponse
+4. Acima disso vira uma Exportacao: a task core.tasks.exportar_dados_task
+   grava o arquivo no MEDIA_ROOT e avisa o usuário por email
+
+CSV no padrão do Excel em português: separador ';', vírgula decimal e
+BOM UTF-8. No XLSX números e datas saem com o tipo nativo. Textos
+digitados pelos clientes que começam como fórmula (=, +, -, @, tab, CR)
+saem com apóstrofo na frente, nos dois formatos, para a planilha não
+executá-los (CSV/formula injection).
+"""
+
+import csv
+import logging
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import models
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ErroExportacao(ValueError):
+    """Pedido de exportação inválido (tipo, formato, colunas ou período)."""
+
+
+# ============================================
+# REGISTRO DE EXPORTAÇÕES
+# ============================================
+# colunas: chave -> (rótulo do cabeçalho, lookup do values_list)
+# padrao: colunas marcadas quando o usuário não escolhe
+# campo_data: campo filtrado pelo período (inicio/fim)
+
+EXPORTACOES = {
+    'agendamentos': {
+        'modelo': 'agendamentos.Agendamento',
+        'titulo': 'Agendamentos',
+        'colunas': {
+            'data_hora_inicio': ('Início', 'data_hora_inicio'),
+            'data_hora_fim': ('Término', 'data_hora_fim'),
+            'cliente': ('Cliente', 'cliente__nome'),
+            'cliente_telefone': ('Telefone do cliente', 'cliente__telefone'),
+            'cliente_cpf': ('CPF do cliente', 'cliente__cpf'),
+            'servico': ('Serviço', 'servico__nome'),
+            'profissional': ('Profissional', 'profissional__nome'),
+            'status': ('Status', 'status'),
+            'valor_cobrado': ('Valor cobrado', 'valor_cobrado'),
+            'origem': ('Origem', 'origem'),
+            'notas': ('Notas', 'notas'),
+            'criado_em': ('Criado em', 'criado_em'),
+        },
+        'padrao': ['data_hora_inicio', 'cliente', 'servico', 'profissional', 'status', 'valor_cobrado'],
+        'campo_data': 'data_hora_inicio',
+        'ordem': ['data_hora_inicio', 'id'],
+    },
+    'clientes': {
+        'modelo': 'clientes.Cliente',
+        'titulo': 'Clientes',
+        'colunas': {
+            'nome': ('Nome', 'nome'),
+            'telefone': ('Telefone', 'telefone'),
+            'email': ('Email', 'email'),
+            'cpf': ('CPF', 'cpf'),
+            'data_nascimento': ('Data de nascimento', 'data_nascimento'),
+            'endereco': ('Endereço', 'endereco'),
+            'cidade': ('Cidade', 'cidade'),
+            'estado': ('UF', 'estado'),
+            'cep': ('CEP', 'cep'),
+            'origem': ('Origem', 'origem'),
+            'ativo': ('Ativo', 'ativo'),
+            'notas': ('Notas', 'notas'),
+            'criado_em': ('Cadastrado em', 'criado_em'),
+        },
+        'padrao': ['nome', 'telefone', 'email', 'cpf', 'cidade', 'estado'],
+        'campo_data': 'criado_em',
+        'ordem': ['nome', 'id'],
+    },
+    'lancamentos': {
+        'modelo': 'financeiro.LancamentoFinanceiro',
+        'titulo': 'Lançamentos',
+        'colunas': {
+            'data_vencimento': ('Vencimento', 'data_vencimento'),
+            'data_pagamento': ('Pagamento', 'data_pagamento'),
+            'tipo': ('Tipo', 'tipo'),
+            'categoria': ('Categoria', 'categoria__nome'),
+            'descricao': ('Descrição', 'descricao'),
+            'valor': ('Valor', 'valor'),
+            'status': ('Status', 'status'),
+            'forma_pagamento': ('Forma de pagamento', 'forma_pagamento__nome'),
+            'cliente': ('Cliente', 'agendamento__cliente__nome'),
+            'observacoes': ('Observações', 'observacoes'),
+        },
+        'padrao': ['data_vencimento', 'data_pagamento', 'tipo', 'categoria', 'descricao', 'valor', 'status', 'forma_pagamento'],
+        'campo_data': 'data_vencimento',
+        'ordem': ['data_vencimento', 'id'],
+    },
+}
+
+FORMATOS = ('csv', 'xlsx')
+
+TIPOS_CONTEUDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Linhas por bloco do CSV enviado em streaming
+LINHAS_POR_BLOCO = 500
+
+
+def _config(nome, padrao):
+    return getattr(settings, f'EXPORTACAO_{nome}', padrao)
+
+
+def limite_sincrono():
+    return _config('LIMITE_SINCRONO', 20000)
+
+
+# ============================================
+# PEDIDO
+# ============================================
+
+def validar_pedido(tipo, formato, colunas=None, inicio=None, fim=None):
+    """
+    Confere o pedido e devolve (colunas, filtros) normalizados: colunas na
+    ordem do registro (vazio = padrão) e datas em ISO.
+    """
+    config = EXPORTACOES.get(tipo)
+    if config is None:
+        raise ErroExportacao(f'Exportação desconhecida: {tipo}')
+    if formato not in FORMATOS:
+        raise ErroExportacao(f'Formato inválido: {formato}')
+
+    pedidas = set(colunas or [])
+    desconhecidas = pedidas - set(config['colunas'])
+    if desconhecidas:
+        raise ErroExportacao(f"Colunas inválidas: {', '.join(sorted(desconhecidas))}")
+    colunas = [chave for chave in config['colunas'] if chave in pedidas] or list(config['padrao'])
+
+    filtros = {}
+    for nome, valor in (('inicio', inicio), ('fim', fim)):
+        if not valor:
+            continue
+        if isinstance(valor, str):
+            try:
+                valor = date.fromisoformat(valor)
+            except ValueError:
+                raise ErroExportacao(f'Data inválida: {valor}')
+        filtros[nome] = valor.isoformat()
+    if filtros.get('inicio') and filtros.get('fim') and filtros['inicio'] > filtros['fim']:
+        raise ErroExportacao('A data inicial é posterior à final')
+    return colunas, filtros
+
+
+def _campo(modelo, lookup):
+    """Field do model no fim do lookup ('cliente__nome' -> Cliente.nome)"""
+    *relacoes, nome = lookup.split('__')
+    for relacao in relacoes:
+        modelo = modelo._meta.get_field(relacao).related_model
+    return modelo._meta.get_field(nome)
+
+
+def consulta(empresa, tipo, colunas, filtros=None):
+    """values_list das colunas pedidas, só da empresa, na ordem do registro"""
+    config = EXPORTACOES[tipo]
+    modelo = apps.get_model(config['modelo'])
+    filtros = filtros or {}
+
+    queryset = modelo.objects.filter(empresa=empresa)
+    campo_data = config['campo_data']
+    datetime_campo = isinstance(modelo._meta.get_field(campo_data), models.DateTimeField)
+    if filtros.get('inicio'):
+        inicio = date.fromisoformat(filtros['inicio'])
+        if datetime_campo:
+            # Limites no fuso local, sem __date (que impediria o índice)
+            inicio = timezone.make_aware(datetime.combine(inicio, time.min))
+        queryset = queryset.filter(**{f'{campo_data}__gte': inicio})
+    if filtros.get('fim'):
+        fim = date.fromisoformat(filtros['fim'])
+        if datetime_campo:
+            queryset = queryset.filter(**{
+                f'{campo_data}__lt': timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min))
+            })
+        else:
+            queryset = queryset.filter(**{f'{campo_data}__lte': fim})
+
+    lookups = [config['colunas'][chave][1] for chave in colunas]
+    return queryset.order_by(*config['ordem']).values_list(*lookups)
+
+
+def cabecalho(tipo, colunas):
+    return [EXPORTACOES[tipo]['colunas'][chave][0] for chave in colunas]
+
+
+# ============================================
+# FORMATAÇÃO DOS VALORES
+# ============================================
+
+def _formatadores(tipo, colunas, formato):
+    """Uma função por coluna: choices viram o rótulo, datas no fuso local"""
+    config = EXPORTACOES[tipo]
+    modelo = apps.get_model(config['modelo'])
+    formatar_valor = _valor_csv if formato == 'csv' else _valor_xlsx
+
+    funcoes = []
+    for chave in colunas:
+        campo = _campo(modelo, config['colunas'][chave][1])
+        rotulos = {str(valor): str(rotulo) for valor, rotulo in campo.flatchoices} if campo.choices else None
+        if rotulos:
+            funcoes.append(lambda valor, rotulos=rotulos: rotulos.get(valor, valor) if valor is not None else '')
+        else:
+            funcoes.append(formatar_valor)
+    return funcoes
+
+
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_seguro(valor):
+    """Texto que o Excel leria como fórmula ganha um apóstrofo na frente"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, Decimal):
+        return str(valor).replace('.', ',')
+    return _texto_seguro(valor)
+
+
+def _valor_xlsx(valor):
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, datetime):
+        # openpyxl não aceita datetime com fuso
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return _texto_seguro(valor)
+
+
+def linhas(empresa, tipo, colunas, formato, filtros=None, chunk_size=None):
+    """Gera as linhas formatadas, lendo o banco em blocos"""
+    funcoes = _formatadores(tipo, colunas, formato)
+    registros = consulta(empresa, tipo, colunas, filtros).iterator(chunk_size=chunk_size or _config('CHUNK', 2000))
+    for registro in registros:
+        yield [formatar(valor) for formatar, valor in zip(funcoes, registro)]
+
+
+# ============================================
+# ESCRITA
+# ============================================
+
+class _Eco:
+    """Pseudo-arquivo: csv.writer devolve a linha em vez de gravar"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(empresa, tipo, colunas, filtros=None):
+    """Gera o CSV em blocos de texto (para StreamingHttpResponse)"""
+    escritor = csv.writer(_Eco(), delimiter=';')
+    bloco = ['\ufeff' + escritor.writerow(cabecalho(tipo, colunas))]
+    for linha in linhas(empresa, tipo, colunas, 'csv', filtros):
+        bloco.append(escritor.writerow(linha))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def escrever_csv(destino, empresa, tipo, colunas, filtros=None):
+    """Grava o CSV no arquivo texto aberto; retorna o número de linhas"""
+    escritor = csv.writer(destino, delimiter=';')
+    destino.write('\ufeff')
+    escritor.writerow(cabecalho(tipo, colunas))
+    total = 0
+    for linha in linhas(empresa, tipo, colunas, 'csv', filtros):
+        escritor.writerow(linha)
+        total += 1
+    return total
+
+
+def escrever_xlsx(destino, empresa, tipo, colunas, filtros=None):
+    """Grava o XLSX (modo write-only) no caminho ou arquivo binário; retorna o número de linhas"""
+    from openpyxl import Workbook
+
+    planilha = Workbook(write_only=True)
+    folha = planilha.create_sheet(EXPORTACOES[tipo]['titulo'])
+    folha.append(cabecalho(tipo, colunas))
+    total = 0
+    for linha in linhas(empresa, tipo, colunas, 'xlsx', filtros):
+        folha.append(linha)
+        total += 1
+    planilha.save(destino)
+    return total
+
+
+def arquivo_temporario(empresa, tipo, formato, colunas, filtros=None):
+    """
+    Gera a exportação num arquivo temporário.
+
+    Returns:
+        tuple: (caminho, linhas); quem chama remove o arquivo
+    """
+    descritor, caminho = tempfile.mkstemp(suffix=f'.{formato}', prefix='exportacao-')
+    try:
+        if formato == 'csv':
+            with os.fdopen(descritor, 'w', newline='', encoding='utf-8') as destino:
+                total = escrever_csv(destino, empresa, tipo, colunas, filtros)
+        else:
+            os.close(descritor)
+            total = escrever_xlsx(caminho, empresa, tipo, colunas, filtros)
+    except Exception:
+        os.remove(caminho)
+        raise
+    return caminho, total
+
+
+def nome_arquivo(empresa, tipo, formato):
+    return f"{tipo}-{empresa.slug}-{timezone.localdate():%Y%m%d}.{formato}"
+
+
+# ============================================
+# JOB EM SEGUNDO PLANO
+# ============================================
+
+def executar(exportacao):
+    """
+    Gera o arquivo de uma Exportacao, grava no storage (MEDIA_ROOT) e
+    avisa o usuário por email. Falha fica registrada na exportação.
+    """
+    from .models import StatusExportacao
+
+    exportacao.status = StatusExportacao.PROCESSANDO
+    exportacao.save(update_fields=['status'])
+
+    caminho = None
+    try:
+        caminho, total = arquivo_temporario(
+            exportacao.empresa, exportacao.tipo, exportacao.formato, exportacao.colunas, exportacao.filtros
+        )
+        with open(caminho, 'rb') as arquivo:
+            exportacao.arquivo.save(
+                nome_arquivo(exportacao.empresa, exportacao.tipo, exportacao.formato), File(arquivo), save=False
+            )
+        exportacao.linhas = total
+        exportacao.status = StatusExportacao.CONCLUIDA
+        exportacao.erro = ''
+    except Exception as e:
+        logger.error(f"[Exportação] {exportacao.pk} falhou: {e}")
+        exportacao.status = StatusExportacao.FALHOU
+        exportacao.erro = str(e)
+    finally:
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
+
+    exportacao.concluido_em = timezone.now()
+    exportacao.save(update_fields=['status', 'arquivo', 'linhas', 'erro', 'concluido_em'])
+    _avisar(exportacao)
+    return exportacao
+
+
+def _avisar(exportacao):
+    from django.urls import reverse
+
+    from .email_outbox import enfileirar_email
+    from .models import StatusExportacao
+
+    usuario = exportacao.usuario
+    if not usuario or not usuario.email:
+        return
+    concluida = exportacao.status == StatusExportacao.CONCLUIDA
+    titulo = EXPORTACOES[exportacao.tipo]['titulo']
+    try:
+        enfileirar_email(
+            [usuario.email],
+            f'Exportação de {titulo.lower()} pronta' if concluida else f'Falha na exportação de {titulo.lower()}',
+            template='emails/exportacao_pronta.html',
+            contexto={
+                'usuario': usuario,
+                'exportacao': exportacao,
+                'titulo': titulo,
+                'concluida': concluida,
+                'link': f"{settings.SITE_URL}{reverse('exportacoes')}",
+                'retencao_dias': _config('RETENCAO_DIAS', 7),
+            },
+            chave=f'exportacao:{exportacao.pk}',
+        )
+    except Exception as e:
+        logger.error(f"[Exportação] Erro ao enfileirar aviso da exportação {exportacao.pk}: {e}")
+
+
+def limpar_antigas(dias=None):
+    """Apaga arquivos e registros de exportações com mais de EXPORTACAO_RETENCAO_DIAS"""
+    from .models import Exportacao
+
+    limite = timezone.now() - timedelta(days=dias or _config('RETENCAO_DIAS', 7))
+    apagadas = 0
+    for exportacao in Exportacao.objects.filter(criado_em__lt=limite).iterator():
+        if exportacao.arquivo:
+            exportacao.arquivo.delete(save=False)
+        exportacao.delete()
+        apagadas += 1
+    return apagadas
@@ -0,0 +1,10 @@
+"""
+URLs da exportação de dados (CSV/XLSX)
+"""
+from django.urls import path
+from . import exportacao_views
+
+urlpatterns = [
+    path('exportar/', exportacao_views.exportacoes, name='exportacoes'),
+    path('exportar/<int:pk>/baixar/', exportacao_views.exportacao_baixar, name='exportacao_baixar'),
+]
@@ -0,0 +1,134 @@
+"""
+Views da exportação de dados (core/exportacao.py)
+
+Liberadas pelo recurso Plano.permite_integracao_contabil.
+"""
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+
+from .decorators import plano_required
+from .exportacao import (
+    EXPORTACOES, FORMATOS, TIPOS_CONTEUDO, ErroExportacao, arquivo_temporario, consulta, executar, gerar_csv,
+    limite_sincrono, nome_arquivo, validar_pedido,
+)
+from .models import Exportacao, StatusExportacao
+from .tasks import exportar_dados_task
+
+TAMANHO_BLOCO_ARQUIVO = 64 * 1024
+
+
+def _blocos(arquivo):
+    """Lê o arquivo aberto em blocos e fecha no fim"""
+    with arquivo:
+        while bloco := arquivo.read(TAMANHO_BLOCO_ARQUIVO):
+            yield bloco
+
+
+def _assincrono(gerador):
+    """
+    Sob ASGI o Django consumiria um iterador síncrono inteiro (list) antes
+    de enviar: entrega um bloco por vez, na thread das queries.
+    """
+    proximo = sync_to_async(next)
+
+    async def iterar():
+        while (bloco := await proximo(gerador, None)) is not None:
+            yield bloco
+
+    return iterar()
+
+
+def _resposta(gerador, formato, nome):
+    if getattr(settings, 'SERVIDOR_ASGI', False):
+        gerador = _assincrono(gerador)
+    resposta = StreamingHttpResponse(gerador, content_type=TIPOS_CONTEUDO[formato])
+    resposta['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return resposta
+
+
+@login_required
+@plano_required(feature_flag='permite_integracao_contabil', feature_name='Exportação Contábil')
+def exportacoes(request):
+    """
+    GET: formulário (tipo, colunas, período, formato) e exportações recentes.
+    POST: até EXPORTACAO_LIMITE_SINCRONO linhas baixa na hora; acima disso
+    cria a Exportacao e gera em segundo plano.
+    """
+    empresa = request.empresa
+
+    if request.method == 'POST':
+        tipo = request.POST.get('tipo', '')
+        formato = request.POST.get('formato', 'csv')
+        try:
+            colunas, filtros = validar_pedido(
+                tipo, formato,
+                colunas=request.POST.getlist(f'colunas_{tipo}'),
+                inicio=request.POST.get('inicio'),
+                fim=request.POST.get('fim'),
+            )
+        except ErroExportacao as e:
+            messages.error(request, str(e))
+            return redirect('exportacoes')
+
+        if consulta(empresa, tipo, colunas, filtros).count() <= limite_sincrono():
+            nome = nome_arquivo(empresa, tipo, formato)
+            if formato == 'csv':
+                return _resposta(gerar_csv(empresa, tipo, colunas, filtros), formato, nome)
+            caminho, _ = arquivo_temporario(empresa, tipo, formato, colunas, filtros)
+            arquivo = open(caminho, 'rb')
+            os.remove(caminho)  # Some do disco; o descritor aberto continua legível
+            return _resposta(_blocos(arquivo), formato, nome)
+
+        exportacao = Exportacao.objects.create(
+            empresa=empresa, usuario=request.user, tipo=tipo, formato=formato, colunas=colunas, filtros=filtros
+        )
+        try:
+            exportar_dados_task.delay(exportacao.pk)
+            messages.info(
+                request,
+                f"Exportação grande: o arquivo está sendo gerado e você receberá um email em {request.user.email} quando estiver pronto."
+            )
+        except Exception:
+            # Sem broker: gera aqui mesmo
+            executar(exportacao)
+            messages.success(request, "Exportação gerada. Baixe o arquivo na lista abaixo.")
+        return redirect('exportacoes')
+
+    tipos = [
+        {
+            'chave': chave,
+            'titulo': config['titulo'],
+            'colunas': [
+                {'chave': coluna, 'rotulo': rotulo, 'padrao': coluna in config['padrao']}
+                for coluna, (rotulo, _) in config['colunas'].items()
+            ],
+        }
+        for chave, config in EXPORTACOES.items()
+    ]
+    context = {
+        'empresa': empresa,
+        'tipos': tipos,
+        'formatos': FORMATOS,
+        'recentes': Exportacao.objects.filter(empresa=empresa)[:10],
+        'limite_sincrono': limite_sincrono(),
+        'retencao_dias': getattr(settings, 'EXPORTACAO_RETENCAO_DIAS', 7),
+    }
+    return render(request, 'core/exportacoes.html', context)
+
+
+@login_required
+@plano_required(feature_flag='permite_integracao_contabil', feature_name='Exportação Contábil')
+def exportacao_baixar(request, pk):
+    """Download de uma exportação concluída (só da empresa do usuário)"""
+    exportacao = get_object_or_404(Exportacao, pk=pk, empresa=request.empresa)
+    if exportacao.status != StatusExportacao.CONCLUIDA or not exportacao.arquivo:
+        raise Http404
+    return _resposta(
+        _blocos(exportacao.arquivo.open('rb')), exportacao.formato, os.path.basename(exportacao.arquivo.name)
+    )
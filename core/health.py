@@ -51,6 +51,20 @@ def health_check(request):
         health_status['checks']['redis'] = f'error: {str(e)}'
         is_healthy = False
 
+    # Métricas da última varredura de status do WhatsApp (informativo)
+    try:
+        from empresas.status_whatsapp import metricas_varredura
+
+        varredura = metricas_varredura()
+        if varredura:
+            health_status['whatsapp'] = {
+                campo: varredura.get(campo)
+                for campo in ('executada_em', 'sucesso', 'duracao_ms', 'configuracoes',
+                              'divergencias', 'transicoes', 'removidas', 'remocoes_bloqueadas')
+            }
+    except Exception:
+        pass
+
     if not is_healthy:
         health_status['status'] = 'unhealthy'
         return JsonResponse(health_status, status=503)
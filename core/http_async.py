@@ -0,0 +1,49 @@
+"""
+Cliente HTTP assíncrono para chamadas de saída (n8n, Evolution API)
+
+Usado pelas views async dos webhooks. Servindo por ASGI (uvicorn,
+SERVIDOR_ASGI=True) o event loop vive o processo inteiro, então um único
+httpx.AsyncClient por loop reaproveita as conexões (keep-alive) com o
+n8n. Sob WSGI o Django roda cada view async num loop descartável: aí o
+cliente é aberto e fechado a cada chamada.
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+from django.conf import settings
+
+# Limites do pool compartilhado (por processo/loop)
+LIMITES_CONEXAO = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+_clientes = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def cliente_http():
+    """AsyncClient do loop atual (compartilhado sob ASGI)."""
+    if not getattr(settings, 'SERVIDOR_ASGI', False):
+        async with httpx.AsyncClient(limits=LIMITES_CONEXAO) as cliente:
+            yield cliente
+        return
+
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None or cliente.is_closed:
+        cliente = httpx.AsyncClient(limits=LIMITES_CONEXAO)
+        _clientes[loop] = cliente
+    yield cliente
+
+
+async def post_json(url, payload, timeout=10, headers=None):
+    """
+    POST JSON sem bloquear o worker.
+
+    Raises:
+        httpx.TimeoutException: timeout de conexão/leitura
+        httpx.HTTPError: demais falhas de rede
+    """
+    async with cliente_http() as cliente:
+        return await cliente.post(url, json=payload, headers=headers, timeout=timeout)
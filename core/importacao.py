@@ -0,0 +1,778 @@
+"""
+Importação de dados de clientes a partir de planilhas (.xlsx) ou CSV
+
+Substitui os scripts em scripts/importar_planilhas*.py, que carregavam a
+planilha inteira com pandas, usavam a primeira empresa ativa como destino
+e faziam update_or_create linha a linha (migrar anos de clientes e
+agendamentos levava muito tempo e segurava locks nas tabelas).
+
+Fluxo por entidade:
+1. Leitura em streaming (openpyxl read_only / csv.DictReader)
+2. Normalização e validação em lotes; linhas inválidas vão para um
+   relatório CSV de erros (linha, erro, dados) e não param a importação
+3. Chaves estrangeiras resolvidas por dicionários pré-carregados
+   (telefone -> cliente, nome -> serviço/profissional)
+4. Upsert em lote com bulk_create(update_conflicts=True), uma transação
+   curta por lote
+5. Checkpoint gravado após cada lote: --retomar continua de onde parou
+
+Uso: python manage.py importar_dados <arquivo> --empresa <id|slug>
+(ou a task Celery core.tasks.importar_dados_task).
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+import unicodedata
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ErroLinha(ValueError):
+    """Linha inválida: vai para o relatório de erros."""
+
+
+class AbaNaoEncontrada(KeyError):
+    """A planilha não tem a aba da entidade."""
+
+
+# ============================================
+# NORMALIZAÇÃO DE VALORES
+# ============================================
+
+def normalizar_cabecalho(texto):
+    """'Duração (min)' -> 'duracao_min'"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', texto.lower()).strip('_')
+
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _texto(valor, obrigatorio=False, campo=''):
+    if _vazio(valor):
+        if obrigatorio:
+            raise ErroLinha(f'{campo} obrigatório')
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _telefone(valor):
+    digitos = re.sub(r'\D', '', _texto(valor, obrigatorio=True, campo='telefone'))
+    if len(digitos) < 8:
+        raise ErroLinha(f'telefone inválido: {valor}')
+    return digitos
+
+
+def _decimal(valor, campo):
+    if _vazio(valor):
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor)).quantize(Decimal('0.01'))
+    texto = re.sub(r'[^\d,.\-]', '', str(valor))
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ErroLinha(f'{campo} inválido: {valor}')
+
+
+def _inteiro(valor, campo):
+    if _vazio(valor):
+        return None
+    try:
+        return int(float(str(valor).replace(',', '.')))
+    except ValueError:
+        raise ErroLinha(f'{campo} inválido: {valor}')
+
+
+def _data(valor, campo):
+    if _vazio(valor):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ErroLinha(f'{campo} inválida: {valor}')
+
+
+def _hora(valor, campo):
+    if _vazio(valor) or str(valor).strip() in ('--', '-'):
+        return None
+    if isinstance(valor, datetime):
+        return valor.time().replace(microsecond=0)
+    if isinstance(valor, time):
+        return valor
+    texto = str(valor).strip().lower().replace('h', ':').rstrip(':')
+    for formato in ('%H:%M', '%H:%M:%S', '%H'):
+        try:
+            return datetime.strptime(texto, formato).time()
+        except ValueError:
+            continue
+    raise ErroLinha(f'{campo} inválida: {valor}')
+
+
+def _data_hora(valor, campo):
+    if _vazio(valor):
+        return None
+    if isinstance(valor, datetime):
+        resultado = valor
+    else:
+        texto = str(valor).strip()
+        resultado = None
+        for formato in ('%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+            try:
+                resultado = datetime.strptime(texto, formato)
+                break
+            except ValueError:
+                continue
+        if resultado is None:
+            raise ErroLinha(f'{campo} inválida: {valor}')
+    return timezone.make_aware(resultado) if timezone.is_naive(resultado) else resultado
+
+
+DIAS_SEMANA = {
+    'segunda': 0, 'segunda_feira': 0, 'seg': 0,
+    'terca': 1, 'terca_feira': 1, 'ter': 1,
+    'quarta': 2, 'quarta_feira': 2, 'qua': 2,
+    'quinta': 3, 'quinta_feira': 3, 'qui': 3,
+    'sexta': 4, 'sexta_feira': 4, 'sex': 4,
+    'sabado': 5, 'sab': 5,
+    'domingo': 6, 'dom': 6,
+}
+
+STATUS_AGENDAMENTO = {
+    'pendente': 'pendente',
+    'confirmado': 'confirmado',
+    'cancelado': 'cancelado',
+    'concluido': 'concluido',
+    'realizado': 'concluido',
+    'nao_compareceu': 'nao_compareceu',
+    'faltou': 'nao_compareceu',
+}
+
+
+def _dia_semana(valor):
+    if isinstance(valor, (int, float)) and 0 <= int(valor) <= 6:
+        return int(valor)
+    dia = DIAS_SEMANA.get(normalizar_cabecalho(valor))
+    if dia is None:
+        raise ErroLinha(f'dia da semana inválido: {valor}')
+    return dia
+
+
+def _chave_nome(valor):
+    return normalizar_cabecalho(valor)
+
+
+# ============================================
+# NORMALIZADORES POR ENTIDADE
+# Recebem (linha, importador) e devolvem os campos do model
+# ============================================
+
+def _normalizar_servico(linha, importador):
+    duracao = _inteiro(linha.get('duracao_minutos'), 'duração')
+    if not duracao or duracao < 1:
+        raise ErroLinha('duração obrigatória (minutos)')
+    preco = _decimal(linha.get('preco'), 'preço')
+    return {
+        'nome': _texto(linha.get('nome'), obrigatorio=True, campo='nome'),
+        'descricao': _texto(linha.get('descricao')),
+        'preco': preco if preco is not None else Decimal('0.00'),
+        'duracao_minutos': duracao,
+        'ativo': True,
+    }
+
+
+def _normalizar_profissional(linha, importador):
+    servicos = []
+    for nome in re.split(r'[;,]', _texto(linha.get('servicos'))):
+        if nome.strip():
+            servico_id = importador.servicos.get(_chave_nome(nome))
+            if servico_id is None:
+                raise ErroLinha(f'serviço não encontrado: {nome.strip()}')
+            servicos.append(servico_id)
+    dados = {
+        'nome': _texto(linha.get('nome'), obrigatorio=True, campo='nome'),
+        'telefone': _texto(linha.get('telefone')),
+        'ativo': True,
+        '_servicos': servicos,
+    }
+    if 'email' in linha:
+        dados['email'] = _texto(linha.get('email')) or None
+    return dados
+
+
+def _normalizar_horario(linha, importador):
+    abertura = _hora(linha.get('hora_abertura'), 'abertura')
+    fechamento = _hora(linha.get('hora_fechamento'), 'fechamento')
+    if not abertura or not fechamento:
+        raise ErroLinha('abertura e fechamento obrigatórios')
+    return {
+        'dia_semana': _dia_semana(linha.get('dia_semana')),
+        'hora_abertura': abertura,
+        'hora_fechamento': fechamento,
+        'intervalo_inicio': _hora(linha.get('intervalo_inicio'), 'início do intervalo'),
+        'intervalo_fim': _hora(linha.get('intervalo_fim'), 'fim do intervalo'),
+        'ativo': True,
+    }
+
+
+def _normalizar_data_especial(linha, importador):
+    data = _data(linha.get('data'), 'data')
+    if not data:
+        raise ErroLinha('data obrigatória')
+    abertura = _hora(linha.get('hora_abertura'), 'abertura')
+    fechamento = _hora(linha.get('hora_fechamento'), 'fechamento')
+    especial = bool(abertura and fechamento)
+    return {
+        'data': data,
+        'descricao': _texto(linha.get('descricao'), obrigatorio=True, campo='descrição')[:200],
+        'tipo': 'especial' if especial else 'feriado',
+        'hora_abertura': abertura if especial else None,
+        'hora_fechamento': fechamento if especial else None,
+    }
+
+
+def _normalizar_cliente(linha, importador):
+    dados = {
+        'nome': _texto(linha.get('nome'), obrigatorio=True, campo='nome'),
+        'telefone': _telefone(linha.get('telefone')),
+        'origem': 'importacao',
+        'ativo': True,
+    }
+    for campo in ('email', 'cpf', 'endereco', 'cidade', 'cep', 'notas'):
+        if campo in linha:
+            dados[campo] = _texto(linha.get(campo))
+    if 'estado' in linha:
+        dados['estado'] = _texto(linha.get('estado')).upper()[:2]
+    if 'data_nascimento' in linha:
+        dados['data_nascimento'] = _data(linha.get('data_nascimento'), 'data de nascimento')
+    return dados
+
+
+def _normalizar_agendamento(linha, importador):
+    telefone = _telefone(linha.get('cliente_telefone'))
+    cliente_id = importador.clientes.get(telefone)
+    if cliente_id is None:
+        raise ErroLinha(f'cliente não encontrado (telefone {telefone}) - importe os clientes antes')
+
+    servico_nome = _texto(linha.get('servico'), obrigatorio=True, campo='serviço')
+    servico = importador.servicos_dados.get(_chave_nome(servico_nome))
+    if servico is None:
+        raise ErroLinha(f'serviço não encontrado: {servico_nome}')
+
+    profissional_id = None
+    profissional_nome = _texto(linha.get('profissional'))
+    if profissional_nome:
+        profissional_id = importador.profissionais.get(_chave_nome(profissional_nome))
+        if profissional_id is None:
+            raise ErroLinha(f'profissional não encontrado: {profissional_nome}')
+
+    inicio = _data_hora(linha.get('data_hora_inicio'), 'data/hora')
+    if inicio is None:
+        data = _data(linha.get('data'), 'data')
+        hora = _hora(linha.get('hora'), 'hora')
+        if not data or not hora:
+            raise ErroLinha('data/hora do agendamento obrigatória')
+        inicio = timezone.make_aware(datetime.combine(data, hora))
+
+    fim = _data_hora(linha.get('data_hora_fim'), 'data/hora de término') or (
+        inicio + timedelta(minutes=servico['duracao_minutos'])
+    )
+
+    status_texto = normalizar_cabecalho(linha.get('status'))
+    if status_texto:
+        status = STATUS_AGENDAMENTO.get(status_texto)
+        if status is None:
+            raise ErroLinha(f'status inválido: {linha.get("status")}')
+    else:
+        status = 'concluido' if inicio < timezone.now() else 'pendente'
+
+    valor = _decimal(linha.get('valor_cobrado'), 'valor')
+    return {
+        'cliente_id': cliente_id,
+        'servico_id': servico['id'],
+        'profissional_id': profissional_id,
+        'data_hora_inicio': inicio,
+        'data_hora_fim': fim,
+        'status': status,
+        'valor_cobrado': valor if valor is not None else servico['preco'],
+        'notas': _texto(linha.get('notas')),
+        'origem': 'manual',
+    }
+
+
+# ============================================
+# REGISTRO DE ENTIDADES
+# ============================================
+# colunas: campo -> cabeçalhos aceitos (já normalizados)
+# chave: campos únicos junto com empresa (upsert por conflito)
+# modo: 'conflito' (bulk_create update_conflicts), 'nome' (sem unique no
+#       banco: casa pelo nome com dicionário pré-carregado) ou 'inserir'
+
+ENTIDADES = {
+    'servicos': {
+        'modelo': 'empresas.Servico',
+        'aba': 'Serviços',
+        'colunas': {
+            'nome': ['nome', 'servico'],
+            'descricao': ['descricao'],
+            'preco': ['preco', 'valor', 'preco_r'],
+            'duracao_minutos': ['duracao_minutos', 'duracao', 'duracao_min', 'tempo'],
+        },
+        'normalizar': _normalizar_servico,
+        'chave': ['nome'],
+        'modo': 'conflito',
+    },
+    'profissionais': {
+        'modelo': 'empresas.Profissional',
+        'aba': 'Profissionais',
+        'colunas': {
+            'nome': ['nome', 'profissional'],
+            'email': ['email', 'e_mail'],
+            'telefone': ['telefone', 'celular', 'whatsapp'],
+            'servicos': ['servicos'],
+        },
+        'normalizar': _normalizar_profissional,
+        'chave': ['nome'],
+        'modo': 'nome',
+    },
+    'horarios': {
+        'modelo': 'empresas.HorarioFuncionamento',
+        'aba': 'horarios',
+        'colunas': {
+            'dia_semana': ['dia_semana', 'dia'],
+            'hora_abertura': ['hora_abertura', 'abertura', 'manha', 'inicio'],
+            'intervalo_inicio': ['intervalo_inicio', 'fim_manha', 'inicio_intervalo'],
+            'intervalo_fim': ['intervalo_fim', 'tarde', 'tarde_noite', 'fim_intervalo'],
+            'hora_fechamento': ['hora_fechamento', 'fechamento', 'fim'],
+        },
+        'normalizar': _normalizar_horario,
+        'chave': ['dia_semana'],
+        'modo': 'conflito',
+    },
+    'datas_especiais': {
+        'modelo': 'empresas.DataEspecial',
+        'aba': 'datas_especiais',
+        'colunas': {
+            'descricao': ['descricao'],
+            'data': ['data'],
+            'hora_abertura': ['hora_abertura', 'abertura', 'manha'],
+            'hora_fechamento': ['hora_fechamento', 'fechamento', 'fim'],
+        },
+        'normalizar': _normalizar_data_especial,
+        'chave': ['data'],
+        'modo': 'conflito',
+    },
+    'clientes': {
+        'modelo': 'clientes.Cliente',
+        'aba': 'Clientes',
+        'colunas': {
+            'nome': ['nome', 'cliente', 'nome_completo'],
+            'telefone': ['telefone', 'celular', 'whatsapp', 'fone'],
+            'email': ['email', 'e_mail'],
+            'cpf': ['cpf'],
+            'data_nascimento': ['data_nascimento', 'nascimento', 'aniversario'],
+            'endereco': ['endereco'],
+            'cidade': ['cidade'],
+            'estado': ['estado', 'uf'],
+            'cep': ['cep'],
+            'notas': ['notas', 'observacoes', 'obs'],
+        },
+        'normalizar': _normalizar_cliente,
+        'chave': ['telefone'],
+        'modo': 'conflito',
+    },
+    'agendamentos': {
+        'modelo': 'agendamentos.Agendamento',
+        'aba': 'Agendamentos',
+        'colunas': {
+            'cliente_telefone': ['cliente_telefone', 'telefone', 'celular', 'whatsapp'],
+            'servico': ['servico'],
+            'profissional': ['profissional'],
+            'data_hora_inicio': ['data_hora_inicio', 'data_hora', 'inicio'],
+            'data_hora_fim': ['data_hora_fim', 'termino'],
+            'data': ['data'],
+            'hora': ['hora', 'horario'],
+            'status': ['status', 'situacao'],
+            'valor_cobrado': ['valor_cobrado', 'valor', 'preco'],
+            'notas': ['notas', 'observacoes', 'obs'],
+        },
+        'normalizar': _normalizar_agendamento,
+        'chave': ['cliente_id', 'data_hora_inicio'],
+        'modo': 'inserir',
+    },
+}
+
+# Ordem de 'todas': dependências (serviços -> profissionais, clientes -> agendamentos)
+ORDEM_ENTIDADES = ['servicos', 'profissionais', 'horarios', 'datas_especiais', 'clientes', 'agendamentos']
+
+
+# ============================================
+# LEITURA EM STREAMING
+# ============================================
+
+def ler_linhas(caminho, aba=None):
+    """
+    Gera (numero_linha, {cabecalho_normalizado: valor}) sem carregar o
+    arquivo inteiro na memória. numero_linha é a linha real da planilha
+    (cabeçalho = 1).
+    """
+    if caminho.lower().endswith('.csv'):
+        # CSV tem uma única "aba": o nome é ignorado
+        yield from _ler_csv(caminho)
+    else:
+        yield from _ler_xlsx(caminho, aba)
+
+
+def _ler_csv(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(arquivo, dialeto)
+        cabecalho = [normalizar_cabecalho(c) for c in next(leitor, [])]
+        for numero, valores in enumerate(leitor, start=2):
+            if any(not _vazio(v) for v in valores):
+                yield numero, dict(zip(cabecalho, valores))
+
+
+def _ler_xlsx(caminho, aba=None):
+    from openpyxl import load_workbook
+
+    planilha = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        if aba:
+            nomes = {normalizar_cabecalho(nome): nome for nome in planilha.sheetnames}
+            nome_aba = nomes.get(normalizar_cabecalho(aba))
+            if nome_aba is None:
+                raise AbaNaoEncontrada(f"Aba '{aba}' não encontrada (abas: {', '.join(planilha.sheetnames)})")
+            folha = planilha[nome_aba]
+        else:
+            folha = planilha.active
+
+        linhas = folha.iter_rows(values_only=True)
+        cabecalho = [normalizar_cabecalho(c) for c in next(linhas, ())]
+        for numero, valores in enumerate(linhas, start=2):
+            if any(not _vazio(v) for v in valores):
+                yield numero, dict(zip(cabecalho, valores))
+    finally:
+        planilha.close()
+
+
+# ============================================
+# IMPORTADOR
+# ============================================
+
+class Importador:
+    """
+    Importa uma ou mais entidades de um arquivo para UMA empresa.
+
+    - progresso: callable(entidade, resumo) chamado após cada lote
+    - checkpoint: caminho do JSON com a última linha gravada por entidade
+    - relatorio_erros: caminho do CSV com as linhas rejeitadas
+    """
+
+    def __init__(self, empresa, caminho, tamanho_lote=1000, checkpoint=None,
+                 relatorio_erros=None, progresso=None, dry_run=False):
+        self.empresa = empresa
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.caminho_checkpoint = checkpoint or f'{caminho}.checkpoint.json'
+        self.caminho_erros = relatorio_erros or f'{caminho}.erros.csv'
+        self.progresso = progresso
+        self.dry_run = dry_run
+
+        self._arquivo_erros = None
+        self._escritor_erros = None
+        self._dicionarios_carregados = False
+
+    # ---------- checkpoint ----------
+
+    def _ler_checkpoint(self):
+        try:
+            with open(self.caminho_checkpoint, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _gravar_checkpoint(self, entidade, linha, concluido=False):
+        if self.dry_run:
+            return
+        dados = self._ler_checkpoint()
+        dados[entidade] = {'linha': linha, 'concluido': concluido, 'empresa_id': self.empresa.id}
+        temporario = f'{self.caminho_checkpoint}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo)
+        os.replace(temporario, self.caminho_checkpoint)
+
+    # ---------- relatório de erros ----------
+
+    def _registrar_erro(self, entidade, numero, erro, linha):
+        if self._escritor_erros is None:
+            self._arquivo_erros = open(self.caminho_erros, 'w', newline='', encoding='utf-8')
+            self._escritor_erros = csv.writer(self._arquivo_erros)
+            self._escritor_erros.writerow(['entidade', 'linha', 'erro', 'dados'])
+        self._escritor_erros.writerow([
+            entidade, numero, erro, json.dumps(linha, default=str, ensure_ascii=False)
+        ])
+
+    def fechar(self):
+        if self._arquivo_erros:
+            self._arquivo_erros.close()
+            self._arquivo_erros = None
+            self._escritor_erros = None
+
+    # ---------- dicionários de chaves estrangeiras ----------
+
+    def carregar_dicionarios(self):
+        """Pré-carrega nome/telefone -> id da empresa (uma query por tabela)."""
+        from empresas.models import Servico, Profissional
+        from clientes.models import Cliente
+
+        self.servicos_dados = {
+            _chave_nome(s['nome']): s
+            for s in Servico.objects.filter(empresa=self.empresa).values('id', 'nome', 'preco', 'duracao_minutos')
+        }
+        self.servicos = {chave: s['id'] for chave, s in self.servicos_dados.items()}
+        self.profissionais = {
+            _chave_nome(nome): pk
+            for pk, nome in Profissional.objects.filter(empresa=self.empresa).values_list('id', 'nome')
+        }
+        self.clientes = dict(
+            Cliente.objects.filter(empresa=self.empresa).values_list('telefone', 'id')
+        )
+        self._dicionarios_carregados = True
+
+    # ---------- importação ----------
+
+    def importar(self, entidade, aba=None, retomar=False):
+        """
+        Importa uma entidade. Retorna o resumo:
+        {'entidade', 'lidas', 'importadas', 'erros', 'puladas'}
+        """
+        config = ENTIDADES[entidade]
+        resumo = {'entidade': entidade, 'lidas': 0, 'importadas': 0, 'erros': 0, 'puladas': 0}
+
+        ultima_linha = 0
+        if retomar:
+            anterior = self._ler_checkpoint().get(entidade, {})
+            if anterior.get('empresa_id') == self.empresa.id:
+                if anterior.get('concluido'):
+                    resumo['concluida_antes'] = True
+                    return resumo
+                ultima_linha = anterior.get('linha', 0)
+
+        # Dicionários recarregados a cada entidade: a anterior pode ter criado registros
+        self.carregar_dicionarios()
+        if config['modo'] == 'inserir':
+            self._existentes = self._carregar_existentes(config)
+
+        mapa = None
+        lote = []
+        numero = ultima_linha
+        for numero, linha in ler_linhas(self.caminho, aba or config['aba']):
+            if mapa is None:
+                mapa = self._mapear_colunas(config, linha)
+            if numero <= ultima_linha:
+                resumo['puladas'] += 1
+                continue
+
+            resumo['lidas'] += 1
+            dados_linha = {campo: linha.get(coluna) for campo, coluna in mapa.items()}
+            try:
+                lote.append((numero, config['normalizar'](dados_linha, self)))
+            except ErroLinha as e:
+                resumo['erros'] += 1
+                self._registrar_erro(entidade, numero, str(e), linha)
+
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_lote(entidade, config, lote, resumo, numero)
+                lote = []
+
+        if lote:
+            self._gravar_lote(entidade, config, lote, resumo, numero)
+        self._gravar_checkpoint(entidade, numero, concluido=True)
+        return resumo
+
+    def _mapear_colunas(self, config, linha):
+        """campo do importador -> cabeçalho presente no arquivo"""
+        mapa = {}
+        for campo, aceitos in config['colunas'].items():
+            for cabecalho in aceitos:
+                if cabecalho in linha:
+                    mapa[campo] = cabecalho
+                    break
+        return mapa
+
+    def _carregar_existentes(self, config):
+        modelo = apps.get_model(config['modelo'])
+        return set(modelo.objects.filter(empresa=self.empresa).values_list(*config['chave']))
+
+    def _gravar_lote(self, entidade, config, lote, resumo, ultima_linha):
+        # Dentro do mesmo lote vale a última ocorrência de cada chave
+        por_chave = {}
+        for numero, dados in lote:
+            chave = tuple(dados.get(c) if c in dados else None for c in config['chave'])
+            por_chave[chave] = (numero, dados)
+        registros = list(por_chave.values())
+
+        if not self.dry_run:
+            with transaction.atomic():
+                gravados = getattr(self, f"_gravar_{config['modo']}")(config, registros)
+        else:
+            gravados = len(registros)
+
+        resumo['importadas'] += gravados
+        self._gravar_checkpoint(entidade, ultima_linha)
+        if self.progresso:
+            self.progresso(entidade, dict(resumo))
+
+    def _instancias(self, config, registros):
+        modelo = apps.get_model(config['modelo'])
+        return modelo, [
+            modelo(empresa=self.empresa, **{k: v for k, v in dados.items() if not k.startswith('_')})
+            for _, dados in registros
+        ]
+
+    def _gravar_conflito(self, config, registros):
+        modelo, objetos = self._instancias(config, registros)
+        campos = set()
+        for _, dados in registros:
+            campos.update(k for k in dados if not k.startswith('_'))
+        update_fields = sorted(campos - set(config['chave'])) + ['atualizado_em']
+
+        modelo.objects.bulk_create(
+            objetos,
+            update_conflicts=True,
+            unique_fields=['empresa', *config['chave']],
+            update_fields=update_fields,
+        )
+        return len(objetos)
+
+    def _gravar_nome(self, config, registros):
+        """Profissionais: sem unique no banco, casa pelo nome (dicionário)."""
+        modelo, objetos = self._instancias(config, registros)
+        novos, existentes = [], []
+        for objeto in objetos:
+            objeto.pk = self.profissionais.get(_chave_nome(objeto.nome))
+            (existentes if objeto.pk else novos).append(objeto)
+
+        if existentes:
+            # bulk_update não aplica auto_now
+            agora = timezone.now()
+            for objeto in existentes:
+                objeto.atualizado_em = agora
+            campos = sorted({k for _, d in registros for k in d if not k.startswith('_')} - {'nome'})
+            modelo.objects.bulk_update(existentes, campos + ['atualizado_em'], batch_size=self.tamanho_lote)
+
+        modelo.objects.bulk_create(novos, batch_size=self.tamanho_lote)
+        if any(objeto.pk is None for objeto in novos):
+            # Backend sem RETURNING no bulk_create: recarrega nome -> id
+            self.profissionais = {
+                _chave_nome(nome): pk
+                for pk, nome in modelo.objects.filter(empresa=self.empresa).values_list('id', 'nome')
+            }
+            for objeto in novos:
+                objeto.pk = self.profissionais[_chave_nome(objeto.nome)]
+        else:
+            self.profissionais.update({_chave_nome(objeto.nome): objeto.pk for objeto in novos})
+
+        vinculos = [
+            modelo.servicos.through(profissional_id=objeto.pk, servico_id=servico_id)
+            for objeto, (_, dados) in zip(objetos, registros)
+            for servico_id in dados['_servicos']
+        ]
+        modelo.servicos.through.objects.bulk_create(vinculos, ignore_conflicts=True)
+        return len(objetos)
+
+    def _gravar_inserir(self, config, registros):
+        """Agendamentos: só insere; linhas já importadas (mesma chave) são ignoradas."""
+        modelo, objetos = self._instancias(config, registros)
+        novos = []
+        for objeto in objetos:
+            chave = tuple(getattr(objeto, campo) for campo in config['chave'])
+            if chave not in self._existentes:
+                self._existentes.add(chave)
+                novos.append(objeto)
+        modelo.objects.bulk_create(novos, batch_size=self.tamanho_lote)
+        return len(novos)
+
+    def finalizar(self, entidades):
+        """
+        bulk_create não dispara signals: descarta os caches derivados da
+        empresa (página pública, contexto do bot, onboarding, uso do mês).
+        """
+        self.fechar()
+        if self.dry_run:
+            return
+
+        from agendamentos.cache_publico import invalidar_catalogo, invalidar_ocupacao
+        from agendamentos.contexto_bot import invalidar_contexto_bot
+        from core.onboarding import invalidar_progresso_onboarding
+
+        invalidar_catalogo(self.empresa.id, self.empresa.slug)
+        invalidar_ocupacao(self.empresa.id)
+        invalidar_contexto_bot(self.empresa.id)
+        invalidar_progresso_onboarding(self.empresa.id)
+
+        if 'agendamentos' in entidades:
+            from assinaturas.uso import periodos_para_reconciliar, reconciliar_uso
+            for periodo in periodos_para_reconciliar():
+                reconciliar_uso(periodo)
+
+
+def importar_arquivo(empresa, caminho, entidades, aba=None, tamanho_lote=1000,
+                     retomar=False, progresso=None, dry_run=False, relatorio_erros=None):
+    """
+    Importa as entidades (na ordem de dependência) e retorna a lista de
+    resumos. Ponto de entrada usado pelo comando e pela task Celery.
+    """
+    importador = Importador(
+        empresa, caminho,
+        tamanho_lote=tamanho_lote,
+        relatorio_erros=relatorio_erros,
+        progresso=progresso,
+        dry_run=dry_run,
+    )
+    ordem = [e for e in ORDEM_ENTIDADES if e in entidades]
+    resumos = []
+    try:
+        for entidade in ordem:
+            try:
+                resumos.append(importador.importar(entidade, aba=aba, retomar=retomar))
+            except AbaNaoEncontrada as e:
+                if len(ordem) == 1:
+                    raise
+                # 'todas': planilha sem a aba da entidade
+                logger.info(f"[Importação] {entidade}: {e}")
+                resumos.append({'entidade': entidade, 'lidas': 0, 'importadas': 0, 'erros': 0,
+                                'puladas': 0, 'aba_ausente': True})
+    finally:
+        importador.finalizar(ordem)
+
+    if not any(r['erros'] for r in resumos) and os.path.exists(importador.caminho_erros):
+        os.remove(importador.caminho_erros)
+    return resumos, importador.caminho_erros
@@ -0,0 +1,88 @@
+"""
+Comando Django para gerenciar tabelas append-only (partições, arquivamento e retenção)
+
+Exemplos:
+    python manage.py gerenciar_particoes --criar
+    python manage.py gerenciar_particoes --purgar --dry-run
+    python manage.py gerenciar_particoes --arquivar --tabela agendamentos.LogMensagemBot --ate 2026-01-01
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.particionamento import (
+    TABELAS_APPEND_ONLY,
+    arquivar_ate,
+    criar_particoes_futuras,
+    get_config_tabela,
+    particionamento_disponivel,
+    purgar_antigos,
+)
+
+
+class Command(BaseCommand):
+    help = 'Cria partições futuras, arquiva e expurga registros antigos das tabelas append-only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--criar', action='store_true', help='Cria as partições mensais futuras (Postgres)')
+        parser.add_argument('--purgar', action='store_true', help='Aplica a retenção (DROP de partições / DELETE em lotes)')
+        parser.add_argument('--arquivar', action='store_true', help='Apenas arquiva registros anteriores a --ate')
+        parser.add_argument('--tabela', help='Restringe a uma tabela (ex: agendamentos.LogMensagemBot)')
+        parser.add_argument('--meses', type=int, default=None, help='Meses futuros a pré-criar')
+        parser.add_argument('--days', type=int, default=None, help='Sobrescreve a retenção (dias)')
+        parser.add_argument('--ate', help='Data limite (AAAA-MM-DD) para --arquivar')
+        parser.add_argument('--formato', choices=['jsonl', 'parquet'], default='jsonl', help='Formato do arquivo')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Registros por DELETE')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostrar o que seria removido')
+
+    def handle(self, *args, **options):
+        if not (options['criar'] or options['purgar'] or options['arquivar']):
+            raise CommandError('Informe ao menos uma ação: --criar, --purgar ou --arquivar')
+
+        try:
+            tabelas = [get_config_tabela(options['tabela'])] if options['tabela'] else TABELAS_APPEND_ONLY
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        if options['criar']:
+            if not particionamento_disponivel():
+                self.stdout.write(self.style.WARNING('Banco sem suporte a particionamento (SQLite) - nada a criar'))
+            else:
+                criadas = criar_particoes_futuras(
+                    meses=options['meses'],
+                    modelos=[cfg['modelo'] for cfg in tabelas],
+                )
+                self.stdout.write(self.style.SUCCESS(f'✓ {len(criadas)} partições garantidas'))
+
+        if options['arquivar']:
+            if not options['ate']:
+                raise CommandError('--arquivar exige --ate AAAA-MM-DD')
+            ate = timezone.make_aware(datetime.strptime(options['ate'], '%Y-%m-%d'))
+            for cfg in tabelas:
+                arquivos = arquivar_ate(cfg, ate, formato=options['formato'])
+                self.stdout.write(self.style.SUCCESS(f"✓ {cfg['modelo']}: {len(arquivos)} arquivos gerados"))
+                for arquivo in arquivos:
+                    self.stdout.write(f'  - {arquivo}')
+
+        if options['purgar']:
+            for cfg in tabelas:
+                resultado = purgar_antigos(
+                    cfg,
+                    dias=options['days'],
+                    formato=options['formato'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+                if resultado['limite'] is None:
+                    self.stdout.write(f"- {cfg['modelo']}: retenção desativada (0 dias), nada removido")
+                    continue
+                prefixo = '[DRY RUN] Seriam removidos' if options['dry_run'] else '✓ Removidos'
+                self.stdout.write(
+                    f"{prefixo} {resultado['registros_removidos']} registros de {cfg['modelo']} "
+                    f"(anteriores a {resultado['limite'].strftime('%d/%m/%Y')})"
+                )
+                for particao in resultado['particoes_removidas']:
+                    self.stdout.write(f'  - partição removida: {particao}')
+                for arquivo in resultado['arquivos']:
+                    self.stdout.write(f'  - arquivado em: {arquivo}')
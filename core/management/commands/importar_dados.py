@@ -0,0 +1,77 @@
+"""
+Comando Django para importar dados de planilhas (.xlsx) ou CSV para uma empresa
+
+Exemplos:
+    python manage.py importar_dados dados.xlsx --empresa brandao-barbearia
+    python manage.py importar_dados clientes.csv --empresa 12 --entidade clientes
+    python manage.py importar_dados agenda.csv --empresa 12 --entidade agendamentos --retomar
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import ENTIDADES, ORDEM_ENTIDADES, importar_arquivo
+
+
+class Command(BaseCommand):
+    help = 'Importa serviços, profissionais, horários, clientes e agendamentos de .xlsx/.csv em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do .xlsx ou .csv')
+        parser.add_argument('--empresa', required=True, help='ID ou slug da empresa de destino')
+        parser.add_argument(
+            '--entidade', default='todas', choices=['todas', *ORDEM_ENTIDADES],
+            help='Entidade a importar (padrão: todas as abas da planilha)'
+        )
+        parser.add_argument('--aba', help='Nome da aba (padrão: a aba da entidade)')
+        parser.add_argument('--lote', type=int, default=1000, help='Linhas por lote/transação')
+        parser.add_argument('--retomar', action='store_true', help='Continua do último checkpoint')
+        parser.add_argument('--relatorio-erros', help='CSV com as linhas rejeitadas (padrão: <arquivo>.erros.csv)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas valida, sem gravar')
+
+    def handle(self, *args, **options):
+        from empresas.models import Empresa
+
+        referencia = options['empresa']
+        filtro = {'pk': int(referencia)} if referencia.isdigit() else {'slug': referencia}
+        empresa = Empresa.objects.filter(**filtro).first()
+        if not empresa:
+            raise CommandError(f'Empresa não encontrada: {referencia}')
+
+        arquivo = options['arquivo']
+        entidades = ORDEM_ENTIDADES if options['entidade'] == 'todas' else [options['entidade']]
+        if arquivo.lower().endswith('.csv') and len(entidades) > 1:
+            raise CommandError('Arquivos CSV têm uma única tabela: informe --entidade')
+
+        self.stdout.write(f'Importando {arquivo} para {empresa.nome}...')
+
+        def progresso(entidade, resumo):
+            self.stdout.write(
+                f"  {entidade}: {resumo['lidas']} lidas, {resumo['importadas']} gravadas, {resumo['erros']} com erro"
+            )
+
+        try:
+            resumos, caminho_erros = importar_arquivo(
+                empresa, arquivo, entidades,
+                aba=options['aba'],
+                tamanho_lote=options['lote'],
+                retomar=options['retomar'],
+                progresso=progresso,
+                dry_run=options['dry_run'],
+                relatorio_erros=options['relatorio_erros'],
+            )
+        except (OSError, KeyError) as e:
+            raise CommandError(str(e))
+
+        prefixo = '[DRY RUN] ' if options['dry_run'] else ''
+        for resumo in resumos:
+            if resumo.get('aba_ausente'):
+                self.stdout.write(f"- {resumo['entidade']}: aba '{ENTIDADES[resumo['entidade']]['aba']}' ausente")
+            elif resumo.get('concluida_antes'):
+                self.stdout.write(f"- {resumo['entidade']}: já concluída (checkpoint)")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{prefixo}✓ {resumo['entidade']}: {resumo['importadas']} gravadas, "
+                    f"{resumo['erros']} com erro, {resumo['puladas']} puladas"
+                ))
+
+        if any(resumo['erros'] for resumo in resumos):
+            self.stdout.write(self.style.WARNING(f'Linhas rejeitadas em: {caminho_erros}'))
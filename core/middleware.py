@@ -59,8 +59,8 @@ class LimitesPlanoMiddleware:
             return self.get_response(request)
 
         # Verificar limites antes de processar a requisição
-        if request.user.is_authenticated and hasattr(request.user, 'empresa'):
-            empresa = request.user.empresa
+        if request.user.is_authenticated and hasattr(request, 'empresa'):
+            empresa = request.empresa
 
             # Pular se usuário não tem empresa vinculada
             if not empresa:
@@ -143,16 +143,10 @@ class LimitesPlanoMiddleware:
 
             # 4. VERIFICAR LIMITE DE AGENDAMENTOS DO MÊS
             if any(rota in path for rota in ['/app/agendamentos/criar/', '/api/whatsapp-webhook/', '/api/bot/processar/']):
-                from agendamentos.models import Agendamento
+                from assinaturas.uso import uso_agendamentos_mes
 
-                # Contar agendamentos do mês atual
-                inicio_mes = now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-                agendamentos_mes = Agendamento.objects.filter(
-                    empresa=empresa,
-                    criado_em__gte=inicio_mes,
-                    status__in=['pendente', 'confirmado', 'concluido']
-                ).count()
+                # Agendamentos do mês atual (contador em cache, sem COUNT)
+                agendamentos_mes = uso_agendamentos_mes(empresa)
 
                 # Calcular porcentagem de uso
                 percentual_uso = (agendamentos_mes / plano.max_agendamentos_mes) * 100
@@ -202,8 +196,8 @@ class AssinaturaExpiracaoMiddleware:
         if request.path.startswith('/api/'):
             return self.get_response(request)
 
-        if request.user.is_authenticated and hasattr(request.user, 'empresa'):
-            empresa = request.user.empresa
+        if request.user.is_authenticated and hasattr(request, 'empresa'):
+            empresa = request.empresa
 
             # Pular se usuário não tem empresa vinculada
             if not empresa:
@@ -279,10 +273,47 @@ class UsageTrackingMiddleware:
             # Aqui você pode salvar métricas em um model futuro
             # Por enquanto, apenas adicionar header de debug
             try:
-                response['X-Plan'] = request.user.empresa.assinatura.plano.nome
+                empresa = getattr(request, 'empresa', None) or request.user.empresa
+                response['X-Plan'] = empresa.assinatura.plano.nome
                 response['X-Response-Time'] = f'{duration:.3f}s'
             except Exception:
                 # Empresa sem assinatura - skip headers
                 pass
 
         return response
+
+
+class UnidadeAtivaMiddleware:
+    """
+    Define request.empresa: a empresa que as telas da sessão mostram
+    (empresas/organizacoes.py)
+
+    É a empresa de cadastro do usuário ou, para quem tem acesso
+    multi-unidade, a unidade escolhida na sessão, sem novo login.
+    request.user não é alterado: salvar o usuário (ex.: alterar_senha)
+    nunca grava a unidade aberta como empresa de cadastro.
+    Rotas /api/ resolvem a empresa na própria autenticação.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith('/api/') or not request.user.is_authenticated:
+            return self.get_response(request)
+
+        from empresas import organizacoes
+
+        origem = getattr(request.user, 'empresa', None)
+        request.empresa = origem
+        unidade_id = request.session.get(organizacoes.CHAVE_SESSAO)
+        if unidade_id and origem and unidade_id != origem.pk:
+            if organizacoes.unidade_permitida(request.user, origem, unidade_id):
+                from empresas.models import Empresa
+
+                request.empresa = Empresa.objects.get(pk=unidade_id)
+            else:
+                # Acesso revogado, unidade desativada ou plano sem o recurso
+                request.session.pop(organizacoes.CHAVE_SESSAO, None)
+
+        return self.get_response(request)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_usuario_activation_token_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailPendente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatarios', models.JSONField(default=list)),
+                ('remetente', models.CharField(max_length=254)),
+                ('assunto', models.CharField(max_length=255)),
+                ('corpo_texto', models.TextField()),
+                ('corpo_html', models.TextField(blank=True)),
+                ('chave', models.CharField(blank=True, help_text='Evita enfileirar o mesmo email duas vezes (ex: trial_expirando_3_dias:12)', max_length=120, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('falhou', 'Falhou')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(help_text='Pendente: quando pode ser enviado. Enviando: fim da reserva do worker')),
+                ('lote', models.CharField(blank=True, help_text='Reserva do worker que está enviando', max_length=32)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('enviado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Email Pendente',
+                'verbose_name_plural': 'Emails Pendentes',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='core_emailp_status_087be2_idx'), models.Index(fields=['lote'], name='core_emailp_lote_d3eed0_idx')],
+            },
+        ),
+    ]
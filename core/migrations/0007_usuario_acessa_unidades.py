@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_exportacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='acessa_unidades',
+            field=models.BooleanField(default=False, help_text='Pode alternar entre as unidades da organização da empresa sem novo login'),
+        ),
+    ]
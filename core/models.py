@@ -15,6 +15,10 @@ class Usuario(AbstractUser):
     )
     telefone = models.CharField(max_length=20, blank=True)
     ativo = models.BooleanField(default=True)
+    acessa_unidades = models.BooleanField(
+        default=False,
+        help_text='Pode alternar entre as unidades da organização da empresa sem novo login'
+    )
     
     # Campos para ativação de conta via email
     activation_token = models.CharField(max_length=64, blank=True, null=True, help_text='Token para ativação de conta')
@@ -44,3 +48,99 @@ class Usuario(AbstractUser):
 
     def __str__(self):
         return f"{self.get_full_name() or self.username} - {self.empresa}"
+
+
+class StatusEmail(models.TextChoices):
+    PENDENTE = 'pendente', 'Pendente'
+    ENVIANDO = 'enviando', 'Enviando'
+    ENVIADO = 'enviado', 'Enviado'
+    FALHOU = 'falhou', 'Falhou'
+
+
+class EmailPendente(models.Model):
+    """
+    Fila de saída de emails (outbox)
+
+    Gravado na mesma transação de quem pede o envio, já com o HTML
+    renderizado; a task enviar_emails_pendentes envia em lotes reutilizando
+    uma conexão SMTP (core/email_outbox.py).
+    """
+    destinatarios = models.JSONField(default=list)
+    remetente = models.CharField(max_length=254)
+    assunto = models.CharField(max_length=255)
+    corpo_texto = models.TextField()
+    corpo_html = models.TextField(blank=True)
+
+    chave = models.CharField(
+        max_length=120, unique=True, null=True, blank=True,
+        help_text='Evita enfileirar o mesmo email duas vezes (ex: trial_expirando_3_dias:12)'
+    )
+    status = models.CharField(max_length=20, choices=StatusEmail.choices, default=StatusEmail.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(
+        help_text='Pendente: quando pode ser enviado. Enviando: fim da reserva do worker'
+    )
+    lote = models.CharField(max_length=32, blank=True, help_text='Reserva do worker que está enviando')
+    erro = models.TextField(blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Email Pendente'
+        verbose_name_plural = 'Emails Pendentes'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa']),  # Fila
+            models.Index(fields=['lote']),
+        ]
+
+    def __str__(self):
+        return f"{self.assunto} -> {', '.join(self.destinatarios)} ({self.get_status_display()})"
+
+
+class StatusExportacao(models.TextChoices):
+    PENDENTE = 'pendente', 'Pendente'
+    PROCESSANDO = 'processando', 'Processando'
+    CONCLUIDA = 'concluida', 'Concluída'
+    FALHOU = 'falhou', 'Falhou'
+
+
+class Exportacao(models.Model):
+    """
+    Exportação grande gerada em segundo plano (core/exportacao.py)
+
+    Exportações acima de EXPORTACAO_LIMITE_SINCRONO linhas viram um job: a
+    task exportar_dados_task grava o arquivo no MEDIA_ROOT e avisa o
+    usuário por email. O download passa pela view (confere a empresa).
+    """
+    FORMATOS = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ]
+
+    empresa = models.ForeignKey('empresas.Empresa', on_delete=models.CASCADE, related_name='exportacoes')
+    usuario = models.ForeignKey('core.Usuario', on_delete=models.SET_NULL, null=True, related_name='exportacoes')
+    tipo = models.CharField(max_length=20)  # Chave de core.exportacao.EXPORTACOES
+    formato = models.CharField(max_length=4, choices=FORMATOS, default='csv')
+    colunas = models.JSONField(default=list)
+    filtros = models.JSONField(default=dict, blank=True)  # {'inicio': 'AAAA-MM-DD', 'fim': 'AAAA-MM-DD'}
+
+    status = models.CharField(max_length=20, choices=StatusExportacao.choices, default=StatusExportacao.PENDENTE)
+    arquivo = models.FileField(upload_to='exportacoes/%Y/%m/', blank=True)
+    linhas = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Exportação'
+        verbose_name_plural = 'Exportações'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['empresa', '-criado_em']),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa} - {self.tipo}.{self.formato} ({self.get_status_display()})"
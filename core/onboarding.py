@@ -1,15 +1,23 @@
 """
 Lógica de Onboarding - Calcula progresso de configuração da empresa
+
+O estado é resolvido com UMA query anotada em Empresa (Exists para
+serviços, profissionais e horários), memorizado no cache por empresa e
+invalidado pelos signals em core/signals.py. Empresas com
+onboarding_completo não fazem nenhuma query.
 """
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django.urls import reverse
 
 
+# Cada 'check' recebe a linha anotada de Empresa (ver _anotar_onboarding)
 ONBOARDING_STEPS = [
     {
         'id': 'empresa_configurada',
         'label': 'Configurar Dados da Empresa',
         'icon': '🏢',
-        'check': lambda empresa: bool(empresa.nome and empresa.telefone and empresa.endereco),
+        'check': lambda dados: bool(dados['nome'] and dados['telefone'] and dados['endereco']),
         'url_name': 'empresa_dados',
         'peso': 15
     },
@@ -17,7 +25,7 @@ ONBOARDING_STEPS = [
         'id': 'whatsapp_conectado',
         'label': 'Conectar WhatsApp',
         'icon': '💬',
-        'check': lambda empresa: empresa.whatsapp_configurado,
+        'check': lambda dados: bool(dados['whatsapp_conectado']),
         'url_name': 'whatsapp_dashboard',
         'peso': 30
     },
@@ -25,7 +33,7 @@ ONBOARDING_STEPS = [
         'id': 'servicos_cadastrados',
         'label': 'Cadastrar Serviços',
         'icon': '✂️',
-        'check': lambda empresa: empresa.servicos.exists(),
+        'check': lambda dados: dados['tem_servicos'],
         'url_name': 'servicos_lista',
         'peso': 20
     },
@@ -33,7 +41,7 @@ ONBOARDING_STEPS = [
         'id': 'profissionais_cadastrados',
         'label': 'Cadastrar Profissionais',
         'icon': '👤',
-        'check': lambda empresa: empresa.profissionais.count() > 0,
+        'check': lambda dados: dados['tem_profissionais'],
         'url_name': 'profissionais_lista',
         'peso': 20
     },
@@ -41,53 +49,81 @@ ONBOARDING_STEPS = [
         'id': 'horarios_configurados',
         'label': 'Configurar Horários de Funcionamento',
         'icon': '🕐',
-        'check': lambda empresa: empresa.horarios_funcionamento.exists(),
+        'check': lambda dados: dados['tem_horarios'],
         'url_name': 'horarios_funcionamento',
         'peso': 15
     }
 ]
 
+ONBOARDING_CACHE_TIMEOUT = 60 * 60  # 1 hora (invalidado por signals antes disso)
 
-def calcular_progresso_onboarding(empresa):
-    """
-    Calcula o progresso de onboarding da empresa.
-    
-    Returns:
-        dict: {
-            'progresso': int (0-100),
-            'steps_completos': int,
-            'steps_total': int,
-            'proximo_passo': dict ou None,
-            'steps': list (todos os steps com status)
-        }
-    """
+# URLs dos steps resolvidas uma única vez por processo
+_urls_steps = {}
+
+
+def _chave_cache(empresa_id):
+    return f'onboarding:{empresa_id}'
+
+
+def _url_step(url_name):
+    if url_name not in _urls_steps:
+        _urls_steps[url_name] = reverse(url_name)
+    return _urls_steps[url_name]
+
+
+def _anotar_onboarding(queryset):
+    """Uma única query com tudo que os checks precisam."""
+    from empresas.models import Servico, Profissional, HorarioFuncionamento
+
+    return queryset.annotate(
+        tem_servicos=Exists(Servico.objects.filter(empresa=OuterRef('pk'))),
+        tem_profissionais=Exists(Profissional.objects.filter(empresa=OuterRef('pk'))),
+        tem_horarios=Exists(HorarioFuncionamento.objects.filter(empresa=OuterRef('pk'))),
+    ).values(
+        'id', 'nome', 'telefone', 'endereco', 'whatsapp_conectado', 'onboarding_completo',
+        'tem_servicos', 'tem_profissionais', 'tem_horarios',
+    )
+
+
+def _status_steps(dados):
+    """{step_id: completo} a partir da linha anotada."""
+    if dados['onboarding_completo']:
+        return {step['id']: True for step in ONBOARDING_STEPS}
+
+    status = {}
+    for step in ONBOARDING_STEPS:
+        try:
+            status[step['id']] = bool(step['check'](dados))
+        except Exception:
+            status[step['id']] = False
+    return status
+
+
+def _montar_progresso(status):
     steps_com_status = []
     peso_total = sum(step['peso'] for step in ONBOARDING_STEPS)
     peso_completo = 0
     proximo_passo = None
-    
+
     for step in ONBOARDING_STEPS:
-        try:
-            completo = step['check'](empresa)
-        except Exception:
-            completo = False
-        
+        completo = status.get(step['id'], False)
+
         step_info = {
             **step,
             'completo': completo,
-            'url': reverse(step['url_name'])
+            'url': _url_step(step['url_name'])
         }
         steps_com_status.append(step_info)
-        
+
         if completo:
             peso_completo += step['peso']
         elif proximo_passo is None:
             # Primeiro step incompleto é o próximo
             proximo_passo = step_info
-    
+
     progresso = int((peso_completo / peso_total) * 100)
     steps_completos = sum(1 for s in steps_com_status if s['completo'])
-    
+
     return {
         'progresso': progresso,
         'steps_completos': steps_completos,
@@ -96,3 +132,92 @@ def calcular_progresso_onboarding(empresa):
         'steps': steps_com_status,
         'completo': progresso == 100
     }
+
+
+def calcular_progresso_onboarding(empresa):
+    """
+    Calcula o progresso de onboarding da empresa.
+
+    - onboarding_completo: retorna direto, sem queries
+    - senão: cache por empresa; no miss, uma query anotada
+
+    Returns:
+        dict: {
+            'progresso': int (0-100),
+            'steps_completos': int,
+            'steps_total': int,
+            'proximo_passo': dict ou None,
+            'steps': list (todos os steps com status)
+        }
+    """
+    if empresa.onboarding_completo:
+        return _montar_progresso({step['id']: True for step in ONBOARDING_STEPS})
+
+    chave = _chave_cache(empresa.pk)
+    status = cache.get(chave)
+    if status is None:
+        from empresas.models import Empresa
+
+        dados = _anotar_onboarding(Empresa.objects.filter(pk=empresa.pk)).first()
+        status = _status_steps(dados) if dados else {}
+        cache.set(chave, status, ONBOARDING_CACHE_TIMEOUT)
+
+    return _montar_progresso(status)
+
+
+def invalidar_progresso_onboarding(empresa_id):
+    """Descarta o progresso memorizado (chamado pelos signals)."""
+    cache.delete(_chave_cache(empresa_id))
+
+
+def calcular_progresso_onboarding_em_lote(empresas=None):
+    """
+    Progresso de várias empresas com UMA query (para o backoffice).
+
+    Args:
+        empresas: queryset de Empresa (padrão: todas)
+
+    Returns:
+        dict: {empresa_id: progresso (mesmo formato de calcular_progresso_onboarding)}
+    """
+    from empresas.models import Empresa
+
+    if empresas is None:
+        empresas = Empresa.objects.all()
+
+    return {
+        dados['id']: _montar_progresso(_status_steps(dados))
+        for dados in _anotar_onboarding(empresas.order_by())
+    }
+
+
+def funil_onboarding(empresas=None):
+    """
+    Funil de onboarding: quantas empresas concluíram cada step.
+
+    Returns:
+        dict: {
+            'total': int,
+            'completos': int (100% configuradas),
+            'steps': list de {'id', 'label', 'icon', 'empresas', 'percentual'}
+        }
+    """
+    progressos = calcular_progresso_onboarding_em_lote(empresas)
+    total = len(progressos)
+
+    steps = []
+    for indice, step in enumerate(ONBOARDING_STEPS):
+        concluidos = sum(1 for p in progressos.values() if p['steps'][indice]['completo'])
+        steps.append({
+            'id': step['id'],
+            'label': step['label'],
+            'icon': step['icon'],
+            'empresas': concluidos,
+            'percentual': round(concluidos / total * 100, 1) if total else 0,
+        })
+
+    return {
+        'total': total,
+        'completos': sum(1 for p in progressos.values() if p['completo']),
+        'steps': steps,
+    }
@@ -20,7 +20,7 @@ def onboarding_wizard(request):
     """
     Redireciona para etapa correta do onboarding ou dashboard se já completo
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Se onboarding já completo, vai para dashboard
     if empresa.onboarding_completo:
@@ -44,7 +44,7 @@ def onboarding_step_1_servicos(request):
     """
     PASSO 1: Cadastrar serviços que a empresa oferece
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     if request.method == 'POST':
         # Processar formulário de serviços
@@ -105,7 +105,7 @@ def onboarding_step_2_profissional(request):
     """
     PASSO 2: Cadastrar pelo menos 1 profissional
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Verificar se está na etapa correta
     if empresa.onboarding_etapa < 1:
@@ -178,7 +178,7 @@ def onboarding_step_3_whatsapp(request):
     """
     PASSO 3: Conectar WhatsApp (opcional, pode pular)
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Verificar se está na etapa correta
     if empresa.onboarding_etapa < 2:
@@ -238,7 +238,7 @@ def onboarding_step_4_pronto(request):
     """
     PASSO 4: Concluído! Mostrar resumo e confete 🎉
     """
-    empresa = request.user.empresa
+    empresa = request.empresa
 
     # Verificar se está na etapa correta
     if empresa.onboarding_etapa < 3:
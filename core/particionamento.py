@@ -0,0 +1,540 @@
+"""
+Particionamento e arquivamento de tabelas append-only
+
+Tabelas que só recebem INSERT (logs do bot, analytics, histórico de
+pagamentos) crescem para sempre. Apagar linhas antigas com um DELETE
+grande gera bloat e locks no Postgres.
+
+Estratégia:
+- Postgres: partições mensais por RANGE na coluna de data. Partições
+  futuras são pré-criadas por uma task Celery e o expurgo é um simples
+  DETACH + DROP da partição inteira (instantâneo).
+- Antes do expurgo, os registros podem ser arquivados em disco local
+  (JSONL comprimido ou Parquet, se o pyarrow estiver instalado).
+- SQLite (dev) / tabelas não particionadas: expurgo com DELETEs em lotes.
+
+Uso nas migrations:
+    migrations.RunPython(converter_para_particionada_op('agendamentos', 'LogMensagemBot'),
+                         migrations.RunPython.noop)
+"""
+
+import gzip
+import json
+import logging
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+# Tabelas append-only gerenciadas por este módulo
+# - campo: coluna de data usada como chave de partição / retenção
+# - particionar: converter em tabela particionada no Postgres
+# - arquivar: gravar os registros em disco antes de expurgar
+# - retencao_setting / retencao_dias: quantos dias manter no banco
+#   (0 = manter tudo, sem expurgo)
+TABELAS_APPEND_ONLY = [
+    {
+        'modelo': 'agendamentos.LogMensagemBot',
+        'campo': 'criado_em',
+        'particionar': True,
+        'arquivar': True,
+        'retencao_setting': 'BOT_LOG_RETENCAO_DIAS',
+        'retencao_dias': 90,
+    },
+    {
+        'modelo': 'landing.PageView',
+        'campo': 'timestamp',
+        'particionar': True,
+        'arquivar': False,
+        'retencao_setting': 'ANALYTICS_RETENCAO_DIAS',
+        'retencao_dias': 30,
+    },
+    {
+        'modelo': 'landing.UserEvent',
+        'campo': 'timestamp',
+        'particionar': True,
+        'arquivar': False,
+        'retencao_setting': 'ANALYTICS_RETENCAO_DIAS',
+        'retencao_dias': 30,
+    },
+    {
+        # transaction_id é UNIQUE e o Postgres não permite unicidade global
+        # em tabela particionada sem incluir a coluna de partição. Por isso
+        # o histórico de pagamentos NÃO é particionado: quando a retenção é
+        # ligada, é arquivado e expurgado em lotes. Por padrão nada é
+        # apagado: é a única fonte das métricas reconstruídas do backoffice
+        # (backoffice/metricas.py, reconstruir_metricas).
+        'modelo': 'assinaturas.HistoricoPagamento',
+        'campo': 'data_criacao',
+        'particionar': False,
+        'arquivar': True,
+        'retencao_setting': 'HISTORICO_PAGAMENTO_RETENCAO_DIAS',
+        'retencao_dias': 0,
+    },
+]
+
+
+# ============================================
+# CONFIGURAÇÃO
+# ============================================
+
+def get_config_tabela(modelo):
+    """Retorna a configuração de uma tabela pelo label ('app.Modelo')."""
+    for cfg in TABELAS_APPEND_ONLY:
+        if cfg['modelo'].lower() == modelo.lower():
+            return cfg
+    raise LookupError(f'Tabela não gerenciada: {modelo}')
+
+
+def get_modelo(cfg):
+    return apps.get_model(cfg['modelo'])
+
+
+def retencao_dias(cfg):
+    return getattr(settings, cfg['retencao_setting'], cfg['retencao_dias'])
+
+
+def particionamento_disponivel():
+    """Particionamento nativo só existe no Postgres."""
+    return connection.vendor == 'postgresql'
+
+
+# ============================================
+# DATAS / NOMES
+# ============================================
+
+def inicio_mes(data_hora):
+    """Primeiro instante do mês (no fuso local) de um datetime aware."""
+    local = timezone.localtime(data_hora)
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def proximo_mes(data_hora):
+    """Primeiro instante do mês seguinte."""
+    inicio = inicio_mes(data_hora)
+    return inicio_mes(inicio + timedelta(days=32))
+
+
+def nome_particao(tabela, inicio):
+    """Ex.: agendamentos_logmensagembot_p202611"""
+    return f'{tabela}_p{inicio:%Y%m}'
+
+
+def _nome_legado(nome):
+    # Nomes de objetos no Postgres têm no máximo 63 caracteres
+    return f'{nome[:56]}_legado'
+
+
+# ============================================
+# POSTGRES - INTROSPECÇÃO
+# ============================================
+
+def tabela_esta_particionada(tabela):
+    if not particionamento_disponivel():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s
+            """,
+            [tabela],
+        )
+        return cursor.fetchone() is not None
+
+
+def listar_particoes(tabela):
+    """
+    Lista as partições de uma tabela particionada.
+
+    Returns:
+        list[dict]: [{'nome': str, 'ate': datetime}] ordenado por 'ate'
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s
+            """,
+            [tabela],
+        )
+        linhas = cursor.fetchall()
+
+    particoes = []
+    for nome, limite in linhas:
+        # Ex.: FOR VALUES FROM ('2026-11-01 00:00:00-03') TO ('2026-12-01 00:00:00-03')
+        match = re.search(r"TO \('([^']+)'\)", limite or '')
+        ate = parse_datetime(match.group(1)) if match else None
+        particoes.append({'nome': nome, 'ate': ate})
+
+    return sorted(particoes, key=lambda p: p['ate'] or timezone.now())
+
+
+# ============================================
+# POSTGRES - CONVERSÃO (MIGRATION HELPER)
+# ============================================
+
+def converter_para_particionada(schema_editor, modelo):
+    """
+    Converte a tabela de `modelo` em tabela particionada por mês.
+
+    A tabela atual vira a partição "<tabela>_legado" (todos os registros
+    até o fim do mês corrente) - nenhum dado é copiado. Índices e FKs são
+    recriados na tabela pai com os mesmos nomes, e a PK passa a ser
+    (id, coluna_de_data), exigência do Postgres (construída uma única vez
+    sobre a partição legada durante a migration).
+
+    No SQLite não faz nada.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    cfg = get_config_tabela(modelo._meta.label)
+    tabela = modelo._meta.db_table
+    coluna = modelo._meta.get_field(cfg['campo']).column
+    pk = modelo._meta.pk.column
+    legado = _nome_legado(tabela)
+    q = schema_editor.quote_name
+
+    if tabela_esta_particionada(tabela):
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        # Índices (exceto PK/UNIQUE) e FKs da tabela atual
+        cursor.execute(
+            """
+            SELECT ic.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            WHERE t.relname = %s AND NOT i.indisprimary AND NOT i.indisunique
+            """,
+            [tabela],
+        )
+        indices = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT con.conname, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_class t ON t.oid = con.conrelid
+            WHERE t.relname = %s AND con.contype = 'f'
+            """,
+            [tabela],
+        )
+        fks = cursor.fetchall()
+
+        cursor.execute(
+            """
+            SELECT con.conname FROM pg_constraint con
+            JOIN pg_class t ON t.oid = con.conrelid
+            WHERE t.relname = %s AND con.contype = 'p'
+            """,
+            [tabela],
+        )
+        pk_constraint = cursor.fetchone()
+
+        cursor.execute(
+            """
+            SELECT a.attidentity FROM pg_attribute a
+            JOIN pg_class t ON t.oid = a.attrelid
+            WHERE t.relname = %s AND a.attname = %s
+            """,
+            [tabela, pk],
+        )
+        identidade = (cursor.fetchone() or [''])[0]
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [tabela, pk])
+        sequencia = cursor.fetchone()[0]
+
+        # 1. A tabela atual (e seus índices) vira a partição legada. A PK só
+        #    em (id) sai: a partição herda a PK (id, data) da tabela pai.
+        cursor.execute(f'ALTER TABLE {q(tabela)} RENAME TO {q(legado)}')
+        for nome_indice, _ in indices:
+            cursor.execute(f'ALTER INDEX {q(nome_indice)} RENAME TO {q(_nome_legado(nome_indice))}')
+        if pk_constraint:
+            cursor.execute(f'ALTER TABLE {q(legado)} DROP CONSTRAINT {q(pk_constraint[0])}')
+
+        # 2. Tabela pai particionada com a mesma estrutura
+        cursor.execute(
+            f'CREATE TABLE {q(tabela)} (LIKE {q(legado)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE ({q(coluna)})'
+        )
+        cursor.execute(f'ALTER TABLE {q(tabela)} ADD PRIMARY KEY ({q(pk)}, {q(coluna)})')
+        for nome_indice, definicao in indices:
+            # Mesma definição, apontando para a tabela pai (nome original)
+            definicao = re.sub(r' ON (ONLY )?\S+ ', f' ON {q(tabela)} ', definicao, count=1)
+            cursor.execute(definicao)
+
+        # 3. Sequência/identity do id continua de onde parou
+        if identidade:
+            cursor.execute(f'ALTER TABLE {q(legado)} ALTER COLUMN {q(pk)} DROP IDENTITY IF EXISTS')
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                f'COALESCE((SELECT MAX({q(pk)}) FROM {q(legado)}), 0) + 1, false)',
+                [tabela, pk],
+            )
+        elif sequencia:
+            cursor.execute(f'ALTER SEQUENCE {sequencia} OWNED BY {q(tabela)}.{q(pk)}')
+
+        # 4. Tabela antiga entra como partição de tudo até o fim do mês atual
+        limite = proximo_mes(timezone.now())
+        cursor.execute(
+            f'ALTER TABLE {q(tabela)} ATTACH PARTITION {q(legado)} '
+            f"FOR VALUES FROM (MINVALUE) TO ('{limite.isoformat()}')"
+        )
+
+        # 5. FKs na tabela pai (propagadas para as novas partições)
+        for nome_fk, definicao in fks:
+            cursor.execute(f'ALTER TABLE {q(tabela)} ADD CONSTRAINT {q(nome_fk)} {definicao}')
+
+    criar_particoes_futuras(modelos=[modelo._meta.label])
+
+
+def converter_para_particionada_op(app_label, model_name):
+    """Retorna a função para migrations.RunPython."""
+    def _converter(apps_migration, schema_editor):
+        modelo = apps_migration.get_model(app_label, model_name)
+        converter_para_particionada(schema_editor, modelo)
+    return _converter
+
+
+# ============================================
+# POSTGRES - PARTIÇÕES FUTURAS
+# ============================================
+
+def criar_particoes_futuras(meses=None, modelos=None):
+    """
+    Garante partições mensais do mês atual até `meses` à frente.
+
+    Returns:
+        list[str]: nomes das partições criadas
+    """
+    if not particionamento_disponivel():
+        return []
+
+    meses = meses if meses is not None else getattr(settings, 'PARTICIONAMENTO_MESES_FUTUROS', 3)
+    criadas = []
+
+    for cfg in TABELAS_APPEND_ONLY:
+        if not cfg['particionar'] or (modelos and cfg['modelo'] not in modelos):
+            continue
+
+        tabela = get_modelo(cfg)._meta.db_table
+        if not tabela_esta_particionada(tabela):
+            continue
+
+        # Começa onde a última partição termina (a legada cobre o passado)
+        existentes = listar_particoes(tabela)
+        inicio = inicio_mes(timezone.now())
+        if existentes and existentes[-1]['ate']:
+            inicio = max(inicio, inicio_mes(existentes[-1]['ate']))
+
+        limite = inicio_mes(timezone.now())
+        for _ in range(meses + 1):
+            limite = proximo_mes(limite)
+
+        while inicio < limite:
+            fim = proximo_mes(inicio)
+            nome = nome_particao(tabela, inicio)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(nome)} '
+                    f'PARTITION OF {connection.ops.quote_name(tabela)} '
+                    f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+                )
+            criadas.append(nome)
+            inicio = fim
+
+    if criadas:
+        logger.info(f"[Particionamento] Partições garantidas: {', '.join(criadas)}")
+    return criadas
+
+
+# ============================================
+# ARQUIVAMENTO
+# ============================================
+
+def _diretorio_arquivo(tabela):
+    base = Path(getattr(settings, 'PARTICIONAMENTO_ARQUIVO_DIR', settings.BASE_DIR / 'data' / 'arquivo'))
+    destino = base / tabela
+    destino.mkdir(parents=True, exist_ok=True)
+    return destino
+
+
+def _caminho_livre(caminho):
+    """Nunca sobrescreve um arquivo existente (ex.: mês arquivado em duas etapas)."""
+    if not caminho.exists():
+        return caminho
+    sufixo = timezone.now().strftime('%Y%m%d%H%M%S')
+    nome = caminho.name.split('.', 1)
+    return caminho.with_name(f'{nome[0]}_{sufixo}.{nome[1]}')
+
+
+def arquivar_periodo(cfg, inicio, fim, formato='jsonl', chunk_size=2000):
+    """
+    Grava em disco os registros com campo de data em [inicio, fim).
+
+    Returns:
+        tuple: (caminho do arquivo ou None se não havia registros, quantidade)
+    """
+    modelo = get_modelo(cfg)
+    registros = modelo.objects.filter(
+        **{f"{cfg['campo']}__gte": inicio, f"{cfg['campo']}__lt": fim}
+    ).order_by('pk').values()
+
+    if not registros.exists():
+        return None, 0
+
+    tabela = modelo._meta.db_table
+    destino = _diretorio_arquivo(tabela)
+    total = 0
+
+    if formato == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Formato parquet requer o pacote pyarrow (pip install pyarrow)')
+
+        caminho = _caminho_livre(destino / f'{tabela}_{inicio:%Y%m%d}.parquet')
+        writer = None
+        lote = []
+        try:
+            for linha in registros.iterator(chunk_size=chunk_size):
+                # JSON round-trip normaliza Decimal/datetime/dict para tipos simples
+                lote.append(json.loads(json.dumps(linha, cls=DjangoJSONEncoder)))
+                if len(lote) >= chunk_size:
+                    tabela_pa = pa.Table.from_pylist(lote)
+                    writer = writer or pq.ParquetWriter(str(caminho), tabela_pa.schema, compression='zstd')
+                    writer.write_table(tabela_pa)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                tabela_pa = pa.Table.from_pylist(lote)
+                writer = writer or pq.ParquetWriter(str(caminho), tabela_pa.schema, compression='zstd')
+                writer.write_table(tabela_pa)
+                total += len(lote)
+        finally:
+            if writer:
+                writer.close()
+    else:
+        caminho = _caminho_livre(destino / f'{tabela}_{inicio:%Y%m%d}.jsonl.gz')
+        with gzip.open(caminho, 'wt', encoding='utf-8') as arquivo:
+            for linha in registros.iterator(chunk_size=chunk_size):
+                arquivo.write(json.dumps(linha, cls=DjangoJSONEncoder, ensure_ascii=False))
+                arquivo.write('\n')
+                total += 1
+
+    logger.info(f"[Particionamento] {total} registros de {tabela} arquivados em {caminho}")
+    return caminho, total
+
+
+def arquivar_ate(cfg, fim, formato='jsonl'):
+    """Arquiva mês a mês tudo o que for anterior a `fim`."""
+    modelo = get_modelo(cfg)
+    mais_antigo = modelo.objects.filter(
+        **{f"{cfg['campo']}__lt": fim}
+    ).aggregate(minimo=Min(cfg['campo']))['minimo']
+
+    arquivos = []
+    if not mais_antigo:
+        return arquivos
+
+    inicio = inicio_mes(mais_antigo)
+    while inicio < fim:
+        caminho, _ = arquivar_periodo(cfg, inicio, min(proximo_mes(inicio), fim), formato=formato)
+        if caminho:
+            arquivos.append(str(caminho))
+        inicio = proximo_mes(inicio)
+    return arquivos
+
+
+# ============================================
+# EXPURGO
+# ============================================
+
+def purgar_antigos(cfg, dias=None, arquivar=None, formato='jsonl', batch_size=5000, dry_run=False):
+    """
+    Remove registros mais antigos que a retenção.
+
+    - Partições inteiramente vencidas: DETACH + DROP (Postgres)
+    - Restante (partição legada, SQLite, tabelas não particionadas):
+      DELETE em lotes de `batch_size`
+    - Retenção 0: nada é removido (limite None)
+
+    Returns:
+        dict: {'particoes_removidas', 'registros_removidos', 'arquivos', 'limite'}
+    """
+    modelo = get_modelo(cfg)
+    tabela = modelo._meta.db_table
+    dias = dias if dias is not None else retencao_dias(cfg)
+    arquivar = cfg['arquivar'] if arquivar is None else arquivar
+
+    resultado = {
+        'particoes_removidas': [],
+        'registros_removidos': 0,
+        'arquivos': [],
+        'limite': None,
+    }
+    if not dias:
+        return resultado
+
+    limite = timezone.now() - timedelta(days=dias)
+    antigos = modelo.objects.filter(**{f"{cfg['campo']}__lt": limite})
+    resultado['limite'] = limite
+
+    if dry_run:
+        resultado['registros_removidos'] = antigos.count()
+        return resultado
+
+    if arquivar:
+        resultado['arquivos'] = arquivar_ate(cfg, limite, formato=formato)
+
+    # 1. Partições inteiras vencidas: DROP é instantâneo e não gera bloat
+    if cfg['particionar'] and tabela_esta_particionada(tabela):
+        q = connection.ops.quote_name
+        for particao in listar_particoes(tabela):
+            if particao['ate'] and particao['ate'] <= limite:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'SELECT COUNT(*) FROM {q(particao["nome"])}')
+                        resultado['registros_removidos'] += cursor.fetchone()[0]
+                        cursor.execute(f'ALTER TABLE {q(tabela)} DETACH PARTITION {q(particao["nome"])}')
+                        cursor.execute(f'DROP TABLE {q(particao["nome"])}')
+                resultado['particoes_removidas'].append(particao['nome'])
+
+    # 2. O que sobrou (ex.: meio de mês): DELETE em lotes curtos
+    while True:
+        ids = list(antigos.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        deletados, _ = modelo.objects.filter(pk__in=ids).delete()
+        resultado['registros_removidos'] += deletados
+
+    logger.info(
+        f"[Particionamento] {tabela}: {resultado['registros_removidos']} registros removidos "
+        f"(anteriores a {limite:%d/%m/%Y}), partições removidas: {resultado['particoes_removidas']}"
+    )
+    return resultado
+
+
+def manter_tabelas_append_only(dry_run=False):
+    """Rotina completa: cria partições futuras e aplica a retenção em todas as tabelas."""
+    resumo = {'particoes_criadas': criar_particoes_futuras() if not dry_run else []}
+    for cfg in TABELAS_APPEND_ONLY:
+        resumo[cfg['modelo']] = purgar_antigos(cfg, dry_run=dry_run)
+    return resumo
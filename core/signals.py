@@ -1,10 +1,16 @@
-from django.db.models.signals import post_save
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
-from django.utils.html import strip_tags
+from empresas.models import Empresa, Servico, Profissional, HorarioFuncionamento
+from .email_outbox import enfileirar_email
 from .models import Usuario
+from .onboarding import invalidar_progresso_onboarding
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Usuario)
@@ -22,28 +28,34 @@ def enviar_email_boas_vindas(sender, instance, created, **kwargs):
         if instance.empresa:
             return
 
-        # Usuário criado manualmente (sem empresa) - envia email padrão
+        # Usuário criado manualmente (sem empresa) - enfileira email padrão
+        # (renderizado agora, enviado pela fila após o commit)
         try:
-            # Contexto para o template
-            context = {
-                'usuario': instance,
-                'site_url': settings.SITE_URL,
-            }
-
-            # Renderiza o template HTML
-            html_message = render_to_string('emails/usuario_boas_vindas.html', context)
-            # Versão texto puro (fallback)
-            plain_message = strip_tags(html_message)
-
-            # Envia o email
-            send_mail(
-                subject='Bem-vindo ao Axio Gestto!',
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.email],
-                html_message=html_message,
-                fail_silently=True,  # Não quebra a aplicação se o email falhar
+            enfileirar_email(
+                [instance.email],
+                'Bem-vindo ao Axio Gestto!',
+                template='emails/usuario_boas_vindas.html',
+                contexto={
+                    'usuario': instance,
+                    'site_url': settings.SITE_URL,
+                },
             )
         except Exception as e:
-            # Log do erro (opcional)
-            print(f"Erro ao enviar email de boas-vindas para {instance.email}: {e}")
+            logger.error(f"Erro ao enfileirar email de boas-vindas para {instance.email}: {e}")
+
+
+@receiver(post_save, sender=Empresa)
+def invalidar_onboarding_empresa(sender, instance, **kwargs):
+    """Dados da empresa/WhatsApp mudaram: recalcula o progresso de onboarding"""
+    transaction.on_commit(partial(invalidar_progresso_onboarding, instance.pk))
+
+
+@receiver(post_save, sender=Servico)
+@receiver(post_delete, sender=Servico)
+@receiver(post_save, sender=Profissional)
+@receiver(post_delete, sender=Profissional)
+@receiver(post_save, sender=HorarioFuncionamento)
+@receiver(post_delete, sender=HorarioFuncionamento)
+def invalidar_onboarding_cadastros(sender, instance, **kwargs):
+    """Serviços, profissionais e horários entram no progresso de onboarding"""
+    transaction.on_commit(partial(invalidar_progresso_onboarding, instance.empresa_id))
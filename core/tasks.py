@@ -0,0 +1,118 @@
+"""
+Tasks Celery do core
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def criar_particoes_futuras():
+    """
+    Pré-cria as partições mensais das tabelas append-only (Postgres).
+
+    Executado diariamente via Celery Beat - idempotente.
+    """
+    from core.particionamento import criar_particoes_futuras as _criar
+
+    criadas = _criar()
+    logger.info(f"Partições garantidas: {len(criadas)}")
+    return criadas
+
+
+@shared_task
+def manter_tabelas_append_only():
+    """
+    Aplica a retenção das tabelas append-only (logs do bot, analytics,
+    histórico de pagamentos): arquiva, remove partições vencidas e
+    apaga o restante em lotes.
+    """
+    from core.particionamento import manter_tabelas_append_only as _manter
+
+    try:
+        resumo = _manter()
+        logger.info("Manutenção das tabelas append-only concluída")
+        return {
+            chave: valor['registros_removidos'] if isinstance(valor, dict) else valor
+            for chave, valor in resumo.items()
+        }
+    except Exception as e:
+        logger.error(f"Erro na manutenção das tabelas append-only: {str(e)}")
+
+
+@shared_task(bind=True)
+def importar_dados_task(self, empresa_id, caminho, entidades, aba=None, tamanho_lote=1000, retomar=False):
+    """
+    Importa uma planilha/CSV em background (upload pelo painel).
+
+    O progresso por lote é publicado no estado da task (PROGRESS) para a
+    tela acompanhar via AsyncResult.
+    """
+    from empresas.models import Empresa
+    from core.importacao import importar_arquivo
+
+    empresa = Empresa.objects.get(pk=empresa_id)
+
+    def progresso(entidade, resumo):
+        self.update_state(state='PROGRESS', meta={'entidade': entidade, **resumo})
+
+    resumos, caminho_erros = importar_arquivo(
+        empresa, caminho, entidades,
+        aba=aba,
+        tamanho_lote=tamanho_lote,
+        retomar=retomar,
+        progresso=progresso,
+    )
+    logger.info(f"Importação de {caminho} para empresa {empresa_id} concluída: {resumos}")
+    return {
+        'resumos': resumos,
+        'relatorio_erros': caminho_erros if any(r['erros'] for r in resumos) else None,
+    }
+
+
+@shared_task
+def enviar_emails_pendentes():
+    """
+    Envia a fila de emails (core/email_outbox.py) em lotes, uma conexão
+    SMTP por lote. Executado a cada minuto via Celery Beat e disparado
+    após o commit de quem enfileira (EMAIL_OUTBOX_DISPARO_IMEDIATO).
+    """
+    from core.email_outbox import processar_fila
+
+    return processar_fila()
+
+
+@shared_task
+def limpar_emails_enviados():
+    """Remove da fila os emails enviados há mais de EMAIL_OUTBOX_RETENCAO_DIAS"""
+    from core.email_outbox import limpar_enviados
+
+    apagados = limpar_enviados()
+    logger.info(f"Emails enviados removidos da fila: {apagados}")
+    return apagados
+
+
+@shared_task
+def exportar_dados_task(exportacao_id):
+    """
+    Gera uma exportação grande (core/exportacao.py) no MEDIA_ROOT e avisa
+    o usuário por email quando fica pronta.
+    """
+    from core.exportacao import executar
+    from core.models import Exportacao
+
+    exportacao = Exportacao.objects.select_related('empresa', 'usuario').get(pk=exportacao_id)
+    executar(exportacao)
+    logger.info(f"Exportação {exportacao_id} ({exportacao.tipo}.{exportacao.formato}): {exportacao.status}, {exportacao.linhas} linhas")
+    return exportacao.status
+
+
+@shared_task
+def limpar_exportacoes():
+    """Remove arquivos de exportação com mais de EXPORTACAO_RETENCAO_DIAS"""
+    from core.exportacao import limpar_antigas
+
+    apagadas = limpar_antigas()
+    logger.info(f"Exportações antigas removidas: {apagadas}")
+    return apagadas
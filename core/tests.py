@@ -563,3 +563,482 @@ class PasswordResetTest(TestCase):
         response = self.client.get(reverse('password_reset_complete'))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'password_reset_complete.html')
+
+
+class ParticionamentoTest(TestCase):
+    """Testes do gerenciamento de tabelas append-only (core/particionamento.py)"""
+
+    def setUp(self):
+        import tempfile
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Partição',
+            slug='empresa-particao',
+            telefone='11999999999',
+            email='particao@teste.com',
+            cnpj='22.333.444/0001-55'
+        )
+        self._diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self._diretorio.cleanup)
+        self.settings_override = override_settings(PARTICIONAMENTO_ARQUIVO_DIR=self._diretorio.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def _criar_log(self, dias_atras):
+        from agendamentos.models import LogMensagemBot
+        log = LogMensagemBot.objects.create(
+            empresa=self.empresa, telefone='5511900000000', mensagem_original='oi',
+            intencao_detectada='consultar', status='sucesso'
+        )
+        LogMensagemBot.objects.filter(pk=log.pk).update(criado_em=now() - timedelta(days=dias_atras))
+        return log
+
+    def test_nomes_e_limites_mensais(self):
+        """Partições são nomeadas por ano/mês e o mês seguinte vira corretamente o ano"""
+        from core.particionamento import inicio_mes, proximo_mes, nome_particao
+
+        dezembro = make_aware(datetime(2026, 12, 15, 10, 30))
+        self.assertEqual(inicio_mes(dezembro).day, 1)
+        self.assertEqual(proximo_mes(dezembro).year, 2027)
+        self.assertEqual(proximo_mes(dezembro).month, 1)
+        self.assertEqual(nome_particao('landing_pageview', inicio_mes(dezembro)), 'landing_pageview_p202612')
+
+    def test_sqlite_nao_cria_particoes(self):
+        """Sem Postgres não há partições a criar (fallback para DELETE em lotes)"""
+        from core.particionamento import criar_particoes_futuras, particionamento_disponivel
+
+        self.assertFalse(particionamento_disponivel())
+        self.assertEqual(criar_particoes_futuras(), [])
+
+    def test_purgar_apaga_em_lotes_e_arquiva(self):
+        """Registros vencidos são arquivados em JSONL.gz e removidos em lotes"""
+        import gzip
+        import json
+        from agendamentos.models import LogMensagemBot
+        from core.particionamento import get_config_tabela, purgar_antigos
+
+        antigos = [self._criar_log(200), self._criar_log(150), self._criar_log(120)]
+        recente = self._criar_log(1)
+
+        resultado = purgar_antigos(get_config_tabela('agendamentos.LogMensagemBot'), dias=90, batch_size=2)
+
+        self.assertEqual(resultado['registros_removidos'], 3)
+        self.assertEqual(list(LogMensagemBot.objects.values_list('pk', flat=True)), [recente.pk])
+
+        arquivados = []
+        for caminho in resultado['arquivos']:
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                arquivados.extend(json.loads(linha)['id'] for linha in arquivo)
+        self.assertEqual(sorted(arquivados), sorted(log.pk for log in antigos))
+
+    def test_purgar_dry_run_nao_remove(self):
+        """Dry-run apenas conta"""
+        from agendamentos.models import LogMensagemBot
+        from core.particionamento import get_config_tabela, purgar_antigos
+
+        self._criar_log(200)
+        resultado = purgar_antigos(get_config_tabela('agendamentos.LogMensagemBot'), dias=90, dry_run=True)
+
+        self.assertEqual(resultado['registros_removidos'], 1)
+        self.assertEqual(LogMensagemBot.objects.count(), 1)
+
+    def test_retencao_zero_nao_remove(self):
+        """Retenção 0 desativa o expurgo (padrão do histórico de pagamentos)"""
+        from agendamentos.models import LogMensagemBot
+        from core.particionamento import get_config_tabela, purgar_antigos, retencao_dias
+
+        self._criar_log(4000)
+        resultado = purgar_antigos(get_config_tabela('agendamentos.LogMensagemBot'), dias=0)
+
+        self.assertIsNone(resultado['limite'])
+        self.assertEqual(LogMensagemBot.objects.count(), 1)
+        self.assertEqual(retencao_dias(get_config_tabela('assinaturas.HistoricoPagamento')), 0)
+
+    def test_comando_gerenciar_particoes(self):
+        """Comando aplica a retenção de todas as tabelas"""
+        from io import StringIO
+        from django.core.management import call_command
+        from agendamentos.models import LogMensagemBot
+
+        self._criar_log(400)
+        saida = StringIO()
+        call_command('gerenciar_particoes', '--criar', '--purgar', stdout=saida)
+
+        self.assertEqual(LogMensagemBot.objects.count(), 0)
+        self.assertIn('agendamentos.LogMensagemBot', saida.getvalue())
+
+    def test_tabela_desconhecida(self):
+        """Tabelas fora do registro são rejeitadas"""
+        from core.particionamento import get_config_tabela
+
+        with self.assertRaises(LookupError):
+            get_config_tabela('clientes.Cliente')
+
+
+class OnboardingProgressoTest(TestCase):
+    """Testes do progresso de onboarding (query única + cache por empresa)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Onboarding',
+            slug='empresa-onboarding',
+            telefone='11999999999',
+            email='onb@teste.com',
+            endereco='Rua A, 1',
+            cnpj='33.444.555/0001-66'
+        )
+
+    def test_onboarding_completo_nao_consulta_banco(self):
+        from core.onboarding import calcular_progresso_onboarding
+
+        self.empresa.onboarding_completo = True
+        with self.assertNumQueries(0):
+            progresso = calcular_progresso_onboarding(self.empresa)
+        self.assertTrue(progresso['completo'])
+        self.assertEqual(progresso['progresso'], 100)
+
+    def test_uma_query_e_cache_invalidado_por_signal(self):
+        from core.onboarding import calcular_progresso_onboarding
+
+        with self.assertNumQueries(1):
+            progresso = calcular_progresso_onboarding(self.empresa)
+        self.assertEqual(progresso['progresso'], 15)
+        self.assertEqual(progresso['proximo_passo']['id'], 'whatsapp_conectado')
+
+        with self.assertNumQueries(0):
+            calcular_progresso_onboarding(self.empresa)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servico.objects.create(
+                empresa=self.empresa,
+                nome='Corte',
+                preco=Decimal('40.00'),
+                duracao_minutos=30
+            )
+
+        progresso = calcular_progresso_onboarding(self.empresa)
+        self.assertEqual(progresso['progresso'], 35)
+        self.assertTrue(progresso['steps'][2]['completo'])
+
+    def test_funil_em_lote_com_uma_query(self):
+        from core.onboarding import calcular_progresso_onboarding_em_lote, funil_onboarding
+
+        outra = Empresa.objects.create(
+            nome='Outra Empresa',
+            slug='outra-empresa',
+            telefone='11888888888',
+            email='outra@teste.com',
+            cnpj='44.555.666/0001-77',
+            whatsapp_conectado=True
+        )
+        Profissional.objects.create(empresa=outra, nome='Bia', telefone='11777777777')
+
+        empresas = Empresa.objects.filter(pk__in=[self.empresa.pk, outra.pk])
+        with self.assertNumQueries(1):
+            progressos = calcular_progresso_onboarding_em_lote(empresas)
+        self.assertEqual(progressos[self.empresa.pk]['progresso'], 15)
+        self.assertEqual(progressos[outra.pk]['progresso'], 50)
+
+        funil = funil_onboarding(empresas)
+        self.assertEqual(funil['total'], 2)
+        self.assertEqual(
+            [step['empresas'] for step in funil['steps']],
+            [1, 1, 0, 1, 0]
+        )
+
+
+class ImportacaoTest(TestCase):
+    """Testes da importação em lotes (core/importacao.py)"""
+
+    def setUp(self):
+        import tempfile
+
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Importação',
+            slug='empresa-importacao',
+            telefone='11999999999',
+            email='importacao@teste.com',
+            cnpj='44.555.666/0001-77'
+        )
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def _csv(self, nome, conteudo):
+        import os
+
+        caminho = os.path.join(self.diretorio.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_upsert_de_clientes_com_relatorio_de_erros(self):
+        from core.importacao import importar_arquivo
+
+        Cliente.objects.create(empresa=self.empresa, nome='Nome Antigo', telefone='11911112222')
+        caminho = self._csv('clientes.csv', (
+            'Nome;Telefone;E-mail\n'
+            'Maria Souza;(11) 91111-2222;maria@teste.com\n'
+            'João Lima;11933334444;\n'
+            'Sem Telefone;;\n'
+        ))
+
+        resumos, caminho_erros = importar_arquivo(self.empresa, caminho, ['clientes'], tamanho_lote=2)
+
+        self.assertEqual(resumos[0]['importadas'], 2)
+        self.assertEqual(resumos[0]['erros'], 1)
+        maria = Cliente.objects.get(empresa=self.empresa, telefone='11911112222')
+        self.assertEqual((maria.nome, maria.email), ('Maria Souza', 'maria@teste.com'))
+        self.assertEqual(Cliente.objects.get(telefone='11933334444').origem, 'importacao')
+        with open(caminho_erros, encoding='utf-8') as arquivo:
+            self.assertIn('telefone obrigatório', arquivo.read())
+
+    def test_agendamentos_resolvem_chaves_e_nao_duplicam(self):
+        from core.importacao import importar_arquivo
+
+        Servico.objects.create(empresa=self.empresa, nome='Corte', preco=Decimal('40.00'), duracao_minutos=30)
+        Cliente.objects.create(empresa=self.empresa, nome='Maria', telefone='11911112222')
+        caminho = self._csv('agendamentos.csv', (
+            'telefone,servico,data,hora,status\n'
+            '11911112222,corte,10/01/2025,09:00,realizado\n'
+            '11911112222,Corte,10/01/2025,09:00,realizado\n'
+            '11900000000,Corte,11/01/2025,09:00,\n'
+        ))
+
+        resumos, _ = importar_arquivo(self.empresa, caminho, ['agendamentos'])
+        self.assertEqual((resumos[0]['importadas'], resumos[0]['erros']), (1, 1))
+
+        agendamento = Agendamento.objects.get(empresa=self.empresa)
+        self.assertEqual(agendamento.status, 'concluido')
+        self.assertEqual(agendamento.valor_cobrado, Decimal('40.00'))
+        self.assertEqual(agendamento.data_hora_fim - agendamento.data_hora_inicio, timedelta(minutes=30))
+
+        # Reimportar o mesmo arquivo não duplica
+        importar_arquivo(self.empresa, caminho, ['agendamentos'])
+        self.assertEqual(Agendamento.objects.filter(empresa=self.empresa).count(), 1)
+
+    def test_retomar_do_checkpoint(self):
+        from core.importacao import Importador
+
+        caminho = self._csv('servicos.csv', (
+            'Serviço,Preço,Duração\n'
+            'Corte,"R$ 40,00",30\n'
+            'Barba,"R$ 25,00",20\n'
+        ))
+        importador = Importador(self.empresa, caminho, tamanho_lote=1)
+        importador.importar('servicos')
+        Servico.objects.filter(empresa=self.empresa, nome='Barba').delete()
+
+        resumo = Importador(self.empresa, caminho).importar('servicos', retomar=True)
+        self.assertTrue(resumo.get('concluida_antes'))
+        self.assertFalse(Servico.objects.filter(nome='Barba').exists())
+
+        # Checkpoint parcial: só as linhas depois da última gravada
+        importador._gravar_checkpoint('servicos', 2)
+        resumo = Importador(self.empresa, caminho).importar('servicos', retomar=True)
+        self.assertEqual((resumo['puladas'], resumo['importadas']), (1, 1))
+        self.assertEqual(Servico.objects.get(nome='Barba').preco, Decimal('25.00'))
+
+
+class EmailOutboxTest(TestCase):
+    """Testes da fila de saída de emails (core/email_outbox.py)"""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Email',
+            slug='empresa-email',
+            telefone='11999999999',
+            email='contato@empresa-email.com',
+            cnpj='44.555.666/0001-77',
+            origem_cadastro='manual'
+        )
+
+    def test_cadastro_enfileira_sem_enviar(self):
+        """Criar empresa grava o email renderizado na fila; nada sai pelo SMTP"""
+        from core.models import EmailPendente
+
+        email = EmailPendente.objects.get(assunto__startswith='Empresa Empresa Email')
+        self.assertEqual(email.status, 'pendente')
+        self.assertIn('Empresa Email', email.assunto)
+        self.assertTrue(email.corpo_html)
+        self.assertNotIn('<', email.corpo_texto.strip()[:1])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_lote_usa_uma_conexao(self):
+        from unittest.mock import patch
+        from django.core.mail.backends.locmem import EmailBackend
+        from core.email_outbox import enfileirar_email, processar_fila
+        from core.models import EmailPendente
+
+        for indice in range(5):
+            enfileirar_email([f'cliente{indice}@teste.com'], f'Aviso {indice}', html='<p>Olá</p>')
+
+        with patch.object(EmailBackend, 'open', autospec=True, return_value=True) as abrir:
+            resumo = processar_fila(tamanho_lote=10)
+
+        self.assertEqual(abrir.call_count, 1)
+        self.assertEqual(resumo, {'enviados': 6, 'falhas': 0, 'lotes': 1})
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(mail.outbox[1].alternatives[0][1], 'text/html')
+        self.assertFalse(EmailPendente.objects.exclude(status='enviado').exists())
+        self.assertEqual(processar_fila()['lotes'], 0)
+
+    def test_falha_reagenda_com_backoff_e_desiste(self):
+        from unittest.mock import patch
+        from django.core.mail.backends.locmem import EmailBackend
+        from core.email_outbox import enfileirar_email, processar_fila
+        from core.models import EmailPendente
+
+        EmailPendente.objects.all().delete()
+        email = enfileirar_email('falha@teste.com', 'Falha', html='<p>x</p>', chave='teste:falha')
+        self.assertIsNone(enfileirar_email('falha@teste.com', 'Falha', html='<p>x</p>', chave='teste:falha'))
+
+        with override_settings(EMAIL_OUTBOX_MAX_TENTATIVAS=2, EMAIL_OUTBOX_BACKOFF_BASE=60), \
+                patch.object(EmailBackend, 'send_messages', side_effect=OSError('SMTP fora')):
+            self.assertEqual(processar_fila()['falhas'], 1)
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.tentativas), ('pendente', 1))
+            self.assertGreater(email.proxima_tentativa, now() + timedelta(seconds=50))
+
+            # Ainda em backoff: não é tentado de novo
+            self.assertEqual(processar_fila()['lotes'], 0)
+
+            EmailPendente.objects.filter(pk=email.pk).update(proxima_tentativa=now())
+            processar_fila()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.tentativas), ('falhou', 2))
+            self.assertIn('SMTP fora', email.erro)
+
+    def test_backend_de_arquivo_para_testes_offline(self):
+        import os
+        import tempfile
+        from core.email_outbox import processar_fila
+
+        with tempfile.TemporaryDirectory() as pasta, override_settings(
+            EMAIL_OUTBOX_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+            EMAIL_FILE_PATH=pasta,
+        ):
+            self.assertEqual(processar_fila()['enviados'], 1)
+            arquivos = os.listdir(pasta)
+            self.assertEqual(len(arquivos), 1)
+            with open(os.path.join(pasta, arquivos[0])) as arquivo:
+                self.assertIn('contato@empresa-email.com', arquivo.read())
+
+
+@override_settings(EXPORTACAO_LIMITE_SINCRONO=1000)
+class ExportacaoTest(TestCase):
+    """Testes da exportação CSV/XLSX (core/exportacao.py)"""
+
+    def setUp(self):
+        import tempfile
+        from assinaturas.models import Assinatura, Plano
+
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Exportação',
+            slug='empresa-exportacao',
+            telefone='11999999999',
+            email='exportacao@teste.com',
+            cnpj='44.555.666/0002-58'
+        )
+        outra = Empresa.objects.create(
+            nome='Outra Empresa',
+            slug='outra-empresa-exportacao',
+            telefone='11888888888',
+            email='outra@teste.com',
+            cnpj='44.555.666/0003-39'
+        )
+        plano = Plano.objects.create(
+            nome='profissional', preco_mensal=Decimal('199.90'), trial_dias=7, permite_integracao_contabil=True
+        )
+        Assinatura.objects.create(
+            empresa=self.empresa, plano=plano, status='ativa', data_expiracao=now() + timedelta(days=30)
+        )
+        self.usuario = Usuario.objects.create_user(
+            username='contador', email='dono@exportacao.com', password='senha123', empresa=self.empresa
+        )
+
+        servico = Servico.objects.create(empresa=self.empresa, nome='Corte', preco=Decimal('40.00'), duracao_minutos=30)
+        cliente = Cliente.objects.create(empresa=self.empresa, nome='Maria; Souza', telefone='11911112222')
+        Cliente.objects.create(empresa=outra, nome='Cliente de Outra', telefone='11911112222')
+        inicio = make_aware(datetime(2025, 3, 10, 14, 30))
+        for dias, status in ((0, 'concluido'), (40, 'pendente')):
+            Agendamento.objects.create(
+                empresa=self.empresa, cliente=cliente, servico=servico, status=status,
+                data_hora_inicio=inicio + timedelta(days=dias),
+                data_hora_fim=inicio + timedelta(days=dias, minutes=30),
+                valor_cobrado=Decimal('40.50'),
+            )
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def test_csv_com_colunas_periodo_e_empresa(self):
+        import csv
+        import io
+        from core.exportacao import gerar_csv, validar_pedido
+
+        colunas, filtros = validar_pedido(
+            'agendamentos', 'csv', ['cliente', 'data_hora_inicio', 'status', 'valor_cobrado'],
+            inicio='2025-03-10', fim='2025-03-31',
+        )
+        conteudo = ''.join(gerar_csv(self.empresa, 'agendamentos', colunas, filtros))
+
+        self.assertTrue(conteudo.startswith('\ufeff'))
+        linhas = list(csv.reader(io.StringIO(conteudo.lstrip('\ufeff')), delimiter=';'))
+        self.assertEqual(linhas, [
+            ['Início', 'Cliente', 'Status', 'Valor cobrado'],
+            ['10/03/2025 14:30', 'Maria; Souza', 'Concluído', '40,50'],
+        ])
+
+        clientes = ''.join(gerar_csv(self.empresa, 'clientes', ['nome']))
+        self.assertNotIn('Cliente de Outra', clientes)
+
+    def test_view_xlsx_na_hora_e_job_acima_do_limite(self):
+        import io
+        from unittest.mock import patch
+        from openpyxl import load_workbook
+        from core.models import EmailPendente, Exportacao
+
+        self.client.force_login(self.usuario)
+        url = reverse('exportacoes')
+        pedido = {'tipo': 'agendamentos', 'formato': 'xlsx', 'colunas_agendamentos': ['data_hora_inicio', 'valor_cobrado']}
+
+        resposta = self.client.post(url, pedido)
+        self.assertEqual(resposta.status_code, 200)
+        folha = load_workbook(io.BytesIO(b''.join(resposta.streaming_content))).active
+        linhas = list(folha.iter_rows(values_only=True))
+        self.assertEqual(linhas[0], ('Início', 'Valor cobrado'))
+        self.assertEqual(linhas[1], (datetime(2025, 3, 10, 14, 30), 40.5))
+        self.assertFalse(Exportacao.objects.exists())
+
+        with override_settings(EXPORTACAO_LIMITE_SINCRONO=1, MEDIA_ROOT=self.diretorio.name), \
+                patch('core.exportacao_views.exportar_dados_task.delay', side_effect=Exception('sem broker')):
+            resposta = self.client.post(url, {**pedido, 'formato': 'csv'})
+            self.assertRedirects(resposta, url, fetch_redirect_response=False)
+
+            exportacao = Exportacao.objects.get(empresa=self.empresa)
+            self.assertEqual((exportacao.status, exportacao.linhas), ('concluida', 2))
+            self.assertTrue(EmailPendente.objects.filter(chave=f'exportacao:{exportacao.pk}').exists())
+            download = self.client.get(reverse('exportacao_baixar', args=[exportacao.pk]))
+            self.assertIn('40,50', b''.join(download.streaming_content).decode('utf-8'))
+
+    def test_texto_com_formula_sai_escapado(self):
+        import io
+        from openpyxl import load_workbook
+        from core.exportacao import escrever_xlsx, gerar_csv
+
+        Cliente.objects.create(empresa=self.empresa, nome='=HYPERLINK("http://x.test","Abrir")', telefone='-11911112222')
+
+        csv_texto = ''.join(gerar_csv(self.empresa, 'clientes', ['nome', 'telefone']))
+        self.assertIn('\'=HYPERLINK', csv_texto)
+        self.assertIn("'-11911112222", csv_texto)
+
+        destino = io.BytesIO()
+        escrever_xlsx(destino, self.empresa, 'clientes', ['nome', 'telefone'])
+        destino.seek(0)
+        folha = load_workbook(destino).active
+        celulas = [linha for linha in folha.iter_rows(min_row=2) if str(linha[0].value).startswith("'=")]
+        self.assertEqual(len(celulas), 1)
+        self.assertEqual(celulas[0][0].data_type, 's')
+        self.assertEqual(celulas[0][1].value, "'-11911112222")
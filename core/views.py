@@ -98,7 +98,7 @@ def logout_view(request):
 @login_required
 def dashboard_view(request):
     """Dashboard principal - Command Center do negócio"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         messages.error(request, 'Usuário não associado a nenhuma empresa.')
         return redirect('logout')
@@ -46,7 +46,7 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    empresa = request.user.empresa
+    empresa = request.empresa
     if not empresa:
         messages.error(request, 'Usuario nao associado a nenhuma empresa.')
         return redirect('logout')
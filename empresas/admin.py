@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
-    Empresa, Servico, Profissional, HorarioFuncionamento, DataEspecial,
-    ConfiguracaoWhatsApp, WhatsAppInstance
+    Empresa, Organizacao, Servico, Profissional, HorarioFuncionamento, DataEspecial,
+    ConfiguracaoWhatsApp, WhatsAppInstance, MensagemWhatsApp
 )
 
 
@@ -23,8 +23,8 @@ class AssinaturaInline(admin.StackedInline):
 
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'cnpj', 'cidade', 'ativa', 'is_demo', 'tem_assinatura')
-    list_filter = ('ativa', 'is_demo', 'onboarding_completo')
+    list_display = ('nome', 'cnpj', 'cidade', 'organizacao', 'ativa', 'is_demo', 'tem_assinatura')
+    list_filter = ('ativa', 'is_demo', 'onboarding_completo', 'organizacao')
     search_fields = ('nome', 'cnpj')
     list_editable = ('is_demo',)
     inlines = [AssinaturaInline]
@@ -47,6 +47,16 @@ class EmpresaAdmin(admin.ModelAdmin):
             return format_html('<span style="color: red;">✗ Sem assinatura</span>')
     tem_assinatura.short_description = 'Assinatura'
 
+@admin.register(Organizacao)
+class OrganizacaoAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'matriz', 'total_unidades', 'criada_em')
+    search_fields = ('nome', 'matriz__nome')
+    raw_id_fields = ('matriz',)
+
+    def total_unidades(self, obj):
+        return obj.unidades.count()
+    total_unidades.short_description = 'Unidades'
+
 @admin.register(Servico)
 class ServicoAdmin(admin.ModelAdmin):
     list_display = ('nome', 'empresa', 'preco', 'duracao_minutos')
@@ -180,3 +190,23 @@ class WhatsAppInstanceAdmin(admin.ModelAdmin):
             'classes': ('collapse',),
         }),
     )
+
+
+@admin.register(MensagemWhatsApp)
+class MensagemWhatsAppAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'tipo', 'numero', 'instance_name', 'status', 'tentativas', 'proxima_tentativa', 'enviada_em')
+    list_filter = ('status', 'tipo')
+    search_fields = ('numero', 'instance_name', 'message_id', 'empresa__nome')
+    ordering = ('-criado_em',)
+    raw_id_fields = ('empresa', 'agendamento')
+    readonly_fields = ('criado_em', 'enviada_em', 'entregue_em', 'message_id', 'erro', 'tentativas')
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar (volta para a fila)')
+    def reenviar(self, request, queryset):
+        from django.utils import timezone
+
+        total = queryset.filter(status='falhou').update(
+            status='pendente', tentativas=0, proxima_tentativa=timezone.now()
+        )
+        self.message_user(request, f'{total} mensagem(ns) devolvida(s) para a fila.')
@@ -0,0 +1,15 @@
+from .organizacoes import unidades_acessiveis
+
+
+def unidades(request):
+    """Unidades que o usuário pode abrir, para o seletor do menu lateral (multi-unidades)"""
+    usuario = getattr(request, 'user', None)
+    if not (usuario and usuario.is_authenticated and getattr(usuario, 'acessa_unidades', False)):
+        return {}
+    lista = unidades_acessiveis(usuario, usuario.empresa)
+    if not lista:
+        return {}
+    return {
+        'unidades_usuario': lista,
+        'unidade_ativa_id': getattr(request, 'empresa', usuario.empresa).pk,
+    }
@@ -0,0 +1,357 @@
+"""
+Fila de envio de mensagens WhatsApp com limite por instância
+
+Antes, lembretes e avisos de trial chamavam enviar_mensagem_texto num
+loop: uma empresa com 300 agendamentos amanhã disparava 300 envios
+seguidos pela mesma instância (risco de bloqueio no WhatsApp e de
+sobrecarregar a Evolution), e as outras empresas esperavam a vez.
+
+Agora quem quer enviar grava MensagemWhatsApp (enfileirar) e a task
+empresas.tasks.processar_fila_whatsapp (Beat, a cada minuto) envia:
+
+- Token bucket por instância: até WHATSAPP_FILA_RAJADA mensagens de uma
+  vez e WHATSAPP_FILA_POR_MINUTO no ritmo contínuo. O estado dos baldes
+  fica no cache entre as execuções
+- Rodadas justas: cada rodada pega no máximo RAJADA mensagens de cada
+  instância (ROW_NUMBER por instância, uma query) e intercala as empresas
+  (A1, B1, C1, A2, ...), começando por uma instância diferente a cada rodada
+- WHATSAPP_FILA_CONCORRENCIA envios simultâneos no total
+- Falha: nova tentativa com backoff exponencial até
+  WHATSAPP_FILA_MAX_TENTATIVAS; depois fica como "falhou"
+- Um lembrete de cada tipo por agendamento (chave única agendamento +
+  tipo): enfileirar de novo é ignorado
+- Só um processador por vez (trava no cache); cada execução dura no
+  máximo WHATSAPP_FILA_DURACAO segundos e nunca dorme esperando token:
+  quando todas as instâncias com mensagens estão sem token, a execução
+  termina e a task se reagenda (apply_async com countdown) para quando
+  o próximo token sair, sem prender um worker do Celery
+
+Entrega: os eventos MESSAGES_UPDATE do webhook (registrar_acks) avançam o
+status para entregue/lida pelo message_id devolvido no envio.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .models import ConfiguracaoWhatsApp, MensagemWhatsApp, StatusMensagemWhatsApp
+
+logger = logging.getLogger(__name__)
+
+CHAVE_TRAVA = 'whatsapp:fila:trava'
+CHAVE_BALDES = 'whatsapp:fila:baldes'
+CHAVE_REAGENDADA = 'whatsapp:fila:reagendada'
+
+# Reserva das mensagens em envio (processador que morreu libera depois disso)
+RESERVA = timedelta(minutes=5)
+
+# Status de entrega na ordem: um ack nunca faz o status voltar
+ORDEM_STATUS = [
+    StatusMensagemWhatsApp.PENDENTE,
+    StatusMensagemWhatsApp.ENVIANDO,
+    StatusMensagemWhatsApp.ENVIADA,
+    StatusMensagemWhatsApp.ENTREGUE,
+    StatusMensagemWhatsApp.LIDA,
+]
+
+# Status do MESSAGES_UPDATE (texto na v2, número na v1) -> status da mensagem
+ACKS = {
+    'SERVER_ACK': StatusMensagemWhatsApp.ENVIADA,
+    'DELIVERY_ACK': StatusMensagemWhatsApp.ENTREGUE,
+    'READ': StatusMensagemWhatsApp.LIDA,
+    'PLAYED': StatusMensagemWhatsApp.LIDA,
+    '2': StatusMensagemWhatsApp.ENVIADA,
+    '3': StatusMensagemWhatsApp.ENTREGUE,
+    '4': StatusMensagemWhatsApp.LIDA,
+    '5': StatusMensagemWhatsApp.LIDA,
+}
+
+
+def _config(nome, padrao):
+    return getattr(settings, f'WHATSAPP_FILA_{nome}', padrao)
+
+
+def normalizar_numero(telefone):
+    """Só dígitos, com DDI 55"""
+    numero = ''.join(c for c in telefone if c.isdigit())
+    return numero if numero.startswith('55') else f'55{numero}'
+
+
+def montar_mensagem(empresa_id, instance_name, numero, mensagem, tipo, agendamento_id=None):
+    """MensagemWhatsApp pronta e ainda não gravada (ver enfileirar)"""
+    return MensagemWhatsApp(
+        empresa_id=empresa_id,
+        agendamento_id=agendamento_id,
+        tipo=tipo,
+        instance_name=instance_name,
+        numero=normalizar_numero(numero),
+        mensagem=mensagem,
+        proxima_tentativa=timezone.now(),
+    )
+
+
+def enfileirar(mensagens, tamanho_lote=500):
+    """
+    Grava as mensagens (de montar_mensagem) com bulk_create. Lembrete já
+    enfileirado para o mesmo agendamento e tipo é ignorado.
+
+    Returns:
+        int: quantas foram passadas
+    """
+    mensagens = list(mensagens)
+    if mensagens:
+        MensagemWhatsApp.objects.bulk_create(mensagens, batch_size=tamanho_lote, ignore_conflicts=True)
+    return len(mensagens)
+
+
+# ==========================================
+# LIMITE POR INSTÂNCIA
+# ==========================================
+
+class Balde:
+    """Token bucket de uma instância"""
+
+    def __init__(self, tokens, atualizado, capacidade, por_segundo):
+        self.tokens = tokens
+        self.atualizado = atualizado
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+
+    def recarregar(self, agora):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.por_segundo)
+        self.atualizado = agora
+
+    def retirar(self, quantidade):
+        """Retira até ``quantidade`` tokens inteiros; retorna quantos saíram"""
+        retirados = min(quantidade, int(self.tokens))
+        self.tokens -= retirados
+        return retirados
+
+    def espera(self):
+        """Segundos até o próximo token"""
+        return max(0.0, (1 - self.tokens) / self.por_segundo)
+
+
+class Baldes:
+    """Baldes de todas as instâncias, persistidos no cache entre execuções"""
+
+    def __init__(self):
+        self.capacidade = _config('RAJADA', 3)
+        self.por_segundo = _config('POR_MINUTO', 20) / 60
+        self._estado = cache.get(CHAVE_BALDES) or {}
+        self._baldes = {}
+
+    def de(self, instance_name, agora):
+        balde = self._baldes.get(instance_name)
+        if balde is None:
+            tokens, atualizado = self._estado.get(instance_name, (self.capacidade, agora))
+            balde = self._baldes[instance_name] = Balde(tokens, atualizado, self.capacidade, self.por_segundo)
+        balde.recarregar(agora)
+        return balde
+
+    def salvar(self):
+        self._estado.update({nome: (b.tokens, b.atualizado) for nome, b in self._baldes.items()})
+        # Balde cheio há mais de uma hora não precisa ficar guardado
+        limite = time.time() - 3600
+        self._estado = {nome: valor for nome, valor in self._estado.items() if valor[1] > limite}
+        cache.set(CHAVE_BALDES, self._estado, 3600)
+
+
+# ==========================================
+# PROCESSAMENTO
+# ==========================================
+
+def _candidatas(por_instancia):
+    """
+    Até ``por_instancia`` mensagens vencidas de cada instância, na ordem
+    da fila (uma query): [(id, instance_name, posicao)]
+    """
+    return list(
+        MensagemWhatsApp.objects
+        .filter(
+            status__in=[StatusMensagemWhatsApp.PENDENTE, StatusMensagemWhatsApp.ENVIANDO],
+            proxima_tentativa__lte=timezone.now(),
+        )
+        .annotate(posicao=Window(
+            RowNumber(),
+            partition_by=[F('instance_name')],
+            order_by=[F('proxima_tentativa').asc(), F('id').asc()],
+        ))
+        .filter(posicao__lte=por_instancia)
+        .order_by()
+        .values_list('id', 'instance_name', 'posicao')
+    )
+
+
+def _intercalar(candidatas, baldes, rodada, agora):
+    """
+    Escolhe as mensagens da rodada respeitando o balde de cada instância e
+    intercala as instâncias, girando quem começa a cada rodada.
+
+    Returns:
+        (ids em ordem de envio, segundos até alguma instância com mensagens ter token)
+    """
+    por_instancia = {}
+    for id_, instance_name, posicao in sorted(candidatas, key=lambda c: c[2]):
+        por_instancia.setdefault(instance_name, []).append(id_)
+
+    instancias = sorted(por_instancia)
+    if instancias:
+        inicio = rodada % len(instancias)
+        instancias = instancias[inicio:] + instancias[:inicio]
+
+    filas, espera = [], None
+    for instance_name in instancias:
+        balde = baldes.de(instance_name, agora)
+        liberadas = balde.retirar(len(por_instancia[instance_name]))
+        filas.append(por_instancia[instance_name][:liberadas])
+        if liberadas < len(por_instancia[instance_name]):
+            espera = balde.espera() if espera is None else min(espera, balde.espera())
+
+    ordem = [fila[i] for i in range(max(map(len, filas), default=0)) for fila in filas if i < len(fila)]
+    return ordem, espera
+
+
+def _servicos(instancias, servicos):
+    """EvolutionAPIService por instance_name (carrega só as que faltam)"""
+    from .services import EvolutionAPIService
+
+    faltantes = set(instancias) - set(servicos)
+    if faltantes:
+        for config in ConfiguracaoWhatsApp.objects.filter(instance_name__in=faltantes):
+            servicos[config.instance_name] = EvolutionAPIService(config)
+    return servicos
+
+
+def _enviar(mensagem, servico):
+    if servico is None:
+        return {'success': False, 'error': f'Instância {mensagem.instance_name} não encontrada'}
+    try:
+        return servico.enviar_mensagem_texto(mensagem.numero, mensagem.mensagem)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def _aplicar_resultado(mensagem, resultado, agora):
+    if resultado.get('success'):
+        mensagem.status = StatusMensagemWhatsApp.ENVIADA
+        mensagem.message_id = resultado.get('message_id', '')
+        mensagem.enviada_em = agora
+        mensagem.erro = ''
+        return True
+
+    mensagem.tentativas += 1
+    mensagem.erro = str(resultado.get('error', 'Erro desconhecido'))[:2000]
+    if mensagem.tentativas >= _config('MAX_TENTATIVAS', 4):
+        mensagem.status = StatusMensagemWhatsApp.FALHOU
+        logger.error(f"[WhatsApp] Desistindo da mensagem #{mensagem.pk} após {mensagem.tentativas} tentativas: {mensagem.erro}")
+    else:
+        mensagem.status = StatusMensagemWhatsApp.PENDENTE
+        espera = _config('BACKOFF_BASE', 60) * 2 ** (mensagem.tentativas - 1)
+        mensagem.proxima_tentativa = agora + timedelta(seconds=espera)
+    return False
+
+
+def processar_fila(duracao=None):
+    """
+    Envia as mensagens vencidas em rodadas até esvaziar a fila, acabar
+    o tempo (``duracao`` segundos) ou faltar token em todas as instâncias.
+
+    Returns:
+        dict: {'enviadas', 'falhas', 'rodadas'} e, se parou por falta de
+              token, 'espera' (segundos até o próximo); ou {'ocupada': True}
+    """
+    duracao = duracao if duracao is not None else _config('DURACAO', 50)
+    if not cache.add(CHAVE_TRAVA, 1, duracao + 60):
+        return {'ocupada': True}
+
+    resumo = {'enviadas': 0, 'falhas': 0, 'rodadas': 0}
+    fim = time.monotonic() + duracao
+    baldes = Baldes()
+    servicos = {}
+    try:
+        with ThreadPoolExecutor(max_workers=_config('CONCORRENCIA', 8)) as executor:
+            while time.monotonic() < fim:
+                candidatas = _candidatas(baldes.capacidade)
+                if not candidatas:
+                    break
+                ids, espera = _intercalar(candidatas, baldes, resumo['rodadas'], time.time())
+                if not ids:
+                    # Todas as instâncias com mensagens estão sem token: quem
+                    # chamou reagenda (empresas.tasks.processar_fila_whatsapp)
+                    if espera is not None:
+                        resumo['espera'] = espera
+                    break
+                resumo['rodadas'] += 1
+
+                agora = timezone.now()
+                MensagemWhatsApp.objects.filter(pk__in=ids).update(
+                    status=StatusMensagemWhatsApp.ENVIANDO, proxima_tentativa=agora + RESERVA
+                )
+                por_id = MensagemWhatsApp.objects.in_bulk(ids)
+                mensagens = [por_id[id_] for id_ in ids if id_ in por_id]
+                _servicos({m.instance_name for m in mensagens}, servicos)
+
+                resultados = executor.map(lambda m: _enviar(m, servicos.get(m.instance_name)), mensagens)
+                agora = timezone.now()
+                for mensagem, resultado in zip(mensagens, resultados):
+                    if _aplicar_resultado(mensagem, resultado, agora):
+                        resumo['enviadas'] += 1
+                    else:
+                        resumo['falhas'] += 1
+                MensagemWhatsApp.objects.bulk_update(
+                    mensagens,
+                    ['status', 'message_id', 'enviada_em', 'erro', 'tentativas', 'proxima_tentativa'],
+                    batch_size=500,
+                )
+    finally:
+        baldes.salvar()
+        cache.delete(CHAVE_TRAVA)
+
+    if resumo['rodadas']:
+        logger.info(f"[WhatsApp] Fila: {resumo['enviadas']} enviadas, {resumo['falhas']} falhas")
+    return resumo
+
+
+# ==========================================
+# ENTREGA (ACKS DO WEBHOOK)
+# ==========================================
+
+def registrar_acks(dados):
+    """
+    Atualiza o status de entrega a partir do data de um MESSAGES_UPDATE
+    (um item ou lista). Retorna quantas mensagens mudaram.
+    """
+    itens = dados if isinstance(dados, list) else [dados]
+    agora = timezone.now()
+    alteradas = 0
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        chave = item.get('key') if isinstance(item.get('key'), dict) else {}
+        message_id = item.get('keyId') or chave.get('id') or item.get('messageId')
+        status = ACKS.get(str(item.get('status', '')).upper())
+        if not message_id or not isinstance(message_id, str):
+            continue
+
+        mensagens = MensagemWhatsApp.objects.filter(message_id=message_id)
+        if str(item.get('status', '')).upper() == 'ERROR':
+            alteradas += mensagens.exclude(status=StatusMensagemWhatsApp.LIDA).update(
+                status=StatusMensagemWhatsApp.FALHOU, erro='Falha de entrega informada pelo WhatsApp'
+            )
+            continue
+        if status is None:
+            continue
+
+        campos = {'status': status}
+        if status in (StatusMensagemWhatsApp.ENTREGUE, StatusMensagemWhatsApp.LIDA):
+            campos['entregue_em'] = Coalesce(F('entregue_em'), agora)
+        anteriores = ORDEM_STATUS[:ORDEM_STATUS.index(status)]
+        alteradas += mensagens.filter(status__in=anteriores).update(**campos)
+    return alteradas
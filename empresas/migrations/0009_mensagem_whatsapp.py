@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agendamentos', '0009_feed_calendario'),
+        ('empresas', '0008_alter_profissional_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MensagemWhatsApp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(help_text='Ex: lembrete_1_dia, trial_3_dias', max_length=30)),
+                ('instance_name', models.CharField(help_text='Instância que envia', max_length=100)),
+                ('numero', models.CharField(max_length=20)),
+                ('mensagem', models.TextField()),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('enviando', 'Enviando'), ('enviada', 'Enviada'), ('entregue', 'Entregue'), ('lida', 'Lida'), ('falhou', 'Falhou')], default='pendente', max_length=20)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(help_text='Pendente: quando pode ser enviada. Enviando: fim da reserva')),
+                ('message_id', models.CharField(blank=True, help_text='Id da mensagem na Evolution (acks)', max_length=100)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('enviada_em', models.DateTimeField(blank=True, null=True)),
+                ('entregue_em', models.DateTimeField(blank=True, null=True)),
+                ('agendamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mensagens_whatsapp', to='agendamentos.agendamento')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mensagens_whatsapp', to='empresas.empresa')),
+            ],
+            options={
+                'verbose_name': 'Mensagem WhatsApp',
+                'verbose_name_plural': 'Mensagens WhatsApp',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'proxima_tentativa'], name='empresas_me_status_883eb7_idx'), models.Index(fields=['message_id'], name='empresas_me_message_ef8f28_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('agendamento__isnull', False)), fields=('agendamento', 'tipo'), name='mensagem_whatsapp_agendamento_tipo')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('empresas', '0009_mensagem_whatsapp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organizacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('matriz', models.OneToOneField(help_text='Unidade cuja assinatura vale para a rede', on_delete=django.db.models.deletion.CASCADE, related_name='organizacao_matriz', to='empresas.empresa')),
+            ],
+            options={
+                'verbose_name': 'Organização',
+                'verbose_name_plural': 'Organizações',
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='organizacao',
+            field=models.ForeignKey(blank=True, help_text='Rede à qual esta unidade (filial) pertence', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unidades', to='empresas.organizacao'),
+        ),
+    ]
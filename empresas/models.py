@@ -31,6 +31,14 @@ class Empresa(models.Model):
 
     # Controle
     ativa = models.BooleanField(default=True)
+    organizacao = models.ForeignKey(
+        'Organizacao',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='unidades',
+        help_text="Rede à qual esta unidade (filial) pertence"
+    )
     is_demo = models.BooleanField(
         default=False,
         help_text="Empresa de demonstração - não aparece nas métricas do Backoffice"
@@ -105,9 +113,43 @@ class Empresa(models.Model):
                 return assinatura
         except Exception:
             pass
+        # Filial sem assinatura própria usa a da matriz da rede
+        if self.organizacao_id and self.organizacao.matriz_id != self.pk:
+            return self.organizacao.matriz.assinatura_ativa
         return None
 
 
+class Organizacao(models.Model):
+    """
+    Rede de unidades (filiais) de um mesmo dono
+
+    Liberada pelo recurso Plano.permite_multi_unidades da assinatura da
+    matriz. Usuários com Usuario.acessa_unidades alternam entre as unidades
+    sem novo login; o painel consolidado fica em empresas/organizacoes.py.
+    """
+    nome = models.CharField(max_length=255)
+    matriz = models.OneToOneField(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='organizacao_matriz',
+        help_text="Unidade cuja assinatura vale para a rede"
+    )
+    criada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Organização'
+        verbose_name_plural = 'Organizações'
+        ordering = ['nome']
+
+    def __str__(self):
+        return self.nome
+
+    @property
+    def permite_multi_unidades(self):
+        assinatura = self.matriz.assinatura_ativa
+        return bool(assinatura and assinatura.plano.permite_multi_unidades)
+
+
 class Servico(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='servicos')
     nome = models.CharField(max_length=255)
@@ -395,3 +437,73 @@ class WhatsAppInstance(models.Model):
 
     def __str__(self):
         return f"{self.empresa.nome} ({self.instance_name})"
+
+
+class StatusMensagemWhatsApp(models.TextChoices):
+    PENDENTE = 'pendente', 'Pendente'
+    ENVIANDO = 'enviando', 'Enviando'
+    ENVIADA = 'enviada', 'Enviada'
+    ENTREGUE = 'entregue', 'Entregue'
+    LIDA = 'lida', 'Lida'
+    FALHOU = 'falhou', 'Falhou'
+
+
+class MensagemWhatsApp(models.Model):
+    """
+    Fila de envio de mensagens WhatsApp
+
+    Lembretes e avisos não chamam a Evolution API direto: gravam aqui e a
+    task processar_fila_whatsapp envia com limite por instância e entre
+    empresas de forma intercalada (empresas/fila_whatsapp.py). O status de
+    entrega vem dos eventos MESSAGES_UPDATE do webhook.
+    """
+    empresa = models.ForeignKey(
+        Empresa,
+        on_delete=models.CASCADE,
+        related_name='mensagens_whatsapp'
+    )
+    agendamento = models.ForeignKey(
+        'agendamentos.Agendamento',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='mensagens_whatsapp'
+    )
+    tipo = models.CharField(max_length=30, help_text='Ex: lembrete_1_dia, trial_3_dias')
+    instance_name = models.CharField(max_length=100, help_text='Instância que envia')
+    numero = models.CharField(max_length=20)
+    mensagem = models.TextField()
+
+    status = models.CharField(
+        max_length=20, choices=StatusMensagemWhatsApp.choices, default=StatusMensagemWhatsApp.PENDENTE
+    )
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(
+        help_text='Pendente: quando pode ser enviada. Enviando: fim da reserva'
+    )
+    message_id = models.CharField(max_length=100, blank=True, help_text='Id da mensagem na Evolution (acks)')
+    erro = models.TextField(blank=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    enviada_em = models.DateTimeField(null=True, blank=True)
+    entregue_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Mensagem WhatsApp'
+        verbose_name_plural = 'Mensagens WhatsApp'
+        ordering = ['-criado_em']
+        constraints = [
+            # Um lembrete de cada tipo por agendamento
+            models.UniqueConstraint(
+                fields=['agendamento', 'tipo'],
+                condition=models.Q(agendamento__isnull=False),
+                name='mensagem_whatsapp_agendamento_tipo'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa']),  # Fila
+            models.Index(fields=['message_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} -> {self.numero} ({self.get_status_display()})"
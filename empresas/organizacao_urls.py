@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import organizacao_views
+
+urlpatterns = [
+    path('unidades/', organizacao_views.painel_organizacao, name='painel_organizacao'),
+    path('unidades/trocar/', organizacao_views.trocar_unidade, name='trocar_unidade'),
+]
@@ -0,0 +1,78 @@
+"""
+Views das organizações multi-unidade (empresas/organizacoes.py)
+
+Liberadas pelo recurso Plano.permite_multi_unidades da matriz: o acesso
+é decidido por unidades_acessiveis(), não pelo plano da unidade aberta.
+"""
+from datetime import date
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+
+from .organizacoes import CHAVE_SESSAO, painel, unidade_permitida, unidades_acessiveis
+
+
+@login_required
+@require_POST
+def trocar_unidade(request):
+    """Abre outra unidade da organização sem novo login (fica na sessão)"""
+    origem = getattr(request.user, 'empresa', None)
+    if origem is None:
+        messages.error(request, 'Você precisa estar vinculado a uma empresa.')
+        return redirect('dashboard')
+    try:
+        unidade_id = int(request.POST.get('unidade', ''))
+    except ValueError:
+        unidade_id = None
+
+    if unidade_id == origem.pk:
+        request.session.pop(CHAVE_SESSAO, None)
+    elif unidade_id and unidade_permitida(request.user, origem, unidade_id):
+        request.session[CHAVE_SESSAO] = unidade_id
+    else:
+        messages.error(request, 'Unidade não disponível para o seu usuário.')
+
+    destino = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(destino, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        destino = 'dashboard'
+    return redirect(destino)
+
+
+@login_required
+def painel_organizacao(request):
+    """
+    Painel consolidado da rede: indicadores do período de cada unidade e
+    o total. ?formato=json devolve os mesmos dados.
+    """
+    origem = getattr(request.user, 'empresa', None)
+    # Acesso multi-unidade do usuário + plano da matriz (unidades())
+    if not unidades_acessiveis(request.user, origem):
+        messages.error(request, 'Seu usuário ou o plano da organização não dá acesso às unidades.')
+        return redirect('dashboard')
+
+    hoje = timezone.localdate()
+    try:
+        inicio = date.fromisoformat(request.GET['inicio']) if request.GET.get('inicio') else hoje.replace(day=1)
+        fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else hoje
+    except ValueError:
+        inicio, fim = hoje.replace(day=1), hoje
+    if fim < inicio:
+        inicio, fim = fim, inicio
+
+    dados = painel(origem.organizacao_id, inicio, fim)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(dados)
+
+    context = {
+        'empresa': request.empresa,
+        'organizacao': origem.organizacao,
+        'inicio': inicio,
+        'fim': fim,
+        'dados': dados,
+    }
+    return render(request, 'empresas/painel_organizacao.html', context)
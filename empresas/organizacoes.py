@@ -0,0 +1,240 @@
+"""
+Organizações com várias unidades (filiais), liberadas por
+Plano.permite_multi_unidades
+
+Antes cada Empresa só era vista isoladamente, e um relatório da rede
+custava N vezes as queries do dashboard.
+
+Aqui:
+- unidades(): unidades ativas da organização e se o plano da matriz
+  libera o recurso, no cache por organização
+- unidades_acessiveis(): unidades que o usuário pode abrir. A unidade
+  escolhida fica na sessão e o UnidadeAtivaMiddleware (core/middleware.py)
+  a expõe em request.empresa, que as telas usam: todas passam a mostrar a
+  unidade sem novo login (request.user continua com a empresa de cadastro)
+- painel(): indicadores do período de todas as unidades com uma query
+  agrupada (GROUP BY empresa_id) por assunto, com totais e quebra por
+  unidade, no cache por organização
+
+As chaves levam a versão da organização (invalidar(), chamado pelos
+signals de empresas/signals.py) e, no painel, a versão da ocupação de
+cada unidade, que muda a cada agendamento salvo. Clientes e lançamentos
+entram com até ORGANIZACOES_CACHE_TTL de atraso.
+"""
+
+import hashlib
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Unidade escolhida pelo usuário (request.session)
+CHAVE_SESSAO = 'unidade_ativa_id'
+
+
+def _ttl():
+    return getattr(settings, 'ORGANIZACOES_CACHE_TTL', 300)
+
+
+def _chave_versao(organizacao_id):
+    return f'organizacoes:{organizacao_id}:versao'
+
+
+def versao(organizacao_id):
+    versao_atual = cache.get(_chave_versao(organizacao_id))
+    if versao_atual is None:
+        versao_atual = 1
+        cache.add(_chave_versao(organizacao_id), versao_atual, None)
+    return versao_atual
+
+
+def invalidar(organizacao_id):
+    """Muda a versão da organização: unidades e painéis em cache ficam obsoletos."""
+    try:
+        cache.incr(_chave_versao(organizacao_id))
+    except ValueError:
+        cache.set(_chave_versao(organizacao_id), 2, None)
+
+
+# ============================================
+# UNIDADES E ACESSO
+# ============================================
+
+def unidades(organizacao_id):
+    """
+    Unidades ativas da organização (do cache ou do banco).
+
+    Returns:
+        dict: 'permite' (plano da matriz libera multi-unidades) e
+              'unidades' (lista de {'id', 'nome'}, por nome)
+    """
+    from .models import Empresa, Organizacao
+
+    chave = f'organizacoes:{organizacao_id}:unidades:{versao(organizacao_id)}'
+    dados = cache.get(chave)
+    if dados is None:
+        organizacao = Organizacao.objects.select_related('matriz').filter(pk=organizacao_id).first()
+        dados = {
+            'permite': bool(organizacao and organizacao.permite_multi_unidades),
+            'unidades': list(
+                Empresa.objects.filter(organizacao_id=organizacao_id, ativa=True)
+                .order_by('nome').values('id', 'nome')
+            ),
+        }
+        cache.set(chave, dados, _ttl())
+    return dados
+
+
+def unidades_acessiveis(usuario, empresa):
+    """
+    Unidades que o usuário pode abrir a partir da empresa de cadastro.
+
+    Vazio quando o usuário não tem acesso multi-unidade (a própria empresa
+    continua acessível normalmente).
+    """
+    if not (usuario.acessa_unidades and empresa and empresa.organizacao_id):
+        return []
+    dados = unidades(empresa.organizacao_id)
+    return dados['unidades'] if dados['permite'] else []
+
+
+def unidade_permitida(usuario, empresa, unidade_id):
+    return any(unidade['id'] == unidade_id for unidade in unidades_acessiveis(usuario, empresa))
+
+
+# ============================================
+# PAINEL CONSOLIDADO
+# ============================================
+
+def _chave_painel(organizacao_id, ids, inicio, fim):
+    from agendamentos.cache_publico import versoes_ocupacao
+
+    ocupacao = versoes_ocupacao(ids)
+    resumo_versoes = hashlib.md5(
+        ','.join(f'{empresa_id}.{ocupacao[empresa_id]}' for empresa_id in ids).encode()
+    ).hexdigest()[:12]
+    return (
+        f'organizacoes:{organizacao_id}:painel:{inicio.isoformat()}:{fim.isoformat()}:'
+        f'{versao(organizacao_id)}:{resumo_versoes}'
+    )
+
+
+def calcular_painel(ids, inicio, fim):
+    """
+    Indicadores do período por unidade, direto do banco: uma query
+    agrupada por empresa_id para agendamentos, clientes, lançamentos e
+    profissionais, qualquer que seja o número de unidades.
+    """
+    from agendamentos.models import Agendamento, StatusAgendamento
+    from clientes.models import Cliente
+    from financeiro.models import LancamentoFinanceiro, StatusLancamento, TipoLancamento
+    from .models import Profissional
+
+    comeco = timezone.make_aware(datetime.combine(inicio, time.min))
+    final = timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min))
+
+    por_unidade = {empresa_id: {} for empresa_id in ids}
+
+    def juntar(linhas):
+        for linha in linhas:
+            por_unidade[linha.pop('empresa_id')].update(linha)
+
+    juntar(
+        Agendamento.objects
+        .filter(empresa_id__in=ids, data_hora_inicio__gte=comeco, data_hora_inicio__lt=final)
+        .values('empresa_id')
+        .annotate(
+            agendamentos=Count('id'),
+            concluidos=Count('id', filter=Q(status=StatusAgendamento.CONCLUIDO)),
+            cancelados=Count('id', filter=Q(status=StatusAgendamento.CANCELADO)),
+            faltas=Count('id', filter=Q(status=StatusAgendamento.NAO_COMPARECEU)),
+            faturamento=Sum(
+                Coalesce('valor_cobrado', 'servico__preco'), filter=Q(status=StatusAgendamento.CONCLUIDO)
+            ),
+        )
+        .order_by()
+    )
+    juntar(
+        Cliente.objects
+        .filter(empresa_id__in=ids, ativo=True)
+        .values('empresa_id')
+        .annotate(
+            clientes=Count('id'),
+            clientes_novos=Count('id', filter=Q(criado_em__gte=comeco, criado_em__lt=final)),
+        )
+        .order_by()
+    )
+    juntar(
+        LancamentoFinanceiro.objects
+        .filter(empresa_id__in=ids, status=StatusLancamento.PAGO, data_pagamento__range=(inicio, fim))
+        .values('empresa_id')
+        .annotate(
+            receitas=Sum('valor', filter=Q(tipo=TipoLancamento.RECEITA)),
+            despesas=Sum('valor', filter=Q(tipo=TipoLancamento.DESPESA)),
+        )
+        .order_by()
+    )
+    juntar(
+        Profissional.objects
+        .filter(empresa_id__in=ids, ativo=True)
+        .values('empresa_id')
+        .annotate(profissionais=Count('id'))
+        .order_by()
+    )
+    return por_unidade
+
+
+INDICADORES = (
+    'agendamentos', 'concluidos', 'cancelados', 'faltas', 'faturamento',
+    'clientes', 'clientes_novos', 'receitas', 'despesas', 'profissionais',
+)
+
+
+def _com_taxas(linha):
+    atendidos = linha['concluidos'] + linha['faltas']
+    linha['taxa_faltas'] = round(linha['faltas'] * 100 / atendidos, 1) if atendidos else 0.0
+    linha['ticket_medio'] = round(linha['faturamento'] / linha['concluidos'], 2) if linha['concluidos'] else 0
+    linha['saldo'] = linha['receitas'] - linha['despesas']
+    return linha
+
+
+def painel(organizacao_id, inicio, fim):
+    """
+    Painel consolidado da organização no período (datas inclusive).
+
+    Returns:
+        dict: 'unidades' (indicadores de cada unidade, com 'id' e 'nome')
+              e 'total' (soma da rede), do cache quando possível
+    """
+    lista = unidades(organizacao_id)['unidades']
+    ids = [unidade['id'] for unidade in lista]
+    chave = _chave_painel(organizacao_id, ids, inicio, fim)
+    dados = cache.get(chave)
+    if dados is not None:
+        return dados
+
+    por_unidade = calcular_painel(ids, inicio, fim)
+    linhas = [
+        _com_taxas({
+            'id': unidade['id'],
+            'nome': unidade['nome'],
+            **{indicador: por_unidade[unidade['id']].get(indicador) or 0 for indicador in INDICADORES},
+        })
+        for unidade in lista
+    ]
+    total = _com_taxas({
+        indicador: sum((linha[indicador] for linha in linhas), 0) for indicador in INDICADORES
+    })
+    dados = {
+        'periodo': {'inicio': inicio.isoformat(), 'fim': fim.isoformat()},
+        'unidades': sorted(linhas, key=lambda linha: -linha['faturamento']),
+        'total': total,
+    }
+    cache.set(chave, dados, _ttl())
+    return dados
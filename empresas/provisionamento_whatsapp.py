@@ -0,0 +1,299 @@
+"""
+Provisionamento da instância WhatsApp em segundo plano
+
+Antes, whatsapp_criar_instancia chamava conectar_whatsapp dentro da
+request: busca na Evolution, até 5 tentativas de QR Code com sleep de 2s,
+deleção + sleep + recriação... 10 a 75 segundos segurando um dos três
+workers do gunicorn. O polling do navegador (whatsapp_obter_qr) ainda
+fazia duas chamadas à Evolution a cada 3 segundos.
+
+Agora é uma máquina de estados executada pela task
+empresas.tasks.provisionar_whatsapp, uma etapa por execução:
+
+    verificar -> criar -> qrcode -> aguardar_conexao
+        |                   |
+        |                   +-> remover -> confirmar_remocao -> criar
+        +-> (já conectado)
+
+Esperas viram countdown da próxima etapa, nunca sleep. O estado do job
+fica no cache por empresa (obter_job) e a view de polling só lê o cache e
+a configuração no banco, sem chamar a Evolution.
+
+Iniciar de novo substitui o job: etapas de um job antigo ainda na fila
+veem que não são mais o job atual e param.
+
+O job precisa de um cache compartilhado entre web e worker (Redis, como em
+produção). Com o LocMemCache do dev o worker não enxerga o job criado pela
+view, então as etapas rodam numa thread do próprio processo (_agendar_local).
+"""
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_FINAIS = {'conectado', 'erro', 'expirado'}
+
+# Job em andamento sem atualização há mais que isso é considerado perdido
+# (worker reiniciado no meio) e pode ser iniciado de novo
+JOB_PERDIDO = 120
+
+
+def _config(nome, padrao):
+    return getattr(settings, f'WHATSAPP_PROVISIONAMENTO_{nome}', padrao)
+
+
+def _chave(empresa_id):
+    return f'whatsapp:provisionamento:{empresa_id}'
+
+
+def obter_job(empresa_id):
+    """Estado do provisionamento da empresa (dict) ou None"""
+    return cache.get(_chave(empresa_id))
+
+
+def _salvar(empresa_id, job):
+    job['atualizado_em'] = time.time()
+    cache.set(_chave(empresa_id), job, _config('DURACAO_MAX', 180) + 300)
+
+
+def _em_andamento(job):
+    return (
+        job is not None
+        and job['estado'] not in ESTADOS_FINAIS
+        and time.time() - job.get('atualizado_em', 0) < JOB_PERDIDO
+    )
+
+
+def iniciar(empresa_id):
+    """
+    Enfileira o provisionamento e retorna o job (sem chamar a Evolution).
+
+    Se já há um job em andamento para a empresa, ele é retornado.
+    """
+    atual = obter_job(empresa_id)
+    if _em_andamento(atual):
+        return atual
+
+    job = {
+        'id': uuid.uuid4().hex,
+        'estado': 'na_fila',
+        'mensagem': 'Preparando conexão...',
+        'recriar': False,
+    }
+    _salvar(empresa_id, job)
+    _agendar(empresa_id, job, 'verificar')
+    return job
+
+
+def empresas_em_provisionamento(empresa_ids):
+    """Das empresas informadas, as que têm job em andamento (uma ida ao cache)"""
+    chaves = {_chave(empresa_id): empresa_id for empresa_id in empresa_ids}
+    jobs = cache.get_many(list(chaves))
+    return {chaves[chave] for chave, job in jobs.items() if _em_andamento(job)}
+
+
+def cancelar(empresa_id):
+    """Descarta o job da empresa; etapas ainda na fila param sozinhas"""
+    cache.delete(_chave(empresa_id))
+
+
+def cache_compartilhado():
+    """False quando o cache só existe neste processo (LocMemCache)"""
+    return 'locmem' not in settings.CACHES['default']['BACKEND'].lower()
+
+
+def _agendar_local(empresa_id, job, etapa, tentativa, espera):
+    """Roda a etapa numa thread deste processo, já que o worker não veria o job"""
+    def rodar():
+        time.sleep(espera)
+        close_old_connections()
+        try:
+            executar_etapa(empresa_id, job['id'], etapa, tentativa)
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=rodar, name=f'provisionamento-whatsapp-{empresa_id}', daemon=True).start()
+
+
+def _agendar(empresa_id, job, etapa, tentativa=1, espera=0):
+    from .tasks import provisionar_whatsapp
+
+    if not cache_compartilhado():
+        _agendar_local(empresa_id, job, etapa, tentativa, espera)
+        return
+
+    try:
+        provisionar_whatsapp.apply_async((empresa_id, job['id'], etapa, tentativa), countdown=espera)
+    except Exception as e:
+        logger.error(f"[WhatsApp] Não foi possível enfileirar a etapa {etapa} da empresa {empresa_id}: {e}")
+        _finalizar(empresa_id, job, 'erro', 'Serviço temporariamente indisponível. Tente novamente.')
+
+
+def _seguir(empresa_id, job, estado, mensagem, etapa, tentativa=1, espera=0):
+    job.update(estado=estado, mensagem=mensagem)
+    _salvar(empresa_id, job)
+    _agendar(empresa_id, job, etapa, tentativa, espera)
+
+
+def _finalizar(empresa_id, job, estado, mensagem):
+    job.update(estado=estado, mensagem=mensagem)
+    _salvar(empresa_id, job)
+    logger.info(f"[WhatsApp] Provisionamento da empresa {empresa_id}: {estado} ({mensagem})")
+
+
+def _falhar(service, job, mensagem, erro_config=None):
+    """Marca a configuração com erro e encerra o job"""
+    service.config.status = 'erro'
+    service.config.ultimo_erro = erro_config or mensagem
+    service.config.save()
+    _finalizar(service.config.empresa_id, job, 'erro', mensagem)
+
+
+# ==========================================
+# ETAPAS
+# ==========================================
+
+def _etapa_verificar(service, job, tentativa):
+    instance_name = service.config.gerar_instance_name()
+    busca = service._buscar_instancia_na_api(instance_name)
+    empresa_id = service.config.empresa_id
+
+    if not busca.get('exists'):
+        return _seguir(empresa_id, job, 'criando', 'Criando instância...', 'criar')
+
+    if busca.get('status') == 'open':
+        service.config.status = 'conectado'
+        service.config.save()
+        return _finalizar(empresa_id, job, 'conectado', 'WhatsApp já está conectado!')
+
+    # Existe mas não está conectada: tenta o QR; sem QR, recria
+    job['recriar'] = True
+    _seguir(empresa_id, job, 'gerando_qr', 'Gerando QR Code...', 'qrcode')
+
+
+def _etapa_criar(service, job, tentativa):
+    instance_name = service.config.gerar_instance_name()
+    resultado = service._criar_instancia_na_api(instance_name)
+    if not resultado['success']:
+        erro = resultado.get('error', 'Erro ao criar instância')
+        return _falhar(service, job, erro)
+
+    service._registrar_instancia_criada(instance_name, resultado)
+    job['recriar'] = False
+    # A instância leva um instante para gerar o primeiro QR
+    _seguir(service.config.empresa_id, job, 'gerando_qr', 'Instância criada! Gerando QR Code...', 'qrcode', espera=1)
+
+
+def _etapa_qrcode(service, job, tentativa):
+    empresa_id = service.config.empresa_id
+    qrcode = service._tentar_obter_qrcode(service.config.instance_name)
+
+    if qrcode:
+        service._salvar_qrcode(qrcode)
+        return _seguir(
+            empresa_id, job, 'qrcode_pronto', 'QR Code pronto! Escaneie com seu WhatsApp.',
+            'aguardar_conexao', espera=_config('INTERVALO_STATUS', 5),
+        )
+
+    if tentativa < _config('TENTATIVAS_QR', 5):
+        return _seguir(
+            empresa_id, job, 'gerando_qr', job['mensagem'], 'qrcode',
+            tentativa + 1, espera=_config('INTERVALO_QR', 2),
+        )
+
+    if job.get('recriar'):
+        logger.warning(f"[WhatsApp] Instância {service.config.instance_name} sem QR Code; removendo para recriar")
+        return _seguir(empresa_id, job, 'removendo', 'Reiniciando instância...', 'remover')
+
+    _finalizar(
+        empresa_id, job, 'erro',
+        'Instância criada mas QR Code ainda não disponível. Tente novamente em alguns segundos.'
+    )
+
+
+def _etapa_remover(service, job, tentativa):
+    if not service._deletar_instancia_na_api(service.config.instance_name):
+        return _falhar(
+            service, job,
+            'Erro ao resetar instância. Tente novamente em alguns minutos ou contate o suporte.',
+            'Erro ao resetar instância. Tente novamente em alguns minutos.',
+        )
+    # Dá tempo para a Evolution processar a deleção antes de conferir
+    _seguir(service.config.empresa_id, job, 'removendo', job['mensagem'], 'confirmar_remocao', espera=2)
+
+
+def _etapa_confirmar_remocao(service, job, tentativa):
+    if service._buscar_instancia_na_api(service.config.instance_name).get('exists'):
+        return _falhar(
+            service, job,
+            'Erro ao resetar instância. A instância antiga não pôde ser removida. Contate o suporte.',
+            'A instância antiga não pôde ser removida.',
+        )
+    _seguir(service.config.empresa_id, job, 'criando', 'Criando instância...', 'criar')
+
+
+def _etapa_aguardar_conexao(service, job, tentativa):
+    """Acompanha a leitura do QR (a instância não envia CONNECTION_UPDATE)"""
+    config = service.config
+    service.obter_status_conexao()
+
+    if config.esta_conectado():
+        config.qr_code = ''
+        config.save()
+        return _finalizar(config.empresa_id, job, 'conectado', 'WhatsApp conectado!')
+
+    intervalo = _config('INTERVALO_STATUS', 5)
+    if tentativa * intervalo >= _config('DURACAO_MAX', 180):
+        return _finalizar(
+            config.empresa_id, job, 'expirado',
+            'Tempo limite excedido. Recarregue a página e tente novamente.'
+        )
+
+    # QR Code expirado: gera outro para o navegador exibir
+    if not config.qr_code_expira_em or config.qr_code_expira_em <= timezone.now():
+        qrcode = service._tentar_obter_qrcode(config.instance_name)
+        if qrcode:
+            service._salvar_qrcode(qrcode)
+
+    _seguir(config.empresa_id, job, 'qrcode_pronto', job['mensagem'], 'aguardar_conexao', tentativa + 1, espera=intervalo)
+
+
+ETAPAS = {
+    'verificar': _etapa_verificar,
+    'criar': _etapa_criar,
+    'qrcode': _etapa_qrcode,
+    'remover': _etapa_remover,
+    'confirmar_remocao': _etapa_confirmar_remocao,
+    'aguardar_conexao': _etapa_aguardar_conexao,
+}
+
+
+def executar_etapa(empresa_id, job_id, etapa, tentativa=1):
+    """Executa uma etapa do job (chamado pela task provisionar_whatsapp)"""
+    from .models import ConfiguracaoWhatsApp
+    from .services import EvolutionAPIService
+
+    job = obter_job(empresa_id)
+    if not job or job['id'] != job_id or job['estado'] in ESTADOS_FINAIS:
+        logger.info(f"[WhatsApp] Etapa {etapa} ignorada: job {job_id} da empresa {empresa_id} não está ativo")
+        return None
+
+    try:
+        config = ConfiguracaoWhatsApp.objects.select_related('empresa').get(empresa_id=empresa_id)
+    except ConfiguracaoWhatsApp.DoesNotExist:
+        _finalizar(empresa_id, job, 'erro', 'Configuração não encontrada')
+        return job
+
+    try:
+        ETAPAS[etapa](EvolutionAPIService(config), job, tentativa)
+    except Exception as e:
+        logger.exception(f"[WhatsApp] Erro na etapa {etapa} da empresa {empresa_id}")
+        _finalizar(empresa_id, job, 'erro', f'Erro ao conectar WhatsApp: {e}')
+    return job
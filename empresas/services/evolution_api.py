@@ -11,6 +11,80 @@ from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+# Estado da conexão na Evolution -> status da ConfiguracaoWhatsApp
+STATUS_EVOLUTION = {
+    'open': 'conectado',
+    'connecting': 'conectando',
+    'close': 'desconectado',
+    'refused': 'erro',
+}
+
+
+def listar_instancias():
+    """
+    Todas as instâncias da Evolution API (uma chamada a fetchInstances,
+    com a API key global). Levanta exceção se a chamada falhar.
+
+    Returns:
+        list: itens de fetchInstances
+    """
+    api_url = getattr(settings, 'EVOLUTION_API_URL', '')
+    api_key = getattr(settings, 'EVOLUTION_API_KEY', '')
+    if not api_url or not api_key:
+        raise ValueError('Evolution API não configurada')
+
+    response = requests.get(
+        f"{api_url.rstrip('/')}/instance/fetchInstances",
+        headers={'Content-Type': 'application/json', 'apikey': api_key},
+        timeout=30
+    )
+    response.raise_for_status()
+    instances = response.json()
+    # Algumas versões da Evolution retornam dict em vez de list
+    return [instances] if isinstance(instances, dict) else instances
+
+
+def dados_instancia(inst):
+    """
+    Nome, estado e perfil de um item de fetchInstances, nos dois formatos
+    da API ({'name': ...} e {'instance': {'instanceName': ...}}).
+    """
+    interno = inst.get('instance') if isinstance(inst.get('instance'), dict) else {}
+
+    def campo(*nomes):
+        for nome in nomes:
+            valor = inst.get(nome) or interno.get(nome)
+            if valor:
+                return valor
+        return ''
+
+    return {
+        'nome': campo('name', 'instanceName'),
+        'estado': campo('connectionStatus', 'status', 'state') or 'unknown',
+        'owner': campo('owner', 'ownerJid'),
+        'perfil': campo('profileName', 'pushName'),
+        'foto': campo('profilePictureUrl', 'profilePicUrl'),
+    }
+
+
+def url_webhook_instancia():
+    """
+    Webhook das instâncias: o global do Django (whatsapp/views.py).
+
+    Ele processa QR, conexão e os acks de entrega da fila
+    (MESSAGES_UPDATE) e encaminha o resto ao N8N_WEBHOOK_URL. Apontar a
+    instância direto para o n8n deixava os acks fora do Django.
+    """
+    return f"{settings.SITE_URL.rstrip('/')}/api/webhooks/whatsapp/"
+
+
+def formatar_numero_conectado(owner):
+    """Número de exibição a partir do owner ("5511999999999@s.whatsapp.net" -> +55 (11) 99999-9999)"""
+    numero = owner.split('@')[0] if '@' in owner else owner
+    if len(numero) >= 12:
+        return f"+{numero[:2]} ({numero[2:4]}) {numero[4:9]}-{numero[9:]}"
+    return numero
+
 
 class EvolutionAPIService:
     """
@@ -183,13 +257,7 @@ class EvolutionAPIService:
 
                     if owner:
                         # owner geralmente vem como "5511999999999@s.whatsapp.net"
-                        numero = owner.split('@')[0] if '@' in owner else owner
-                        # Formatar número para exibição
-                        if len(numero) >= 12:
-                            # Formato: +55 (11) 99999-9999
-                            self.config.numero_conectado = f"+{numero[:2]} ({numero[2:4]}) {numero[4:9]}-{numero[9:]}"
-                        else:
-                            self.config.numero_conectado = numero
+                        self.config.numero_conectado = formatar_numero_conectado(owner)
 
                     # Tentar extrair nome do perfil de diferentes locais
                     profile_name = (
@@ -250,57 +318,65 @@ class EvolutionAPIService:
         except Exception as e:
             logger.debug(f"Endpoint alternativo de perfil não disponível: {e}")
 
-    def _obter_qrcode_com_retry(self, instance_name, max_tentativas=5, intervalo=2):
+    def _tentar_obter_qrcode(self, instance_name):
         """
-        Tenta obter o QR Code com retry.
-
-        Args:
-            instance_name: Nome da instância
-            max_tentativas: Número máximo de tentativas
-            intervalo: Segundos entre tentativas
+        Uma tentativa de obter o QR Code (/instance/connect e depois /instance/qr).
 
         Returns:
-            dict: {'success': bool, 'qrcode': str|None, 'error': str|None}
+            str|None: QR Code em base64
         """
         api_url = getattr(settings, 'EVOLUTION_API_URL', '')
         api_key = getattr(settings, 'EVOLUTION_API_KEY', '')
 
-        for tentativa in range(1, max_tentativas + 1):
-            logger.info(f"Tentativa {tentativa}/{max_tentativas} de obter QR Code para {instance_name}")
+        try:
+            # Tenta endpoint /instance/connect primeiro (gera QR se necessário)
+            response = requests.get(
+                f"{api_url.rstrip('/')}/instance/connect/{instance_name}",
+                headers={'Content-Type': 'application/json', 'apikey': api_key},
+                timeout=15
+            )
 
-            try:
-                # Tenta endpoint /instance/connect primeiro (gera QR se necessário)
-                response = requests.get(
-                    f"{api_url.rstrip('/')}/instance/connect/{instance_name}",
-                    headers={'Content-Type': 'application/json', 'apikey': api_key},
-                    timeout=15
-                )
+            if response.status_code == 200:
+                qr_base64 = response.json().get('base64', '')
+                if qr_base64:
+                    return qr_base64
 
-                if response.status_code == 200:
-                    data = response.json()
-                    qr_base64 = data.get('base64', '')
+            # Se não veio no connect, tenta endpoint específico de QR
+            response = requests.get(
+                f"{api_url.rstrip('/')}/instance/qr/{instance_name}",
+                headers={'Content-Type': 'application/json', 'apikey': api_key},
+                timeout=15
+            )
 
-                    if qr_base64:
-                        logger.info(f"QR Code obtido com sucesso na tentativa {tentativa}")
-                        return {'success': True, 'qrcode': qr_base64}
+            if response.status_code == 200:
+                qr_base64 = response.json().get('base64', '')
+                if qr_base64:
+                    return qr_base64
 
-                # Se não veio no connect, tenta endpoint específico de QR
-                response = requests.get(
-                    f"{api_url.rstrip('/')}/instance/qr/{instance_name}",
-                    headers={'Content-Type': 'application/json', 'apikey': api_key},
-                    timeout=15
-                )
+        except Exception as e:
+            logger.warning(f"Erro ao obter QR Code de {instance_name}: {e}")
 
-                if response.status_code == 200:
-                    data = response.json()
-                    qr_base64 = data.get('base64', '')
+        return None
 
-                    if qr_base64:
-                        logger.info(f"QR Code obtido via /qr na tentativa {tentativa}")
-                        return {'success': True, 'qrcode': qr_base64}
+    def _obter_qrcode_com_retry(self, instance_name, max_tentativas=5, intervalo=2):
+        """
+        Tenta obter o QR Code com retry (bloqueante: dorme entre as tentativas).
 
-            except Exception as e:
-                logger.warning(f"Erro na tentativa {tentativa}: {e}")
+        Args:
+            instance_name: Nome da instância
+            max_tentativas: Número máximo de tentativas
+            intervalo: Segundos entre tentativas
+
+        Returns:
+            dict: {'success': bool, 'qrcode': str|None, 'error': str|None}
+        """
+        for tentativa in range(1, max_tentativas + 1):
+            logger.info(f"Tentativa {tentativa}/{max_tentativas} de obter QR Code para {instance_name}")
+
+            qr_base64 = self._tentar_obter_qrcode(instance_name)
+            if qr_base64:
+                logger.info(f"QR Code obtido com sucesso na tentativa {tentativa}")
+                return {'success': True, 'qrcode': qr_base64}
 
             # Aguardar antes da próxima tentativa
             if tentativa < max_tentativas:
@@ -312,9 +388,47 @@ class EvolutionAPIService:
             'error': f'QR Code não disponível após {max_tentativas} tentativas'
         }
 
+    def _salvar_qrcode(self, qr_base64):
+        """Guarda o QR Code (válido por 2 minutos) e marca aguardando_qr"""
+        self.config.qr_code = qr_base64
+        self.config.qr_code_expira_em = now() + timedelta(minutes=2)
+        self.config.status = 'aguardando_qr'
+        self.config.save()
+
+    def _registrar_instancia_criada(self, instance_name, criar_result):
+        """Salva na configuração e em WhatsAppInstance a instância recém-criada"""
+        instance_data = criar_result.get('data', {}).get('instance', {})
+        self.config.instance_name = instance_name
+        self.config.instance_token = instance_data.get('token', '')
+
+        # Salvar URL do webhook (URL única - identificação por instance_name)
+        self.config.webhook_url = url_webhook_instancia()
+
+        self.config.status = 'aguardando_qr'
+        self.config.save()
+
+        # Registrar no banco
+        from empresas.models import WhatsAppInstance
+        try:
+            WhatsAppInstance.objects.update_or_create(
+                empresa=self.config.empresa,
+                defaults={
+                    "instance_name": instance_name,
+                    "evolution_instance_id": instance_data.get("instanceId", ""),
+                    "status": "pending",
+                    "webhook_token": self.config.webhook_secret,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Erro ao salvar WhatsAppInstance: {e}")
+
     def conectar_whatsapp(self):
         """
-        Método principal e robusto para conectar WhatsApp.
+        Conecta o WhatsApp de forma síncrona (bloqueia até ~75s).
+
+        As views usam o provisionamento em segundo plano
+        (empresas/provisionamento_whatsapp.py), que faz as mesmas etapas
+        sem dormir no worker web.
 
         Fluxo:
         1. Verifica se instância já existe na Evolution API
@@ -358,10 +472,7 @@ class EvolutionAPIService:
             qr_result = self._obter_qrcode_com_retry(instance_name)
 
             if qr_result['success']:
-                self.config.qr_code = qr_result['qrcode']
-                self.config.qr_code_expira_em = now() + timedelta(minutes=2)
-                self.config.status = 'aguardando_qr'
-                self.config.save()
+                self._salvar_qrcode(qr_result['qrcode'])
 
                 return {
                     'success': True,
@@ -432,30 +543,7 @@ class EvolutionAPIService:
             }
 
         # Salvar dados da instância criada
-        instance_data = criar_result.get('data', {}).get('instance', {})
-        self.config.instance_name = instance_name
-        self.config.instance_token = instance_data.get('token', '')
-
-        # Salvar URL do webhook (URL única - identificação por instance_name)
-        self.config.webhook_url = getattr(settings, 'N8N_WEBHOOK_URL', '') or f"{settings.SITE_URL}/api/webhooks/whatsapp/"
-
-        self.config.status = 'aguardando_qr'
-        self.config.save()
-
-        # Registrar no banco
-        from empresas.models import WhatsAppInstance
-        try:
-            WhatsAppInstance.objects.update_or_create(
-                empresa=self.config.empresa,
-                defaults={
-                    "instance_name": instance_name,
-                    "evolution_instance_id": instance_data.get("instanceId", ""),
-                    "status": "pending",
-                    "webhook_token": self.config.webhook_secret,
-                }
-            )
-        except Exception as e:
-            logger.error(f"Erro ao salvar WhatsAppInstance: {e}")
+        self._registrar_instancia_criada(instance_name, criar_result)
 
         # 3. Obter QR Code com retry
         # Aguardar um pouco para a instância ficar pronta
@@ -464,9 +552,7 @@ class EvolutionAPIService:
         qr_result = self._obter_qrcode_com_retry(instance_name)
 
         if qr_result['success']:
-            self.config.qr_code = qr_result['qrcode']
-            self.config.qr_code_expira_em = now() + timedelta(minutes=2)
-            self.config.save()
+            self._salvar_qrcode(qr_result['qrcode'])
 
             return {
                 'success': True,
@@ -497,9 +583,9 @@ class EvolutionAPIService:
 
         webhook_secret = self.config.gerar_webhook_secret()
 
-        # Usar N8N_WEBHOOK_URL diretamente (URL única para todas as empresas)
-        # A identificação da empresa é feita pelo instance_name no payload
-        webhook_url = getattr(settings, 'N8N_WEBHOOK_URL', '') or f"{settings.SITE_URL}/api/webhooks/whatsapp/"
+        # URL única para todas as empresas (identificação pelo instance_name
+        # no payload); o Django encaminha as mensagens ao n8n
+        webhook_url = url_webhook_instancia()
 
         logger.info(f"Webhook configurado: {webhook_url}")
 
@@ -520,6 +606,7 @@ class EvolutionAPIService:
                 "base64": True,
                 "events": [
                     "MESSAGES_UPSERT",
+                    "MESSAGES_UPDATE",  # Acks de entrega da fila de envio
                 ]
             }
         }
@@ -761,11 +848,7 @@ class EvolutionAPIService:
             qr_base64 = data.get('base64', '')
 
             if qr_base64:
-                # Salvar QR Code
-                self.config.qr_code = qr_base64
-                self.config.qr_code_expira_em = now() + timedelta(minutes=2)
-                self.config.status = 'aguardando_qr'
-                self.config.save()
+                self._salvar_qrcode(qr_base64)
 
                 logger.info(f"QR Code obtido para {self.config.instance_name}")
                 return {'success': True, 'qrcode': qr_base64}
@@ -1213,6 +1296,13 @@ class EvolutionAPIService:
 
             return {'success': True, 'processed': True, 'type': 'new_message'}
 
+        # Ack de mensagem enviada (enviada / entregue / lida)
+        elif str(event_type).upper().replace('.', '_') == 'MESSAGES_UPDATE':
+            from empresas.fila_whatsapp import registrar_acks
+
+            alteradas = registrar_acks(payload.get('data', {}))
+            return {'success': True, 'processed': bool(alteradas), 'type': 'message_ack'}
+
         return {'success': True, 'processed': False, 'type': 'unknown_event'}
 
     
@@ -1,10 +1,16 @@
-from django.db.models.signals import post_save
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
-from django.utils.html import strip_tags
-from .models import Empresa, ConfiguracaoWhatsApp
+from assinaturas.models import Assinatura
+from core.email_outbox import enfileirar_email
+from . import organizacoes
+from .models import Empresa, ConfiguracaoWhatsApp, Organizacao
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Empresa)
@@ -35,21 +41,36 @@ def enviar_email_empresa_criada(sender, instance, created, **kwargs):
             return
         
         try:
-            context = {
-                'empresa': instance,
-                'site_url': settings.SITE_URL,
-            }
-
-            html_message = render_to_string('emails/empresa_criada.html', context)
-            plain_message = strip_tags(html_message)
-
-            send_mail(
-                subject=f'Empresa {instance.nome} cadastrada com sucesso!',
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[instance.email],
-                html_message=html_message,
-                fail_silently=True,
+            # Renderizado agora e enviado pela fila após o commit (core/email_outbox.py)
+            enfileirar_email(
+                [instance.email],
+                f'Empresa {instance.nome} cadastrada com sucesso!',
+                template='emails/empresa_criada.html',
+                contexto={
+                    'empresa': instance,
+                    'site_url': settings.SITE_URL,
+                },
             )
         except Exception as e:
-            print(f"Erro ao enviar email de empresa criada para {instance.email}: {e}")
+            logger.error(f"Erro ao enfileirar email de empresa criada para {instance.email}: {e}")
+
+
+# Cache das organizações (empresas/organizacoes.py): unidades, plano da
+# matriz e painel consolidado
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_organizacao_unidade(sender, instance, **kwargs):
+    if instance.organizacao_id:
+        transaction.on_commit(partial(organizacoes.invalidar, instance.organizacao_id))
+
+
+@receiver(post_save, sender=Organizacao)
+@receiver(post_delete, sender=Organizacao)
+def invalidar_organizacao(sender, instance, **kwargs):
+    transaction.on_commit(partial(organizacoes.invalidar, instance.pk))
+
+
+@receiver(post_save, sender=Assinatura)
+def invalidar_organizacao_assinatura(sender, instance, **kwargs):
+    for organizacao_id in Organizacao.objects.filter(matriz_id=instance.empresa_id).values_list('pk', flat=True):
+        transaction.on_commit(partial(organizacoes.invalidar, organizacao_id))
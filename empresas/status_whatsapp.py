@@ -0,0 +1,261 @@
+"""
+Status da conexão WhatsApp por empresa, sincronizado em segundo plano
+
+Antes, cada abertura de whatsapp_dashboard chamava sincronizar_status()
+na request (fetchInstances + connectionState na Evolution), e fora dela o
+status só mudava por webhook: lembretes e avisos de trial decidiam pelo
+status salvo, possivelmente velho.
+
+Agora:
+- Varredura (task empresas.tasks.sincronizar_status_whatsapp, Beat a cada
+  5 minutos): UMA chamada a fetchInstances para todas as empresas, status
+  reconciliado em memória e gravado com um bulk_update (só as linhas que
+  mudaram; as demais recebem ultima_sincronizacao num único UPDATE)
+- O status de cada empresa é publicado no cache (set_many, TTL
+  WHATSAPP_STATUS_TTL); as views leem o banco e o cache e, se a empresa
+  ainda não tem status publicado, pedem uma sincronização só dela (no
+  máximo uma por minuto)
+- Métricas da última varredura (duração, divergências por transição,
+  instâncias removidas) ficam no cache e aparecem em /health/
+- Instância removida por fora: o aviso fica no cache até ser exibido.
+  Se a resposta da Evolution sumiria com mais da metade das instâncias, a
+  varredura não reseta nenhuma (resposta incompleta) e registra o bloqueio
+- Empresas com provisionamento em andamento são puladas (a task de
+  provisionamento acompanha o status delas)
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre sincronizações pedidas pelas views
+INTERVALO_SOLICITACAO = 60
+
+CHAVE_METRICAS = 'whatsapp:varredura:ultima'
+
+# Campos zerados quando a instância não existe mais na Evolution
+CAMPOS_REMOCAO = {
+    'instance_name': '',
+    'instance_token': '',
+    'status': 'nao_configurado',
+    'qr_code': '',
+    'numero_conectado': '',
+    'nome_perfil': '',
+    'foto_perfil_url': '',
+    'webhook_url': '',
+    'ultimo_erro': 'Instância foi deletada externamente',
+}
+
+CAMPOS_VARREDURA = [
+    *CAMPOS_REMOCAO, 'ultima_sincronizacao', 'atualizado_em',
+]
+
+# Gravados nas instâncias reconciliadas: só o que _reconciliar() altera.
+# Credenciais, QR code e webhook podem ter mudado desde a leitura
+# (provisionamento, webhook da Evolution) e não são sobrescritos
+CAMPOS_RECONCILIACAO = [
+    'status', 'numero_conectado', 'nome_perfil', 'foto_perfil_url',
+    'ultima_sincronizacao', 'atualizado_em',
+]
+
+
+def _chave(empresa_id):
+    return f'whatsapp:status:{empresa_id}'
+
+
+def status_em_cache(empresa_id):
+    """Último status sincronizado da empresa (dict) ou None"""
+    return cache.get(_chave(empresa_id))
+
+
+def _status(config, acao='', agora=None):
+    return {
+        'status': config.status,
+        'conectado': config.esta_conectado(),
+        'numero': config.numero_conectado,
+        'nome': config.nome_perfil,
+        'acao': acao,
+        'sincronizado_em': (agora or timezone.now()).isoformat(),
+    }
+
+
+def guardar_status(config, acao=''):
+    """Publica no cache o status atual da configuração"""
+    status = _status(config, acao)
+    cache.set(_chave(config.empresa_id), status, getattr(settings, 'WHATSAPP_STATUS_TTL', 600))
+    return status
+
+
+def consumir_aviso_remocao(empresa_id):
+    """True (uma única vez) se a instância foi removida externamente"""
+    status = status_em_cache(empresa_id)
+    if not status or status.get('acao') != 'deleted_externally':
+        return False
+    status['acao'] = ''
+    cache.set(_chave(empresa_id), status, getattr(settings, 'WHATSAPP_STATUS_TTL', 600))
+    return True
+
+
+def sincronizar_empresa(config):
+    """Sincroniza uma configuração com a Evolution e publica o status"""
+    from .services import EvolutionAPIService
+
+    if not config.instance_name:
+        return guardar_status(config)
+    resultado = EvolutionAPIService(config).sincronizar_status()
+    if not resultado['success']:
+        logger.warning(f"[WhatsApp] Falha ao sincronizar empresa {config.empresa_id}: {resultado.get('message')}")
+        return None
+    return guardar_status(config, resultado.get('action', ''))
+
+
+def _reconciliar(config, dados):
+    """
+    Aplica à configuração o que a Evolution informou.
+
+    Returns:
+        str|None: 'removida', a transição 'antigo>novo' ou None (sem mudança)
+    """
+    from .services.evolution_api import STATUS_EVOLUTION, formatar_numero_conectado
+
+    if dados is None:
+        for campo, valor in CAMPOS_REMOCAO.items():
+            setattr(config, campo, valor)
+        return 'removida'
+
+    antes = (config.status, config.numero_conectado, config.nome_perfil, config.foto_perfil_url)
+    # Estado desconhecido não derruba o status salvo
+    config.status = STATUS_EVOLUTION.get(dados['estado'], config.status)
+    if config.status == 'conectado':
+        if dados['owner']:
+            config.numero_conectado = formatar_numero_conectado(dados['owner'])
+        config.nome_perfil = dados['perfil'] or config.nome_perfil or config.numero_conectado
+        config.foto_perfil_url = dados['foto'] or config.foto_perfil_url
+
+    if antes == (config.status, config.numero_conectado, config.nome_perfil, config.foto_perfil_url):
+        return None
+    return f'{antes[0]}>{config.status}'
+
+
+def varrer_instancias():
+    """
+    Reconcilia todas as ConfiguracaoWhatsApp com uma chamada a
+    fetchInstances e publica o status de cada empresa no cache.
+
+    Returns:
+        dict: métricas da varredura (também guardadas em CHAVE_METRICAS)
+    """
+    from .models import ConfiguracaoWhatsApp
+    from .provisionamento_whatsapp import empresas_em_provisionamento
+    from .services.evolution_api import dados_instancia, listar_instancias
+
+    inicio = time.monotonic()
+    agora = timezone.now()
+    metricas = {
+        'executada_em': agora.isoformat(),
+        'sucesso': False,
+        'instancias_evolution': 0,
+        'configuracoes': 0,
+        'puladas': 0,
+        'divergencias': 0,
+        'transicoes': {},
+        'removidas': 0,
+        'remocoes_bloqueadas': 0,
+        'duracao_ms': 0,
+    }
+
+    try:
+        instancias = {}
+        for inst in listar_instancias():
+            if isinstance(inst, dict):
+                dados = dados_instancia(inst)
+                instancias[dados['nome']] = dados
+    except Exception as e:
+        logger.error(f"[WhatsApp] Varredura abortada, fetchInstances falhou: {e}")
+        metricas['erro'] = str(e)
+        return _registrar_metricas(metricas, inicio)
+    metricas['instancias_evolution'] = len(instancias)
+
+    configs = list(ConfiguracaoWhatsApp.objects.exclude(instance_name='').only(
+        'id', 'empresa_id', *CAMPOS_VARREDURA
+    ))
+    metricas['configuracoes'] = len(configs)
+    em_provisionamento = empresas_em_provisionamento(config.empresa_id for config in configs)
+
+    reconciliadas, removidas, inalteradas, publicar = [], [], [], {}
+    for config in configs:
+        if config.empresa_id in em_provisionamento:
+            metricas['puladas'] += 1
+            continue
+        dados = instancias.get(config.instance_name)
+        if dados is None:
+            removidas.append(config)
+            continue
+        transicao = _reconciliar(config, dados)
+        if transicao:
+            metricas['transicoes'][transicao] = metricas['transicoes'].get(transicao, 0) + 1
+            reconciliadas.append(config)
+        else:
+            inalteradas.append(config.pk)
+        publicar[_chave(config.empresa_id)] = _status(config, agora=agora)
+
+    # Resposta incompleta da Evolution não pode resetar metade das empresas
+    if len(removidas) > max(5, len(configs) // 2):
+        logger.error(
+            f"[WhatsApp] Varredura: {len(removidas)} de {len(configs)} instâncias ausentes "
+            f"em fetchInstances; remoções ignoradas"
+        )
+        metricas['remocoes_bloqueadas'] = len(removidas)
+        inalteradas.extend(config.pk for config in removidas)
+        removidas = []
+    else:
+        for config in removidas:
+            logger.warning(f"[WhatsApp] Instância {config.instance_name} foi deletada externamente")
+            _reconciliar(config, None)
+            publicar[_chave(config.empresa_id)] = _status(config, 'deleted_externally', agora)
+        metricas['removidas'] = len(removidas)
+
+    for config in (*reconciliadas, *removidas):
+        config.ultima_sincronizacao = agora
+        config.atualizado_em = agora
+    if reconciliadas:
+        ConfiguracaoWhatsApp.objects.bulk_update(reconciliadas, CAMPOS_RECONCILIACAO, batch_size=500)
+    if removidas:
+        ConfiguracaoWhatsApp.objects.bulk_update(removidas, CAMPOS_VARREDURA, batch_size=500)
+    if inalteradas:
+        ConfiguracaoWhatsApp.objects.filter(pk__in=inalteradas).update(ultima_sincronizacao=agora)
+    cache.set_many(publicar, getattr(settings, 'WHATSAPP_STATUS_TTL', 600))
+
+    metricas['divergencias'] = len(reconciliadas) + len(removidas)
+    metricas['sucesso'] = True
+    return _registrar_metricas(metricas, inicio)
+
+
+def _registrar_metricas(metricas, inicio):
+    metricas['duracao_ms'] = round((time.monotonic() - inicio) * 1000)
+    cache.set(CHAVE_METRICAS, metricas, None)
+    return metricas
+
+
+def metricas_varredura():
+    """Métricas da última varredura (dict) ou None"""
+    return cache.get(CHAVE_METRICAS)
+
+
+def solicitar_sincronizacao(empresa_id):
+    """Enfileira a sincronização de uma empresa (no máximo uma por minuto)"""
+    from .tasks import sincronizar_whatsapp_empresa
+
+    if not cache.add(f'whatsapp:status:solicitado:{empresa_id}', 1, INTERVALO_SOLICITACAO):
+        return False
+    try:
+        sincronizar_whatsapp_empresa.delay(empresa_id)
+    except Exception as e:
+        # Sem broker a sincronização periódica cobre
+        logger.warning(f"[WhatsApp] Não foi possível enfileirar a sincronização da empresa {empresa_id}: {e}")
+        return False
+    return True
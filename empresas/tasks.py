@@ -0,0 +1,72 @@
+"""
+Tasks Celery de empresas (integração WhatsApp)
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def provisionar_whatsapp(empresa_id, job_id, etapa='verificar', tentativa=1):
+    """
+    Executa uma etapa do provisionamento da instância WhatsApp e agenda a
+    próxima (empresas/provisionamento_whatsapp.py).
+    """
+    from empresas.provisionamento_whatsapp import executar_etapa
+
+    job = executar_etapa(empresa_id, job_id, etapa, tentativa)
+    return job['estado'] if job else None
+
+
+@shared_task
+def sincronizar_whatsapp_empresa(empresa_id):
+    """Sincroniza o status WhatsApp de uma empresa (pedido pelas views)"""
+    from empresas.models import ConfiguracaoWhatsApp
+    from empresas.status_whatsapp import sincronizar_empresa
+
+    config = ConfiguracaoWhatsApp.objects.select_related('empresa').filter(empresa_id=empresa_id).first()
+    if config is None:
+        return None
+    status = sincronizar_empresa(config)
+    return status['status'] if status else None
+
+
+@shared_task
+def sincronizar_status_whatsapp():
+    """
+    Varredura do status WhatsApp de todas as empresas: uma chamada a
+    fetchInstances, reconciliação em lote e status publicado no cache.
+
+    Executado a cada 5 minutos via Celery Beat.
+    """
+    from empresas.status_whatsapp import varrer_instancias
+
+    metricas = varrer_instancias()
+    logger.info(
+        f"Varredura WhatsApp em {metricas['duracao_ms']}ms: {metricas['configuracoes']} configurações, "
+        f"{metricas['divergencias']} divergências, {metricas['removidas']} removidas"
+    )
+    return metricas
+
+
+@shared_task
+def processar_fila_whatsapp():
+    """
+    Envia as mensagens WhatsApp da fila respeitando o limite de cada
+    instância (empresas/fila_whatsapp.py).
+
+    Executado a cada minuto via Celery Beat. Se parou por falta de token,
+    se reagenda para quando o próximo sair (um reagendamento por vez).
+    """
+    import math
+    from django.core.cache import cache
+    from empresas.fila_whatsapp import CHAVE_REAGENDADA, processar_fila
+
+    resumo = processar_fila()
+    espera = resumo.get('espera')
+    if espera is not None:
+        countdown = max(1, math.ceil(espera))
+        if cache.add(CHAVE_REAGENDADA, 1, countdown):
+            processar_fila_whatsapp.apply_async(countdown=countdown)
+    return resumo
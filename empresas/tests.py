@@ -1,7 +1,18 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
-from empresas.models import Empresa, Servico, Profissional
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from core.models import Usuario
+from clientes.models import Cliente
+from agendamentos.models import Agendamento
+from empresas import fila_whatsapp, provisionamento_whatsapp, status_whatsapp
+from empresas.models import Empresa, Servico, Profissional, ConfiguracaoWhatsApp, MensagemWhatsApp
+from empresas.services import EvolutionAPIService
 from decimal import Decimal
 
 
@@ -379,3 +390,423 @@ class ProfissionalModelTest(TestCase):
 
         with self.assertRaises(ValidationError):
             profissional.full_clean()
+
+
+class ProvisionamentoWhatsAppTest(TestCase):
+    """Testes do provisionamento em segundo plano (empresas/provisionamento_whatsapp.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Zap',
+            slug='empresa-zap',
+            telefone='11999999999',
+            email='zap@teste.com',
+            cnpj='12.345.678/0001-90'
+        )
+        self.config = ConfiguracaoWhatsApp.objects.get(empresa=self.empresa)
+        self.agendadas = []
+        # Os testes seguem o caminho de produção (Celery + Redis)
+        compartilhado = patch.object(provisionamento_whatsapp, 'cache_compartilhado', return_value=True)
+        compartilhado.start()
+        self.addCleanup(compartilhado.stop)
+
+    def _iniciar(self):
+        with patch('empresas.tasks.provisionar_whatsapp.apply_async', side_effect=self._agendar):
+            return provisionamento_whatsapp.iniciar(self.empresa.pk)
+
+    def _agendar(self, args, countdown=0):
+        self.agendadas.append((args[2], args[3], countdown))
+
+    def _executar(self, etapa, tentativa=1, **mocks):
+        job = provisionamento_whatsapp.obter_job(self.empresa.pk)
+        with patch('empresas.tasks.provisionar_whatsapp.apply_async', side_effect=self._agendar), \
+                patch('time.sleep') as sleep:
+            patches = [patch.object(EvolutionAPIService, nome, **mock) for nome, mock in mocks.items()]
+            for p in patches:
+                p.start()
+            try:
+                provisionamento_whatsapp.executar_etapa(self.empresa.pk, job['id'], etapa, tentativa)
+            finally:
+                for p in patches:
+                    p.stop()
+        sleep.assert_not_called()
+        return provisionamento_whatsapp.obter_job(self.empresa.pk)
+
+    def test_sem_cache_compartilhado_roda_a_etapa_no_proprio_processo(self):
+        with patch.object(provisionamento_whatsapp, 'cache_compartilhado', return_value=False), \
+                patch.object(provisionamento_whatsapp, 'executar_etapa') as executar, \
+                patch('empresas.tasks.provisionar_whatsapp.apply_async') as apply_async, \
+                patch.object(provisionamento_whatsapp.threading, 'Thread') as thread:
+            job = provisionamento_whatsapp.iniciar(self.empresa.pk)
+            thread.call_args.kwargs['target']()
+
+        apply_async.assert_not_called()
+        thread.return_value.start.assert_called_once()
+        executar.assert_called_once_with(self.empresa.pk, job['id'], 'verificar', 1)
+
+    def test_cria_instancia_e_aguarda_qrcode_sem_bloquear(self):
+        job = self._iniciar()
+        self.assertEqual(job['estado'], 'na_fila')
+        self.assertEqual(self.agendadas, [('verificar', 1, 0)])
+
+        # Novo clique com o job em andamento não enfileira de novo
+        self.assertEqual(self._iniciar()['id'], job['id'])
+        self.assertEqual(len(self.agendadas), 1)
+
+        job = self._executar('verificar', _buscar_instancia_na_api={'return_value': {'exists': False}})
+        self.assertEqual((job['estado'], self.agendadas[-1]), ('criando', ('criar', 1, 0)))
+
+        criada = {'success': True, 'data': {'instance': {'token': 'tok', 'instanceId': 'abc'}}}
+        job = self._executar('criar', _criar_instancia_na_api={'return_value': criada})
+        self.assertEqual(self.agendadas[-1], ('qrcode', 1, 1))
+
+        job = self._executar('qrcode', 1, _tentar_obter_qrcode={'return_value': None})
+        self.assertEqual((job['estado'], self.agendadas[-1]), ('gerando_qr', ('qrcode', 2, 2)))
+
+        job = self._executar('qrcode', 2, _tentar_obter_qrcode={'return_value': 'data:image/png;base64,QR'})
+        self.assertEqual(job['estado'], 'qrcode_pronto')
+        self.assertEqual(self.agendadas[-1][0], 'aguardar_conexao')
+        self.config.refresh_from_db()
+        self.assertEqual(self.config.status, 'aguardando_qr')
+        self.assertEqual(self.config.qr_code, 'data:image/png;base64,QR')
+        self.assertEqual(self.config.instance_token, 'tok')
+
+        def conectar(service):
+            service.config.status = 'conectado'
+
+        job = self._executar('aguardar_conexao', _tentar_obter_qrcode={'return_value': None},
+                             obter_status_conexao={'autospec': True, 'side_effect': conectar})
+        self.assertEqual(job['estado'], 'conectado')
+        self.config.refresh_from_db()
+        self.assertTrue(self.config.esta_conectado())
+        self.assertEqual(self.config.qr_code, '')
+
+    def test_etapa_de_job_cancelado_nao_chama_a_evolution(self):
+        job = self._iniciar()
+        provisionamento_whatsapp.cancelar(self.empresa.pk)
+
+        with patch.object(EvolutionAPIService, '_buscar_instancia_na_api') as buscar:
+            self.assertIsNone(provisionamento_whatsapp.executar_etapa(self.empresa.pk, job['id'], 'verificar'))
+        buscar.assert_not_called()
+
+    def test_polling_le_somente_cache_e_banco(self):
+        usuario = Usuario.objects.create_user(username='zap', password='senha-123', empresa=self.empresa)
+        self.client.force_login(usuario)
+        job = self._iniciar()
+
+        with patch('requests.get') as get, patch('requests.request') as request:
+            resposta = self.client.get(reverse('whatsapp_obter_qr')).json()
+        get.assert_not_called()
+        request.assert_not_called()
+        self.assertEqual((resposta['job'], resposta['estado']), (job['id'], 'na_fila'))
+        self.assertFalse(resposta['conectado'])
+
+
+class VarreduraWhatsAppTest(TestCase):
+    """Testes da varredura de status (empresas/status_whatsapp.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.configs = []
+        for indice, status in enumerate(['conectado', 'desconectado', 'conectado', 'conectado'], start=1):
+            empresa = Empresa.objects.create(
+                nome=f'Empresa Varredura {indice}',
+                slug=f'empresa-varredura-{indice}',
+                telefone='11999999999',
+                email=f'varredura{indice}@teste.com',
+                cnpj=f'12.345.678/0002-{indice:02d}'
+            )
+            config = ConfiguracaoWhatsApp.objects.get(empresa=empresa)
+            config.instance_name = f'inst_{indice}'
+            config.status = status
+            config.save()
+            self.configs.append(config)
+
+    def _varrer(self, instancias):
+        with patch('empresas.services.evolution_api.listar_instancias', return_value=instancias):
+            return status_whatsapp.varrer_instancias()
+
+    def test_reconcilia_todas_as_empresas_em_lote(self):
+        instancias = [
+            {'name': 'inst_1', 'connectionStatus': 'close'},
+            {'instance': {'instanceName': 'inst_2', 'status': 'open', 'owner': '5511988887777@s.whatsapp.net'}},
+            {'name': 'inst_3', 'connectionStatus': 'open'},
+        ]
+        # select das configurações, bulk_update das reconciliadas e das removidas,
+        # UPDATE das inalteradas
+        with self.assertNumQueries(4):
+            metricas = self._varrer(instancias)
+
+        self.assertTrue(metricas['sucesso'])
+        self.assertEqual(metricas['divergencias'], 3)
+        self.assertEqual(metricas['transicoes'], {'conectado>desconectado': 1, 'desconectado>conectado': 1})
+        self.assertEqual(metricas['removidas'], 1)
+
+        status = {c.instance_name or c.pk: c.status for c in ConfiguracaoWhatsApp.objects.all()}
+        self.assertEqual(status['inst_1'], 'desconectado')
+        self.assertEqual(status['inst_2'], 'conectado')
+        self.assertEqual(status[self.configs[3].pk], 'nao_configurado')
+        self.assertEqual(
+            ConfiguracaoWhatsApp.objects.get(pk=self.configs[1].pk).numero_conectado, '+55 (11) 98888-7777'
+        )
+
+        # Status publicado por empresa; aviso de remoção exibido uma vez
+        self.assertTrue(status_whatsapp.status_em_cache(self.configs[1].empresa_id)['conectado'])
+        self.assertTrue(status_whatsapp.consumir_aviso_remocao(self.configs[3].empresa_id))
+        self.assertFalse(status_whatsapp.consumir_aviso_remocao(self.configs[3].empresa_id))
+        self.assertEqual(status_whatsapp.metricas_varredura()['divergencias'], 3)
+
+    def test_reconciliacao_nao_sobrescreve_credenciais_gravadas_durante_a_varredura(self):
+        config = self.configs[0]
+
+        def provisionamento_concorrente(empresa_ids):
+            # Credenciais trocadas depois que a varredura leu as configurações
+            ConfiguracaoWhatsApp.objects.filter(pk=config.pk).update(
+                instance_token='token-novo', webhook_url='https://novo/webhook', qr_code='qr-novo'
+            )
+            return set()
+
+        with patch('empresas.provisionamento_whatsapp.empresas_em_provisionamento', provisionamento_concorrente):
+            self._varrer([{'name': 'inst_1', 'connectionStatus': 'close'}])
+
+        config.refresh_from_db()
+        self.assertEqual(config.status, 'desconectado')
+        self.assertEqual(
+            (config.instance_token, config.webhook_url, config.qr_code),
+            ('token-novo', 'https://novo/webhook', 'qr-novo')
+        )
+
+    def test_falha_ou_resposta_incompleta_nao_reseta_instancias(self):
+        with patch('empresas.services.evolution_api.listar_instancias', side_effect=ValueError('timeout')):
+            metricas = status_whatsapp.varrer_instancias()
+        self.assertFalse(metricas['sucesso'])
+
+        for indice in range(5, 9):
+            empresa = Empresa.objects.create(
+                nome=f'Empresa Varredura {indice}', slug=f'empresa-varredura-{indice}',
+                telefone='11999999999', email=f'varredura{indice}@teste.com',
+                cnpj=f'12.345.678/0002-{indice:02d}'
+            )
+            ConfiguracaoWhatsApp.objects.filter(empresa=empresa).update(instance_name=f'inst_{indice}')
+
+        metricas = self._varrer([])
+        self.assertEqual((metricas['removidas'], metricas['remocoes_bloqueadas']), (0, 8))
+        self.assertEqual(ConfiguracaoWhatsApp.objects.filter(instance_name='').count(), 0)
+
+
+@override_settings(WHATSAPP_FILA_RAJADA=3, WHATSAPP_FILA_POR_MINUTO=20, WHATSAPP_FILA_CONCORRENCIA=1)
+class FilaWhatsAppTest(TestCase):
+    """Testes da fila de envio WhatsApp (empresas/fila_whatsapp.py)"""
+
+    def setUp(self):
+        cache.clear()
+        self.empresas = []
+        for indice in (1, 2):
+            empresa = Empresa.objects.create(
+                nome=f'Empresa Fila {indice}',
+                slug=f'empresa-fila-{indice}',
+                telefone='11999999999',
+                email=f'fila{indice}@teste.com',
+                cnpj=f'12.345.678/0003-{indice:02d}'
+            )
+            ConfiguracaoWhatsApp.objects.filter(empresa=empresa).update(instance_name=f'fila_{indice}', status='conectado')
+            self.empresas.append(empresa)
+
+    def _enfileirar(self, empresa, quantidade):
+        indice = self.empresas.index(empresa) + 1
+        fila_whatsapp.enfileirar(
+            fila_whatsapp.montar_mensagem(empresa.pk, f'fila_{indice}', f'(11) 9000{indice}-000{n}', 'Olá', 'teste')
+            for n in range(quantidade)
+        )
+
+    def test_lembrete_do_mesmo_agendamento_nao_repete(self):
+        empresa = self.empresas[0]
+        cliente = Cliente.objects.create(empresa=empresa, nome='Cliente Fila', telefone='11777777777')
+        servico = Servico.objects.create(empresa=empresa, nome='Corte', preco=Decimal('50.00'), duracao_minutos=30)
+        inicio = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            agendamento = Agendamento.objects.create(
+                empresa=empresa, cliente=cliente, servico=servico,
+                data_hora_inicio=inicio, data_hora_fim=inicio + timedelta(minutes=30),
+            )
+
+        for _ in range(2):
+            fila_whatsapp.enfileirar([fila_whatsapp.montar_mensagem(
+                empresa.pk, 'fila_1', cliente.telefone, 'Lembrete', 'lembrete_1_dia', agendamento_id=agendamento.pk
+            )])
+        self.assertEqual(MensagemWhatsApp.objects.filter(agendamento=agendamento).count(), 1)
+        self.assertEqual(MensagemWhatsApp.objects.get().numero, '5511777777777')
+
+    def test_intercala_empresas_e_respeita_o_limite_da_instancia(self):
+        self._enfileirar(self.empresas[0], 5)
+        self._enfileirar(self.empresas[1], 2)
+        enviados = []
+
+        def enviar(servico, numero, mensagem):
+            enviados.append(servico.config.instance_name)
+            if len(enviados) == 2:
+                return {'success': False, 'error': 'timeout'}
+            return {'success': True, 'message_id': f'id{len(enviados)}'}
+
+        with patch.object(EvolutionAPIService, 'enviar_mensagem_texto', autospec=True, side_effect=enviar):
+            resumo = fila_whatsapp.processar_fila(duracao=1)
+
+        # Rajada de 3 por instância, alternando as empresas; o resto espera token
+        self.assertEqual(enviados, ['fila_1', 'fila_2', 'fila_1', 'fila_2', 'fila_1'])
+        self.assertEqual((resumo['enviadas'], resumo['falhas']), (4, 1))
+        self.assertGreater(resumo['espera'], 0)
+        self.assertEqual(MensagemWhatsApp.objects.filter(status='pendente', instance_name='fila_1').count(), 2)
+
+        falha = MensagemWhatsApp.objects.get(instance_name='fila_2', status='pendente')
+        self.assertEqual((falha.tentativas, falha.erro), (1, 'timeout'))
+        self.assertGreater(falha.proxima_tentativa, timezone.now())
+
+    def test_sem_token_reagenda_em_vez_de_dormir(self):
+        from empresas.tasks import processar_fila_whatsapp
+
+        self._enfileirar(self.empresas[0], 5)
+        retorno = {'success': True, 'message_id': 'id'}
+        with patch.object(EvolutionAPIService, 'enviar_mensagem_texto', return_value=retorno), \
+                patch('empresas.fila_whatsapp.time.sleep') as dormir, \
+                patch.object(processar_fila_whatsapp, 'apply_async') as reagendar:
+            processar_fila_whatsapp()
+            processar_fila_whatsapp()
+
+        dormir.assert_not_called()
+        # Rajada enviada; o restante espera token numa única task reagendada
+        self.assertEqual(MensagemWhatsApp.objects.filter(status='enviada').count(), 3)
+        reagendar.assert_called_once()
+        self.assertGreaterEqual(reagendar.call_args.kwargs['countdown'], 1)
+
+    def test_acks_do_webhook_avancam_o_status(self):
+        self._enfileirar(self.empresas[0], 1)
+        MensagemWhatsApp.objects.update(status='enviada', message_id='ABC123')
+        service = EvolutionAPIService(ConfiguracaoWhatsApp.objects.get(empresa=self.empresas[0]))
+
+        resultado = service.processar_webhook(
+            {'event': 'messages.update', 'data': {'keyId': 'ABC123', 'status': 'DELIVERY_ACK'}}
+        )
+        self.assertEqual(resultado['type'], 'message_ack')
+        mensagem = MensagemWhatsApp.objects.get()
+        self.assertEqual(mensagem.status, 'entregue')
+        self.assertIsNotNone(mensagem.entregue_em)
+
+        # Ack atrasado não faz o status voltar
+        service.processar_webhook({'event': 'MESSAGES_UPDATE', 'data': [{'keyId': 'ABC123', 'status': 'SERVER_ACK'}]})
+        self.assertEqual(MensagemWhatsApp.objects.get().status, 'entregue')
+        service.processar_webhook({'event': 'MESSAGES_UPDATE', 'data': {'key': {'id': 'ABC123'}, 'status': 'READ'}})
+        self.assertEqual(MensagemWhatsApp.objects.get().status, 'lida')
+
+
+
+class OrganizacaoTest(TestCase):
+    """Testes das organizações multi-unidade (empresas/organizacoes.py)"""
+
+    def setUp(self):
+        from assinaturas.models import Assinatura, Plano
+        from empresas.models import Organizacao
+
+        cache.clear()
+        self.matriz, self.filial, self.outra = [
+            Empresa.objects.create(
+                nome=nome, slug=slug, telefone='11999999999', email=f'{slug}@teste.com',
+                cnpj=f'33.444.555/000{indice}-66', onboarding_completo=True
+            )
+            for indice, (nome, slug) in enumerate(
+                [('Rede Centro', 'rede-centro'), ('Rede Bairro', 'rede-bairro'), ('Concorrente', 'concorrente')], start=1
+            )
+        ]
+        self.organizacao = Organizacao.objects.create(nome='Rede', matriz=self.matriz)
+        Empresa.objects.filter(pk__in=[self.matriz.pk, self.filial.pk]).update(organizacao=self.organizacao)
+        plano = Plano.objects.create(
+            nome='empresarial', preco_mensal=Decimal('399.90'),
+            permite_multi_unidades=True, permite_relatorios_avancados=True
+        )
+        Assinatura.objects.create(
+            empresa=self.matriz, plano=plano, status='ativa', data_expiracao=timezone.now() + timedelta(days=30)
+        )
+
+        inicio = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        for empresa, quantidade in [(self.matriz, 3), (self.filial, 2), (self.outra, 4)]:
+            servico = Servico.objects.create(empresa=empresa, nome='Corte', preco=Decimal('50.00'), duracao_minutos=30)
+            cliente = Cliente.objects.create(empresa=empresa, nome='Cliente', telefone='11777777777')
+            for indice in range(quantidade):
+                Agendamento.objects.create(
+                    empresa=empresa, cliente=cliente, servico=servico,
+                    data_hora_inicio=inicio - timedelta(hours=indice + 1),
+                    data_hora_fim=inicio - timedelta(hours=indice + 1) + timedelta(minutes=30),
+                    status='concluido' if indice else 'nao_compareceu',
+                )
+
+        self.usuario = Usuario.objects.create_user(
+            username='dona', email='dona@rede.com', password='senha12345', empresa=self.matriz, acessa_unidades=True
+        )
+
+    def test_painel_agrupa_por_unidade_com_queries_fixas(self):
+        from empresas import organizacoes
+
+        hoje = timezone.localdate()
+        with self.assertNumQueries(4):
+            organizacoes.calcular_painel([self.matriz.pk, self.filial.pk, self.outra.pk], hoje - timedelta(days=1), hoje)
+
+        dados = organizacoes.painel(self.organizacao.pk, hoje - timedelta(days=1), hoje)
+        por_nome = {unidade['nome']: unidade for unidade in dados['unidades']}
+        self.assertEqual(set(por_nome), {'Rede Centro', 'Rede Bairro'})
+        self.assertEqual(por_nome['Rede Centro']['agendamentos'], 3)
+        self.assertEqual(por_nome['Rede Centro']['faturamento'], Decimal('100.00'))
+        self.assertEqual(por_nome['Rede Bairro']['taxa_faltas'], 50.0)
+        self.assertEqual(dados['total']['agendamentos'], 5)
+        self.assertEqual(dados['total']['clientes'], 2)
+        with self.assertNumQueries(0):
+            organizacoes.painel(self.organizacao.pk, hoje - timedelta(days=1), hoje)
+
+    def test_troca_de_unidade_sem_novo_login(self):
+        self.client.force_login(self.usuario)
+        relatorio = reverse('agendamentos:relatorios')
+
+        resposta = self.client.post(reverse('trocar_unidade'), {'unidade': self.filial.pk, 'next': relatorio})
+        self.assertRedirects(resposta, relatorio, fetch_redirect_response=False)
+        # A filial não tem assinatura própria: vale a da matriz
+        dados = self.client.get(relatorio, {'formato': 'json'}).json()
+        self.assertEqual(dados['resumo']['agendamentos'], 2)
+
+        self.client.post(reverse('trocar_unidade'), {'unidade': self.outra.pk})
+        self.assertEqual(self.client.session['unidade_ativa_id'], self.filial.pk)
+
+        self.assertEqual(self.client.get(reverse('painel_organizacao'), {'formato': 'json'}).json()['total']['agendamentos'], 5)
+
+        # Sem acesso multi-unidade a unidade guardada na sessão deixa de valer
+        Usuario.objects.filter(pk=self.usuario.pk).update(acessa_unidades=False)
+        dados = self.client.get(relatorio, {'formato': 'json'}).json()
+        self.assertEqual(dados['resumo']['agendamentos'], 3)
+        self.assertNotIn('unidade_ativa_id', self.client.session)
+
+    def test_painel_segue_o_plano_da_matriz_e_nao_o_da_unidade_aberta(self):
+        from assinaturas.models import Assinatura, Plano
+
+        basico = Plano.objects.create(nome='basico', preco_mensal=Decimal('49.90'))
+        Assinatura.objects.create(
+            empresa=self.filial, plano=basico, status='ativa', data_expiracao=timezone.now() + timedelta(days=30)
+        )
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('trocar_unidade'), {'unidade': self.filial.pk})
+
+        resposta = self.client.get(reverse('painel_organizacao'), {'formato': 'json'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['total']['agendamentos'], 5)
+
+    def test_salvar_usuario_com_unidade_aberta_mantem_empresa_de_cadastro(self):
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('trocar_unidade'), {'unidade': self.filial.pk})
+
+        # alterar_senha salva request.user enquanto a filial está aberta
+        resposta = self.client.post(reverse('alterar_senha'), {
+            'senha_atual': 'senha12345', 'nova_senha': 'OutraSenha!2024', 'confirmar_senha': 'OutraSenha!2024',
+        })
+        self.assertRedirects(resposta, reverse('configuracoes_dashboard'), fetch_redirect_response=False)
+
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.empresa_id, self.matriz.pk)
+        self.assertTrue(self.usuario.check_password('OutraSenha!2024'))
+        self.assertEqual(self.client.session['unidade_ativa_id'], self.filial.pk)
@@ -0,0 +1,174 @@
+"""
+Conclusão automática de agendamentos passados (em lote)
+
+Antes, processar_agendamentos_concluidos percorria cada agendamento
+vencido e chamava save(): o pre_save buscava o agendamento de novo e o
+post_save fazia get_or_create da categoria e create do lançamento. Depois
+de um feriado prolongado eram milhares de idas ao banco.
+
+Agora, por lote de CONCLUSAO_TAMANHO_LOTE agendamentos:
+1. Um UPDATE ... RETURNING muda o status para concluído. O WHERE repete a
+   elegibilidade (status pendente/confirmado, terminou há mais de
+   CONCLUSAO_MARGEM_MINUTOS, sem lançamento), então rodar de novo, ou duas
+   execuções ao mesmo tempo, nunca conclui duas vezes
+2. Uma query traz valor, cliente e serviço dos agendamentos concluídos
+3. As categorias "Serviços" das empresas do lote vêm num mapa pré-carregado
+   (as que faltam são criadas num bulk_create)
+4. As receitas são criadas num único bulk_create
+5. O lote concluído é emitido uma vez como evento "salvo"
+   (agendamentos/services/eventos.py): invalida o cache de ocupação e
+   publica a mudança para os calendários abertos, após o commit
+
+Os signals de Agendamento não rodam (não há save()); atualizado_em é
+gravado no UPDATE para o feed incremental do calendário enxergar a mudança.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from agendamentos.models import Agendamento, StatusAgendamento
+from agendamentos.services.eventos import SALVO, emitir
+from .models import CategoriaFinanceira, LancamentoFinanceiro, StatusLancamento, TipoLancamento
+
+logger = logging.getLogger(__name__)
+
+STATUS_ELEGIVEIS = [StatusAgendamento.PENDENTE, StatusAgendamento.CONFIRMADO]
+
+CATEGORIA_SERVICOS = {
+    'nome': 'Serviços',
+    'tipo': TipoLancamento.RECEITA,
+    'descricao': 'Receitas de serviços prestados',
+    'cor': '#28a745',
+}
+
+
+def _tamanho_lote():
+    return getattr(settings, 'CONCLUSAO_TAMANHO_LOTE', 500)
+
+
+def limite_conclusao(agora=None):
+    """Agendamentos que terminaram antes deste instante podem ser concluídos"""
+    margem = getattr(settings, 'CONCLUSAO_MARGEM_MINUTOS', 30)
+    return (agora or timezone.now()) - timedelta(minutes=margem)
+
+
+def agendamentos_elegiveis(limite):
+    """Pendentes/confirmados que já terminaram e ainda não têm lançamento"""
+    return Agendamento.objects.filter(
+        data_hora_fim__lt=limite,
+        status__in=STATUS_ELEGIVEIS,
+        lancamentos__isnull=True,
+    ).order_by('id')
+
+
+def _concluir_lote(limite, tamanho_lote):
+    """UPDATE ... RETURNING de um lote; retorna os ids concluídos"""
+    subconsulta, parametros_sub = agendamentos_elegiveis(limite).values('id')[:tamanho_lote].query.sql_with_params()
+    q = connection.ops.quote_name
+    sql = (
+        f'UPDATE {q(Agendamento._meta.db_table)} '
+        f'SET {q("status")} = %s, {q("atualizado_em")} = %s '
+        f'WHERE {q("id")} IN ({subconsulta}) AND {q("status")} IN (%s, %s) '
+        f'RETURNING {q("id")}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            StatusAgendamento.CONCLUIDO,
+            connection.ops.adapt_datetimefield_value(timezone.now()),
+            *parametros_sub, *STATUS_ELEGIVEIS,
+        ])
+        return [linha[0] for linha in cursor.fetchall()]
+
+
+def _mapa_categorias(empresa_ids):
+    """{empresa_id: categoria "Serviços"} criando as que faltam em um bulk_create"""
+    filtro = {'nome': CATEGORIA_SERVICOS['nome'], 'tipo': CATEGORIA_SERVICOS['tipo']}
+    mapa = dict(
+        CategoriaFinanceira.objects.filter(empresa_id__in=empresa_ids, **filtro).values_list('empresa_id', 'id')
+    )
+    faltando = set(empresa_ids) - set(mapa)
+    if faltando:
+        CategoriaFinanceira.objects.bulk_create(
+            [CategoriaFinanceira(empresa_id=empresa_id, **CATEGORIA_SERVICOS) for empresa_id in faltando],
+            ignore_conflicts=True,  # Outra execução pode ter criado no meio tempo
+        )
+        mapa.update(
+            CategoriaFinanceira.objects.filter(empresa_id__in=faltando, **filtro).values_list('empresa_id', 'id')
+        )
+    return mapa
+
+
+def criar_receitas(ids):
+    """
+    Receitas dos agendamentos concluídos com valor (os que já têm
+    lançamento são ignorados); retorna (criadas, sem_valor).
+
+    Também usada pelo evento de domínio "concluido" (financeiro/signals.py).
+    """
+    linhas = list(
+        Agendamento.objects.filter(id__in=ids, lancamentos__isnull=True).values_list(
+            'id', 'empresa_id', 'valor_cobrado', 'data_hora_inicio', 'cliente__nome', 'servico__nome'
+        )
+    )
+    com_valor = [linha for linha in linhas if linha[2]]
+    if not com_valor:
+        return 0, len(linhas)
+
+    categorias = _mapa_categorias({linha[1] for linha in com_valor})
+    hoje = timezone.localdate()
+    LancamentoFinanceiro.objects.bulk_create([
+        LancamentoFinanceiro(
+            empresa_id=empresa_id,
+            tipo=TipoLancamento.RECEITA,
+            categoria_id=categorias[empresa_id],
+            agendamento_id=agendamento_id,
+            descricao=f"{servico or 'Serviço'} - {cliente}",
+            valor=valor,
+            data_vencimento=timezone.localtime(inicio).date(),
+            data_pagamento=hoje,
+            status=StatusLancamento.PAGO,
+        )
+        for agendamento_id, empresa_id, valor, inicio, cliente, servico in com_valor
+    ])
+    return len(com_valor), len(linhas) - len(com_valor)
+
+
+def concluir_agendamentos_vencidos(limite=None, tamanho_lote=None):
+    """
+    Conclui, em lotes, todos os agendamentos elegíveis e cria as receitas.
+
+    Cada lote é uma transação: se um falhar, os anteriores continuam
+    gravados e a próxima execução retoma do ponto em que parou.
+
+    Returns:
+        dict: {'concluidos', 'lancamentos', 'sem_valor', 'lotes'}
+    """
+    limite = limite or limite_conclusao()
+    tamanho_lote = tamanho_lote or _tamanho_lote()
+    resumo = {'concluidos': 0, 'lancamentos': 0, 'sem_valor': 0, 'lotes': 0}
+
+    while True:
+        with transaction.atomic():
+            ids = _concluir_lote(limite, tamanho_lote)
+            if not ids:
+                break
+            criadas, sem_valor = criar_receitas(ids)
+            # Sem save() não há post_save: caches e calendário recebem o lote aqui
+            emitir(SALVO, list(
+                Agendamento.objects.filter(id__in=ids)
+                .only('id', 'empresa_id', 'data_hora_inicio', 'profissional_id', 'status')
+            ))
+
+        resumo['lotes'] += 1
+        resumo['concluidos'] += len(ids)
+        resumo['lancamentos'] += criadas
+        resumo['sem_valor'] += sem_valor
+        logger.info(f"Lote {resumo['lotes']}: {len(ids)} agendamentos concluídos, {criadas} receitas")
+
+        if len(ids) < tamanho_lote:
+            break
+
+    return resumo
@@ -1,64 +1,36 @@
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
-from django.utils.timezone import now
-from agendamentos.models import Agendamento, StatusAgendamento
-from .models import LancamentoFinanceiro, TipoLancamento, StatusLancamento, CategoriaFinanceira
+"""
+Receitas de agendamentos, via eventos de domínio (agendamentos/services/eventos.py)
 
+O status anterior vem do snapshot da instância: nada é buscado de novo
+no banco, e um lote de agendamentos gera as receitas com um bulk_create.
+"""
+from agendamentos.models import StatusAgendamento
+from agendamentos.services.eventos import CANCELADO, CONCLUIDO, assinar
+from .conclusao import criar_receitas
+from .models import LancamentoFinanceiro, StatusLancamento
 
-@receiver(post_save, sender=Agendamento)
-def criar_receita_agendamento_concluido(sender, instance, created, **kwargs):
+
+@assinar(CONCLUIDO)
+def criar_receita_agendamento_concluido(agendamentos):
     """
     Cria automaticamente uma receita quando um agendamento é marcado como concluído
     """
-    # Só processa se o agendamento foi concluído e tem valor
-    if instance.status == StatusAgendamento.CONCLUIDO and instance.valor_cobrado:
-        
-        # Verifica se já existe um lançamento para este agendamento
-        if not instance.lancamentos.exists():
-            
-            # Busca ou cria categoria padrão "Serviços"
-            categoria, _ = CategoriaFinanceira.objects.get_or_create(
-                empresa=instance.empresa,
-                nome='Serviços',
-                tipo=TipoLancamento.RECEITA,
-                defaults={
-                    'descricao': 'Receitas de serviços prestados',
-                    'cor': '#28a745'
-                }
-            )
-            
-            # Cria o lançamento financeiro
-            LancamentoFinanceiro.objects.create(
-                empresa=instance.empresa,
-                tipo=TipoLancamento.RECEITA,
-                categoria=categoria,
-                agendamento=instance,
-                descricao=f"{instance.servico.nome} - {instance.cliente.nome}",
-                valor=instance.valor_cobrado,
-                data_vencimento=instance.data_hora_inicio.date(),
-                data_pagamento=now().date(),
-                status=StatusLancamento.PAGO,
-                criado_por=None  # Pode ser ajustado se tiver o usuário que marcou como concluído
-            )
+    ids = [agendamento.pk for agendamento in agendamentos if agendamento.valor_cobrado]
+    if ids:
+        criar_receitas(ids)
 
 
-@receiver(pre_save, sender=Agendamento)
-def cancelar_receita_agendamento_cancelado(sender, instance, **kwargs):
+@assinar(CANCELADO)
+def cancelar_receita_agendamento_cancelado(agendamentos):
     """
     Cancela a receita quando um agendamento concluído é cancelado
     """
-    if instance.pk:  # Só processa se o agendamento já existe
-        try:
-            agendamento_anterior = Agendamento.objects.get(pk=instance.pk)
-            
-            # Se estava concluído e agora foi cancelado
-            if (agendamento_anterior.status == StatusAgendamento.CONCLUIDO and 
-                instance.status == StatusAgendamento.CANCELADO):
-                
-                # Cancela os lançamentos vinculados
-                instance.lancamentos.filter(
-                    status__in=[StatusLancamento.PENDENTE, StatusLancamento.PAGO]
-                ).update(status=StatusLancamento.CANCELADO)
-                
-        except Agendamento.DoesNotExist:
-            pass
\ No newline at end of file
+    ids = [
+        agendamento.pk for agendamento in agendamentos
+        if agendamento.valor_original('status') == StatusAgendamento.CONCLUIDO
+    ]
+    if ids:
+        LancamentoFinanceiro.objects.filter(
+            agendamento_id__in=ids,
+            status__in=[StatusLancamento.PENDENTE, StatusLancamento.PAGO]
+        ).update(status=StatusLancamento.CANCELADO)
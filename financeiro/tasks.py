@@ -0,0 +1,30 @@
+"""
+Tasks Celery do financeiro
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def concluir_agendamentos_vencidos():
+    """
+    Conclui os agendamentos que já terminaram e cria as receitas, em lotes
+    (financeiro/conclusao.py).
+
+    Executado a cada 15 minutos via Celery Beat. Idempotente: execuções
+    repetidas ou simultâneas não concluem nem lançam nada duas vezes.
+    """
+    from financeiro.conclusao import concluir_agendamentos_vencidos as _concluir
+
+    try:
+        resumo = _concluir()
+        if resumo['concluidos']:
+            logger.info(
+                f"{resumo['concluidos']} agendamentos concluídos, "
+                f"{resumo['lancamentos']} receitas criadas ({resumo['lotes']} lotes)"
+            )
+        return resumo
+    except Exception as e:
+        logger.error(f"Erro ao concluir agendamentos vencidos: {str(e)}")
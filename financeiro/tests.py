@@ -651,3 +651,105 @@ class ManagementCommandTest(TestCase):
 
         # Verifica que não criou lançamento duplicado
         self.assertEqual(agendamento.lancamentos.count(), 1)
+
+
+class ConclusaoEmLoteTest(TestCase):
+    """Testes da conclusão automática em lote (financeiro/conclusao.py)"""
+
+    def setUp(self):
+        self.empresas = []
+        for indice in range(2):
+            empresa = Empresa.objects.create(
+                nome=f'Empresa Lote {indice}',
+                slug=f'empresa-lote-{indice}',
+                telefone='11999999999',
+                email=f'lote{indice}@teste.com',
+                cnpj=f'66.777.888/000{indice}-99'
+            )
+            servico = Servico.objects.create(
+                empresa=empresa, nome='Corte', preco=Decimal('50.00'), duracao_minutos=30
+            )
+            cliente = Cliente.objects.create(empresa=empresa, nome=f'Cliente {indice}', telefone=f'1177777777{indice}')
+            self.empresas.append((empresa, servico, cliente))
+
+        # Só a primeira empresa já tem a categoria
+        CategoriaFinanceira.objects.create(
+            empresa=self.empresas[0][0], nome='Serviços', tipo=TipoLancamento.RECEITA
+        )
+
+    def _criar(self, empresa, servico, cliente, horas_atras, valor=Decimal('50.00'), status=StatusAgendamento.CONFIRMADO):
+        fim = now() - timedelta(hours=horas_atras)
+        return Agendamento.objects.create(
+            empresa=empresa,
+            cliente=cliente,
+            servico=servico,
+            data_hora_inicio=fim - timedelta(minutes=30),
+            data_hora_fim=fim,
+            status=status,
+            valor_cobrado=valor
+        )
+
+    def test_conclui_em_lotes_e_cria_receitas(self):
+        from financeiro.conclusao import concluir_agendamentos_vencidos
+
+        vencidos = [self._criar(*self.empresas[i % 2], horas_atras=2 + i) for i in range(5)]
+        sem_valor = self._criar(*self.empresas[0], horas_atras=3, valor=None)
+        futuro = self._criar(*self.empresas[1], horas_atras=-2)
+        cancelado = self._criar(*self.empresas[1], horas_atras=5, status=StatusAgendamento.CANCELADO)
+
+        resumo = concluir_agendamentos_vencidos(tamanho_lote=2)
+
+        self.assertEqual(resumo, {'concluidos': 6, 'lancamentos': 5, 'sem_valor': 1, 'lotes': 3})
+        self.assertEqual(
+            set(Agendamento.objects.filter(status=StatusAgendamento.CONCLUIDO).values_list('id', flat=True)),
+            {a.id for a in vencidos} | {sem_valor.id}
+        )
+        futuro.refresh_from_db()
+        cancelado.refresh_from_db()
+        self.assertEqual(futuro.status, StatusAgendamento.CONFIRMADO)
+        self.assertEqual(cancelado.status, StatusAgendamento.CANCELADO)
+
+        lancamento = LancamentoFinanceiro.objects.get(agendamento=vencidos[1])
+        self.assertEqual(lancamento.empresa, self.empresas[1][0])
+        self.assertEqual(lancamento.categoria.nome, 'Serviços')
+        self.assertEqual(lancamento.status, StatusLancamento.PAGO)
+        self.assertEqual(lancamento.valor, Decimal('50.00'))
+        self.assertEqual(lancamento.descricao, 'Corte - Cliente 1')
+        # Categoria criada para a empresa que não tinha
+        self.assertEqual(CategoriaFinanceira.objects.filter(nome='Serviços').count(), 2)
+
+    def test_idempotente_e_com_queries_fixas(self):
+        from financeiro.conclusao import concluir_agendamentos_vencidos
+
+        for i in range(20):
+            self._criar(*self.empresas[i % 2], horas_atras=2 + i)
+
+        # SAVEPOINT + UPDATE RETURNING + dados + categorias (select, bulk_create, select)
+        # + bulk_create das receitas + lote do evento "salvo" + RELEASE,
+        # independente do número de agendamentos
+        with self.assertNumQueries(9):
+            resumo = concluir_agendamentos_vencidos(tamanho_lote=100)
+        self.assertEqual(resumo['concluidos'], 20)
+
+        resumo = concluir_agendamentos_vencidos(tamanho_lote=100)
+        self.assertEqual(resumo['concluidos'], 0)
+        self.assertEqual(LancamentoFinanceiro.objects.count(), 20)
+
+    def test_lote_invalida_ocupacao_e_publica_no_calendario(self):
+        from unittest.mock import patch
+        from agendamentos.cache_publico import versao_ocupacao
+        from financeiro.conclusao import concluir_agendamentos_vencidos
+
+        agendamentos = [self._criar(*self.empresas[i % 2], horas_atras=2 + i) for i in range(3)]
+        versoes = [versao_ocupacao(empresa.pk) for empresa, _, _ in self.empresas]
+
+        with patch('agendamentos.signals.publicar_mudanca') as publicar, \
+                self.captureOnCommitCallbacks(execute=True):
+            concluir_agendamentos_vencidos()
+
+        for (empresa, _, _), versao in zip(self.empresas, versoes):
+            self.assertGreater(versao_ocupacao(empresa.pk), versao)
+        publicados = {chamada.args[1]['id']: chamada.args for chamada in publicar.call_args_list}
+        self.assertEqual(set(publicados), {a.pk for a in agendamentos})
+        self.assertEqual(publicados[agendamentos[1].pk][0], self.empresas[1][0].pk)
+        self.assertEqual(publicados[agendamentos[1].pk][1]['status'], StatusAgendamento.CONCLUIDO)
@@ -176,7 +176,7 @@ def calcular_evolucao_mensal(empresa, inicio, fim):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def financeiro_dashboard(request):
     """Dashboard financeiro com métricas e gráficos"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     agora = now()
     
     # Parâmetros do período
@@ -379,7 +379,7 @@ def financeiro_dashboard(request):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def lancamentos_lista(request):
     """Lista todos os lançamentos financeiros"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     # Filtros
     tipo = request.GET.get('tipo', '')
@@ -418,7 +418,7 @@ def lancamentos_lista(request):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def lancamento_criar(request):
     """Cria um novo lançamento financeiro"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     
     if request.method == 'POST':
         tipo = request.POST.get('tipo')
@@ -464,7 +464,7 @@ def lancamento_criar(request):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def lancamento_editar(request, pk):
     """Edita um lançamento existente"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     lancamento = get_object_or_404(LancamentoFinanceiro, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -499,7 +499,7 @@ def lancamento_editar(request, pk):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def lancamento_deletar(request, pk):
     """Deleta um lançamento"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     lancamento = get_object_or_404(LancamentoFinanceiro, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -513,7 +513,7 @@ def lancamento_deletar(request, pk):
 @plano_required(feature_flag='permite_financeiro', feature_name='Controle Financeiro')
 def marcar_como_pago(request, pk):
     """Marca um lançamento como pago"""
-    empresa = request.user.empresa
+    empresa = request.empresa
     lancamento = get_object_or_404(LancamentoFinanceiro, pk=pk, empresa=empresa)
     
     if request.method == 'POST':
@@ -1,11 +1,12 @@
 """
 Comando Django para limpar logs antigos de analytics
 Executar periodicamente via cron ou Celery Beat
+
+Usa core.particionamento: no Postgres remove partições mensais inteiras
+(DROP instantâneo); no SQLite apaga em lotes para evitar DELETEs gigantes.
 """
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from landing.models import PageView, UserEvent
+from core.particionamento import get_config_tabela, purgar_antigos
 
 
 class Command(BaseCommand):
@@ -18,6 +19,12 @@ class Command(BaseCommand):
             default=30,
             help='Manter logs dos últimos N dias (padrão: 30)'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Quantidade de registros removidos por DELETE (padrão: 5000)'
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -27,16 +34,24 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         days = options['days']
         dry_run = options['dry_run']
-        
-        # Calcular data limite
-        data_limite = timezone.now() - timedelta(days=days)
-        
-        # Contar registros a serem deletados
-        pageviews_count = PageView.objects.filter(timestamp__lt=data_limite).count()
-        events_count = UserEvent.objects.filter(timestamp__lt=data_limite).count()
-        
+
+        pageviews = purgar_antigos(
+            get_config_tabela('landing.PageView'),
+            dias=days, batch_size=options['batch_size'], dry_run=dry_run
+        )
+        events = purgar_antigos(
+            get_config_tabela('landing.UserEvent'),
+            dias=days, batch_size=options['batch_size'], dry_run=dry_run
+        )
+
+        data_limite = pageviews['limite']
+        if data_limite is None:
+            self.stdout.write(self.style.WARNING('Retenção desativada (0 dias): nenhum registro removido'))
+            return
+        pageviews_count = pageviews['registros_removidos']
+        events_count = events['registros_removidos']
         total = pageviews_count + events_count
-        
+
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(f'[DRY RUN] Seriam deletados:')
@@ -46,19 +61,13 @@ class Command(BaseCommand):
             self.stdout.write(f'  - Total: {total} registros')
             self.stdout.write(f'  - Mais antigos que: {data_limite.strftime("%d/%m/%Y")}')
             return
-        
-        # Deletar registros antigos
-        self.stdout.write(f'Deletando logs anteriores a {data_limite.strftime("%d/%m/%Y")}...')
-        
-        pageviews_deleted = PageView.objects.filter(timestamp__lt=data_limite).delete()
-        events_deleted = UserEvent.objects.filter(timestamp__lt=data_limite).delete()
-        
+
         self.stdout.write(
-            self.style.SUCCESS(f'✓ Deletados {pageviews_deleted[0]} pageviews')
+            self.style.SUCCESS(f'✓ Deletados {pageviews_count} pageviews')
         )
         self.stdout.write(
-            self.style.SUCCESS(f'✓ Deletados {events_deleted[0]} eventos')
+            self.style.SUCCESS(f'✓ Deletados {events_count} eventos')
         )
         self.stdout.write(
-            self.style.SUCCESS(f'✓ Total: {pageviews_deleted[0] + events_deleted[0]} registros removidos')
+            self.style.SUCCESS(f'✓ Total: {total} registros removidos')
         )
@@ -0,0 +1,24 @@
+# Converte PageView e UserEvent em tabelas particionadas por mês (apenas Postgres).
+# No SQLite esta migration não faz nada. Ver core/particionamento.py.
+
+from django.db import migrations
+
+from core.particionamento import converter_para_particionada_op
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            converter_para_particionada_op('landing', 'PageView'),
+            migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            converter_para_particionada_op('landing', 'UserEvent'),
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 """
 Criar clientes de teste para a Barbearia
+
+Com --carga, gera a massa de dados dos testes de carga (tests/locustfile_api.py):
+N empresas x M profissionais x K agendamentos, mais um manifesto JSON com
+ids, slugs, instâncias e logins que os cenários do locust usam.
+
+Uso:
+    python scripts/criar_clientes_teste.py
+    python scripts/criar_clientes_teste.py --carga --empresas 20 --profissionais 5 --agendamentos 5000
 """
 
 import os
@@ -22,6 +30,7 @@ django.setup()
 
 # Imports após setup do Django
 from datetime import date
+from decimal import Decimal
 from clientes.models import Cliente
 from empresas.models import Empresa
 
@@ -255,9 +264,191 @@ def criar_clientes_teste():
     return True
 
 
+# ============================================
+# MASSA DE DADOS PARA TESTES DE CARGA
+# ============================================
+
+PREFIXO_CARGA = 'carga-'
+
+SERVICOS_CARGA = [
+    ('Corte', Decimal('40.00'), 30),
+    ('Barba', Decimal('25.00'), 20),
+    ('Corte + Barba', Decimal('60.00'), 50),
+    ('Sobrancelha', Decimal('15.00'), 15),
+]
+
+
+def limpar_dados_carga():
+    """Remove as empresas geradas por criar_dados_carga (cascata)."""
+    from core.models import Usuario
+
+    Usuario.objects.filter(empresa__slug__startswith=PREFIXO_CARGA).delete()
+    removidas, _ = Empresa.objects.filter(slug__startswith=PREFIXO_CARGA).delete()
+    return removidas
+
+
+def criar_dados_carga(empresas=10, profissionais=3, clientes=200, agendamentos=1000,
+                      dias=30, senha='carga12345', saida='tests/resultados/manifesto_carga.json', semente=42):
+    """
+    Gera N empresas x M profissionais x K agendamentos (bulk_create) e
+    grava o manifesto usado pelo locust.
+
+    Os agendamentos ficam espalhados entre -dias e +dias a partir de hoje,
+    em horário comercial, para os cálculos de disponibilidade terem
+    conflitos reais.
+    """
+    import json
+    import random
+    import secrets
+    from datetime import datetime, time, timedelta
+    from django.utils import timezone
+    from agendamentos.models import Agendamento
+    from assinaturas.models import Assinatura, Plano
+    from core.models import Usuario
+    from empresas.models import ConfiguracaoWhatsApp, HorarioFuncionamento, Profissional, Servico
+
+    aleatorio = random.Random(semente)
+    plano, _ = Plano.objects.get_or_create(
+        nome='profissional',
+        defaults={
+            'descricao': 'Plano gerado para testes de carga',
+            'preco_mensal': Decimal('0.00'),
+            'max_profissionais': max(profissionais, 1),
+            'max_agendamentos_mes': 1000000,
+            'max_usuarios': 10,
+            'max_servicos': 50,
+        }
+    )
+
+    print(f"[LIMPANDO] {limpar_dados_carga()} registros de cargas anteriores")
+    manifesto = {'gerado_em': timezone.now().isoformat(), 'senha': senha, 'empresas': []}
+    hoje = timezone.localdate()
+
+    for indice in range(1, empresas + 1):
+        slug = f'{PREFIXO_CARGA}{indice:03d}'
+        empresa = Empresa.objects.create(
+            nome=f'Carga {indice:03d}',
+            slug=slug,
+            telefone=f'8799{indice:07d}',
+            email=f'{slug}@carga.local',
+            cnpj=f'99.{indice:03d}.000/0001-{indice % 100:02d}',
+            endereco='Rua da Carga, 1',
+            onboarding_completo=True,
+            whatsapp_conectado=True,
+            is_demo=True,
+            origem_cadastro='checkout',  # não dispara o e-mail de boas-vindas
+        )
+        instance_name = f'gestto_{slug}'
+        webhook_secret = secrets.token_hex(8)
+        ConfiguracaoWhatsApp.objects.filter(empresa=empresa).update(
+            instance_name=instance_name,
+            webhook_secret=webhook_secret,
+            status='conectado',
+        )
+        Assinatura.objects.create(
+            empresa=empresa,
+            plano=plano,
+            status='ativa',
+            data_expiracao=timezone.now() + timedelta(days=365),
+        )
+        usuario = Usuario.objects.create_user(
+            username=f'carga_{indice:03d}',
+            email=f'{slug}@carga.local',
+            password=senha,
+            empresa=empresa,
+            is_activated=True,
+        )
+
+        servicos = Servico.objects.bulk_create([
+            Servico(empresa=empresa, nome=nome, preco=preco, duracao_minutos=duracao)
+            for nome, preco, duracao in SERVICOS_CARGA
+        ])
+        equipe = Profissional.objects.bulk_create([
+            Profissional(empresa=empresa, nome=f'Profissional {p:02d}', telefone=f'8798{indice:03d}{p:04d}')
+            for p in range(1, profissionais + 1)
+        ])
+        Profissional.servicos.through.objects.bulk_create([
+            Profissional.servicos.through(profissional_id=profissional.id, servico_id=servico.id)
+            for profissional in equipe for servico in servicos
+        ])
+        HorarioFuncionamento.objects.bulk_create([
+            HorarioFuncionamento(
+                empresa=empresa, dia_semana=dia,
+                hora_abertura=time(9), hora_fechamento=time(19),
+                intervalo_inicio=time(12), intervalo_fim=time(13),
+            )
+            for dia in range(6)
+        ])
+        carteira = Cliente.objects.bulk_create([
+            Cliente(empresa=empresa, nome=f'Cliente {c:05d}', telefone=f'55{indice:03d}9{c:07d}')
+            for c in range(1, clientes + 1)
+        ])
+
+        lote = []
+        for _ in range(agendamentos):
+            data = hoje + timedelta(days=aleatorio.randint(-dias, dias))
+            inicio = timezone.make_aware(datetime.combine(data, time(aleatorio.randint(9, 18), aleatorio.choice([0, 30]))))
+            servico = aleatorio.choice(servicos)
+            lote.append(Agendamento(
+                empresa=empresa,
+                cliente=aleatorio.choice(carteira),
+                servico=servico,
+                profissional=aleatorio.choice(equipe) if equipe else None,
+                data_hora_inicio=inicio,
+                data_hora_fim=inicio + timedelta(minutes=servico.duracao_minutos),
+                status=aleatorio.choice(['concluido', 'concluido', 'cancelado']) if data < hoje
+                else aleatorio.choice(['pendente', 'confirmado']),
+                valor_cobrado=servico.preco,
+            ))
+        Agendamento.objects.bulk_create(lote, batch_size=1000)
+
+        manifesto['empresas'].append({
+            'id': empresa.id,
+            'slug': slug,
+            'instance_name': instance_name,
+            'webhook_secret': webhook_secret,
+            'usuario': usuario.username,
+            'servicos': [{'id': s.id, 'nome': s.nome} for s in servicos],
+            'profissionais': [p.id for p in equipe],
+            'telefones': [c.telefone for c in carteira[:50]],
+        })
+        print(f"[OK] {empresa.nome}: {len(equipe)} profissionais, {len(carteira)} clientes, {len(lote)} agendamentos")
+
+    os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2)
+    print(f"\n[MANIFESTO] {saida}")
+    return manifesto
+
+
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Clientes de teste / massa de dados de carga')
+    parser.add_argument('--carga', action='store_true', help='Gera a massa de dados dos testes de carga')
+    parser.add_argument('--empresas', type=int, default=10)
+    parser.add_argument('--profissionais', type=int, default=3)
+    parser.add_argument('--clientes', type=int, default=200, help='Clientes por empresa')
+    parser.add_argument('--agendamentos', type=int, default=1000, help='Agendamentos por empresa')
+    parser.add_argument('--dias', type=int, default=30, help='Janela (± dias) dos agendamentos')
+    parser.add_argument('--saida', default='tests/resultados/manifesto_carga.json')
+    parser.add_argument('--limpar', action='store_true', help='Apenas remove a massa de carga')
+    argumentos = parser.parse_args()
+
     try:
-        criar_clientes_teste()
+        if argumentos.limpar:
+            print(f"[OK] {limpar_dados_carga()} registros removidos")
+        elif argumentos.carga:
+            criar_dados_carga(
+                empresas=argumentos.empresas,
+                profissionais=argumentos.profissionais,
+                clientes=argumentos.clientes,
+                agendamentos=argumentos.agendamentos,
+                dias=argumentos.dias,
+                saida=argumentos.saida,
+            )
+        else:
+            criar_clientes_teste()
     except Exception as e:
         print(f"\n[ERRO FATAL] {e}")
         import traceback
@@ -4,8 +4,8 @@
 
 cd /app
 
-# Roda o comando Django
-python manage.py processar_agendamentos_concluidos >> /var/log/cron.log 2>&1
+# A conclusão automática de agendamentos (processar_agendamentos_concluidos)
+# roda pelo Celery Beat: financeiro.tasks.concluir_agendamentos_vencidos
 
 # Adicione aqui outros comandos periódicos no futuro
 # python manage.py enviar_lembretes >> /var/log/cron.log 2>&1
\ No newline at end of file
@@ -1,6 +1,9 @@
 """
 Script para importar dados das planilhas Excel para o Django
 
+OBSOLETO: use `python manage.py importar_dados <arquivo> --empresa <id|slug>`
+(core/importacao.py), que importa em lotes para a empresa informada.
+
 Uso:
     python manage.py shell < scripts/importar_planilhas.py
 
@@ -2,6 +2,9 @@
 """
 Script para importar dados das planilhas Excel da Brandão Barbearia
 
+OBSOLETO: use `python manage.py importar_dados <arquivo> --empresa <id|slug>`
+(core/importacao.py), que importa em lotes para a empresa informada.
+
 Estrutura das planilhas:
 - Serviços: (vazia - cadastrar manualmente)
 - horarios: Dia | Manhã | Fim Manhã | Tarde | Fim
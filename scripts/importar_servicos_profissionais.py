@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """
 Importar Serviços e Profissionais da Brandão Barbearia
+
+OBSOLETO: use `python manage.py importar_dados <arquivo> --empresa <id|slug>`
+(core/importacao.py), que importa em lotes para a empresa informada.
 """
 
 import os
@@ -0,0 +1,42 @@
+// Agenda em tempo real (Server-Sent Events: /app/agendamentos/api/eventos/)
+// Se o push não estiver disponível (503/429, navegador sem EventSource),
+// cai para atualização por intervalo chamando aoReconectar.
+function conectarEventosCalendario({ aoMudar, aoReconectar, intervaloFallback = 60000 }) {
+  let fallback = null;
+
+  function iniciarFallback() {
+    if (!fallback && intervaloFallback && aoReconectar) {
+      fallback = setInterval(aoReconectar, intervaloFallback);
+    }
+  }
+
+  if (!window.EventSource) {
+    iniciarFallback();
+    return null;
+  }
+
+  const fonte = new EventSource('/app/agendamentos/api/eventos/');
+  let jaConectou = false;
+
+  // 'pronto' chega a cada (re)conexão: na reconexão busca o que mudou no intervalo
+  fonte.addEventListener('pronto', () => {
+    if (jaConectou && aoReconectar) {
+      aoReconectar();
+    }
+    jaConectou = true;
+  });
+
+  fonte.addEventListener('agendamento', (e) => {
+    aoMudar(JSON.parse(e.data));
+  });
+
+  fonte.onerror = () => {
+    // CLOSED = o servidor recusou (sem SSE ou limite de conexões); senão o navegador reconecta sozinho
+    if (fonte.readyState === EventSource.CLOSED) {
+      console.warn('[Agenda] Tempo real indisponível, atualizando por intervalo');
+      iniciarFallback();
+    }
+  };
+
+  return fonte;
+}
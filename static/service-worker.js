@@ -61,6 +61,9 @@ self.addEventListener('fetch', (event) => {
   // Ignora requisições do Django Admin
   if (event.request.url.includes('/admin/')) return;
 
+  // Streams SSE (calendário em tempo real) nunca passam pelo cache
+  if (event.request.headers.get('Accept') === 'text/event-stream') return;
+
   event.respondWith(
     fetch(event.request)
       .then((response) => {
@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks das primitivas de agenda (pytest-benchmark)
+
+Mede tempo e número de queries de cada primitiva isolada, nas escalas
+definidas em conftest.py (1/10/50 profissionais, 100/10k/100k agendamentos).
+Não roda com o `pytest` normal (o arquivo não casa com python_files):
+
+    pip install pytest-benchmark
+
+    # Baseline de tempo desta máquina (fica em .benchmarks/)
+    pytest tests/benchmarks/bench_agenda.py --benchmark-save=baseline
+
+    # Depois da mudança: compara e falha se a mediana piorar mais de 20%
+    pytest tests/benchmarks/bench_agenda.py --benchmark-compare \\
+        --benchmark-compare-fail=median:20%
+
+    # Só as escalas rápidas
+    BENCH_ESCALAS=pequena,media pytest tests/benchmarks/bench_agenda.py
+
+O número de queries é comparado sempre com baseline_queries.json (ver
+conftest.py), independente da máquina.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from agendamentos.api_n8n import gerar_slots_disponiveis
+from agendamentos.public_views import _gerar_slots_disponiveis
+from agendamentos.utils_recorrencia import gerar_agendamentos_recorrencia
+from agendamentos.views import _verificar_disponibilidade_horario
+from financeiro.views import calcular_evolucao_mensal
+
+
+def test_gerar_slots_disponiveis(escala, medir):
+    """Slots do n8n para um profissional num dia cheio"""
+    slots = medir(
+        gerar_slots_disponiveis,
+        escala['empresa'], escala['profissionais'][0], escala['data_alvo'],
+        time(9), time(19), time(12), time(13), escala['servico'].duracao_minutos,
+    )
+    assert isinstance(slots, list)
+
+
+def test_gerar_slots_disponiveis_qualquer_profissional(escala, medir):
+    """Slots do n8n sem profissional: conflitos de toda a equipe no dia"""
+    medir(
+        gerar_slots_disponiveis,
+        escala['empresa'], None, escala['data_alvo'],
+        time(9), time(19), None, None, escala['servico'].duracao_minutos,
+    )
+
+
+def test_gerar_slots_disponiveis_publico(escala, medir):
+    """Slots da página pública de agendamento"""
+    slots = medir(
+        _gerar_slots_disponiveis,
+        escala['empresa'], escala['profissionais'][0], escala['servico'],
+        escala['data_alvo'], time(9), time(19),
+    )
+    assert isinstance(slots, list)
+
+
+def test_verificar_disponibilidade_horario(escala, medir):
+    """Checagem de um horário sem profissional (varre a equipe e gera sugestões)"""
+    inicio = timezone.make_aware(datetime.combine(escala['data_alvo'], time(10)))
+    resultado = medir(
+        _verificar_disponibilidade_horario,
+        escala['empresa'], inicio, inicio + timedelta(minutes=30), escala['servico'],
+    )
+    assert 'disponivel' in resultado
+
+
+def test_gerar_agendamentos_recorrencia(escala, medir):
+    """Geração de 60 dias de uma recorrência semanal (Seg/Qua/Sex)"""
+    from agendamentos.models import Agendamento
+
+    recorrencia = escala['recorrencia']
+
+    def limpar_gerados():
+        Agendamento.objects.filter(
+            empresa=escala['empresa'],
+            notas=f'Gerado automaticamente pela recorrência #{recorrencia.id}',
+        ).delete()
+
+    criados = medir(gerar_agendamentos_recorrencia, recorrencia, preparar=limpar_gerados)
+    assert criados > 0
+
+
+def test_calcular_evolucao_mensal(escala, medir):
+    """Receitas x despesas mês a mês nos últimos 12 meses"""
+    fim = timezone.now()
+    inicio = fim - timedelta(days=365)
+    evolucao = medir(calcular_evolucao_mensal, escala['empresa'], inicio, fim)
+    assert len(evolucao) >= 12
@@ -0,0 +1,231 @@
+"""
+Fixtures dos micro-benchmarks de agenda (ver bench_agenda.py)
+
+Cada escala é semeada uma vez por módulo, dentro de uma transação que é
+desfeita no fim: nada sobra no banco de teste (útil com --reuse-db) e
+não é preciso apagar 100k agendamentos um a um.
+
+Escalas (BENCH_ESCALAS=pequena,media para rodar só algumas):
+    pequena:  1 profissional,   100 agendamentos
+    media:   10 profissionais,  10k agendamentos
+    grande:  50 profissionais, 100k agendamentos
+
+Baseline de queries: baseline_queries.json (versionado). Cada benchmark
+falha se passar do baseline + BENCH_TOLERANCIA_QUERIES (% , padrão 10).
+Para regravar após uma mudança intencional:
+    BENCH_ATUALIZAR_BASELINE=1 pytest tests/benchmarks/bench_agenda.py
+"""
+import json
+import math
+import os
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+ESCALAS = {
+    'pequena': {'profissionais': 1, 'agendamentos': 100},
+    'media': {'profissionais': 10, 'agendamentos': 10_000},
+    'grande': {'profissionais': 50, 'agendamentos': 100_000},
+}
+
+# Agendamentos por profissional por dia (expediente tem 20 slots de 30min)
+AGENDAMENTOS_POR_DIA = 10
+
+CAMINHO_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline_queries.json')
+ATUALIZAR_BASELINE = os.environ.get('BENCH_ATUALIZAR_BASELINE') == '1'
+TOLERANCIA_QUERIES = float(os.environ.get('BENCH_TOLERANCIA_QUERIES', '10'))
+
+_medicoes = {}
+
+
+def escalas_selecionadas():
+    nomes = os.environ.get('BENCH_ESCALAS')
+    if not nomes:
+        return list(ESCALAS)
+    return [nome.strip() for nome in nomes.split(',') if nome.strip() in ESCALAS]
+
+
+def carregar_baseline():
+    if not os.path.exists(CAMINHO_BASELINE):
+        return {}
+    with open(CAMINHO_BASELINE, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def semear(profissionais, agendamentos, semente=42):
+    """
+    Empresa com horário Seg-Sáb 9h-19h, N profissionais e K agendamentos
+    futuros (~10 por profissional por dia), mais um lançamento financeiro
+    pago por agendamento espalhado nos últimos 12 meses.
+    """
+    from agendamentos.models import Agendamento, AgendamentoRecorrente
+    from clientes.models import Cliente
+    from empresas.models import Empresa, HorarioFuncionamento, Profissional, Servico
+    from financeiro.models import CategoriaFinanceira, LancamentoFinanceiro, StatusLancamento, TipoLancamento
+
+    aleatorio = random.Random(semente)
+    hoje = timezone.localdate()
+
+    empresa = Empresa.objects.create(
+        nome='Benchmark',
+        slug=f'benchmark-{profissionais}-{agendamentos}',
+        telefone='11900000000',
+        email='benchmark@teste.local',
+        cnpj='99.999.999/0001-99',
+        origem_cadastro='checkout',
+    )
+    servico = Servico.objects.create(empresa=empresa, nome='Corte', preco=Decimal('50.00'), duracao_minutos=30)
+    equipe = Profissional.objects.bulk_create([
+        Profissional(empresa=empresa, nome=f'Profissional {p:02d}', telefone=f'1198{p:07d}')
+        for p in range(1, profissionais + 1)
+    ])
+    Profissional.servicos.through.objects.bulk_create([
+        Profissional.servicos.through(profissional_id=profissional.id, servico_id=servico.id)
+        for profissional in equipe
+    ])
+    HorarioFuncionamento.objects.bulk_create([
+        HorarioFuncionamento(empresa=empresa, dia_semana=dia, hora_abertura=time(9), hora_fechamento=time(19))
+        for dia in range(6)
+    ])
+    carteira = Cliente.objects.bulk_create([
+        Cliente(empresa=empresa, nome=f'Cliente {c:04d}', telefone=f'5511{c:09d}')
+        for c in range(1, 201)
+    ])
+
+    # Dias úteis a partir de amanhã, suficientes para ~10 por profissional/dia
+    dias_necessarios = max(1, math.ceil(agendamentos / (profissionais * AGENDAMENTOS_POR_DIA)))
+    dias_uteis = []
+    dia = hoje + timedelta(days=1)
+    while len(dias_uteis) < dias_necessarios:
+        if dia.weekday() < 6:
+            dias_uteis.append(dia)
+        dia += timedelta(days=1)
+
+    lote = []
+    for indice in range(agendamentos):
+        data = dias_uteis[indice % len(dias_uteis)]
+        inicio = timezone.make_aware(datetime.combine(data, time(aleatorio.randint(9, 18), aleatorio.choice([0, 30]))))
+        lote.append(Agendamento(
+            empresa=empresa,
+            cliente=aleatorio.choice(carteira),
+            servico=servico,
+            profissional=equipe[indice % len(equipe)],
+            data_hora_inicio=inicio,
+            data_hora_fim=inicio + timedelta(minutes=servico.duracao_minutos),
+            status=aleatorio.choice(['pendente', 'confirmado']),
+            valor_cobrado=servico.preco,
+        ))
+    Agendamento.objects.bulk_create(lote, batch_size=2000)
+
+    categorias = {
+        tipo: CategoriaFinanceira.objects.get_or_create(empresa=empresa, nome='Benchmark', tipo=tipo)[0]
+        for tipo in (TipoLancamento.RECEITA, TipoLancamento.DESPESA)
+    }
+    LancamentoFinanceiro.objects.bulk_create([
+        LancamentoFinanceiro(
+            empresa=empresa,
+            tipo=tipo,
+            categoria=categorias[tipo],
+            descricao='Benchmark',
+            valor=Decimal(aleatorio.randint(10, 300)),
+            data_vencimento=hoje - timedelta(days=aleatorio.randint(0, 364)),
+            status=StatusLancamento.PAGO,
+        )
+        for tipo in (aleatorio.choice([TipoLancamento.RECEITA] * 3 + [TipoLancamento.DESPESA])
+                     for _ in range(agendamentos))
+    ], batch_size=2000)
+
+    recorrencia = AgendamentoRecorrente.objects.create(
+        empresa=empresa,
+        cliente=carteira[0],
+        servico=servico,
+        profissional=equipe[0],
+        frequencia='semanal',
+        dias_semana=[0, 2, 4],
+        hora_inicio=time(8),  # antes da abertura: não colide com a massa
+        data_inicio=hoje,
+    )
+
+    # Dia "cheio" no meio do período, sempre um dia útil
+    data_alvo = dias_uteis[len(dias_uteis) // 2]
+    return {
+        'empresa': empresa,
+        'servico': servico,
+        'profissionais': equipe,
+        'recorrencia': recorrencia,
+        'data_alvo': data_alvo,
+        'hoje': hoje,
+    }
+
+
+@pytest.fixture(scope='module', params=escalas_selecionadas())
+def escala(request, django_db_setup, django_db_blocker):
+    """Massa de dados da escala, semeada numa transação desfeita ao final"""
+    parametros = ESCALAS[request.param]
+    with django_db_blocker.unblock():
+        atomico = transaction.atomic()
+        atomico.__enter__()
+        dados = semear(**parametros)
+    dados['nome'] = request.param
+    yield dados
+    with django_db_blocker.unblock():
+        transaction.set_rollback(True)
+        atomico.__exit__(None, None, None)
+
+
+@pytest.fixture
+def medir(request, benchmark, db):
+    """
+    medir(funcao, *args, preparar=None, **kwargs)
+
+    Conta as queries de uma chamada, confere com o baseline e cronometra
+    com o pytest-benchmark. ``preparar`` roda antes de cada rodada (fora
+    do cronômetro) para primitivas que gravam no banco.
+    """
+    def _medir(funcao, *args, preparar=None, **kwargs):
+        if preparar:
+            preparar()
+        with CaptureQueriesContext(connection) as consultas:
+            funcao(*args, **kwargs)
+        total = len(consultas)
+        benchmark.extra_info['queries'] = total
+        _medicoes[request.node.name] = total
+
+        if preparar:
+            def _setup():
+                preparar()
+                return args, kwargs
+            resultado = benchmark.pedantic(funcao, setup=_setup, rounds=5, iterations=1)
+        else:
+            resultado = benchmark(funcao, *args, **kwargs)
+
+        if not ATUALIZAR_BASELINE:
+            esperado = carregar_baseline().get(request.node.name)
+            if esperado is None:
+                pytest.fail(
+                    f'{request.node.name} sem baseline de queries; '
+                    f'rode com BENCH_ATUALIZAR_BASELINE=1 ({total} queries medidas)'
+                )
+            limite = esperado * (1 + TOLERANCIA_QUERIES / 100)
+            assert total <= limite, (
+                f'{request.node.name}: {total} queries, baseline {esperado} '
+                f'(tolerância {TOLERANCIA_QUERIES:.0f}%)'
+            )
+        return resultado
+
+    return _medir
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not ATUALIZAR_BASELINE or not _medicoes:
+        return
+    baseline = carregar_baseline()
+    baseline.update(_medicoes)
+    with open(CAMINHO_BASELINE, 'w', encoding='utf-8') as arquivo:
+        json.dump(dict(sorted(baseline.items())), arquivo, indent=2)
+        arquivo.write('\n')
@@ -0,0 +1,82 @@
+"""
+Compara duas execuções do teste de carga (JSON gerado por tests/locustfile_api.py)
+
+Uso:
+    python tests/comparar_carga.py tests/resultados/antes.json tests/resultados/depois.json
+    python tests/comparar_carga.py antes.json depois.json --limite 15
+
+Mostra, por endpoint, req/s, p50, p95 e taxa de falhas das duas execuções.
+Sai com código 1 se algum endpoint piorar o p95 além de --limite (%),
+para poder ser usado em CI.
+"""
+import argparse
+import json
+import sys
+
+
+def carregar(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        dados = json.load(arquivo)
+    return dados, {(e['metodo'], e['nome']): e for e in dados['endpoints']}
+
+
+def variacao(antes, depois):
+    if not antes:
+        return None
+    return (depois - antes) / antes * 100
+
+
+def taxa_falhas(entrada):
+    return entrada['falhas'] / entrada['requisicoes'] * 100 if entrada['requisicoes'] else 0
+
+
+def formatar_variacao(valor):
+    return '   n/a' if valor is None else f'{valor:+6.1f}%'
+
+
+def comparar(caminho_antes, caminho_depois, limite):
+    dados_antes, antes = carregar(caminho_antes)
+    dados_depois, depois = carregar(caminho_depois)
+
+    print(f"Antes:  {caminho_antes} (commit {dados_antes.get('commit')}, {dados_antes.get('usuarios')} usuários)")
+    print(f"Depois: {caminho_depois} (commit {dados_depois.get('commit')}, {dados_depois.get('usuarios')} usuários)\n")
+    print(f"{'endpoint':58} {'req/s':>15} {'p50 ms':>13} {'p95 ms':>21} {'falhas %':>13}")
+
+    regressoes = []
+    for chave in sorted(set(antes) | set(depois), key=lambda c: c[1]):
+        a, d = antes.get(chave), depois.get(chave)
+        nome = f'{chave[0]} {chave[1]}'[:58]
+        if not a or not d:
+            print(f"{nome:58} {'(só em ' + ('depois' if d else 'antes') + ')':>15}")
+            continue
+
+        delta_p95 = variacao(a['p95_ms'], d['p95_ms'])
+        print(
+            f"{nome:58} {a['rps']:6.1f}->{d['rps']:<6.1f} {a['p50_ms']:5.0f}->{d['p50_ms']:<5.0f} "
+            f"{a['p95_ms']:5.0f}->{d['p95_ms']:<5.0f}{formatar_variacao(delta_p95)} "
+            f"{taxa_falhas(a):5.1f}->{taxa_falhas(d):<5.1f}"
+        )
+        if delta_p95 is not None and delta_p95 > limite:
+            regressoes.append((nome, delta_p95))
+
+    total_antes, total_depois = dados_antes['total'], dados_depois['total']
+    print(
+        f"\nTOTAL: {total_antes['rps']:.1f} -> {total_depois['rps']:.1f} req/s, "
+        f"p95 {total_antes['p95_ms']:.0f} -> {total_depois['p95_ms']:.0f} ms"
+    )
+
+    if regressoes:
+        print(f'\nRegressões de p95 acima de {limite}%:')
+        for nome, delta in regressoes:
+            print(f'  - {nome}: {delta:+.1f}%')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compara duas execuções do teste de carga')
+    parser.add_argument('antes')
+    parser.add_argument('depois')
+    parser.add_argument('--limite', type=float, default=20.0, help='Piora máxima aceita no p95 (%%)')
+    argumentos = parser.parse_args()
+    sys.exit(comparar(argumentos.antes, argumentos.depois, argumentos.limite))
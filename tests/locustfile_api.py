@@ -0,0 +1,294 @@
+"""
+Testes de carga do caminho que mais pesa: bot/n8n, webhooks e agendamento público
+
+Cenários (classes de usuário, filtráveis por tag ou nome da classe):
+- BotUser (bot): rajadas de intenções em /api/bot/processar/
+- N8nUser (n8n): /api/n8n/horarios-disponiveis/ e /api/n8n/contexto/
+  espalhados por vários tenants
+- WebhookUser (webhook): enxurrada de mensagens no webhook global
+- AgendamentoPublicoUser (publico): página /agendar/<slug>/ e suas APIs
+- DashboardUser (dashboard): login e telas do painel
+
+Preparação (offline):
+1. Massa de dados + manifesto:
+       python scripts/criar_clientes_teste.py --carga --empresas 20 --profissionais 5 --agendamentos 5000
+2. Stub da Evolution/n8n:
+       python tests/stub_servicos.py --porta 9000 --atraso 0.3
+3. Django apontando para o stub e com throttling folgado:
+       N8N_WEBHOOK_URL=http://localhost:9000/webhook/bot EVOLUTION_API_URL=http://localhost:9000 \\
+       THROTTLE_ANON=1000000/hour THROTTLE_USER=1000000/hour THROTTLE_BOT_API=1000000/hour \\
+       gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker --workers 3 --bind 0.0.0.0:8000
+
+Execução:
+    locust -f tests/locustfile_api.py --host http://localhost:8000 --headless -u 200 -r 20 -t 2m
+    locust -f tests/locustfile_api.py --host http://localhost:8000 --headless -u 100 -r 10 -t 1m --tags n8n
+
+Cada execução grava tests/resultados/carga-<data>.json (ou CARGA_RESULTADO);
+compare duas execuções com:
+    python tests/comparar_carga.py tests/resultados/antes.json tests/resultados/depois.json
+"""
+import json
+import os
+import random
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+from locust import HttpUser, between, constant, events, tag, task
+
+MANIFESTO = os.environ.get('CARGA_MANIFESTO', 'tests/resultados/manifesto_carga.json')
+API_KEY = os.environ.get('GESTTO_API_KEY', 'desenvolvimento-inseguro-mudar-em-producao')
+
+_manifesto = None
+
+
+def manifesto():
+    global _manifesto
+    if _manifesto is None:
+        with open(MANIFESTO, encoding='utf-8') as arquivo:
+            _manifesto = json.load(arquivo)
+        if not _manifesto['empresas']:
+            raise RuntimeError(f'Manifesto sem empresas: {MANIFESTO}')
+    return _manifesto
+
+
+def empresa_aleatoria():
+    return random.choice(manifesto()['empresas'])
+
+
+def data_futura(max_dias=14):
+    return (date.today() + timedelta(days=random.randint(0, max_dias))).isoformat()
+
+
+def mensagem_evolution(instance_name, telefone, texto):
+    """Payload no formato do evento messages.upsert da Evolution API"""
+    return {
+        'event': 'messages.upsert',
+        'instance': instance_name,
+        'data': {
+            'key': {'remoteJid': f'{telefone}@s.whatsapp.net', 'fromMe': False, 'id': f'{time.time_ns()}'},
+            'pushName': 'Cliente Carga',
+            'message': {'conversation': texto},
+            'messageType': 'conversation',
+        },
+    }
+
+
+class TenantUser(HttpUser):
+    """Base: cada usuário virtual fala em nome de um tenant do manifesto"""
+
+    abstract = True
+
+    def on_start(self):
+        self.empresa = empresa_aleatoria()
+        self.headers_api = {
+            'X-API-Key': API_KEY,
+            'X-Empresa-ID': str(self.empresa['id']),
+        }
+
+
+@tag('bot')
+class BotUser(TenantUser):
+    """
+    Conversas do WhatsApp chegando em rajadas: várias intenções em
+    sequência rápida e depois uma pausa (o cliente lendo a resposta).
+    """
+
+    weight = 3
+
+    def on_start(self):
+        super().on_start()
+        self._restantes_rajada = 0
+
+    def wait_time(self):
+        if self._restantes_rajada > 0:
+            self._restantes_rajada -= 1
+            return random.uniform(0.1, 0.5)
+        self._restantes_rajada = random.randint(3, 8)
+        return random.uniform(3, 10)
+
+    def _processar(self, intencao, dados):
+        self.client.post('/api/bot/processar/', json={
+            'telefone': random.choice(self.empresa['telefones']),
+            'mensagem_original': f'carga {intencao}',
+            'intencao': intencao,
+            'dados': dados,
+        }, headers=self.headers_api, name=f'/api/bot/processar/ [{intencao}]')
+
+    @task(5)
+    def consultar(self):
+        self._processar('consultar', {})
+
+    @task(3)
+    def agendar(self):
+        self._processar('agendar', {
+            'servico': random.choice(self.empresa['servicos'])['nome'],
+            'data': data_futura(),
+            'hora': f'{random.randint(9, 18):02d}:{random.choice(["00", "30"])}',
+        })
+
+    @task(1)
+    def endereco(self):
+        self._processar('endereco', {})
+
+
+@tag('n8n')
+class N8nUser(TenantUser):
+    """Consultas de disponibilidade do n8n para muitos tenants"""
+
+    weight = 3
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        super().on_start()
+        self._etag = None
+
+    @task(4)
+    def horarios_disponiveis(self):
+        # Troca de tenant a cada consulta: espalha a carga pelas empresas
+        self.on_start()
+        dados = {'data': data_futura(), 'servico_id': random.choice(self.empresa['servicos'])['id']}
+        if self.empresa['profissionais'] and random.random() < 0.5:
+            dados['profissional_id'] = random.choice(self.empresa['profissionais'])
+        self.client.post('/api/n8n/horarios-disponiveis/', json=dados, headers=self.headers_api)
+
+    @task(2)
+    def contexto(self):
+        headers = dict(self.headers_api)
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        with self.client.get('/api/n8n/contexto/', params={'dias': 7}, headers=headers,
+                             catch_response=True) as resposta:
+            if resposta.status_code in (200, 304):
+                self._etag = resposta.headers.get('ETag', self._etag)
+                resposta.success()
+
+
+@tag('webhook')
+class WebhookUser(TenantUser):
+    """Enxurrada de mensagens entregues pela Evolution"""
+
+    weight = 2
+    wait_time = constant(0)
+
+    @task
+    def mensagem(self):
+        self.on_start()
+        telefone = random.choice(self.empresa['telefones'])
+        self.client.post(
+            '/api/webhooks/whatsapp/',
+            json=mensagem_evolution(self.empresa['instance_name'], telefone, 'quero agendar amanhã'),
+        )
+
+
+@tag('publico')
+class AgendamentoPublicoUser(TenantUser):
+    """Visitante vindo de rede social: página, profissionais e horários"""
+
+    weight = 3
+    wait_time = between(1, 4)
+
+    @task
+    def fluxo_agendamento(self):
+        slug = self.empresa['slug']
+        servico = random.choice(self.empresa['servicos'])
+        self.client.get(f'/agendar/{slug}/', name='/agendar/[slug]/')
+        self.client.get(
+            f'/agendar/{slug}/api/profissionais/', params={'servico_id': servico['id']},
+            name='/agendar/[slug]/api/profissionais/'
+        )
+        dados = {'servico_id': servico['id'], 'data': data_futura()}
+        if self.empresa['profissionais']:
+            dados['profissional_id'] = random.choice(self.empresa['profissionais'])
+        self.client.post(
+            f'/agendar/{slug}/api/horarios-disponiveis/', json=dados,
+            name='/agendar/[slug]/api/horarios-disponiveis/'
+        )
+
+
+@tag('dashboard')
+class DashboardUser(TenantUser):
+    """Dono do negócio abrindo o painel ao longo do dia"""
+
+    weight = 1
+    wait_time = between(2, 6)
+
+    def on_start(self):
+        super().on_start()
+        self.client.get('/app/login/')
+        self.client.post('/app/login/', data={
+            'email_ou_usuario': self.empresa['usuario'],
+            'senha': manifesto()['senha'],
+            'csrfmiddlewaretoken': self.client.cookies.get('csrftoken', ''),
+        }, headers={'Referer': f'{self.host}/app/login/'})
+
+    @task(4)
+    def dashboard(self):
+        self.client.get('/app/dashboard/')
+
+    @task(2)
+    def calendario(self):
+        inicio = date.today() - timedelta(days=date.today().weekday())
+        self.client.get('/app/agendamentos/api/', params={
+            'start': inicio.isoformat(),
+            'end': (inicio + timedelta(days=7)).isoformat(),
+        }, name='/app/agendamentos/api/')
+
+    @task(1)
+    def clientes(self):
+        self.client.get('/app/clientes/')
+
+
+# ============================================
+# RESULTADOS EM JSON (comparáveis entre execuções)
+# ============================================
+
+def _commit_atual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def _resumo_entrada(entrada):
+    return {
+        'metodo': entrada.method,
+        'nome': entrada.name,
+        'requisicoes': entrada.num_requests,
+        'falhas': entrada.num_failures,
+        'rps': round(entrada.total_rps, 2),
+        'media_ms': round(entrada.avg_response_time, 1),
+        'p50_ms': entrada.get_response_time_percentile(0.5),
+        'p95_ms': entrada.get_response_time_percentile(0.95),
+        'p99_ms': entrada.get_response_time_percentile(0.99),
+        'max_ms': round(entrada.max_response_time or 0, 1),
+    }
+
+
+@events.quitting.add_listener
+def salvar_resultado(environment, **kwargs):
+    stats = environment.stats
+    if not stats.total.num_requests:
+        return
+
+    caminho = os.environ.get('CARGA_RESULTADO') or os.path.join(
+        'tests', 'resultados', f"carga-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    parsed = environment.parsed_options
+    resultado = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'host': environment.host,
+        'usuarios': getattr(parsed, 'num_users', None),
+        'tags': getattr(parsed, 'tags', None),
+        'total': _resumo_entrada(stats.total),
+        'endpoints': [_resumo_entrada(e) for e in sorted(stats.entries.values(), key=lambda e: (e.name, e.method))],
+        'erros': [
+            {'metodo': e.method, 'nome': e.name, 'erro': str(e.error), 'ocorrencias': e.occurrences}
+            for e in stats.errors.values()
+        ],
+    }
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f'Resultado salvo em {caminho}')
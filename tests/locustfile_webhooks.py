@@ -0,0 +1,71 @@
+"""
+Teste de carga dos webhooks do WhatsApp (Evolution -> Django -> n8n)
+
+Mede quantos webhooks concorrentes o Django encaminha por segundo quando o
+n8n demora a responder. Compare o servidor WSGI (gunicorn sync) com o
+ASGI (gunicorn + uvicorn workers, views async):
+
+1. Suba o stub do n8n/Evolution, que responde com atraso fixo:
+       python tests/stub_servicos.py --atraso 0.5 --porta 9000
+
+2. Rode o Django apontando para ele (N8N_WEBHOOK_URL=http://localhost:9000/)
+   e com uma empresa com WhatsApp configurado:
+
+   ANTES (WSGI):
+       gunicorn config.wsgi:application --workers 3 --bind 0.0.0.0:8000
+   DEPOIS (ASGI):
+       SERVIDOR_ASGI=True gunicorn config.asgi:application \\
+           -k uvicorn_worker.UvicornWorker --workers 3 --bind 0.0.0.0:8000
+
+3. Dispare a carga (mesmos parâmetros nos dois casos):
+       WEBHOOK_EMPRESA_ID=1 WEBHOOK_SECRET=<secret> WEBHOOK_INSTANCE=<instance> \\
+       locust -f tests/locustfile_webhooks.py --host http://localhost:8000 \\
+           --headless -u 100 -r 20 -t 1m
+
+Com 3 workers sync e 0.5s de atraso o teto é ~6 req/s (3 esperas
+simultâneas); com uvicorn o limite passa a ser o n8n e o banco.
+"""
+import os
+import random
+import time
+
+from locust import HttpUser, task, constant
+
+EMPRESA_ID = os.environ.get('WEBHOOK_EMPRESA_ID', '1')
+SECRET = os.environ.get('WEBHOOK_SECRET', 'secret')
+INSTANCE = os.environ.get('WEBHOOK_INSTANCE', 'gestto_empresa_1')
+
+
+def _mensagem(instance):
+    """Payload no formato do evento messages.upsert da Evolution API"""
+    telefone = f'55119{random.randint(10000000, 99999999)}'
+    return {
+        'event': 'messages.upsert',
+        'instance': instance,
+        'data': {
+            'key': {'remoteJid': f'{telefone}@s.whatsapp.net', 'fromMe': False, 'id': f'{time.time_ns()}'},
+            'pushName': 'Cliente Carga',
+            'message': {'conversation': 'Oi, quero agendar um corte amanhã'},
+            'messageType': 'conversation',
+        },
+    }
+
+
+class WebhookUser(HttpUser):
+    """Evolution API entregando mensagens sem pausa entre elas"""
+
+    wait_time = constant(0)
+
+    @task(3)
+    def webhook_por_empresa(self):
+        """Webhook intermediário (URL com empresa e secret)"""
+        self.client.post(
+            f'/api/webhooks/whatsapp-n8n/{EMPRESA_ID}/{SECRET}/',
+            json=_mensagem(INSTANCE),
+            name='/api/webhooks/whatsapp-n8n/[id]/[secret]/',
+        )
+
+    @task(1)
+    def webhook_global(self):
+        """Webhook global (empresa resolvida pelo instance_name)"""
+        self.client.post('/api/webhooks/whatsapp/', json=_mensagem(INSTANCE))
@@ -0,0 +1,90 @@
+"""
+Stub offline da Evolution API e do n8n para os testes de carga
+
+Responde com atraso configurável (simula a latência real dos serviços):
+- Evolution: connectionState, connect (QR), sendText e criação de instância
+- n8n: qualquer outro POST responde {"ok": true}
+
+Uso:
+    python tests/stub_servicos.py --porta 9000 --atraso 0.3
+
+No Django alvo:
+    N8N_WEBHOOK_URL=http://localhost:9000/webhook/bot
+    EVOLUTION_API_URL=http://localhost:9000
+"""
+import json
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _resposta_evolution(metodo, caminho):
+    """Payload da Evolution para a rota, ou None se não for rota da Evolution"""
+    instancia = caminho.rstrip('/').rsplit('/', 1)[-1]
+    if re.match(r'^/instance/connectionState/', caminho):
+        return {'instance': {'instanceName': instancia, 'state': 'open'}}
+    if re.match(r'^/instance/connect/', caminho):
+        return {'pairingCode': None, 'code': 'stub', 'base64': '', 'count': 1}
+    if re.match(r'^/instance/create', caminho):
+        return {'instance': {'instanceName': 'stub', 'status': 'created'}, 'hash': {'apikey': 'stub'}}
+    if re.match(r'^/message/send\w+/', caminho):
+        return {'key': {'remoteJid': 'stub@s.whatsapp.net', 'fromMe': True, 'id': uuid.uuid4().hex}, 'status': 'PENDING'}
+    if re.match(r'^/(instance|webhook|chat|message)/', caminho):
+        return {'status': 'SUCCESS'}
+    return None
+
+
+def criar_handler(atraso):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _responder(self, metodo):
+            tamanho = int(self.headers.get('Content-Length', 0) or 0)
+            if tamanho:
+                self.rfile.read(tamanho)
+            time.sleep(atraso)
+
+            dados = _resposta_evolution(metodo, self.path)
+            if dados is None:
+                dados = {'ok': True}  # n8n
+            corpo = json.dumps(dados).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            self._responder('GET')
+
+        def do_POST(self):
+            self._responder('POST')
+
+        def do_PUT(self):
+            self._responder('PUT')
+
+        def do_DELETE(self):
+            self._responder('DELETE')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def servir(porta=9000, atraso=0.3):
+    servidor = ThreadingHTTPServer(('0.0.0.0', porta), criar_handler(atraso))
+    servidor.daemon_threads = True
+    print(f'Stub Evolution/n8n em http://localhost:{porta}/ (atraso {atraso}s)')
+    servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Stub offline da Evolution API e do n8n')
+    parser.add_argument('--porta', type=int, default=9000)
+    parser.add_argument('--atraso', type=float, default=0.3, help='Segundos até responder')
+    argumentos = parser.parse_args()
+    servir(argumentos.porta, argumentos.atraso)
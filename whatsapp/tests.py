@@ -1,3 +1,106 @@
-from django.test import TestCase
+import json
+from unittest.mock import AsyncMock, patch
 
-# Create your tests here.
+import httpx
+from django.test import TestCase, override_settings
+
+from empresas.models import Empresa, ConfiguracaoWhatsApp
+
+
+@override_settings(N8N_WEBHOOK_URL='http://n8n.teste/webhook/bot')
+class WebhookAsyncTest(TestCase):
+    """Testes dos webhooks async (encaminhamento ao n8n via httpx)"""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nome='Empresa Webhook',
+            slug='empresa-webhook',
+            telefone='11999999999',
+            email='webhook@teste.com',
+            cnpj='55.666.777/0001-88'
+        )
+        # Configuração criada automaticamente pelo signal de Empresa
+        ConfiguracaoWhatsApp.objects.filter(empresa=self.empresa).update(
+            instance_name='gestto_empresa_webhook',
+            webhook_secret='segredo'
+        )
+        self.payload = {
+            'event': 'messages.upsert',
+            'instance': 'gestto_empresa_webhook',
+            'data': {'message': {'conversation': 'oi'}},
+        }
+
+    def _post(self, url):
+        return self.client.post(url, json.dumps(self.payload), content_type='application/json')
+
+    @patch('whatsapp.views.post_json', new_callable=AsyncMock)
+    def test_webhook_global_encaminha_com_contexto(self, post_json):
+        post_json.return_value = httpx.Response(200, json={'ok': True})
+
+        response = self._post('/api/webhooks/whatsapp/')
+
+        self.assertEqual(response.status_code, 200)
+        url, payload = post_json.await_args.args
+        self.assertEqual(url, 'http://n8n.teste/webhook/bot')
+        self.assertEqual(payload['empresa_id'], self.empresa.id)
+        self.assertEqual(payload['body'], self.payload)
+        # Campos da Evolution também no topo, como quando o n8n era o webhook da instância
+        self.assertEqual(payload['data'], self.payload['data'])
+
+    @patch('whatsapp.views.post_json', new_callable=AsyncMock)
+    def test_webhook_global_registra_ack_sem_encaminhar(self, post_json):
+        from django.utils import timezone
+        from empresas.models import MensagemWhatsApp, StatusMensagemWhatsApp
+
+        mensagem = MensagemWhatsApp.objects.create(
+            empresa=self.empresa, tipo='lembrete_1_dia', instance_name='gestto_empresa_webhook',
+            numero='5511999999999', mensagem='Lembrete', status=StatusMensagemWhatsApp.ENVIADA,
+            proxima_tentativa=timezone.now(), message_id='3EB0ACK123',
+        )
+        self.payload = {
+            'event': 'messages.update',
+            'instance': 'gestto_empresa_webhook',
+            'data': {'keyId': '3EB0ACK123', 'status': 'DELIVERY_ACK'},
+        }
+
+        response = self._post('/api/webhooks/whatsapp/')
+
+        self.assertEqual(response.status_code, 200)
+        mensagem.refresh_from_db()
+        self.assertEqual(mensagem.status, StatusMensagemWhatsApp.ENTREGUE)
+        self.assertIsNotNone(mensagem.entregue_em)
+        post_json.assert_not_awaited()
+
+    @patch('whatsapp.views.post_json', new_callable=AsyncMock)
+    def test_webhook_global_timeout_n8n(self, post_json):
+        post_json.side_effect = httpx.ReadTimeout('timeout')
+
+        self.assertEqual(self._post('/api/webhooks/whatsapp/').status_code, 504)
+
+    def test_webhook_global_instancia_desconhecida(self):
+        self.payload['instance'] = 'nao-existe'
+        self.assertEqual(self._post('/api/webhooks/whatsapp/').status_code, 404)
+
+    @patch('core.http_async.post_json', new_callable=AsyncMock)
+    def test_webhook_por_empresa_valida_secret(self, post_json):
+        post_json.return_value = httpx.Response(200, json={'ok': True})
+        url = f'/api/webhooks/whatsapp-n8n/{self.empresa.id}/segredo/'
+
+        # Empresa sem assinatura ativa não é encaminhada
+        self.assertEqual(self._post(url).status_code, 402)
+        self.assertEqual(
+            self._post(f'/api/webhooks/whatsapp-n8n/{self.empresa.id}/errado/').status_code, 403
+        )
+        post_json.assert_not_awaited()
+
+    @patch('whatsapp.views.post_json', new_callable=AsyncMock)
+    async def test_webhook_global_via_asgi(self, post_json):
+        """Mesmo fluxo servido pelo handler ASGI (AsyncClient)"""
+        post_json.return_value = httpx.Response(200, json={'ok': True})
+
+        response = await self.async_client.post(
+            '/api/webhooks/whatsapp/', self.payload, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        post_json.assert_awaited_once()
@@ -1,17 +1,49 @@
 import json
 import logging
-import requests
+import httpx
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.conf import settings
 from empresas.models import WhatsAppInstance, ConfiguracaoWhatsApp, Empresa
+from core.http_async import post_json
 
 logger = logging.getLogger(__name__)
 
 
+def _resolver_empresa_instancia(instance_name):
+    """(empresa, config) pelo instance_name, ou (None, None) se desconhecida."""
+    try:
+        # Busca via ConfiguracaoWhatsApp (relação com Empresa)
+        config = ConfiguracaoWhatsApp.objects.select_related("empresa").get(
+            instance_name=instance_name
+        )
+        empresa = config.empresa
+        logger.info(f"[Webhook] Empresa identificada: {empresa.nome} (ID={empresa.id})")
+        return empresa, config
+    except ConfiguracaoWhatsApp.DoesNotExist:
+        pass
+
+    # Fallback: buscar via WhatsAppInstance
+    try:
+        instance = WhatsAppInstance.objects.select_related("empresa").get(
+            instance_name=instance_name
+        )
+    except WhatsAppInstance.DoesNotExist:
+        return None, None
+    empresa = instance.empresa
+    logger.info(f"[Webhook] Empresa via fallback: {empresa.nome}")
+    return empresa, getattr(empresa, 'config_whatsapp', None)
+
+
+def _processar_evento_local(config, body):
+    from empresas.services.evolution_api import EvolutionAPIService
+    EvolutionAPIService(config).processar_webhook(body)
+
+
 @csrf_exempt
-def webhook_whatsapp_global(request):
+async def webhook_whatsapp_global(request):
     """
     Webhook global que recebe eventos da Evolution API
     e encaminha ao n8n com contexto da empresa.
@@ -19,8 +51,16 @@ def webhook_whatsapp_global(request):
     Fluxo:
     1. Evolution API envia evento para este webhook
     2. Identifica a empresa pelo instance_name
-    3. Processa evento localmente (QR, conexão)
-    4. Encaminha para n8n com dados enriquecidos
+    3. Processa evento localmente (QR, conexão, acks de entrega)
+    4. Encaminha para n8n com dados enriquecidos; acks (MESSAGES_UPDATE)
+       ficam só aqui
+
+    O n8n recebe o payload da Evolution como veio (mesmos campos de quando
+    a instância apontava direto para ele) mais empresa_id, empresa_slug,
+    empresa_nome e o original em "body".
+
+    View async: servindo por ASGI, a espera pelo n8n não prende um worker.
+    As partes com ORM rodam em sync_to_async.
     """
 
     if request.method != 'POST':
@@ -46,33 +86,20 @@ def webhook_whatsapp_global(request):
     # =============================
     # 2. Resolução da empresa
     # =============================
-    try:
-        # Busca via ConfiguracaoWhatsApp (relação com Empresa)
-        config = ConfiguracaoWhatsApp.objects.select_related("empresa").get(
-            instance_name=instance_name
-        )
-        empresa = config.empresa
-        logger.info(f"[Webhook] Empresa identificada: {empresa.nome} (ID={empresa.id})")
-    except ConfiguracaoWhatsApp.DoesNotExist:
-        # Fallback: buscar via WhatsAppInstance
-        try:
-            instance = WhatsAppInstance.objects.select_related("empresa").get(
-                instance_name=instance_name
-            )
-            empresa = instance.empresa
-            config = getattr(empresa, 'config_whatsapp', None)
-            logger.info(f"[Webhook] Empresa via fallback: {empresa.nome}")
-        except WhatsAppInstance.DoesNotExist:
-            logger.error(f"[Webhook] Instância desconhecida: {instance_name}")
-            return JsonResponse({'error': 'Instância não reconhecida'}, status=404)
+    empresa, config = await sync_to_async(_resolver_empresa_instancia)(instance_name)
+    if empresa is None:
+        logger.error(f"[Webhook] Instância desconhecida: {instance_name}")
+        return JsonResponse({'error': 'Instância não reconhecida'}, status=404)
 
     # =============================
     # 3. Processar evento localmente
     # =============================
     if config:
-        from empresas.services.evolution_api import EvolutionAPIService
-        service = EvolutionAPIService(config)
-        service.processar_webhook(body)
+        await sync_to_async(_processar_evento_local)(config, body)
+
+    # Acks de entrega só interessam à fila de envio (empresas/fila_whatsapp.py)
+    if str(event_type).upper().replace('.', '_') == 'MESSAGES_UPDATE':
+        return JsonResponse({"success": True, "processed": "ack"})
 
     # =============================
     # 4. Encaminhar para n8n
@@ -84,6 +111,7 @@ def webhook_whatsapp_global(request):
 
     # Monta payload enriquecido para o n8n
     payload_n8n = {
+        **body,
         "instance": instance_name,
         "empresa_id": empresa.id,
         "empresa_slug": empresa.slug,
@@ -93,7 +121,7 @@ def webhook_whatsapp_global(request):
     }
 
     try:
-        response = requests.post(n8n_url, json=payload_n8n, timeout=10)
+        response = await post_json(n8n_url, payload_n8n, timeout=10)
 
         if response.status_code == 200:
             logger.info(f"[Webhook] Encaminhado ao n8n: empresa={empresa.nome}")
@@ -105,11 +133,11 @@ def webhook_whatsapp_global(request):
             "error": f"Erro ao encaminhar para o n8n ({response.status_code})"
         }, status=500)
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         logger.error(f"[Webhook] Timeout n8n ({n8n_url})")
         return JsonResponse({"error": "Timeout ao conectar ao n8n"}, status=504)
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"[Webhook] Falha n8n: {str(e)}")
         return JsonResponse({"error": "Falha de conexão com n8n"}, status=502)
 